@@ -0,0 +1,85 @@
+# Benchmark of slip category recognizers: accuracy on hold-out lines, training time and latency of one slip recognition.
+# Categorized lines are taken from 'map_category' table of given database or are generated randomly:
+#     python benchmarks/category_recognizer.py --db jal/jal.sqlite
+#     python benchmarks/category_recognizer.py --lines 5000 --categories 40
+# Only recognizers which dependencies are installed are measured (Tensorflow is required for keras one).
+import os
+import sys
+import random
+import sqlite3
+import argparse
+import logging
+from timeit import default_timer as timer
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from jal.data_import.category_recognizer import available_recognizers
+
+SLIP_SIZE = 20
+UNITS = ['1L', '0.5L', '900ML', '1KG', '400G', '250 G', '10 ШТ', '2%', '3.2%', '']
+
+
+# Returns a list of {'value', 'mapped_to'} that is read from 'map_category' table of database file
+def load_lines(db_file: str) -> list:
+    db = sqlite3.connect(db_file)
+    lines = [{'value': value, 'mapped_to': mapped_to} for value, mapped_to in
+             db.execute("SELECT value, mapped_to FROM map_category")]
+    db.close()
+    return lines
+
+
+# Generates random product names: every category has its own words and also all categories share some common words
+def generate_lines(count: int, categories: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    word = lambda: ''.join(rnd.choice('ABCDEFGHIKLMNOPRSTUVXYZ') for _ in range(rnd.randint(3, 9)))
+    common = [word() for _ in range(50)]
+    vocabulary = [[word() for _ in range(20)] for _ in range(categories)]
+    lines = {}
+    while len(lines) < count:
+        category = rnd.randrange(categories)
+        words = rnd.sample(vocabulary[category], rnd.randint(1, 3)) + rnd.sample(common, rnd.randint(0, 2))
+        rnd.shuffle(words)
+        lines[' '.join(words + [rnd.choice(UNITS)]).strip()] = category + 1
+    return [{'value': value, 'mapped_to': category} for value, category in lines.items()]
+
+
+# Trains recognizer and returns a tuple: (training time in s, accuracy, average time of one slip recognition in ms)
+def measure(recognizer, train: list, test: list) -> tuple:
+    start = timer()
+    recognizer.train(train)
+    train_time = timer() - start
+    predicted = []
+    start = timer()
+    for i in range(0, len(test), SLIP_SIZE):
+        predicted += recognizer.predict([x['value'] for x in test[i:i + SLIP_SIZE]])[0]
+    slips = (len(test) + SLIP_SIZE - 1) // SLIP_SIZE
+    slip_time = (timer() - start) / slips * 1e3
+    accuracy = sum(1 for x, category in zip(test, predicted) if x['mapped_to'] == category) / len(test)
+    return train_time, accuracy, slip_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of slip category recognizers")
+    parser.add_argument("--db", default='', help="Database file to take categorized lines from")
+    parser.add_argument("--lines", type=int, default=3000, help="How many lines to generate if no database is given")
+    parser.add_argument("--categories", type=int, default=30, help="How many categories to generate")
+    parser.add_argument("--test", type=float, default=0.2, help="Share of lines that is used for accuracy check")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for data generation and hold-out split")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    lines = load_lines(args.db) if args.db else generate_lines(args.lines, args.categories, args.seed)
+    random.Random(args.seed).shuffle(lines)
+    test_size = max(1, int(len(lines) * args.test))
+    train, test = lines[test_size:], lines[:test_size]
+    print(f"{len(train)} lines for training, {len(test)} lines for test, slip size {SLIP_SIZE}")
+    for recognizer_class in available_recognizers():
+        train_time, accuracy, slip_time = measure(recognizer_class(), train, test)
+        print(f"{recognizer_class.name:>8}: accuracy {accuracy:.1%}, training {train_time:.2f}s, "
+              f"recognition {slip_time:.1f}ms per slip")
+
+
+if __name__ == "__main__":
+    main()
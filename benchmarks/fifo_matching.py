@@ -0,0 +1,97 @@
+# Benchmark of ledger re-build with FIFO matching of trades.
+# It takes trades from 'deals_set.tgz' backup of test data and puts several copies of them into a new database
+# (every copy is shifted in time after the previous one) in order to get more deals for matching.
+# Then ledger is re-built from scratch and elapsed time is reported together with number of deals created.
+# Script uses only public Ledger methods so the same script may be used to compare different code revisions:
+#     python benchmarks/fifo_matching.py --copies 50
+import os
+import sys
+import sqlite3
+import tarfile
+import argparse
+import logging
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+from timeit import default_timer as timer
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from jal.constants import Setup, PredefinedAsset, PredefindedAccountType, PredefinedCategory
+from jal.db.db import JalDB, JalDBError
+from jal.db.peer import JalPeer
+from jal.db.account import JalAccount
+from jal.db.asset import JalAsset
+from jal.db.operations import LedgerTransaction
+from jal.db.ledger import Ledger
+
+DEALS_SET = ROOT_PATH + os.sep + "tests" + os.sep + "test_data" + os.sep + "deals_set.tgz"
+
+
+# Returns a list of trades from 'deals_set.tgz' as tuples (timestamp, settlement, symbol, qty, price, fee)
+def load_deals_set(tmp_path: str) -> list:
+    with tarfile.open(DEALS_SET, "r:gz") as tar:
+        tar.extract(Setup.DB_PATH, tmp_path + os.sep + "backup")
+    db = sqlite3.connect(tmp_path + os.sep + "backup" + os.sep + Setup.DB_PATH)
+    trades = db.execute("SELECT t.timestamp, t.settlement, a.name, t.qty, t.price, t.fee FROM trades t "
+                        "LEFT JOIN assets a ON a.id=t.asset_id ORDER BY t.timestamp, t.id").fetchall()
+    db.close()
+    return trades
+
+
+# Creates a new database in 'db_path' folder with one investment account and puts 'copies' copies of 'trades' into it
+def prepare_db(db_path: str, trades: list, copies: int) -> None:
+    copyfile(ROOT_PATH + os.sep + "jal" + os.sep + Setup.INIT_SCRIPT_PATH, db_path + Setup.INIT_SCRIPT_PATH)
+    error = JalDB().init_db(db_path)
+    if error.code != JalDBError.NoError:
+        raise RuntimeError(f"DB initialization failed: {error.message} {error.details}")
+    JalPeer(data={'name': 'Broker', 'parent': 0}, create=True)
+    account = JalAccount(data={'type': PredefindedAccountType.Investment, 'name': 'Benchmark', 'number': 'B1',
+                               'currency': 1, 'active': 1, 'organization': 1}, create=True)
+    assets = {}
+    for symbol in sorted(set(x[2] for x in trades)):
+        asset = JalAsset(data={'type': PredefinedAsset.Stock, 'name': f"{symbol} SHARE"}, create=True)
+        asset.add_symbol(symbol, 1, '')
+        assets[symbol] = asset.id()
+    begin = trades[0][0]
+    period = trades[-1][0] - begin + 86400
+    LedgerTransaction.create_new(LedgerTransaction.IncomeSpending, {
+        'timestamp': begin - 86400, 'account_id': account.id(), 'peer_id': 1,
+        'lines': [{'amount': 1e9, 'category_id': PredefinedCategory.StartingBalance}]})
+    JalDB().enable_triggers(False)
+    for i in range(copies):
+        for timestamp, settlement, symbol, qty, price, fee in trades:
+            _ = JalDB._exec("INSERT INTO trades (timestamp, settlement, account_id, asset_id, qty, price, fee) "
+                            "VALUES (:timestamp, :settlement, :account_id, :asset_id, :qty, :price, :fee)",
+                            [(":timestamp", timestamp + i * period), (":settlement", settlement + i * period),
+                             (":account_id", account.id()), (":asset_id", assets[symbol]),
+                             (":qty", str(qty)), (":price", str(price)), (":fee", str(fee))])
+    JalDB().enable_triggers(True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of ledger re-build with FIFO deals matching")
+    parser.add_argument("--copies", type=int, default=20, help="How many copies of initial trades to create")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to re-build ledger")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    _app = QApplication([])
+    with TemporaryDirectory(prefix="jal_bench_") as tmp_path:
+        db_path = tmp_path + os.sep
+        prepare_db(db_path, load_deals_set(tmp_path), args.copies)
+        trades = JalDB._read("SELECT COUNT(*) FROM trades")
+        timings = []
+        for _i in range(args.repeat):
+            start = timer()
+            Ledger().rebuild(from_timestamp=0)
+            timings.append(timer() - start)
+        deals = JalDB._read("SELECT COUNT(*) FROM trades_closed")
+        JalDB.connection().close()
+    print(f"trades: {trades}, deals: {deals}, rebuild time (best of {args.repeat}): {min(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
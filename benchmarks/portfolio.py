@@ -0,0 +1,271 @@
+# Deterministic generator of a large synthetic portfolio for benchmarks.
+# It creates a new database with a cash account full of categorized expenses and several investment accounts with
+# trades, dividends, transfers and stock splits of assets that have daily quotes history. The same seed and sizes give
+# exactly the same database, so timings of different code revisions may be compared.
+# Also it may create a statement file in JSON import format with new operations for the generated database.
+# Module is used by 'suite.py' but it may be run alone to prepare a database for manual checks:
+#     python benchmarks/portfolio.py --path /tmp/bench/ --trades 20000
+import os
+import sys
+import json
+import random
+import argparse
+import logging
+from decimal import Decimal
+from datetime import datetime, timezone
+from shutil import copyfile
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from jal.constants import Setup, PredefinedAsset, PredefindedAccountType, PredefinedCategory
+from jal.db.db import JalDB, JalDBError
+from jal.db.peer import JalPeer
+from jal.db.account import JalAccount
+from jal.db.asset import JalAsset
+from jal.db.operations import LedgerTransaction, Dividend, CorporateAction
+
+BEGIN = int(datetime(2019, 1, 1, tzinfo=timezone.utc).timestamp())
+DAY = 86400
+USD = 2    # ID of USD currency that is created by DB initialization script
+RUB = 1    # ID of RUB currency
+DEFAULT_SIZES = {'accounts': 3, 'assets': 40, 'trades': 5000, 'expenses': 10000, 'splits': 5, 'years': 4}
+
+
+# Creates a new database in 'db_path' folder (it should end with path separator)
+def create_db(db_path: str) -> None:
+    copyfile(ROOT_PATH + os.sep + "jal" + os.sep + Setup.INIT_SCRIPT_PATH, db_path + Setup.INIT_SCRIPT_PATH)
+    error = JalDB().init_db(db_path)
+    if error.code != JalDBError.NoError:
+        raise RuntimeError(f"DB initialization failed: {error.message} {error.details}")
+
+
+# Returns random walk of daily prices (starting from 'start') for 'days' days. Prices are divided by 2 at split days.
+def price_history(rnd: random.Random, start: float, days: int, splits: set) -> list:
+    prices = []
+    price = start
+    for day in range(days):
+        if day in splits:
+            price /= 2
+        price = max(0.5, price * (1 + rnd.gauss(0.0003, 0.02)))
+        prices.append(round(price, 2))
+    return prices
+
+
+# Creates peers, accounts, categories and tags. Returns a tuple (cash account, list of investment accounts,
+# list of shop peer ids, employer peer id, list of spending category ids, salary category id, list of tag ids)
+def create_references(rnd: random.Random, accounts: int) -> tuple:
+    broker = JalPeer(data={'name': 'Broker', 'parent': 0}, create=True).id()
+    shops = [JalPeer(data={'name': f"Shop {i + 1}", 'parent': 0}, create=True).id() for i in range(20)]
+    employer = JalPeer(data={'name': 'Employer', 'parent': 0}, create=True).id()
+    cash = JalAccount(data={'type': PredefindedAccountType.Cash, 'name': 'Wallet', 'number': 'N/A', 'currency': RUB,
+                            'active': 1}, create=True).id()
+    investment = [JalAccount(data={'type': PredefindedAccountType.Investment, 'name': f"Broker {i + 1}",
+                                   'number': f"B{i + 1:05d}", 'currency': USD, 'active': 1, 'organization': broker,
+                                   'country': 'us', 'precision': 2}, create=True).id() for i in range(accounts)]
+    categories = []
+    for group in ['Food', 'Transport', 'Home', 'Health', 'Leisure']:
+        parent = JalDB._exec("INSERT INTO categories (pid, name, often, special) VALUES (:pid, :name, 0, 0)",
+                             [(":pid", PredefinedCategory.Spending), (":name", group)]).lastInsertId()
+        for i in range(6):
+            query = JalDB._exec("INSERT INTO categories (pid, name, often, special) VALUES (:pid, :name, 0, 0)",
+                                [(":pid", parent), (":name", f"{group} {i + 1}")])
+            categories.append(query.lastInsertId())
+    salary = JalDB._exec("INSERT INTO categories (pid, name, often, special) VALUES (:pid, 'Salary', 0, 0)",
+                         [(":pid", PredefinedCategory.Income)]).lastInsertId()
+    tags = [JalDB._exec("INSERT INTO tags (tag) VALUES (:tag)", [(":tag", f"Tag {i + 1}")]).lastInsertId()
+            for i in range(10)]
+    LedgerTransaction.create_new(LedgerTransaction.IncomeSpending, {
+        'timestamp': BEGIN - DAY, 'account_id': cash, 'peer_id': employer,
+        'lines': [{'amount': 1e8, 'category_id': PredefinedCategory.StartingBalance}]})
+    for account in investment:
+        LedgerTransaction.create_new(LedgerTransaction.IncomeSpending, {
+            'timestamp': BEGIN - DAY, 'account_id': account, 'peer_id': broker,
+            'lines': [{'amount': 1e8, 'category_id': PredefinedCategory.StartingBalance}]})
+    rnd.shuffle(categories)    # to have different categories popular in different generations
+    return cash, investment, shops, employer, categories, salary, tags
+
+
+# Creates 'count' stocks with quotes history for 'days' days and USD/RUB rates history.
+# Returns a tuple (list of asset ids, {asset_id: list of prices}, {asset_id: set of split days})
+def create_assets(rnd: random.Random, count: int, days: int, splits: int) -> tuple:
+    assets = []
+    for i in range(count):
+        asset_type = PredefinedAsset.ETF if i % 10 == 9 else PredefinedAsset.Stock
+        asset = JalAsset(data={'type': asset_type, 'name': f"SYNTHETIC COMPANY {i + 1}",
+                               'isin': f"US{i + 1:09d}0", 'country': 'us'}, create=True)
+        asset.add_symbol(f"S{i + 1:04d}", USD, 'SYNTHETIC')
+        assets.append(asset.id())
+    split_days = {x: set() for x in assets}
+    for _i in range(splits):
+        split_days[rnd.choice(assets)].add(rnd.randrange(30, days))
+    prices = {x: price_history(rnd, rnd.uniform(10, 500), days, split_days[x]) for x in assets}
+    timestamps = [BEGIN + day * DAY for day in range(days)]
+    quotes = {(x, USD): (timestamps, [Decimal(str(price)) for price in prices[x]]) for x in assets}
+    quotes[(USD, RUB)] = (timestamps, [Decimal(str(rate)) for rate in price_history(rnd, 70, days, set())])
+    JalAsset.store_quotes(quotes)
+    return assets, prices, split_days
+
+
+# Returns a list of events (timestamp, kind, data) sorted by time. Events are applied in 'create_operations()'
+def plan_events(rnd: random.Random, sizes: dict, days: int, assets: list, split_days: dict) -> list:
+    events = []
+    for _i in range(sizes['trades']):
+        day = rnd.randrange(days)
+        events.append((BEGIN + day * DAY + rnd.randrange(36000, 57600), 'trade', day))
+    for asset in assets:
+        for day in split_days[asset]:
+            events.append((BEGIN + day * DAY + 28800, 'split', asset))
+        for day in range(rnd.randrange(60, 90), days, 91):    # quarterly dividends
+            events.append((BEGIN + day * DAY + 72000, 'dividend', (asset, day)))
+    for day in range(15, days, 30):
+        events.append((BEGIN + day * DAY + 43200, 'transfer', day))
+        events.append((BEGIN + day * DAY + 32400, 'salary', day))
+    for _i in range(sizes['expenses']):
+        events.append((BEGIN + rnd.randrange(days * DAY), 'expense', None))
+    events.sort(key=lambda x: (x[0], x[1]))
+    return events
+
+
+# Creates operations for planned events. Trades never sell more than account has so holdings stay positive.
+# Returns a dict with count of created operations of every kind
+def create_operations(rnd: random.Random, events: list, references: tuple, assets: list, prices: dict) -> dict:
+    cash, investment, shops, employer, categories, salary, tags = references
+    positions = {(account, asset): 0 for account in investment for asset in assets}
+    counts = {'trade': 0, 'split': 0, 'dividend': 0, 'transfer': 0, 'salary': 0, 'expense': 0}
+    for timestamp, kind, data in events:
+        if kind == 'trade':
+            account, asset = rnd.choice(investment), rnd.choice(assets)
+            held = positions[(account, asset)]
+            qty = -rnd.randint(1, held) if held and rnd.random() < 0.45 else rnd.randint(1, 100)
+            positions[(account, asset)] += qty
+            LedgerTransaction.create_new(LedgerTransaction.Trade, {
+                'timestamp': timestamp, 'settlement': timestamp + 2 * DAY, 'account_id': account, 'asset_id': asset,
+                'qty': qty, 'price': prices[asset][data], 'fee': round(abs(qty) * 0.01 + 1, 2),
+                'number': f"T{counts['trade'] + 1}"})
+        elif kind == 'split':
+            for account in investment:
+                held = positions[(account, data)]
+                if held:
+                    positions[(account, data)] = 2 * held
+                    LedgerTransaction.create_new(LedgerTransaction.CorporateAction, {
+                        'timestamp': timestamp, 'account_id': account, 'type': CorporateAction.Split,
+                        'asset_id': data, 'qty': held, 'note': "SPLIT 2 FOR 1",
+                        'outcome': [{'asset_id': data, 'qty': 2 * held, 'value_share': 1.0}]})
+                    counts[kind] += 1
+            continue
+        elif kind == 'dividend':
+            asset, day = data
+            for account in investment:
+                held = positions[(account, asset)]
+                if held:
+                    amount = round(held * prices[asset][day] * 0.005, 2)
+                    LedgerTransaction.create_new(LedgerTransaction.Dividend, {
+                        'timestamp': timestamp, 'type': Dividend.Dividend, 'account_id': account, 'asset_id': asset,
+                        'amount': amount, 'tax': round(amount * 0.1, 2), 'note': f"S{asset} CASH DIVIDEND"})
+                    counts[kind] += 1
+            continue
+        elif kind == 'transfer':
+            if len(investment) < 2:
+                continue
+            source, target = rnd.sample(investment, 2)
+            amount = rnd.randrange(1000, 10000)
+            LedgerTransaction.create_new(LedgerTransaction.Transfer, {
+                'withdrawal_timestamp': timestamp, 'withdrawal_account': source, 'withdrawal': amount,
+                'deposit_timestamp': timestamp, 'deposit_account': target, 'deposit': amount})
+        elif kind == 'salary':
+            LedgerTransaction.create_new(LedgerTransaction.IncomeSpending, {
+                'timestamp': timestamp, 'account_id': cash, 'peer_id': employer,
+                'lines': [{'amount': rnd.randrange(100000, 200000), 'category_id': salary}]})
+        elif kind == 'expense':
+            # Popular categories are used more often, as it happens in real life
+            lines = [{'amount': -round(rnd.uniform(10, 5000), 2),
+                      'category_id': categories[min(int(rnd.expovariate(0.15)), len(categories) - 1)],
+                      'tag_id': rnd.choice(tags) if rnd.random() < 0.2 else None,
+                      'note': f"Item {rnd.randrange(1000)}"} for _i in range(rnd.randint(1, 4))]
+            LedgerTransaction.create_new(LedgerTransaction.IncomeSpending, {
+                'timestamp': timestamp, 'account_id': cash, 'peer_id': rnd.choice(shops), 'lines': lines})
+        counts[kind] += 1
+    return counts
+
+
+# Creates a new database in 'db_path' folder and fills it with synthetic data of given 'sizes' (see DEFAULT_SIZES).
+# Returns a dict with description of generated data: period, ids of accounts and counts of created records
+def generate_portfolio(db_path: str, sizes: dict, seed: int) -> dict:
+    sizes = {**DEFAULT_SIZES, **sizes}
+    rnd = random.Random(seed)
+    days = sizes['years'] * 365
+    create_db(db_path)
+    if not JalDB.begin_bulk():
+        raise RuntimeError("Failed to start DB transaction")
+    try:
+        references = create_references(rnd, sizes['accounts'])
+        assets, prices, split_days = create_assets(rnd, sizes['assets'], days, sizes['splits'])
+        events = plan_events(rnd, sizes, days, assets, split_days)
+        counts = create_operations(rnd, events, references, assets, prices)
+    except Exception:
+        JalDB.end_bulk(commit=False)
+        raise
+    if not JalDB.end_bulk():
+        raise RuntimeError("Failed to save generated data into database")
+    counts['quotes'] = days * (len(assets) + 1)
+    return {'begin': BEGIN, 'end': BEGIN + days * DAY - 1, 'cash_account': references[0],
+            'investment_accounts': references[1], 'assets': assets, 'counts': counts}
+
+
+# Writes a statement file in JSON import format with 'trades' buy trades and dividends for every bought asset.
+# All operations belong to the first investment account of 'portfolio' and are dated after 'shift' days from its end
+def generate_statement(filename: str, portfolio: dict, trades: int, seed: int, shift: int = 0) -> None:
+    rnd = random.Random(seed)
+    begin = portfolio['end'] + 1 + shift * DAY
+    end = begin + 30 * DAY - 1
+    statement = {'period': [begin, end],
+                 'accounts': [{'id': 1, 'number': JalAccount(portfolio['investment_accounts'][0]).number(),
+                               'currency': 1, 'precision': 2}],
+                 'assets': [{'id': 1, 'type': 'money', 'name': ''}],
+                 'symbols': [{'id': 1, 'asset': 1, 'symbol': 'USD'}],
+                 'assets_data': [], 'trades': [], 'income_spending': [], 'transfers': [], 'corporate_actions': [],
+                 'asset_payments': []}
+    for i, asset_id in enumerate(portfolio['assets']):
+        asset = JalAsset(asset_id)
+        statement['assets'].append({'id': i + 2, 'type': 'stock', 'name': asset.name(), 'isin': asset.isin()})
+        statement['symbols'].append({'id': i + 2, 'asset': i + 2, 'symbol': asset.symbol(USD), 'currency': 1,
+                                     'note': 'SYNTHETIC'})
+    bought = set()
+    for i in range(trades):
+        timestamp = begin + rnd.randrange(29 * DAY)
+        asset = rnd.randrange(len(portfolio['assets'])) + 2
+        bought.add(asset)
+        statement['trades'].append({'id': i + 1, 'number': f"S{shift}-{i + 1}", 'timestamp': timestamp,
+                                    'settlement': timestamp + 2 * DAY, 'account': 1, 'asset': asset,
+                                    'quantity': rnd.randint(1, 100), 'price': round(rnd.uniform(10, 500), 2),
+                                    'fee': 1.0})
+    for i, asset in enumerate(sorted(bought)):
+        statement['asset_payments'].append({'id': i + 1, 'type': 'dividend', 'account': 1, 'timestamp': end - DAY,
+                                            'number': f"D{shift}-{i + 1}", 'asset': asset,
+                                            'amount': round(rnd.uniform(1, 100), 2), 'tax': 0.5,
+                                            'description': "CASH DIVIDEND"})
+    with open(filename, 'w', encoding='utf-8') as statement_file:
+        json.dump(statement, statement_file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator of a synthetic portfolio database")
+    parser.add_argument("--path", required=True, help="Folder to create database in")
+    for name, value in DEFAULT_SIZES.items():
+        parser.add_argument(f"--{name}", type=int, default=value, help=f"Number of {name} to generate")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of random data generation")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    _app = QApplication([])
+    portfolio = generate_portfolio(args.path.rstrip(os.sep) + os.sep,
+                                   {x: getattr(args, x) for x in DEFAULT_SIZES}, args.seed)
+    JalDB.connection().close()
+    print(json.dumps(portfolio['counts']))
+
+
+if __name__ == "__main__":
+    main()
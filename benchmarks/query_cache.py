@@ -0,0 +1,69 @@
+# Micro-benchmark of JalDB._exec() overhead with and without prepared queries cache.
+# It measures time of many small reads with JalDB._read() and inserts with JalDB._exec() in a new empty database.
+# Queries cache is disabled for the first run by setting JalDB.QUERY_CACHE_SIZE to 0:
+#     python benchmarks/query_cache.py --calls 20000
+import os
+import sys
+import argparse
+import logging
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+from timeit import default_timer as timer
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from jal.constants import Setup
+from jal.db.db import JalDB, JalDBError
+
+
+# Executes 'calls' reads and 'calls' inserts and returns a tuple with time per one read and per one insert (in us)
+def measure(calls: int) -> tuple:
+    _ = JalDB._exec("DELETE FROM quotes")
+    start = timer()
+    for i in range(calls):
+        _ = JalDB._read("SELECT full_name FROM assets WHERE id=:id", [(":id", i % 3 + 1)])
+    read_time = timer() - start
+    JalDB.connection().transaction()   # Keep inserts in one transaction to measure query overhead but not disk sync
+    start = timer()
+    for i in range(calls):
+        _ = JalDB._exec("INSERT INTO quotes (timestamp, asset_id, currency_id, quote) "
+                        "VALUES (:timestamp, :asset_id, :currency_id, :quote)",
+                        [(":timestamp", i), (":asset_id", 2), (":currency_id", 1), (":quote", "1.0")])
+    insert_time = timer() - start
+    JalDB().commit()
+    return read_time / calls * 1e6, insert_time / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of prepared queries cache")
+    parser.add_argument("--calls", type=int, default=10000, help="How many reads and inserts to execute")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    _app = QApplication([])
+    with TemporaryDirectory(prefix="jal_bench_") as tmp_path:
+        db_path = tmp_path + os.sep
+        copyfile(ROOT_PATH + os.sep + "jal" + os.sep + Setup.INIT_SCRIPT_PATH, db_path + Setup.INIT_SCRIPT_PATH)
+        error = JalDB().init_db(db_path)
+        if error.code != JalDBError.NoError:
+            raise RuntimeError(f"DB initialization failed: {error.message} {error.details}")
+        cache_size = JalDB.QUERY_CACHE_SIZE
+        JalDB.QUERY_CACHE_SIZE = 0
+        no_cache = measure(args.calls)
+        JalDB.QUERY_CACHE_SIZE = cache_size
+        stats_before = JalDB.query_cache_stats()
+        cached = measure(args.calls)
+        stats = JalDB.query_cache_stats()
+        stats = {key: stats[key] - stats_before[key] for key in ['hits', 'misses']}
+        JalDB._drop_query_cache()
+        JalDB.connection().close()
+    print(f"without cache: read {no_cache[0]:.1f}us, insert {no_cache[1]:.1f}us per call")
+    print(f"with cache:    read {cached[0]:.1f}us, insert {cached[1]:.1f}us per call "
+          f"(hits: {stats['hits']}, misses: {stats['misses']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Benchmark suite that measures main scenarios of application usage on a large synthetic portfolio.
+# Database is generated by 'portfolio.py' with given sizes and seed, then every scenario is run several times:
+#     ledger_rebuild       - full re-build of ledger with FIFO matching of trades
+#     operations_scroll    - load of operations list and display of all its rows (as if it is scrolled till the end)
+#     holdings             - re-calculation of holdings for the last date of the portfolio
+#     report_*             - preparation of every report from 'jal/reports' for the whole portfolio period
+#     taxes_russia         - Russian tax report for every investment account
+#     statement_import     - import of JSON statement with new trades and dividends
+# Results are printed and saved as JSON in order to track them between code revisions:
+#     python benchmarks/suite.py --trades 20000 --output results.json
+#     python benchmarks/suite.py --scenario report_ --repeat 5
+import os
+import sys
+import json
+import platform
+import argparse
+import logging
+import subprocess
+from statistics import median
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from timeit import default_timer as timer
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt, QDateTime, QModelIndex, QAbstractTableModel
+from PySide6.QtWidgets import QApplication, QTableView, QTreeView
+from jal.constants import PredefinedCategory
+from jal.db.db import JalDB
+from jal.db.ledger import Ledger
+import jal.widgets.reference_dialogs   # it is imported before models in order to resolve circular import of widgets
+from jal.db.operations_model import OperationsModel
+from jal.db.holdings_model import HoldingsModel
+from jal.data_import.statement import Statement
+from jal.data_export.tax_reports.russia import TaxesRussia
+from jal.reports.category import CategoryOperationsModel
+from jal.reports.deals import ClosedTradesModel
+from jal.reports.income_spending import IncomeSpendingReportModel
+from jal.reports.peer import PeerOperationsModel
+from jal.reports.profit_loss import ProfitLossModel
+from jal.reports.tag import TagOperationsModel
+from portfolio import DEFAULT_SIZES, RUB, generate_portfolio, generate_statement
+
+STATEMENT_TRADES = 1000
+
+
+# Requests display text of every cell of the model as a view does when all rows are scrolled through.
+# Returns number of visited rows (children of tree models are visited recursively)
+def read_model(model, parent=QModelIndex()) -> int:
+    while model.canFetchMore(parent):
+        model.fetchMore(parent)
+    rows = model.rowCount(parent)
+    count = rows
+    for row in range(rows):
+        for column in range(model.columnCount(parent)):
+            _ = model.data(model.index(row, column, parent), Qt.DisplayRole)
+        if not isinstance(model, QAbstractTableModel):
+            count += read_model(model, model.index(row, 0, parent))
+    return count
+
+
+# Returns a list of values of the first column of 'sql_text' query result
+def read_list(sql_text: str) -> list:
+    query = JalDB._exec(sql_text)
+    values = []
+    while query.next():
+        values.append(query.value(0))
+    return values
+
+
+# Returns a dict {scenario_name: function} with scenarios for generated 'portfolio'. Every function returns a number
+# of processed items (rows, deals, etc.) to be reported together with timing
+def scenarios(portfolio: dict, tmp_path: str) -> dict:
+    begin, end = portfolio['begin'], portfolio['end']
+    investment = portfolio['investment_accounts']
+    year = datetime.fromtimestamp(end, tz=timezone.utc).year - 1   # the last full year of the portfolio
+    imports = []
+
+    def ledger_rebuild():
+        Ledger().rebuild(from_timestamp=0)
+        return JalDB._read("SELECT COUNT(*) FROM ledger")
+
+    def operations_scroll():
+        model = OperationsModel(QTableView())
+        model.setDateRange(begin, end)
+        return read_model(model)
+
+    def holdings():
+        tree = QTreeView()
+        model = HoldingsModel(tree)
+        tree.setModel(model)
+        model.setCurrency(RUB)
+        model.setDate(QDateTime.fromSecsSinceEpoch(end, Qt.UTC).date())
+        return read_model(model)
+
+    def report_deals():
+        tree = QTreeView()
+        model = ClosedTradesModel(tree)
+        tree.setModel(model)
+        model.setDatesRange(begin, end)
+        return sum(model.setAccount(x) or read_model(model) for x in investment)
+
+    def report_profit_loss():
+        model = ProfitLossModel(QTableView())
+        model.setDatesRange(begin, end)
+        return sum(model.setAccount(x) or read_model(model) for x in investment)
+
+    def report_income_spending():
+        tree = QTreeView()
+        model = IncomeSpendingReportModel(tree)
+        tree.setModel(model)
+        model.setDatesRange(begin, end)
+        model.setCurrency(RUB)
+        return read_model(model)
+
+    def report_category():
+        model = CategoryOperationsModel(QTableView())
+        model.setDateRange(begin, end)
+        categories = read_list("SELECT DISTINCT category_id FROM action_details")
+        return sum(model.setCategory(x) or read_model(model) for x in categories + [PredefinedCategory.Dividends])
+
+    def report_peer():
+        model = PeerOperationsModel(QTableView())
+        model.setDateRange(begin, end)
+        return sum(model.setPeer(x) or read_model(model) for x in read_list("SELECT id FROM agents"))
+
+    def report_tag():
+        model = TagOperationsModel(QTableView())
+        model.setDateRange(begin, end)
+        return sum(model.setTag(x) or read_model(model) for x in read_list("SELECT id FROM tags"))
+
+    def taxes_russia():
+        reports = [TaxesRussia().prepare_tax_report(year, x) for x in investment]
+        return sum(len(x) for report in reports for x in report.values())
+
+    def statement_import():
+        filename = tmp_path + f"statement{len(imports)}.json"
+        generate_statement(filename, portfolio, STATEMENT_TRADES, len(imports), shift=len(imports) * 30)
+        imports.append(filename)
+        statement = Statement()
+        statement.load(filename)
+        statement.validate_format()
+        statement.match_db_ids()
+        statement.import_into_db()
+        return STATEMENT_TRADES
+
+    # statement import should be the last one as it changes database
+    return {x.__name__: x for x in [ledger_rebuild, operations_scroll, holdings, report_deals, report_profit_loss,
+                                    report_income_spending, report_category, report_peer, report_tag, taxes_russia,
+                                    statement_import]}
+
+
+# Runs 'scenario' function 'repeat' times and returns a dict with timings (in seconds) and count of processed items
+def measure(scenario, repeat: int) -> dict:
+    timings = []
+    items = 0
+    for _i in range(repeat):
+        start = timer()
+        items = scenario()
+        timings.append(timer() - start)
+    return {'items': items, 'best': min(timings), 'median': median(timings), 'timings': timings}
+
+
+# Returns hash of current git commit of the repository or empty string if it isn't available
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_PATH, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite on a synthetic portfolio")
+    for name, value in DEFAULT_SIZES.items():
+        parser.add_argument(f"--{name}", type=int, default=value, help=f"Number of {name} to generate")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of random data generation")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to run every scenario")
+    parser.add_argument("--scenario", default='', help="Run only scenarios with names that start with given text")
+    parser.add_argument("--output", default='', help="File to save results in JSON format")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    _app = QApplication([])
+    sizes = {x: getattr(args, x) for x in DEFAULT_SIZES}
+    results = {'revision': git_revision(), 'python': platform.python_version(), 'platform': platform.platform(),
+               'date': datetime.now(tz=timezone.utc).isoformat(timespec='seconds'), 'seed': args.seed,
+               'sizes': sizes, 'repeat': args.repeat, 'scenarios': {}}
+    with TemporaryDirectory(prefix="jal_bench_") as tmp_path:
+        db_path = tmp_path + os.sep
+        start = timer()
+        portfolio = generate_portfolio(db_path, sizes, args.seed)
+        Ledger().rebuild(from_timestamp=0)   # ledger is required for all scenarios
+        results['generation'] = {'time': timer() - start, 'counts': portfolio['counts']}
+        print(f"portfolio generated in {results['generation']['time']:.1f}s: {portfolio['counts']}")
+        for name, scenario in scenarios(portfolio, db_path).items():
+            if not name.startswith(args.scenario):
+                continue
+            results['scenarios'][name] = measure(scenario, args.repeat)
+            result = results['scenarios'][name]
+            print(f"{name:>24}: best {result['best']:.3f}s, median {result['median']:.3f}s, items {result['items']}")
+        JalDB.connection().close()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from PySide6.QtWidgets import QApplication, QComboBox
 class Setup:
     DB_PATH = "jal.sqlite"
     DB_CONNECTION = "JAL.DB"
-    DB_REQUIRED_VERSION = 44
+    DB_REQUIRED_VERSION = 47
     SQLITE_MIN_VERSION = "3.35"
     MAIN_WND_NAME = "JAL_MainWindow"
     INIT_SCRIPT_PATH = 'jal_init.sql'
@@ -19,6 +19,8 @@ class Setup:
     REPORT_PATH = "reports"
     STATEMENT_PATH = "broker_statements"
     STATEMENT_DUMP = "statement_error_log_"
+    SLOW_QUERY_LOG = "jal_slow_queries.log"
+    RECOGNIZER_PATH = "category_model"
     TEMPLATE_PATH = "templates"
     TAX_REPORT_PATH = "tax_reports"
     TAX_TREATY_PARAM = "tax_treaty"
@@ -1,7 +1,6 @@
 import os
 import json
 import logging
-import xlsxwriter
 
 from PySide6.QtCore import Qt, QModelIndex
 from PySide6.QtWidgets import QApplication
@@ -32,6 +31,8 @@ class XLSX:
     START_ROW = 9
 
     def __init__(self, xlsx_filename):
+        import xlsxwriter
+
         self.filename = xlsx_filename
         self.workbook = xlsxwriter.Workbook(filename=xlsx_filename)
         self.formats = xslxFormat(self.workbook)
@@ -3,6 +3,7 @@ import re
 from copy import deepcopy
 from datetime import datetime
 from itertools import groupby
+from collections import defaultdict, deque
 from decimal import Decimal
 from lxml import etree
 
@@ -18,6 +19,13 @@ from jal.data_import.statement_xml import StatementXML
 JAL_STATEMENT_CLASS = "StatementIBKR"
 IBKR_CALCULATION_PRECISION = 10
 DIVIDENDS_TABLE_ASSET_FIELD = 7
+PAYMENT_IN_LIEU_OF_DIVIDEND = 'PAYMENT IN LIEU OF DIVIDEND'
+TAX_FULL_PATTERN = re.compile(r"^(?P<description>.*) - (?P<country>\w\w) TAX$", re.IGNORECASE)
+TAX_NOTE_PATTERN = re.compile(
+    r"^(?P<symbol>.*\w) ?\((?P<isin>\w+)\)(?P<prefix>( \w*)+) +(?P<amount>\d+\.\d+)?(?P<suffix>.*)$", re.IGNORECASE)
+DIVIDEND_NOTE_PATTERN = re.compile(
+    r"^(?P<symbol>.*\w) ?\((?P<isin>\w+)\)(?P<prefix>( \w*)+) +(?P<amount>\d+\.\d+)?(?P<suffix>.*) \(.*\)$",
+    re.IGNORECASE)
 
 # -----------------------------------------------------------------------------------------------------------------------
 class IBKRCashOp:
@@ -86,6 +94,41 @@ class IBKR_CorpActionType:
                 QApplication.translate("IBKR", "Corporate action isn't supported: ") + f"{action_type}")
 
 
+# -----------------------------------------------------------------------------------------------------------------------
+# Hash index over a list of cash payments that allows to find and remove the first payment that is equal to given one,
+# optionally ignoring some fields. Used to match reversals with original payments without scanning the whole list
+class IBKR_PaymentIndex:
+    def __init__(self, payments: list, ignored_fields: list):
+        self._payments = payments
+        self._removed = set()
+        self._indices = {}
+        for fields in ignored_fields:
+            index = defaultdict(deque)
+            for i, payment in enumerate(payments):
+                index[self.key(payment, fields)].append(i)
+            self._indices[fields] = index
+
+    # Returns hashable representation of payment without 'ignored' fields
+    @staticmethod
+    def key(payment: dict, ignored: tuple = ()) -> tuple:
+        return tuple(sorted((k, tuple(v) if type(v) == list else v) for k, v in payment.items() if k not in ignored))
+
+    # Removes the first remaining payment that matches given one (without 'ignored' fields) and returns it
+    # Returns None if there is no such payment
+    def pop(self, payment: dict, ignored: tuple = ()):
+        positions = self._indices[ignored].get(self.key(payment, ignored))
+        while positions:
+            i = positions.popleft()
+            if i not in self._removed:
+                self._removed.add(i)
+                return self._payments[i]
+        return None
+
+    # Returns list of payments that weren't removed, in original order
+    def remaining(self) -> list:
+        return [x for i, x in enumerate(self._payments) if i not in self._removed]
+
+
 # -----------------------------------------------------------------------------------------------------------------------
 class IBKR_Currency:
     pass
@@ -137,6 +180,9 @@ class StatementIBKR(StatementXML):
         self.name = self.tr("Interactive Brokers")
         self.icon_name = "ibkr.png"
         self.filename_filter = self.tr("IBKR flex-query (*.xml)")
+        self._dividends4tax = {}      # (account, asset) -> {timestamp: [dividends]} - candidates to match with taxes
+        self._db_dividends4tax = {}   # (account, asset) -> [dividends] that are present in Jal DB already
+        self._dividend_notes = {}     # dividend description -> its parts matched by DIVIDEND_NOTE_PATTERN
 
         ibkr_loaders = {
             IBKR_Currency: self.attr_currency,
@@ -283,10 +329,9 @@ class StatementIBKR(StatementXML):
     def save_debug_info(self, account, asset):
         # Dump statement info relevant to given asset
         debug_info = 'Statement data:\n----------------------------------------------------------------\n'
-        assert self._statement is not None
         symbols = [x['symbol'] for x in self._data[FOF.SYMBOLS] if x["asset"] == asset]
         for symbol in symbols:
-            elements = self._statement.findall(f".//*[@symbol='{symbol}']")
+            elements = self.find_elements('symbol', symbol)
             for element in elements:
                 if 'accountId' in element.attrib:
                     element.attrib['accountId'] = 'U7654321'  # Hide real account number
@@ -451,7 +496,7 @@ class StatementIBKR(StatementXML):
         logging.info(self.tr("Trades loaded: ") + f"{trades_loaded + transfers_loaded} ({len(ib_trades)})")
 
     def load_trades(self, trades):
-        trade_base = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+        trade_base = self._next_id(FOF.TRADES)
         cnt = 0
         for i, trade in enumerate(sorted(trades, key=lambda x: x['timestamp'])):
             trade['id'] = trade_base + i
@@ -471,7 +516,7 @@ class StatementIBKR(StatementXML):
         return cnt
 
     def load_transfers(self, transfers):
-        transfer_base = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        transfer_base = self._next_id(FOF.TRANSFERS)
         cnt = 0
         for i, transfer in enumerate(sorted(transfers, key=lambda x: x['timestamp'])):
             transfer['id'] = transfer_base + i
@@ -619,7 +664,7 @@ class StatementIBKR(StatementXML):
         asset_b = self.locate_asset(merger_a['symbol_old'], merger_a['isin_old'])
 
         if pattern_id == 4:  # Asset converted to money -> store it as a sell trade
-            action['id'] = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+            action['id'] = self._next_id(FOF.TRADES)
             action['settlement'] = action['timestamp']
             action['price'] = action['proceeds'] / (-action['quantity'])
             action['note'] = action.pop('description')
@@ -637,7 +682,7 @@ class StatementIBKR(StatementXML):
             existing_action = self.locate_existing_merger(action['timestamp'],
                                                           action['account'], paired_record[0]['asset'])
         if existing_action is None:
-            action['id'] = max([0] + [x['id'] for x in self._data[FOF.CORP_ACTIONS]]) + 1
+            action['id'] = self._next_id(FOF.CORP_ACTIONS)
             action['outcome'] = [{'asset': action['asset'], 'quantity': action['quantity']/adj_factor, 'share': 0.0}]
             action['asset'] = paired_record[0]['asset']
             action['quantity'] = -paired_record[0]['quantity']/adj_factor
@@ -680,7 +725,7 @@ class StatementIBKR(StatementXML):
         if abs(round(qty_old) - qty_old) > 0.01:
             raise Statement_ImportError(self.tr("Spin-off rounding error is too big ") + f"'{action}'")
         qty_old = round(qty_old)
-        action['id'] = max([0] + [x['id'] for x in self._data[FOF.CORP_ACTIONS]]) + 1
+        action['id'] = self._next_id(FOF.CORP_ACTIONS)
         action['outcome'] = [{'asset': asset_old, 'quantity': qty_old, 'share': 0.0},
                              {'asset': action['asset'], 'quantity': action['quantity'], 'share': 0.0}]
         action['asset'] = asset_old
@@ -701,7 +746,7 @@ class StatementIBKR(StatementXML):
         description_b = action['description'][:parts.span('symbol')[0]] + isin_change['symbol_old']
         asset_b = self.locate_asset(isin_change['symbol_old'], isin_change['isin_old'])
         paired_record = self.find_corp_action_pair(asset_b, description_b, action, parts_b)
-        action['id'] = max([0] + [x['id'] for x in self._data[FOF.CORP_ACTIONS]]) + 1
+        action['id'] = self._next_id(FOF.CORP_ACTIONS)
         action['outcome'] = [{'asset': action['asset'], 'quantity': action['quantity'], 'share': 1.0}]
         action['asset'] = paired_record[0]['asset']
         action['quantity'] = -paired_record[0]['quantity']
@@ -718,7 +763,7 @@ class StatementIBKR(StatementXML):
             raise Statement_ImportError(self.tr("Can't parse Stock Dividend description ") + f"'{action}'")
         action['description'] = parts.groupdict()['description']
 
-        action['id'] = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+        action['id'] = self._next_id(FOF.ASSET_PAYMENTS)
         action['amount'] = action['quantity']
         action['price'] = format_decimal(Decimal(str(action['value'])) / Decimal(str(action['quantity'])))
         action['tax'] = 0
@@ -739,7 +784,7 @@ class StatementIBKR(StatementXML):
             qty_delta = action['quantity']
             qty_old = qty_delta / (int(split['X']) / int(split['Y']) - 1)
             qty_new = qty_old + qty_delta
-            action['id'] = max([0] + [x['id'] for x in self._data[FOF.CORP_ACTIONS]]) + 1
+            action['id'] = self._next_id(FOF.CORP_ACTIONS)
             action['outcome'] = [{'asset': action['asset'], 'quantity': qty_new, 'share': 1.0}]
             action['quantity'] = qty_old
             self.drop_extra_fields(action, ["value", "proceeds", "code", "asset_type", "jal_processed"])
@@ -749,7 +794,7 @@ class StatementIBKR(StatementXML):
             description_b = action['description'][:parts.span('symbol')[0]] + split['symbol_old']
             asset_b = self.locate_asset(split['symbol_old'], split['isin_old'])
             paired_record = self.find_corp_action_pair(asset_b, description_b, action, parts_b)
-            action['id'] = max([0] + [x['id'] for x in self._data[FOF.CORP_ACTIONS]]) + 1
+            action['id'] = self._next_id(FOF.CORP_ACTIONS)
             action['outcome'] = [{'asset': action['asset'], 'quantity': action['quantity'], 'share': 1.0}]
             action['asset'] = paired_record[0]['asset']
             action['quantity'] = -paired_record[0]['quantity']
@@ -760,7 +805,7 @@ class StatementIBKR(StatementXML):
 
     # Bond maturity is processed as ordinary bond
     def load_bond_maturity(self, action, parts_b) -> int:
-        action['id'] = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+        action['id'] = self._next_id(FOF.TRADES)
         action['quantity'] = action['quantity'] / IBKR_Asset.BondPrincipal
         action['price'] = action['proceeds'] / (-action['quantity'])  # Quantity is negative, bonds are withdrawn
         action['settlement'] = action['timestamp']                    # Settled by the same date
@@ -776,7 +821,7 @@ class StatementIBKR(StatementXML):
         asset = [x for x in self._data[FOF.ASSETS] if x['id'] == action['asset']][0]
         if asset['type'] == FOF.ASSET_RIGHTS:
             return 0
-        action['id'] = max([0] + [x['id'] for x in self._data[FOF.CORP_ACTIONS]]) + 1
+        action['id'] = self._next_id(FOF.CORP_ACTIONS)
         action['asset'] = action['asset']
         action['quantity'] = -action['quantity']
         action['outcome'] = []
@@ -786,7 +831,7 @@ class StatementIBKR(StatementXML):
 
     def load_vestings(self, vestings):
         cnt = 0
-        asset_payments_base = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+        asset_payments_base = self._next_id(FOF.ASSET_PAYMENTS)
         for i, vesting in enumerate(vestings):
             vesting['id'] = asset_payments_base + i
             vesting['type'] = FOF.PAYMENT_STOCK_VESTING
@@ -800,7 +845,7 @@ class StatementIBKR(StatementXML):
         dividends = list(filter(lambda tr: tr['type'] in ['Dividends', 'Payment In Lieu Of Dividends'], cash))
         dividends = [drop_fields(x, ['tid']) for x in dividends]  # remove 'tid' field as not used for dividends
         dividends = self.aggregate_dividends(dividends)
-        asset_payments_base = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+        asset_payments_base = self._next_id(FOF.ASSET_PAYMENTS)
         for i, dividend in enumerate(dividends):
             dividend['id'] = asset_payments_base + i
             dividend['type'] = FOF.PAYMENT_DIVIDEND
@@ -819,10 +864,11 @@ class StatementIBKR(StatementXML):
         taxes = list(filter(lambda tr: tr['type'] == 'Withholding Tax', cash))
         taxes = [drop_fields(x, ['tid']) for x in taxes]
         taxes = self.aggregate_taxes(taxes)
+        self._index_dividends4tax()
         for tax in taxes:
             cnt += self.apply_tax_withheld(tax)
 
-        transfer_base = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        transfer_base = self._next_id(FOF.TRANSFERS)
         transfers = list(filter(lambda tr: tr['type'] == 'Deposits/Withdrawals', cash))
         for i, transfer in enumerate(transfers):
             transfer['id'] = transfer_base + i
@@ -839,7 +885,7 @@ class StatementIBKR(StatementXML):
             self._data[FOF.TRANSFERS].append(transfer)
             cnt += 1
 
-        payment_base = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        payment_base = self._next_id(FOF.INCOME_SPENDING)
         fees = list(filter(lambda tr: 'type' in tr and tr['type'] in ['Other Fees',
                                                                       'Commission Adjustments',  #FIXME Link this fee with asset
                                                                       'Broker Interest Paid',
@@ -865,66 +911,53 @@ class StatementIBKR(StatementXML):
         is_reversal = lambda x: self.ReversalSuffix in x or x.startswith(self.CancelPrefix)
         payments = [x for x in deepcopy(dividends) if not is_reversal(x['description'])]
         reversals = [x for x in deepcopy(dividends) if is_reversal(x['description'])]
+        index = IBKR_PaymentIndex(payments, [(), ('description',), ('reported',)])
         # Drop reversals that match payments exactly
         for reversal in reversals:
             t_payment = deepcopy(reversal)  # target payment to search for
             t_payment['description'] = t_payment['description'].replace(self.ReversalSuffix, '')
             t_payment['description'] = t_payment['description'].replace(self.CancelPrefix, '')
             t_payment['amount'] = -t_payment['amount']
-            if t_payment not in payments:
-                no_description = lambda x: {i:x[i] for i in x if i != 'description'}
-                m_payments = [x for x in payments if no_description(x) == no_description(t_payment)]
-                if len(m_payments):
-                    payments.remove(m_payments[0])
+            if index.pop(t_payment) is None:
+                if index.pop(t_payment, ('description',)) is not None:
                     logging.warning(self.tr("Payment was reversed by approximate description: ") +
                                     f"{ts2dt(t_payment['timestamp'])}, '{t_payment['description']}': {t_payment['amount']}")
                     continue
-                no_reported = lambda x: {i: x[i] for i in x if i != 'reported'}
-                m_payments = [x for x in payments if no_reported(x) == no_reported(t_payment)]
-                if len(m_payments):
-                    payments.remove(m_payments[0])   # FIXME - this branch may lead to non-reversed taxes theoretically
+                if index.pop(t_payment, ('reported',)) is not None:   # FIXME - this branch may lead to non-reversed taxes theoretically
                     logging.warning(self.tr("Payment was reversed with different reported date: ") +
                                     f"{ts2dt(t_payment['timestamp'])}, '{t_payment['description']}': {t_payment['amount']}")
                     continue
                 raise Statement_ImportError(self.tr("Can't find match for reversal: ") + f"{reversal}")
-            else:
-                payments.remove(t_payment) # Source payment found -> remove it
+            else:  # Source payment found and removed
                 logging.info(self.tr("Payment was reversed: ") +
                              f"{ts2dt(t_payment['timestamp'])}, '{t_payment['description']}': {t_payment['amount']}")
-        return payments
+        return index.remaining()
 
     # Method takes a list of taxes and checks if we have the same amount added and deducted the same day
     # First it tries to find exact match. Second it does it again ignoring reportDate.
     def aggregate_taxes(self, taxes: list) -> list:
         payments = [x for x in deepcopy(taxes) if x['amount'] < 0]
         reversals = [x for x in deepcopy(taxes) if x['amount'] > 0]
+        index = IBKR_PaymentIndex(payments, [(), ('reported',), ('description', 'reported')])
         not_matched_reversals = []
         for reversal in reversals:
             t_payment = deepcopy(reversal)   # target payment to search for
             t_payment['description'] = t_payment['description'].replace(self.CancelPrefix, '')
             t_payment['amount'] = -t_payment['amount']
-            if t_payment not in payments:
-                no_report = lambda x: {i: x[i] for i in x if i != 'reported'}
-                m_payments = [x for x in payments if no_report(x) == no_report(t_payment)]
-                if len(m_payments):
-                    payments.remove(m_payments[0])
-                else:
-                    no_d_and_r = lambda x: {i: x[i] for i in x if i != 'description' and i != 'reported'}
-                    m_payments = [x for x in payments if no_d_and_r(x) == no_d_and_r(t_payment)]
-                    if len(m_payments):
-                        payments.remove(m_payments[0])
-                    else:
+            if index.pop(t_payment) is None:    # it is possible to kill exact match silently
+                if index.pop(t_payment, ('reported',)) is None:
+                    if index.pop(t_payment, ('description', 'reported')) is None:
                         not_matched_reversals.append(reversal)
-            else:
-                payments.remove(t_payment)    # it is possible to kill exact match silently
-        taxes = [x for x in taxes if x in payments or x in not_matched_reversals]
+        keep = set(IBKR_PaymentIndex.key(x) for x in index.remaining() + not_matched_reversals)
+        taxes = [x for x in taxes if IBKR_PaymentIndex.key(x) in keep]
 
         # Sometimes IB split tax in several parts for Payment in Lieu of Dividend
         # Below code aggregates such taxes but only negative values (positive might be a correction of previous tax)
         key_func = lambda x: (x['account'], x['asset'], x['currency'], x['description'], x['timestamp'], x['reported'])
         taxes_sorted = sorted(taxes, key=key_func)
-        tax_in_lieu = [x for x in taxes_sorted if x['amount'] < 0 and 'PAYMENT IN LIEU OF DIVIDEND' in x['description']]
-        other_taxes = [x for x in taxes_sorted if x not in tax_in_lieu]
+        is_tax_in_lieu = lambda x: x['amount'] < 0 and PAYMENT_IN_LIEU_OF_DIVIDEND in x['description']
+        tax_in_lieu = [x for x in taxes_sorted if is_tax_in_lieu(x)]
+        other_taxes = [x for x in taxes_sorted if not is_tax_in_lieu(x)]
         lieu_aggregated = []
         for k, group in groupby(tax_in_lieu, key=key_func):
             group_list = list(group)
@@ -936,7 +969,7 @@ class StatementIBKR(StatementXML):
 
     def load_taxes(self, taxes):
         cnt = 0   #FIXME Link this tax with asset
-        tax_base = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        tax_base = self._next_id(FOF.INCOME_SPENDING)
         for i, tax in enumerate(taxes):
             tax['id'] = tax_base + i
             tax['peer'] = 0
@@ -949,7 +982,7 @@ class StatementIBKR(StatementXML):
 
     def load_cfd_charges(self, charges):
         cnt = 0
-        charges_base = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        charges_base = self._next_id(FOF.INCOME_SPENDING)
         for i, charge in enumerate(charges):
             if charge['asset'] != self.NoAsset and not charge['description'].startswith('CFD BORROW FEE FOR'):
                 # FIXME if asset is present -> put this charge not in Income/Spending but in Asset Payments section
@@ -972,9 +1005,7 @@ class StatementIBKR(StatementXML):
     # if tax < 0: apply it to dividend without tax
     # otherwise: it is a correction and there should be dividend with exactly the same tax that will be set to 0
     def apply_tax_withheld(self, tax) -> int:
-        TaxFullPattern = r"^(?P<description>.*) - (?P<country>\w\w) TAX$"
-
-        parts = re.match(TaxFullPattern, tax['description'], re.IGNORECASE)
+        parts = TAX_FULL_PATTERN.match(tax['description'])
         if not parts:
             logging.warning(self.tr("*** MANUAL ENTRY REQUIRED ***"))
             logging.warning(self.tr("Unhandled tax country pattern found: ") + f"{tax['description']}")
@@ -994,54 +1025,78 @@ class StatementIBKR(StatementXML):
                          f"{dividend['tax']} -> {new_tax} ({ts2dt(dividend['timestamp'])} {dividend['description']})")
         dividend["tax"] = new_tax
         # append new dividend if it came from DB and haven't been loaded in self._data yet
-        if len([1 for x in self._data[FOF.ASSET_PAYMENTS] if x['id'] == dividend['id']]) == 0:
+        if dividend['id'] not in self._section_index(FOF.ASSET_PAYMENTS).ids:
             dividend['type'] = FOF.PAYMENT_DIVIDEND
             self._data[FOF.ASSET_PAYMENTS].append(dividend)
+            self._add_dividend4tax(dividend)
         return 1
 
+    # Puts all dividends from the statement into index that is used to find a dividend for withholding tax
+    def _index_dividends4tax(self):
+        self._dividends4tax = {}
+        self._db_dividends4tax = {}
+        for payment in self._data[FOF.ASSET_PAYMENTS]:
+            self._add_dividend4tax(payment)
+
+    def _add_dividend4tax(self, payment):
+        if payment['type'] == FOF.PAYMENT_DIVIDEND or payment['type'] == FOF.PAYMENT_STOCK_DIVIDEND:
+            by_date = self._dividends4tax.setdefault((payment['account'], payment['asset']), {})
+            by_date.setdefault(payment['timestamp'], []).append(payment)
+
+    # Returns a list of dividends for given account and asset that are present in Jal DB already
+    # DB is queried only once for every account/asset pair, and a fresh copy of dividends is returned for every call
+    def _db_dividends(self, account_id, asset_id) -> list:
+        if (account_id, asset_id) not in self._db_dividends4tax:
+            dividends = []
+            db_account = self._map_db_account(account_id)
+            db_asset = self._map_db_asset(asset_id)
+            if db_account and db_asset:
+                for db_dividend in Dividend.get_list(db_account, db_asset, Dividend.Dividend):
+                    dividends.append({
+                        "id": -db_dividend.oid(),
+                        "account": account_id,
+                        "asset": asset_id,
+                        "timestamp": db_dividend.timestamp(),
+                        "number": db_dividend.number(),
+                        "amount": float(db_dividend.amount()),
+                        "tax": float(db_dividend.tax()),
+                        "description": db_dividend.note()
+                    })
+            self._db_dividends4tax[(account_id, asset_id)] = dividends
+        return [dict(x) for x in self._db_dividends4tax[(account_id, asset_id)]]
+
+    # Returns parts of dividend description matched by DIVIDEND_NOTE_PATTERN (or None if it doesn't match)
+    def _dividend_note(self, description: str):
+        if description not in self._dividend_notes:
+            parts = DIVIDEND_NOTE_PATTERN.match(description)
+            self._dividend_notes[description] = parts.groupdict() if parts else None
+        return self._dividend_notes[description]
+
     # Searches for dividend that matches tax in the best way:
     # - it should have exactly the same account_id and asset_id
     # - tax amount withheld from dividend should be equal to provided 'tax' value
     # - timestamp should be the same or within previous year for weak match of Q1 taxes
     # - note should be exactly the same or contain the same key elements
     def find_dividend4tax(self, timestamp, account_id, asset_id, prev_tax, new_tax, note):
-        PaymentInLiueOfDividend = 'PAYMENT IN LIEU OF DIVIDEND'
-        TaxNotePattern = r"^(?P<symbol>.*\w) ?\((?P<isin>\w+)\)(?P<prefix>( \w*)+) +(?P<amount>\d+\.\d+)?(?P<suffix>.*)$"
-        DividendNotePattern = r"^(?P<symbol>.*\w) ?\((?P<isin>\w+)\)(?P<prefix>( \w*)+) +(?P<amount>\d+\.\d+)?(?P<suffix>.*) \(.*\)$"
-
-        dividends = [x for x in self._data[FOF.ASSET_PAYMENTS] if
-                     (x['type'] == FOF.PAYMENT_DIVIDEND or x['type'] == FOF.PAYMENT_STOCK_DIVIDEND)
-                     and x['asset'] == asset_id and x['account'] == account_id]
-        db_account = self._map_db_account(account_id)
-        db_asset = self._map_db_asset(asset_id)
-        if db_account and db_asset:
-            for db_dividend in Dividend.get_list(db_account, db_asset, Dividend.Dividend):
-                dividends.append({
-                    "id": -db_dividend.oid(),
-                    "account": account_id,
-                    "asset": asset_id,
-                    "timestamp": db_dividend.timestamp(),
-                    "number": db_dividend.number(),
-                    "amount": float(db_dividend.amount()),
-                    "tax": float(db_dividend.tax()),
-                    "description": db_dividend.note()
-                })
+        by_date = self._dividends4tax.get((account_id, asset_id), {})
+        db_dividends = self._db_dividends(account_id, asset_id)
         if datetime.utcfromtimestamp(timestamp).timetuple().tm_yday < 75:
             # We may have wrong date in taxes before March, 15 due to tax correction
             range_start, _range_end = ManipulateDate.PreviousYear(day=datetime.utcfromtimestamp(timestamp))
-            dividends = [x for x in dividends if x['timestamp'] >= range_start]
+            dividends = [x for date in by_date if date >= range_start for x in by_date[date]]
+            dividends += [x for x in db_dividends if x['timestamp'] >= range_start]
         else:
             # For any other day - use exact time match
-            dividends = [x for x in dividends if x['timestamp'] == timestamp]
+            dividends = by_date.get(timestamp, []) + [x for x in db_dividends if x['timestamp'] == timestamp]
         dividends = [x for x in dividends if 'tax' not in x or (abs(Decimal(x['tax']) - prev_tax) < 0.0001)]
         dividends = sorted(dividends, key=lambda x: x['timestamp'])
 
         # Choose either Dividends or Payments in liue with regards to note of the matching tax
-        if PaymentInLiueOfDividend in note.upper():
-            dividends = list(filter(lambda item: PaymentInLiueOfDividend in item['description'], dividends))
+        if PAYMENT_IN_LIEU_OF_DIVIDEND in note.upper():
+            dividends = list(filter(lambda item: PAYMENT_IN_LIEU_OF_DIVIDEND in item['description'], dividends))
             # we don't check for full match as there are a lot of records without amount
         else:
-            dividends = list(filter(lambda item: PaymentInLiueOfDividend not in item['description'], dividends))
+            dividends = list(filter(lambda item: PAYMENT_IN_LIEU_OF_DIVIDEND not in item['description'], dividends))
             # Check for full match
             for dividend in dividends:
                 if (dividend['timestamp'] == timestamp) and (note.upper() == dividend['description'][:len(note)].upper()):
@@ -1050,7 +1105,7 @@ class StatementIBKR(StatementXML):
             return None
 
         # Chose most probable dividend - by amount, timestamp and description
-        parts = re.match(TaxNotePattern, note, re.IGNORECASE)
+        parts = TAX_NOTE_PATTERN.match(note)
         if not parts:
             logging.warning(self.tr("*** MANUAL ENTRY REQUIRED ***"))
             logging.warning(self.tr("Unhandled tax pattern found: ") + f"{note}")
@@ -1064,12 +1119,11 @@ class StatementIBKR(StatementXML):
             note_amount = 0
         score = [0] * len(dividends)
         for i, dividend in enumerate(dividends):
-            parts = re.match(DividendNotePattern, dividend['description'], re.IGNORECASE)
+            parts = self._dividend_note(dividend['description'])
             if not parts:
                 logging.warning(self.tr("*** MANUAL ENTRY REQUIRED ***"))
                 logging.warning(self.tr("Unhandled dividend pattern found: ") + f"{dividend['description']}")
                 return None
-            parts = parts.groupdict()
             try:
                 amount = float(parts['amount'])
             except (ValueError, TypeError):
@@ -137,7 +137,7 @@ class StatementJ2T(StatementXLS):
             # Settlement is stored as date in Excel report file
             settlement = int(self._statement[headers['settlement']][row].replace(tzinfo=timezone.utc).timestamp())
             account_id = self._find_account_id(self._account_number, 'USD')   # FIXME - replace hardcoded 'USD'
-            new_id = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+            new_id = self._next_id(FOF.TRADES)
             trade = {"id": new_id, "number": deal_number, "timestamp": timestamp, "settlement": settlement,
                      "account": account_id, "asset": asset_id, "quantity": qty, "price": price, "fee": fee}
             self._data[FOF.TRADES].append(trade)
@@ -191,7 +191,7 @@ class StatementJ2T(StatementXLS):
             price = -(amount + fee) / qty
             assert price > 0.0
             account_id = self._find_account_id(self._account_number, self._statement[headers['account_currency']][row])
-            new_id = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+            new_id = self._next_id(FOF.TRADES)
             trade = {"id": new_id, "number": deal_number, "timestamp": timestamp, "settlement": settlement,
                      "account": account_id, "asset": asset_id, "quantity": qty, "price": price, "fee": fee}
             self._data[FOF.TRADES].append(trade)
@@ -317,7 +317,7 @@ class StatementJ2T(StatementXLS):
             raise Statement_ImportError(self.tr("Dividend description miss some data ") + f"'{note}'")
         asset_id = self._find_asset_by_name(dividend['asset'])
         ex_date = int(datetime.strptime(dividend['date'], "%d/%m/%Y").replace(tzinfo=timezone.utc).timestamp())
-        new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+        new_id = self._next_id(FOF.ASSET_PAYMENTS)
         payment = {"id": new_id, "type": FOF.PAYMENT_DIVIDEND, "account": account_id, "timestamp": timestamp,
                    "ex_date": ex_date, "asset": asset_id, "amount": amount, "description": note}
         self._data[FOF.ASSET_PAYMENTS].append(payment)
@@ -339,14 +339,14 @@ class StatementJ2T(StatementXLS):
             dividend_record['tax'] = amount
 
     def fee(self, timestamp, account_id, amount, note):
-        new_id = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        new_id = self._next_id(FOF.INCOME_SPENDING)
         fee = {"id": new_id, "timestamp": timestamp, "account": account_id, "peer": 0,
                "lines": [{"amount": amount, "category": -PredefinedCategory.Fees, "description": note}]}
         self._data[FOF.INCOME_SPENDING].append(fee)
 
     def transfer_in(self, timestamp, account_id, amount, note):
         account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        new_id = self._next_id(FOF.TRANSFERS)
         transfer = {"id": new_id, "account": [0, account_id, 0],
                     "asset": [account['currency'], account['currency']], "timestamp": timestamp,
                     "withdrawal": amount, "deposit": amount, "fee": 0.0, "description": note}
@@ -354,7 +354,7 @@ class StatementJ2T(StatementXLS):
 
     def transfer_out(self, timestamp, account_id, amount, note):
         account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        new_id = self._next_id(FOF.TRANSFERS)
         transfer = {"id": new_id, "account": [account_id, 0, 0],
                     "asset": [account['currency'], account['currency']], "timestamp": timestamp,
                     "withdrawal": -amount, "deposit": -amount, "fee": 0.0, "description": note}
@@ -273,7 +273,7 @@ class StatementOpenBroker(StatementXML):
             asset_id = self.asset_id(asset)
             if broker_symbol:
                 if not [x['id'] for x in self._data[FOF.SYMBOLS] if x['symbol'] == broker_symbol]:
-                    symbol_id = max([0] + [x['id'] for x in self._data[FOF.SYMBOLS]]) + 1
+                    symbol_id = self._next_id(FOF.SYMBOLS)
                     symbol = {"id": symbol_id, "asset": asset_id, "symbol": broker_symbol,
                               "currency": asset['currency'], "broker_symbol": True}
                     self._data[FOF.SYMBOLS].append(symbol)
@@ -282,7 +282,7 @@ class StatementOpenBroker(StatementXML):
 
     def load_balances(self, balances):
         cnt = 0
-        base = max([0] + [x['id'] for x in self._data[FOF.ACCOUNTS]]) + 1
+        base = self._next_id(FOF.ACCOUNTS)
         for balance in balances:
             asset = [x for x in self._data[FOF.ASSETS] if 'id' in x and x['id'] == balance['asset']][0]
             if asset['type'] == FOF.ASSET_MONEY:
@@ -295,7 +295,7 @@ class StatementOpenBroker(StatementXML):
 
     def load_trades(self, trades):
         cnt = 0
-        trade_base = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+        trade_base = self._next_id(FOF.TRADES)
         for i, trade in enumerate(sorted(trades, key=lambda x: x['timestamp'])):
             trade['id'] = trade_base + i
             trade['account'] = self.account_by_currency(trade['currency'])
@@ -312,7 +312,7 @@ class StatementOpenBroker(StatementXML):
             if abs(abs(trade['price'] * trade['quantity']) - amount) >= self.RU_PRICE_TOLERANCE:
                 trade['price'] = abs(amount / trade['quantity'])
             if abs(trade['accrued_interest']) > 0:
-                new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+                new_id = self._next_id(FOF.ASSET_PAYMENTS)
                 payment = {"id": new_id, "type": FOF.PAYMENT_INTEREST, "account": trade['account'],
                            "timestamp": trade['timestamp'], "number": trade['number'], "asset": trade['asset'],
                            "amount": trade['accrued_interest'], "description": "НКД"}
@@ -345,7 +345,7 @@ class StatementOpenBroker(StatementXML):
         ticker = self._find_in_list(self._data[FOF.SYMBOLS], 'asset', operation['asset'])
         if ticker['symbol'] != repayment_note['asset_name']:  # Store alternative depositary name
             ticker = ticker.copy()
-            ticker['id'] = max([0] + [x['id'] for x in self._data[FOF.SYMBOLS]]) + 1
+            ticker['id'] = self._next_id(FOF.SYMBOLS)
             ticker['symbol'] = repayment_note['asset_name']
             ticker['broker_symbol'] = True
             self._data[FOF.SYMBOLS].append(ticker)
@@ -357,7 +357,7 @@ class StatementOpenBroker(StatementXML):
         self.asset_withdrawal.append(record)
 
     def load_asset_transfer_out(self, transfer):
-        transfer['id'] = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        transfer['id'] = self._next_id(FOF.TRANSFERS)
         ruble_id = JalAsset(data={'symbol': 'RUB', 'type_id': PredefinedAsset.Money}, search=True, create=False).id()
         transfer['account'] = [ruble_id, 0, 0]   # Assume russian ruble as default for Open Broker
         transfer['asset'] = [transfer['asset'], transfer['asset']]
@@ -401,7 +401,7 @@ class StatementOpenBroker(StatementXML):
 
     def transfer_in(self, timestamp, account_id, amount, description):
         account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        new_id = self._next_id(FOF.TRANSFERS)
         transfer = {"id": new_id, "account": [0, account_id, 0], "asset": [account['currency'], account['currency']],
                     "timestamp": timestamp, "withdrawal": amount, "deposit": amount, "fee": 0.0,
                     "description": description}
@@ -409,7 +409,7 @@ class StatementOpenBroker(StatementXML):
 
     def transfer_out(self, timestamp, account_id, amount, description):
         account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        new_id = self._next_id(FOF.TRANSFERS)
         transfer = {"id": new_id, "account": [account_id, 0, 0], "asset": [account['currency'], account['currency']],
                     "timestamp": timestamp, "withdrawal": -amount, "deposit": -amount, "fee": 0.0,
                     "description": description}
@@ -438,31 +438,31 @@ class StatementOpenBroker(StatementXML):
                 raise Statement_ImportError(self.tr("Unknown payment type: ") + f"'{parts.groupdict()['type']}'")
 
     def tax_refund(self, timestamp, account_id, amount, description):
-        new_id = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        new_id = self._next_id(FOF.INCOME_SPENDING)
         payment = {'id': new_id, 'account': account_id, 'timestamp': timestamp, 'peer': 0,
                    'lines': [{'amount': amount, 'category': -PredefinedCategory.Taxes, 'description': description}]}
         self._data[FOF.INCOME_SPENDING].append(payment)
 
     def cash_fee(self, timestamp, account_id, amount, description):
-        new_id = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        new_id = self._next_id(FOF.INCOME_SPENDING)
         payment = {'id': new_id, 'account': account_id, 'timestamp': timestamp, 'peer': 0,
                    'lines': [{'amount': amount, 'category': -PredefinedCategory.Fees, 'description': description}]}
         self._data[FOF.INCOME_SPENDING].append(payment)
 
     def cash_tax(self, timestamp, account_id, amount, description):
-        new_id = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        new_id = self._next_id(FOF.INCOME_SPENDING)
         payment = {'id': new_id, 'account': account_id, 'timestamp': timestamp, 'peer': 0,
                    'lines': [{'amount': amount, 'category': -PredefinedCategory.Taxes, 'description': description}]}
         self._data[FOF.INCOME_SPENDING].append(payment)
 
     def cash_interest(self, timestamp, account_id, amount, description):
-        new_id = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+        new_id = self._next_id(FOF.INCOME_SPENDING)
         payment = {'id': new_id, 'account': account_id, 'timestamp': timestamp, 'peer': 0,
                    'lines': [{'amount': amount, 'category': -PredefinedCategory.Interest, 'description': description}]}
         self._data[FOF.INCOME_SPENDING].append(payment)
 
     def dividend(self, timestamp, account_id, asset_id, amount, tax, description):
-        new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+        new_id = self._next_id(FOF.ASSET_PAYMENTS)
         payment = {"id": new_id, "type": FOF.PAYMENT_DIVIDEND, "account": account_id, "timestamp": timestamp,
                    "asset": asset_id, "amount": amount, "tax": tax, "description": description}
         self._data[FOF.ASSET_PAYMENTS].append(payment)
@@ -481,7 +481,7 @@ class StatementOpenBroker(StatementXML):
                                         + f"'{interest['symbol']}'")
         tax = float(interest['tax'])   # it has '\d+\.\d+' regex pattern so here shouldn't be an exception
         note = f"{interest['type']} {interest['number']}"
-        new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+        new_id = self._next_id(FOF.ASSET_PAYMENTS)
         payment = {"id": new_id, "type": FOF.PAYMENT_INTEREST, "account": account_id, "timestamp": timestamp,
                    "asset": asset_id, "amount": amount, "tax": tax, "description": note}
         self._data[FOF.ASSET_PAYMENTS].append(payment)
@@ -507,7 +507,7 @@ class StatementOpenBroker(StatementXML):
         number = datetime.utcfromtimestamp(timestamp).strftime('%Y%m%d') + f"-{asset_cancel['id']}"
         qty = asset_cancel['quantity']
         price = abs(amount / qty)  # Price is always positive
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+        new_id = self._next_id(FOF.TRADES)
         trade = {"id": new_id, "number": number, "timestamp": timestamp, "settlement": timestamp, "account": account_id,
                  "asset": asset_cancel['asset'], "quantity": qty, "price": price, "fee": 0.0,
                  "note": asset_cancel['note']}
@@ -515,7 +515,7 @@ class StatementOpenBroker(StatementXML):
 
     def load_loans(self, loans):
         for loan in loans:
-            new_id = max([0] + [x['id'] for x in self._data[FOF.INCOME_SPENDING]]) + 1
+            new_id = self._next_id(FOF.INCOME_SPENDING)
             account_id = self.account_by_currency(loan['currency'])
             note = f"Доход по сделке займа #{loan['number']}: {loan['qty']} x {loan['ticker']}"
             fee_note = f"Комиссия за сделку займа #{loan['number']}: {loan['qty']} x {loan['ticker']}"
@@ -108,12 +108,12 @@ class StatementPSB(StatementXLS):
                     settlement = int(datetime.strptime(self._statement[headers['*settlement']][row],
                                                        "%d.%m.%Y").replace(tzinfo=timezone.utc).timestamp())
                 account_id = self._find_account_id(self._account_number, currency)
-                new_id = max([0] + [x['id'] for x in self._data[FOF.TRADES]]) + 1
+                new_id = self._next_id(FOF.TRADES)
                 trade = {"id": new_id, "number": deal_number, "timestamp": timestamp, "settlement": settlement,
                          "account": account_id, "asset": asset_id, "quantity": qty, "price": price, "fee": fee}
                 self._data[FOF.TRADES].append(trade)
                 if bond_interest != 0:
-                    new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+                    new_id = self._next_id(FOF.ASSET_PAYMENTS)
                     payment = {"id": new_id, "type": FOF.PAYMENT_INTEREST, "account": account_id,
                                "timestamp": timestamp,
                                "number": deal_number, "asset": asset_id, "amount": bond_interest, "description": "НКД"}
@@ -170,7 +170,7 @@ class StatementPSB(StatementXLS):
 
     def transfer_in(self, timestamp, account_id, amount):
         account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        new_id = self._next_id(FOF.TRANSFERS)
         transfer = {"id": new_id, "account": [0, account_id, 0],
                     "asset": [account['currency'], account['currency']], "timestamp": timestamp,
                     "withdrawal": amount, "deposit": amount, "fee": 0.0}
@@ -178,7 +178,7 @@ class StatementPSB(StatementXLS):
 
     def transfer_out(self, timestamp, account_id, amount):
         account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        new_id = max([0] + [x['id'] for x in self._data[FOF.TRANSFERS]]) + 1
+        new_id = self._next_id(FOF.TRANSFERS)
         transfer = {"id": new_id, "account": [account_id, 0, 0],
                     "asset": [account['currency'], account['currency']], "timestamp": timestamp,
                     "withdrawal": -amount, "deposit": -amount, "fee": 0.0}
@@ -220,7 +220,7 @@ class StatementPSB(StatementXLS):
                                       'reg_number': self._statement[headers['reg_number']][row],
                                       'currency': code, 'search_online': "MOEX"})
             note = self._statement[headers['operation']][row] + " " + self._statement[headers['asset_name']][row]
-            new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+            new_id = self._next_id(FOF.ASSET_PAYMENTS)
             payment = {"id": new_id, "type": FOF.PAYMENT_INTEREST, "account": account_id, "timestamp": timestamp,
                        "asset": asset_id, "amount": amount, "tax": tax, "description": note}
             self._data[FOF.ASSET_PAYMENTS].append(payment)
@@ -258,7 +258,7 @@ class StatementPSB(StatementXLS):
             asset_id = self.asset_id({'isin': self._statement[headers['isin']][row],
                                       'reg_number': self._statement[headers['reg_number']][row],
                                       'currency': code, 'search_online': "MOEX"})
-            new_id = max([0] + [x['id'] for x in self._data[FOF.ASSET_PAYMENTS]]) + 1
+            new_id = self._next_id(FOF.ASSET_PAYMENTS)
             payment = {"id": new_id, "type": FOF.PAYMENT_DIVIDEND, "account": account_id, "timestamp": timestamp,
                        "asset": asset_id, "amount": amount, "tax": tax, "description": ''}
             self._data[FOF.ASSET_PAYMENTS].append(payment)
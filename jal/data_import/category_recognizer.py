@@ -1,7 +1,36 @@
+import os
 import re
-import pandas as pd
+import json
+import math
+import heapq
+import hashlib
+import logging
+import threading
+import traceback
+import importlib.util
+from collections import Counter, defaultdict
+from PySide6.QtCore import QThread
+from PySide6.QtWidgets import QApplication
+from jal.constants import Setup
+from jal.db.db import JalDB
+from jal.db.settings import JalSettings
 from jal.db.category import JalCategory
 
+RECOGNIZER_SETTING = "CategoryRecognizer"
+TRAIN_EPOCHS = 40
+FINE_TUNE_EPOCHS = 5
+FULL_RETRAIN_GROWTH = 0.2     # Model is trained from scratch if training data grew by more than 20% since last training
+RECOGNIZER_FILE = "recognizer.json"
+MODEL_FILE = "model.keras"
+
+NGRAM_SIZE = 3
+NGRAM_NEIGHBOURS = 5
+NGRAM_MAX_DF = 0.5            # n-grams that are present in more than 50% of lines are ignored as non-informative
+
+_recognizers = {}             # Recognizer instances that keep trained models in memory: {name: CategoryRecognizer}
+_recognizer_lock = threading.Lock()
+_training_thread = None
+
 #----------------------------------------------------------------------------------------------------------------------
 
 
@@ -22,41 +51,247 @@ def clean_text(text):
 #----------------------------------------------------------------------------------------------------------------------
 
 
-def recognize_categories(purchases):
-    import tensorflow as tf
+# Returns a fingerprint of training data - it changes if any categorized line is added, changed or removed
+def training_data_fingerprint(mapped_values: list) -> str:
+    lines = sorted((x['value'], x['mapped_to']) for x in mapped_values)
+    return hashlib.sha256(json.dumps(lines, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Returns a path to a folder where trained model is stored (it is placed near the database file)
+def recognizer_path() -> str:
+    return os.path.dirname(JalSettings().DbPath()) + os.sep + Setup.RECOGNIZER_PATH + os.sep
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Base class for category recognizers. Recognizer is trained with a list of {'value': text, 'mapped_to': category_id}
+# dictionaries and then predicts category with confidence level (from 0 to 1) for every given text
+class CategoryRecognizer:
+    name = ''              # Key that is stored in settings
+    dependencies = []      # Modules that should be installed to use recognizer
+
+    def __init__(self):
+        self._fingerprint = None
+
+    # Returns translated human-readable name of recognizer
+    @classmethod
+    def title(cls) -> str:
+        raise NotImplementedError("title() method isn't defined for category recognizer")
+
+    # Checks presence of dependencies without import as it may take a lot of time
+    @classmethod
+    def available(cls) -> bool:
+        return all(importlib.util.find_spec(x) is not None for x in cls.dependencies)
+
+    # Re-trains recognizer with categorized lines from database if they were changed since last training
+    def prepare(self):
+        mapped_values = JalCategory.get_mapped_names()
+        fingerprint = training_data_fingerprint(mapped_values)
+        if fingerprint != self._fingerprint:
+            self.train(mapped_values)
+            self._fingerprint = fingerprint
+
+    def train(self, mapped_values: list):
+        raise NotImplementedError("train() method isn't defined for category recognizer")
+
+    # Returns a tuple of 2 lists - with recognized categories and with confidence levels for every purchase
+    def predict(self, purchases: list) -> tuple:
+        raise NotImplementedError("predict() method isn't defined for category recognizer")
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Pure Python recognizer: lines are represented as TF-IDF vectors of character n-grams and category is chosen by votes
+# of the nearest (by cosine similarity) categorized lines. Confidence is a similarity of the nearest line of the category
+class NgramRecognizer(CategoryRecognizer):
+    name = 'ngram'
+
+    def __init__(self):
+        super().__init__()
+        self._idf = {}
+        self._index = {}         # n-gram -> list of (line number, weight)
+        self._categories = []    # category of every training line
+        self._default = None     # most frequent category that is returned when nothing similar was found
+
+    @classmethod
+    def title(cls) -> str:
+        return QApplication.translate("CategoryRecognizer", "Character n-grams")
+
+    @staticmethod
+    def ngrams(text: str) -> Counter:
+        text = ' ' + ' '.join(clean_text(text).split()) + ' '
+        return Counter(text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1))
+
+    # Returns TF-IDF vector with unit length
+    def _vector(self, ngrams: Counter) -> dict:
+        vector = {x: count * self._idf[x] for x, count in ngrams.items() if x in self._idf}
+        norm = math.sqrt(sum(x * x for x in vector.values()))
+        return {x: weight / norm for x, weight in vector.items()} if norm else {}
+
+    def train(self, mapped_values: list):
+        lines = [self.ngrams(x['value']) for x in mapped_values]
+        self._categories = [x['mapped_to'] for x in mapped_values]
+        self._default = Counter(self._categories).most_common(1)[0][0] if self._categories else None
+        frequency = Counter(x for ngrams in lines for x in ngrams)
+        self._idf = {x: math.log((1 + len(lines)) / (1 + df)) + 1 for x, df in frequency.items()
+                     if len(lines) < 2 * NGRAM_NEIGHBOURS or df <= NGRAM_MAX_DF * len(lines)}
+        self._index = defaultdict(list)
+        for i, ngrams in enumerate(lines):
+            for x, weight in self._vector(ngrams).items():
+                self._index[x].append((i, weight))
+
+    def predict(self, purchases: list) -> tuple:
+        categories = []
+        confidence = []
+        for purchase in purchases:
+            similarity = defaultdict(float)
+            for x, weight in self._vector(self.ngrams(purchase)).items():
+                for i, line_weight in self._index.get(x, []):
+                    similarity[i] += weight * line_weight
+            nearest = heapq.nlargest(NGRAM_NEIGHBOURS, similarity.items(), key=lambda x: x[1])
+            votes = defaultdict(float)
+            best_match = {}
+            for i, value in nearest:
+                votes[self._categories[i]] += value
+                best_match[self._categories[i]] = max(best_match.get(self._categories[i], 0.0), value)
+            if votes:
+                category = max(votes, key=votes.get)
+                categories.append(category)
+                confidence.append(min(best_match[category], 1.0))
+            else:
+                categories.append(self._default)
+                confidence.append(0.0)
+        return categories, confidence
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Recognizer based on neural network that is trained with help of Tensorflow. Trained model is saved on disk near the
+# database file and is re-used while categorized lines are not changed
+class KerasRecognizer(CategoryRecognizer):
+    name = 'keras'
+    dependencies = ['tensorflow', 'pandas']
+
+    def __init__(self):
+        super().__init__()
+        self._recognizer = None   # Trained model with its parameters: {'fingerprint', 'model', 'tokenizer', ...}
+
+    @classmethod
+    def title(cls) -> str:
+        return QApplication.translate("CategoryRecognizer", "Neural network (Tensorflow)")
+
+    # Takes a model from disk if it was trained with the same data already. If some lines were added, saved model is
+    # trained a bit more with the full data set; it is trained from scratch if list of categories changed or data grew
+    # too much since last training from scratch (fine-tuning doesn't move this point, so growth can't accumulate)
+    def prepare(self):
+        import tensorflow as tf
+        tf.get_logger().setLevel('WARNING')
+
+        mapped_values = JalCategory.get_mapped_names()
+        fingerprint = training_data_fingerprint(mapped_values)
+        if self._recognizer is not None and self._recognizer['fingerprint'] == fingerprint:
+            return
+        path = recognizer_path()
+        recognizer = load_recognizer(path)
+        if recognizer is not None and recognizer['fingerprint'] == fingerprint:
+            self._recognizer = recognizer
+            return
+        data, categories = self.training_data(mapped_values)
+        if recognizer is not None and recognizer['categories'] == categories \
+                and len(data) <= recognizer.get('trained_size', 0) * (1 + FULL_RETRAIN_GROWTH):
+            fit_model(recognizer, data, FINE_TUNE_EPOCHS)
+        else:
+            recognizer = train_model(data, categories)
+        recognizer['fingerprint'] = fingerprint
+        save_recognizer(path, recognizer)
+        self._recognizer = recognizer
+
+    # Returns a data frame with cleaned values and their category numbers together with a list of categories
+    @staticmethod
+    def training_data(mapped_values: list) -> tuple:
+        import pandas as pd
+
+        categories = sorted(set([x['mapped_to'] for x in mapped_values]))  # set() is used to get unique categories
+        data = pd.DataFrame(mapped_values)
+        data['idx'] = data.mapped_to.map({category: i for i, category in enumerate(categories)})
+        data['cleaned_value'] = data.value.apply(clean_text)
+        return data, categories
+
+    def train(self, mapped_values: list):
+        self._recognizer = train_model(*self.training_data(mapped_values))
+        self._recognizer['fingerprint'] = training_data_fingerprint(mapped_values)
+
+    def predict(self, purchases: list) -> tuple:
+        import tensorflow.keras as keras
+
+        purchases_sequenced = self._recognizer['tokenizer'].texts_to_sequences(purchases)
+        NewX = keras.preprocessing.sequence.pad_sequences(purchases_sequenced, padding='post', truncating='post',
+                                                          maxlen=self._recognizer['max_len'])
+        NewY = self._recognizer['model'].predict(NewX, verbose=0)
+        result_idx = NewY.argmax(axis=1)
+        result = [self._recognizer['categories'][i] for i in result_idx.tolist()]
+        probability = NewY.max(axis=1)
+        return result, probability.tolist()
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+RECOGNIZERS = [NgramRecognizer, KerasRecognizer]
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Returns a list of recognizer classes that may be used with installed modules
+def available_recognizers() -> list:
+    return [x for x in RECOGNIZERS if x.available()]
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Returns a name of recognizer that is selected in settings. If nothing is selected or selected recognizer isn't
+# available then Tensorflow-based recognizer is used if it is installed and lightweight one otherwise
+def selected_recognizer() -> str:
+    available = [x.name for x in available_recognizers()]
+    name = JalSettings().getValue(RECOGNIZER_SETTING, default='')
+    if name in available:
+        return name
+    return KerasRecognizer.name if KerasRecognizer.name in available else NgramRecognizer.name
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+def select_recognizer(name: str):
+    JalSettings().setValue(RECOGNIZER_SETTING, name)
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Returns recognizer instance with given name (or the one selected in settings). Instances are kept in memory to
+# re-use trained models
+def get_recognizer(name: str = '') -> CategoryRecognizer:
+    name = name if name else selected_recognizer()
+    if name not in _recognizers:
+        recognizer_class = [x for x in RECOGNIZERS if x.name == name]
+        if not recognizer_class:
+            raise ValueError(f"Unknown category recognizer: {name}")
+        _recognizers[name] = recognizer_class[0]()
+    return _recognizers[name]
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Builds a new model and trains it from scratch. Tokenizer vocabulary and category list are built from 'data'.
+# Size of 'data' is remembered as 'trained_size' in order to decide later whether fine-tuning is still enough
+def train_model(data: 'pd.DataFrame', categories: list) -> dict:
     import tensorflow.keras as keras
-    tf.get_logger().setLevel('WARNING')
-
-    classes_number = 0
-    classes = []
-    mapped_values = JalCategory.get_mapped_names()
-    for category in set([x['mapped_to'] for x in mapped_values]):  # set() is used to get unique list from full list
-        classes.append({
-            'idx': classes_number,
-            'category': category
-        })
-        classes_number += 1
-    categories = pd.DataFrame(classes)
-
-    data = pd.DataFrame(mapped_values)
-    data = data.merge(categories, left_on="mapped_to", right_on='category')
-    data = data.drop(columns=['mapped_to', 'category'])     # we don't need this column as we will use custom 'idx'
-
-    data['cleaned_value'] = data.value.apply(clean_text)
-
-    # prepare X values
-    descriptions = data.cleaned_value
+
     tokenizer = keras.preprocessing.text.Tokenizer(num_words=5000, oov_token='UNKNOWN', lower=False)
-    tokenizer.fit_on_texts(descriptions)
+    tokenizer.fit_on_texts(data.cleaned_value)
     dictionary_size = len(tokenizer.word_index)
-    descriptions_sequenced = tokenizer.texts_to_sequences(descriptions)
-    max_desc_len = len(max(descriptions_sequenced, key=len))
-    X = keras.preprocessing.sequence.pad_sequences(descriptions_sequenced, padding='post', maxlen=max_desc_len)
-
-    # prepare Y values
-    Y = keras.utils.to_categorical(data.idx)
-
-    # prepare and train model
+    max_desc_len = len(max(tokenizer.texts_to_sequences(data.cleaned_value), key=len))
+    classes_number = len(categories)
     nn_model = keras.Sequential(
         [keras.layers.Embedding(input_length=max_desc_len, input_dim=dictionary_size + 1, output_dim=classes_number * 2),
          keras.layers.Flatten(),
@@ -64,14 +299,92 @@ def recognize_categories(purchases):
          keras.layers.Dense(classes_number, activation='softmax')
          ])
     nn_model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
-    nn_model.fit(X, Y, epochs=40, batch_size=50, verbose=0)
+    recognizer = {'model': nn_model, 'tokenizer': tokenizer, 'categories': categories, 'max_len': max_desc_len,
+                  'trained_size': len(data)}
+    fit_model(recognizer, data, TRAIN_EPOCHS)
+    return recognizer
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Trains model of 'recognizer' with given data for given number of epochs
+def fit_model(recognizer: dict, data: 'pd.DataFrame', epochs: int):
+    import tensorflow.keras as keras
+
+    sequenced = recognizer['tokenizer'].texts_to_sequences(data.cleaned_value)
+    X = keras.preprocessing.sequence.pad_sequences(sequenced, padding='post', truncating='post',
+                                                   maxlen=recognizer['max_len'])
+    Y = keras.utils.to_categorical(data.idx, num_classes=len(recognizer['categories']))
+    recognizer['model'].fit(X, Y, epochs=epochs, batch_size=50, verbose=0)
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Loads model that was saved previously by save_recognizer(). Returns None if there is no valid saved model
+def load_recognizer(path: str):
+    import tensorflow.keras as keras
+
+    try:
+        with open(path + RECOGNIZER_FILE, 'r', encoding='utf-8') as json_file:
+            recognizer = json.load(json_file)
+        recognizer['tokenizer'] = keras.preprocessing.text.tokenizer_from_json(recognizer['tokenizer'])
+        recognizer['model'] = keras.models.load_model(path + MODEL_FILE)
+    except (OSError, ValueError, KeyError) as e:
+        logging.debug(f"Saved category recognizer wasn't loaded: {e}")
+        return None
+    return recognizer
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Saves trained model, tokenizer vocabulary and category list into files in given folder. Description file is written
+# last, so it never refers to a model that wasn't saved completely
+def save_recognizer(path: str, recognizer: dict):
+    description = {x: recognizer[x] for x in ['fingerprint', 'categories', 'max_len', 'trained_size']}
+    description['tokenizer'] = recognizer['tokenizer'].to_json()
+    try:
+        os.makedirs(path, exist_ok=True)
+        recognizer['model'].save(path + MODEL_FILE)
+        with open(path + RECOGNIZER_FILE + '.tmp', 'w', encoding='utf-8') as json_file:
+            json.dump(description, json_file, ensure_ascii=False)
+        os.replace(path + RECOGNIZER_FILE + '.tmp', path + RECOGNIZER_FILE)
+    except OSError as e:
+        logging.warning(f"Failed to save category recognizer: {e}")
 
-    # predict categories
-    purchases_sequenced = tokenizer.texts_to_sequences(purchases)
-    NewX = keras.preprocessing.sequence.pad_sequences(purchases_sequenced, padding='post', maxlen=max_desc_len)
-    NewY = nn_model.predict(NewX)
-    result_idx = keras.backend.argmax(NewY, axis=1)
-    result = categories.take(result_idx.numpy().tolist()).category
-    probability = NewY.max(axis=1)
+#----------------------------------------------------------------------------------------------------------------------
+
+
+# Thread that prepares category recognizer in advance, so it is ready when user asks to recognize categories
+class RecognizerTrainingThread(QThread):
+    def __init__(self, name):
+        super().__init__()
+        self._name = name
+
+    def run(self):
+        try:
+            with _recognizer_lock:
+                get_recognizer(self._name).prepare()
+        except Exception:
+            logging.error(f"{traceback.format_exc()}")
+        finally:
+            JalDB.close_thread_connection()
+
+#----------------------------------------------------------------------------------------------------------------------
 
-    return result.tolist(), probability.tolist()
\ No newline at end of file
+
+# Starts preparation of selected category recognizer in background if it isn't running already
+def prepare_recognizer_in_background():
+    global _training_thread
+    if _training_thread is not None and _training_thread.isRunning():
+        return
+    _training_thread = RecognizerTrainingThread(selected_recognizer())
+    _training_thread.start()
+
+#----------------------------------------------------------------------------------------------------------------------
+
+
+def recognize_categories(purchases):
+    with _recognizer_lock:
+        recognizer = get_recognizer()
+        recognizer.prepare()
+        return recognizer.predict(purchases)
@@ -8,13 +8,14 @@ from PySide6.QtGui import QImage
 from PySide6.QtWidgets import QApplication, QDialog, QFileDialog, QHeaderView, QStyledItemDelegate
 from jal.widgets.reference_selector import CategorySelector, TagSelector
 from jal.constants import CustomColor
-from jal.widgets.helpers import dependency_present, decodeQR
+from jal.widgets.helpers import decodeQR
 from jal.db.peer import JalPeer
 from jal.db.category import JalCategory
 from jal.db.operations import LedgerTransaction
 from jal.data_import.slips_tax import SlipsTaxAPI
 from jal.ui.ui_slip_import_dlg import Ui_ImportSlipDlg
-from jal.data_import.category_recognizer import recognize_categories
+from jal.data_import.category_recognizer import recognize_categories, prepare_recognizer_in_background, \
+    available_recognizers, selected_recognizer, select_recognizer
 
 
 #-----------------------------------------------------------------------------------------------------------------------
@@ -131,7 +132,7 @@ class ImportSlipDialog(QDialog):
         self.slip_lines = None
 
         self.slipsAPI = SlipsTaxAPI(self)
-        self.tensor_flow_present = dependency_present(['tensorflow'])
+        self.recognizers = available_recognizers()
 
         self.ui.LoadQRfromFileBtn.clicked.connect(self.loadFileQR)
         self.ui.GetQRfromClipboardBtn.clicked.connect(self.readClipboardQR)
@@ -144,7 +145,13 @@ class ImportSlipDialog(QDialog):
         self.ui.ClearBtn.clicked.connect(self.clearSlipData)
         self.ui.AssignCategoryBtn.clicked.connect(self.recognizeCategories)
 
-        self.ui.AssignCategoryBtn.setEnabled(self.tensor_flow_present)
+        for recognizer in self.recognizers:
+            self.ui.RecognizerCombo.addItem(recognizer.title(), recognizer.name)
+        self.ui.RecognizerCombo.setCurrentIndex(self.ui.RecognizerCombo.findData(selected_recognizer()))
+        self.ui.RecognizerCombo.currentIndexChanged.connect(self.onRecognizerChange)
+        self.ui.AssignCategoryBtn.setEnabled(bool(self.recognizers))
+        if self.recognizers:   # Model will be ready or up-to-date by the time when slip is loaded
+            prepare_recognizer_in_background()
 
     def closeEvent(self, arg__1):
         self.ui.ScannerQR.stopScan()
@@ -378,10 +385,15 @@ class ImportSlipDialog(QDialog):
 
         self.initUi()
 
+    @Slot()
+    def onRecognizerChange(self, index):
+        select_recognizer(self.ui.RecognizerCombo.itemData(index))
+        prepare_recognizer_in_background()
+
     @Slot()
     def recognizeCategories(self):
-        if not self.tensor_flow_present:
-            logging.warning(self.tr("Categories are not recognized: Tensorflow is not found"))
+        if not self.recognizers:
+            logging.warning(self.tr("Categories are not recognized: no recognizer is available"))
             return
         self.slip_lines['category'], self.slip_lines['confidence'] = \
             recognize_categories(self.slip_lines['name'].tolist())
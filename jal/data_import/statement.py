@@ -1,6 +1,4 @@
 import json
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
 import sys
 import os
 import logging
@@ -12,6 +10,7 @@ from PySide6.QtCore import QObject
 from PySide6.QtWidgets import QDialog, QMessageBox
 from jal.constants import Setup, MarketDataFeed, PredefinedAsset, PredefindedAccountType
 from jal.db.helpers import get_app_path
+from jal.db.db import JalDB
 from jal.db.account import JalAccount
 from jal.db.asset import JalAsset
 from jal.db.operations import LedgerTransaction, Dividend, CorporateAction
@@ -74,6 +73,51 @@ class FOF:
 class Statement_ImportError(Exception):
     pass
 
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Index of statement section elements that is used to avoid linear search through statement lists:
+# 'ids' - {id: element}, 'refs' - {(key, value): [elements with 'value' in 'key']} for keys listed in 'reference_keys'.
+# Index is made for given list object and is extended by update() when new elements are appended to the list.
+# Reference keys of indexed elements should be changed by Statement methods only in order to keep the index valid.
+class StatementSectionIndex:
+    def __init__(self, elements: list, reference_keys: list):
+        self.elements = elements
+        self.size = 0
+        self.ids = {}
+        self.duplicates = set()
+        self.max_id = 0
+        self.refs = defaultdict(list)
+        self._reference_keys = reference_keys
+        self.update()
+
+    # Adds elements that were appended to the list since last update
+    def update(self):
+        for element in self.elements[self.size:]:
+            if 'id' in element:
+                self.add_id(element)
+            for key in self._reference_keys:
+                if key in element:
+                    self.add_reference(element, key)
+        self.size = len(self.elements)
+
+    def add_id(self, element):
+        if element['id'] in self.ids:
+            self.duplicates.add(element['id'])
+        else:
+            self.ids[element['id']] = element
+        self.max_id = max(self.max_id, element['id'])
+
+    def remove_id(self, element):
+        if self.ids.get(element['id']) is element:
+            del self.ids[element['id']]
+        if element['id'] == self.max_id:
+            self.max_id = max([0] + list(self.ids))
+
+    def add_reference(self, element, key):
+        values = set(element[key]) if type(element[key]) == list else [element[key]]
+        for value in values:
+            self.refs[(key, value)].append(element)
+
 # Possible statement module capabilities
 class Statement_Capabilities:
     MULTIPLE_LOAD = 1
@@ -112,9 +156,15 @@ class Statement(QObject):   # derived from QObject to have proper string transla
         'MOEX': MarketDataFeed.RU
     }
     
+    # Sections that have elements with 'id' and may refer to elements of other sections by _reference_keys
+    _mutable_sections = [FOF.ACCOUNTS, FOF.ASSETS, FOF.SYMBOLS, FOF.ASSETS_DATA, FOF.TRADES, FOF.TRANSFERS,
+                         FOF.CORP_ACTIONS, FOF.ASSET_PAYMENTS, FOF.INCOME_SPENDING]
+    _reference_keys = ["asset", "account", "currency", "peer"]
+
     def __init__(self):
         super().__init__()
         self._data = {}
+        self._indices = {}    # section name -> StatementSectionIndex
         self._previous_accounts = {}
         self._last_selected_account = None
         self._section_loaders = {
@@ -162,8 +212,8 @@ class Statement(QObject):   # derived from QObject to have proper string transla
 
     # Finds an account in jal database and returns its id
     def _map_db_account(self, account_id: int) -> int:
-        account = [x for x in self._data[FOF.ACCOUNTS] if x["id"] == account_id][0]
-        currency_symbol = [x for x in self._data[FOF.SYMBOLS] if x["asset"] == account['currency']][0]['symbol']
+        account = self._find_in_list(self._data[FOF.ACCOUNTS], "id", account_id)
+        currency_symbol = self._section_index(FOF.SYMBOLS).refs[("asset", account['currency'])][0]['symbol']
         db_currency = JalAsset(data={'symbol': currency_symbol, 'type': PredefinedAsset.Money}, search=True, create=False).id()
         db_account = JalAccount(data={'number': account['number'], 'currency': db_currency}, search=True, create=False).id()
         return db_account
@@ -179,6 +229,7 @@ class Statement(QObject):   # derived from QObject to have proper string transla
     # Loads JSON statement format from file defined by 'filename'
     def load(self, filename: str) -> None:
         self._data = {}
+        self._indices = {}
         try:
             with open(filename, 'r', encoding='utf-8') as exchange_file:
                 try:
@@ -195,6 +246,7 @@ class Statement(QObject):   # derived from QObject to have proper string transla
 
     # check are assets and accounts from self._data present in database
     # replace IDs in self._data with IDs from database (DB IDs will be negative, initial IDs will be positive)
+    # Every step collects search keys of all not matched elements first and resolves them in one batch
     def match_db_ids(self):
         self._match_currencies()
         self._match_asset_isin()
@@ -203,42 +255,35 @@ class Statement(QObject):   # derived from QObject to have proper string transla
         self._match_account_ids()
 
     def _match_currencies(self):
-        for asset in self._data[FOF.ASSETS]:
-            if asset['type'] != FOF.ASSET_MONEY:
-                continue
-            symbol = self._find_in_list(self._data[FOF.SYMBOLS], "asset", asset['id'])
-            asset_id = JalAsset(data={'symbol': symbol['symbol'], 'type': self._asset_types[asset['type']]},
-                                search=True, create=False).id()
+        currencies = [x for x in self._data[FOF.ASSETS] if x['type'] == FOF.ASSET_MONEY]
+        search_list = [{'symbol': self._find_in_list(self._data[FOF.SYMBOLS], "asset", x['id'])['symbol'],
+                        'type': self._asset_types[x['type']]} for x in currencies]
+        for asset, asset_id in zip(currencies, JalAsset.find_assets(search_list)):
             if asset_id:
-                symbol['asset'] = -asset_id
-                old_id, asset['id'] = asset['id'], -asset_id
+                old_id = self._set_id(FOF.ASSETS, asset, -asset_id)
                 self._update_id("currency", old_id, asset_id)
                 self._update_id("asset", old_id, asset_id)     # TRANSFERS section may have currency in asset list
 
     # Check and replace IDs for Assets matched by isin
     def _match_asset_isin(self):
-        for asset in self._data[FOF.ASSETS]:
-            if asset['id'] < 0:  # already matched
-                continue
-            if 'isin' in asset:
-                asset_id = JalAsset(data={'isin': asset['isin']}, search=True, create=False).id()
-                if asset_id:
-                    old_id, asset['id'] = asset['id'], -asset_id
-                    self._update_id("asset", old_id, asset_id)
+        assets = [x for x in self._data[FOF.ASSETS] if x['id'] > 0 and 'isin' in x]   # skip already matched
+        for asset, asset_id in zip(assets, JalAsset.find_assets([{'isin': x['isin']} for x in assets])):
+            if asset_id:
+                old_id = self._set_id(FOF.ASSETS, asset, -asset_id)
+                self._update_id("asset", old_id, asset_id)
 
     # Check and replace IDs for Assets matched by reg_number
     def _match_asset_reg_number(self):
-        for asset in self._data[FOF.ASSETS_DATA]:
-            if asset['asset'] < 0:  # already matched
-                continue
-            if 'reg_number' in asset:
-                asset_id = JalAsset(data={'reg_number': asset['reg_number']}, search=True, create=False).id()
-                if asset_id:
-                    asset = self._find_in_list(self._data[FOF.ASSETS], "id", asset['asset'])
-                    old_id, asset['id'] = asset['id'], -asset_id
-                    self._update_id("asset", old_id, asset_id)
+        assets_data = [x for x in self._data[FOF.ASSETS_DATA] if x['asset'] > 0 and 'reg_number' in x]
+        search_list = [{'reg_number': x['reg_number']} for x in assets_data]
+        for data, asset_id in zip(assets_data, JalAsset.find_assets(search_list)):
+            if asset_id and data['asset'] > 0:   # asset might be matched already via previous data element
+                asset = self._find_in_list(self._data[FOF.ASSETS], "id", data['asset'])
+                old_id = self._set_id(FOF.ASSETS, asset, -asset_id)
+                self._update_id("asset", old_id, asset_id)
 
     def _match_asset_symbol(self):
+        candidates = []
         for symbol in self._data[FOF.SYMBOLS]:
             if symbol['asset'] < 0:  # already matched
                 continue
@@ -250,65 +295,89 @@ class Statement(QObject):   # derived from QObject to have proper string transla
             if data is not None:
                 self._uppend_keys_from(search_data, data, ['expiry'])
                 reg_number = data['reg_number'] if 'reg_number' in data else ''
-            db_asset = JalAsset(data=search_data, search=True, create=False)
-            db_id = db_asset.id()
-            if db_id:
-                if db_asset.isin() and 'isin' in asset and asset['isin'] and db_asset.isin() != asset['isin']:
-                    continue  # verify that we don't have ISIN mismatch
-                if db_asset.reg_number() and reg_number and db_asset.reg_number() != reg_number:
-                    continue  # verify that we don't have reg.number mismatch
-                old_id, asset['id'] = asset['id'], -db_id
-                self._update_id("asset", old_id, db_id)
+            candidates.append((symbol, asset, reg_number, search_data))
+        db_ids = JalAsset.find_assets([x[-1] for x in candidates])
+        for (symbol, asset, reg_number, _search_data), db_id in zip(candidates, db_ids):
+            if not db_id or symbol['asset'] < 0:   # not found or matched via another symbol of the same asset
+                continue
+            db_asset = JalAsset(db_id)
+            if db_asset.isin() and 'isin' in asset and asset['isin'] and db_asset.isin() != asset['isin']:
+                continue  # verify that we don't have ISIN mismatch
+            if db_asset.reg_number() and reg_number and db_asset.reg_number() != reg_number:
+                continue  # verify that we don't have reg.number mismatch
+            old_id = self._set_id(FOF.ASSETS, asset, -db_id)
+            self._update_id("asset", old_id, db_id)
 
     # Check and replace IDs for Accounts
     def _match_account_ids(self):
-        for account in self._data[FOF.ACCOUNTS]:
-            account_data = account.copy()
-            account_data['currency'] = -account['currency']
-            account_id = JalAccount(data=account_data, search=True, create=False).id()
+        accounts = self._data[FOF.ACCOUNTS]
+        search_list = [{'number': x['number'], 'currency': -x['currency']} for x in accounts]
+        for account, account_id in zip(list(accounts), JalAccount.find_accounts(search_list)):
             if account_id:
-                old_id, account['id'] = account['id'], -account_id
+                old_id = self._set_id(FOF.ACCOUNTS, account, -account_id)
                 self._update_id("account", old_id, account_id)
 
-    # Replace 'old_value' with 'new_value' in keys 'tag_name' of sections listed in mutable_sections
+    # Replace 'old_value' with 'new_value' in keys 'tag_name' of sections listed in _mutable_sections
+    # Elements with 'old_value' are taken from sections' indices, so time doesn't depend on statement size
     def _update_id(self, tag_name, old_value, new_value):
-        mutable_sections = [FOF.ACCOUNTS, FOF.ASSETS, FOF.SYMBOLS, FOF.ASSETS_DATA, FOF.TRADES, FOF.TRANSFERS,
-                            FOF.CORP_ACTIONS, FOF.ASSET_PAYMENTS, FOF.INCOME_SPENDING]
-        for section in mutable_sections:
+        for section in self._mutable_sections:
             if section not in self._data:
                 continue
-            for element in self._data[section]:
-                if self._key_match(element, tag_name, old_value):
-                    if type(element[tag_name]) == list:
-                        element[tag_name] = [-new_value if x == old_value else x for x in element[tag_name]]
-                    else:
-                        element[tag_name] = -new_value if element[tag_name] == old_value else element[tag_name]
+            index = self._section_index(section)
+            for element in index.refs.pop((tag_name, old_value), []):
+                if not self._key_match(element, tag_name, old_value):
+                    continue   # Key was changed or removed from element already
+                if type(element[tag_name]) == list:
+                    element[tag_name] = [-new_value if x == old_value else x for x in element[tag_name]]
+                else:
+                    element[tag_name] = -new_value
+                index.refs[(tag_name, -new_value)].append(element)
         for element in self._data[FOF.CORP_ACTIONS]:  # Corporate actions have 'outcome' subsection with assets
             for item in element['outcome']:
                 if self._key_match(item, tag_name, old_value):
                     item[tag_name] = -new_value if item[tag_name] == old_value else item[tag_name]
 
+    # Sets id of 'element' from 'section' to 'new_id' and returns its previous id
+    def _set_id(self, section, element, new_id) -> int:
+        index = self._section_index(section)
+        old_id = element['id']
+        index.remove_id(element)
+        element['id'] = new_id
+        index.add_id(element)
+        return old_id
+
+    # Returns next free id for a new element of given section
+    def _next_id(self, section) -> int:
+        return self._section_index(section).max_id + 1
+
+    # Returns index of given section that is up-to-date with section content. Index is re-created if section list was
+    # replaced or shortened and is extended if new elements were appended to the section list
+    def _section_index(self, section) -> StatementSectionIndex:
+        elements = self._data[section]
+        index = self._indices.get(section)
+        if index is None or index.elements is not elements or index.size > len(elements):
+            index = self._indices[section] = StatementSectionIndex(elements, self._reference_keys)
+        elif index.size < len(elements):
+            index.update()
+        return index
+
     # Deletes element if it's 'tag_name' key matches 'value'
     def _delete_with_id(self, tag_name, value):
-        mutable_sections = [FOF.ACCOUNTS, FOF.ASSETS, FOF.SYMBOLS, FOF.ASSETS_DATA, FOF.TRADES, FOF.TRANSFERS,
-                            FOF.CORP_ACTIONS, FOF.ASSET_PAYMENTS, FOF.INCOME_SPENDING]
-        for section in mutable_sections:
+        for section in self._mutable_sections:
             self._data[section] = [x for x in self._data[section] if not self._key_match(x, tag_name, value)]
 
     # returns True if dictionary 'element' has 'key' that matches 'value' or is a list with 'value'
     def _key_match(self, element, key, value):
-        for tag in element:
-            if tag == key:
-                if type(element[tag]) == list:
-                    for x in element[tag]:
-                        if x == value:
-                            return True
-                else:
-                    if element[tag] == value:
-                        return True
-        return False
+        if key not in element:
+            return False
+        if type(element[key]) == list:
+            return value in element[key]
+        return element[key] == value
 
     def validate_format(self):
+        from jsonschema import validate
+        from jsonschema.exceptions import ValidationError
+
         schema_name = get_app_path() + Setup.IMPORT_PATH + os.sep + Setup.IMPORT_SCHEMA_NAME
         try:
             with open(schema_name, 'r') as schema_file:
@@ -326,10 +395,19 @@ class Statement(QObject):   # derived from QObject to have proper string transla
     # Store content of JSON statement into database
     # Returns a dict of dict with amounts:
     # { account_1: { asset_1: X, asset_2: Y, ...}, account_2: { asset_N: Z, ...}, ... }
+    # Imports statement data into DB in bulk mode - either all data are imported or nothing is changed in case of failure
     def import_into_db(self):
-        for section in self._section_loaders:
-            if section in self._data:
-                self._section_loaders[section](self._data[section])
+        bulk = JalDB.begin_bulk()
+        try:
+            for section in self._section_loaders:
+                if section in self._data:
+                    self._section_loaders[section](self._data[section])
+        except Exception:
+            if bulk:
+                JalDB.end_bulk(commit=False)
+            raise
+        if bulk and not JalDB.end_bulk():
+            raise Statement_ImportError(self.tr("Failed to save imported data into database"))
 
         totals = defaultdict(dict)
         for account in self._data[FOF.ACCOUNTS]:
@@ -360,7 +438,7 @@ class Statement(QObject):   # derived from QObject to have proper string transla
             asset_data['type'] = self._asset_types[asset_data['type']]
             new_asset = JalAsset(data=asset_data, search=False, create=True)
             if new_asset.id():
-                old_id, asset['id'] = asset['id'], -new_asset.id()
+                old_id = self._set_id(FOF.ASSETS, asset, -new_asset.id())
                 self._update_id("asset", old_id, new_asset.id())
                 if asset['type'] == FOF.ASSET_MONEY:
                     self._update_id("currency", old_id, new_asset.id())
@@ -403,7 +481,7 @@ class Statement(QObject):   # derived from QObject to have proper string transla
             account_data['currency'] = -account_data['currency']  # all currencies are already in db
             new_account = JalAccount(data=account_data, search=True, create=True)
             if new_account.id():
-                old_id, account['id'] = account['id'], -new_account.id()
+                old_id = self._set_id(FOF.ACCOUNTS, account, -new_account.id())
                 self._update_id("account", old_id, new_account.id())
             else:
                 raise Statement_ImportError(self.tr("Can't create account: ") + f"{account}")
@@ -574,13 +652,30 @@ class Statement(QObject):   # derived from QObject to have proper string transla
     # exception is raised if multiple elements found
     # Returns None if nothing was found in the list
     def _find_in_list(self, data_list, key, value):
-        filtered = [x for x in data_list if key in x and x[key] == value]
+        section = self._section_of(data_list)
+        if section is not None and key == 'id':
+            index = self._section_index(section)
+            if value in index.duplicates:
+                filtered = [x for x in data_list if key in x and x[key] == value]
+            else:
+                filtered = [index.ids[value]] if value in index.ids else []
+        elif section is not None and key in self._reference_keys:
+            filtered = [x for x in self._section_index(section).refs.get((key, value), []) if x.get(key) == value]
+        else:
+            filtered = [x for x in data_list if key in x and x[key] == value]
         if filtered:
             if len(filtered) == 1:
                 return filtered[0]
             else:
                 raise Statement_ImportError(self.tr("Multiple match for ") + f"'{key}'='{value}': {filtered}")
 
+    # Returns name of statement section that is kept in given list object or None if the list isn't a section
+    def _section_of(self, data_list) -> str:
+        for section in self._mutable_sections:
+            if self._data.get(section) is data_list:
+                return section
+        return None
+
     # Method finds currency in current statement data. New currency is created if no currency was found.
     # Returns currency id
     def currency_id(self, currency_symbol) -> int:
@@ -592,9 +687,9 @@ class Statement(QObject):   # derived from QObject to have proper string transla
             else:
                 raise Statement_ImportError(self.tr("Multiple currency match for ") + f"{currency_symbol}")
         else:
-            asset_id = max([0] + [x['id'] for x in self._data[FOF.ASSETS]]) + 1
+            asset_id = self._next_id(FOF.ASSETS)
             self._data[FOF.ASSETS].append({"id": asset_id, "type": "money", "name": ""})
-            symbol_id = max([0] + [x['id'] for x in self._data[FOF.SYMBOLS]]) + 1
+            symbol_id = self._next_id(FOF.SYMBOLS)
             currency = {"id": symbol_id, "asset": asset_id, "symbol": currency_symbol}
             self._data[FOF.SYMBOLS].append(currency)
             return asset_id
@@ -635,19 +730,19 @@ class Statement(QObject):   # derived from QObject to have proper string transla
         if asset is None:
             if 'should_exist' in asset_info and asset_info['should_exist']:
                 raise Statement_ImportError(self.tr("Can't locate asset in statement data: ") + f"'{asset_info}'")
-            asset_id = max([0] + [x['id'] for x in self._data[FOF.ASSETS]]) + 1
+            asset_id = self._next_id(FOF.ASSETS)
             asset = {"id": asset_id}
             self._uppend_keys_from(asset, asset_info, ['type', 'name', 'isin', 'country'])
             self._data[FOF.ASSETS].append(asset)
             if 'symbol' in asset_info:
-                symbol_id = max([0] + [x['id'] for x in self._data[FOF.SYMBOLS]]) + 1
+                symbol_id = self._next_id(FOF.SYMBOLS)
                 symbol = {"id": symbol_id, "asset": asset_id}
                 self._uppend_keys_from(symbol, asset_info, ['symbol', 'currency', 'note'])
                 self._data[FOF.SYMBOLS].append(symbol)
             data = {}
             self._uppend_keys_from(data, asset_info, ['reg_number', 'expiry', 'principal'])
             if data:
-                data_id = max([0] + [x['id'] for x in self._data[FOF.ASSETS_DATA]]) + 1
+                data_id = self._next_id(FOF.ASSETS_DATA)
                 data['id'] = data_id
                 data['asset'] = asset_id
                 self._data[FOF.ASSETS_DATA].append(data)
@@ -675,7 +770,7 @@ class Statement(QObject):   # derived from QObject to have proper string transla
                             'currency' not in asset_info or symbol['currency'] == asset_info['currency']):
                         symbol_exists = True
             if not symbol_exists:
-                symbol_id = max([0] + [x['id'] for x in self._data[FOF.SYMBOLS]]) + 1
+                symbol_id = self._next_id(FOF.SYMBOLS)
                 symbol = {"id": symbol_id, "asset": asset_id}
                 self._uppend_keys_from(symbol, asset_info, ['symbol', 'currency', 'note', 'alt_symbol'])
                 self._data[FOF.SYMBOLS].append(symbol)
@@ -684,7 +779,7 @@ class Statement(QObject):   # derived from QObject to have proper string transla
         if asset_data is None:
             if {'reg_number', 'expiry', 'principal'}.intersection(set(asset_info)):  # if keys are present in info
                 asset_data = {}
-                data_id = max([0] + [x['id'] for x in self._data[FOF.ASSETS_DATA]]) + 1
+                data_id = self._next_id(FOF.ASSETS_DATA)
                 asset_data['id'] = data_id
                 asset_data['asset'] = asset_id
                 self._data[FOF.ASSETS_DATA].append(asset_data)
@@ -178,7 +178,7 @@ class StatementXLS(Statement):
     def _load_accounts(self):
         currencies = [x for x in self._data[FOF.ASSETS] if x['type'] == FOF.ASSET_MONEY]
         for currency in currencies:
-            id = max([0] + [x['id'] for x in self._data[FOF.ACCOUNTS]]) + 1
+            id = self._next_id(FOF.ACCOUNTS)
             account = {"id": id, "number": self._account_number, "currency": currency['id']}
             self._data[FOF.ACCOUNTS].append(account)
 
@@ -238,7 +238,7 @@ class StatementXLS(Statement):
                 return match[0]['id']
             else:
                 raise Statement_ImportError(self.tr("Multiple accounts found: ") + f"{number}/{currency}")
-        new_id = max([0] + [x['id'] for x in self._data[FOF.ACCOUNTS]]) + 1
+        new_id = self._next_id(FOF.ACCOUNTS)
         new_account = {"id": new_id, "number": number, 'currency': currency_id}
         self._data[FOF.ACCOUNTS].append(new_account)
         return new_id
@@ -16,7 +16,8 @@ class StatementXML(Statement):
     def __init__(self):
         super().__init__()
         self.statement_name = ''
-        self._statement = None
+        self._filename = ''
+        self._statement_index = 0
         self._sections = {}
         self._init_data()
         self.attr_loader = {
@@ -80,39 +81,126 @@ class StatementXML(Statement):
                                         + f"{xml_element.attrib[attr_name]}")
 
     # XML file can contain several statements - load 1st one by default, but may be changed by index
-    def load(self, filename: str, index : int = 0) -> None:
+    # File is parsed incrementally and records of a section are dropped from memory right after they are converted
+    # into dictionaries if all sections that precede it in self._sections are loaded already. Otherwise, section is kept
+    # in memory until all preceding sections are loaded (or till the end of the statement if some of them are absent).
+    def load(self, filename: str, index: int = 0) -> None:
         self._init_data()
+        self._filename = filename
+        self._statement_index = index
+        path = self._statement_path()
+        pending = [x for x in self._sections if x != StatementXML.STATEMENT_ROOT]   # Sections to load in their order
+        kept = {}            # Sections that were read but wait for preceding sections {tag: element}
+        section = None       # Section that is being read now
+        section_data = None  # Records of current section if it is loaded immediately (None otherwise)
+        keep_section = False
+        statement = None     # Statement with given index
+        count = 0            # Number of statements found in file
+        tags = []            # Tags of current element and all its parents
         try:
-            xml_root = etree.parse(filename)
+            for event, element in etree.iterparse(filename, events=('start', 'end'), huge_tree=True):
+                if event == 'start':
+                    tags.append(element.tag)
+                    if len(tags) == 1:
+                        self.validate_file_header_attributes(element.attrib)
+                    if statement is None and self._is_statement(path, tags):
+                        if count == index:
+                            if element.tag != self.statement_tag:
+                                logging.warning(self.tr("Unknown statement tag: ") + f"'{element.tag}'@{filename}")
+                                return
+                            statement = element
+                            header_data = self.get_section_data(statement)
+                            self._sections[StatementXML.STATEMENT_ROOT]['loader'](header_data)
+                        count += 1
+                    elif statement is not None and len(tags) == len(path) + 2:
+                        section = element
+                        section_data = [] if pending and element.tag == pending[0] else None
+                        keep_section = section_data is None and element.tag in pending and element.tag not in kept
+                    continue
+                level = len(tags) - len(path) - 1   # Level inside statement: 0 - statement, 1 - section, 2 - record
+                tags.pop()
+                if statement is None:
+                    self._drop_element(element)
+                elif level == 0:
+                    for tag in pending:
+                        if tag in kept:
+                            self._load_section(kept.pop(tag))
+                    self.strip_unused_data()
+                    logging.info(self.statement_name + self.tr(" loaded successfully"))
+                    return
+                elif level == 1:
+                    if section_data is not None:
+                        self._sections[element.tag]['loader'](section_data)
+                        pending.pop(0)
+                        self._drop_element(element, siblings=False)
+                        while pending and pending[0] in kept:
+                            self._load_section(kept.pop(pending.pop(0)))
+                    elif keep_section:
+                        kept[element.tag] = element
+                    else:
+                        self._drop_element(element, siblings=False)
+                    section = section_data = None
+                elif level == 2:
+                    if section_data is not None and element.tag == self._sections[section.tag]['tag']:
+                        attributes = self.parse_attributes(section.tag, element)
+                        if attributes is not None:
+                            section_data.append(attributes)
+                    if not keep_section:
+                        self._drop_element(element)
         except etree.XMLSyntaxError as e:
             raise Statement_ImportError(self.tr("Can't parse XML file: ") + e.msg)
-        self.validate_file_header_attributes(xml_root.findall('.')[0].attrib)
-        statements = xml_root.findall(self.statements_path)
-        if len(statements) == 0:
+        if count == 0:
             logging.info(self.tr("No statement was found in file: " + filename))
-            return
-        try:
-            statement = statements[index]
-        except IndexError:
+        else:
             logging.warning(self.tr("Failed to find statement index: ") + f"{index}@{filename}")
-            return
-        if statement.tag != self.statement_tag:
-            logging.warning(self.tr("Unknown statement tag: ") + f"'{statement.tag}'@{filename}")
-            return
-        self._statement = statement
-        header_data = self.get_section_data(statement)
-        self._sections[StatementXML.STATEMENT_ROOT]['loader'](header_data)
-        for section in self._sections:
-            if section == StatementXML.STATEMENT_ROOT:
-                continue  # skip header description
-            section_elements = statement.xpath(section)  # Actually should be list of 0 or 1 element
-            if section_elements:
-                section_data = self.get_section_data(section_elements[0])
-                if section_data is None:
-                    return
-                self._sections[section]['loader'](section_data)
-        self.strip_unused_data()
-        logging.info(self.statement_name + self.tr(" loaded successfully"))
+
+    # Returns a list of tags that lead from XML root to statement element ('*' matches any tag)
+    def _statement_path(self) -> list:
+        return [x for x in self.statements_path.split('/') if x not in ('', '.')]
+
+    # Returns True if element with given list of tags (from root to element) is a statement element
+    @staticmethod
+    def _is_statement(path: list, tags: list) -> bool:
+        return len(tags) == len(path) + 1 and all(x == '*' or x == tag for x, tag in zip(path, tags[1:]))
+
+    # Calls loader for section element that was kept in memory and releases it
+    def _load_section(self, section) -> None:
+        self._sections[section.tag]['loader'](self.get_section_data(section))
+        self._drop_element(section, siblings=False)
+
+    # Releases memory used by element that was completely read by iterparse() and, if 'siblings' is True, removes
+    # its preceding siblings (they should be processed already) from the document
+    @staticmethod
+    def _drop_element(element, siblings=True) -> None:
+        element.clear(keep_tail=True)
+        if siblings:
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    # Scans statement again and returns a list of its elements with attribute 'name' equal to 'value'. Returned
+    # elements are copies without children, as statement isn't kept in memory after load
+    def find_elements(self, name: str, value: str) -> list:
+        elements = []
+        path = self._statement_path()
+        count = 0
+        in_statement = False
+        tags = []
+        for event, element in etree.iterparse(self._filename, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                tags.append(element.tag)
+                if self._is_statement(path, tags):
+                    in_statement = count == self._statement_index
+                    count += 1
+                continue
+            tags.pop()
+            if in_statement and len(tags) == len(path):   # End of the statement
+                break
+            if in_statement and len(tags) > len(path) and element.get(name) == value:
+                copy = etree.Element(element.tag, dict(element.attrib))
+                copy.tail = element.tail
+                elements.append(copy)
+            element.clear(keep_tail=True)
+        return elements
 
     def validate_file_header_attributes(self, xml_data):
         return
@@ -7,6 +7,7 @@ from PySide6.QtCore import QObject, Signal
 from PySide6.QtWidgets import QFileDialog
 from jal.constants import Setup
 from jal.db.helpers import get_app_path
+from jal.widgets.helpers import plugin_metadata
 from jal.db.settings import JalSettings, FolderFor
 from jal.data_import.statement import Statement_ImportError, Statement_Capabilities
 
@@ -23,35 +24,68 @@ class Statements(QObject):
         self.items = []
         self.loadStatementsList()
 
+    # Statement modules aren't imported here - their metadata are read from source files and module is imported on
+    # the first use. Module is imported immediately only if its metadata can't be read without import
     def loadStatementsList(self):
         statements_folder = get_app_path() + Setup.IMPORT_PATH + os.sep + Setup.STATEMENT_PATH
         statement_modules = [filename[:-3] for filename in os.listdir(statements_folder) if filename.endswith(".py")]
         for module_name in statement_modules:
-            logging.debug(f"Trying to load statement module: {module_name}")
+            logging.debug(f"Reading metadata of statement module: {module_name}")
+            metadata = plugin_metadata(statements_folder + os.sep + module_name + ".py", "JAL_STATEMENT_CLASS",
+                                       ['name', 'icon_name', 'filename_filter'])
+            if metadata is None:
+                continue
+            if len(metadata) == 4:
+                self.items.append({
+                    'name': metadata['name'],
+                    'module': None,
+                    'module_name': module_name,
+                    'loader_class': metadata['class'],
+                    'icon': metadata['icon_name'],
+                    'filename_filter': metadata['filename_filter']
+                })
+            else:
+                self.loadStatementModule(module_name)
+        self.items = sorted(self.items, key=lambda item: item['name'])
+
+    # Imports statement module and adds its description into self.items list
+    def loadStatementModule(self, module_name):
+        logging.debug(f"Trying to load statement module: {module_name}")
+        try:
+            module = importlib.import_module(f"jal.data_import.broker_statements.{module_name}")
+        except ImportError:
+            logging.error(self.tr("Statement module can't be imported: ") + module_name)
+            return
+        try:
+            statement_class_name = getattr(module, "JAL_STATEMENT_CLASS")
+        except AttributeError:
+            return
+        try:
+            class_instance = getattr(module, statement_class_name)
+        except AttributeError:
+            logging.error(self.tr("Statement class can't be loaded: ") + statement_class_name)
+            return
+        statement = class_instance()
+        self.items.append({
+            'name': statement.name,
+            'module': module,
+            'module_name': module_name,
+            'loader_class': statement_class_name,
+            'icon': statement.icon_name,
+            'filename_filter': statement.filename_filter
+        })
+        logging.debug(f"Class '{statement_class_name}' providing '{statement.name}' statement has been loaded")
+
+    # Returns statement loader class from module that is imported if it wasn't done before
+    def loaderClass(self, statement_loader):
+        if statement_loader['module'] is None:
+            module_name = statement_loader['module_name']
             try:
-                module = importlib.import_module(f"jal.data_import.broker_statements.{module_name}")
+                statement_loader['module'] = importlib.import_module(f"jal.data_import.broker_statements.{module_name}")
             except ImportError:
                 logging.error(self.tr("Statement module can't be imported: ") + module_name)
-                continue
-            try:
-                statement_class_name = getattr(module, "JAL_STATEMENT_CLASS")
-            except AttributeError:
-                continue
-            try:
-                class_instance = getattr(module, statement_class_name)
-            except AttributeError:
-                logging.error(self.tr("Statement class can't be loaded: ") + statement_class_name)
-                continue
-            statement = class_instance()
-            self.items.append({
-                'name': statement.name,
-                'module': module,
-                'loader_class': statement_class_name,
-                'icon': statement.icon_name,
-                'filename_filter': statement.filename_filter
-            })
-            logging.debug(f"Class '{statement_class_name}' providing '{statement.name}' statement has been loaded")
-        self.items = sorted(self.items, key=lambda item: item['name'])
+                return None
+        return getattr(statement_loader['module'], statement_loader['loader_class'])
 
     # method is called directly from menu, so it contains QAction that was triggered
     def load(self, action):
@@ -63,8 +97,9 @@ class Statements(QObject):
             return
         JalSettings().setRecentFolder(FolderFor.Statement, statement_files[0])
 
-        module = statement_loader['module']
-        class_instance = getattr(module, statement_loader['loader_class'])
+        class_instance = self.loaderClass(statement_loader)
+        if class_instance is None:
+            return
         if len(statement_files) > 1:
             if not Statement_Capabilities.MULTIPLE_LOAD in class_instance.capabilities():
                 logging.warning(statement_loader['name'] +
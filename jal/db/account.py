@@ -1,5 +1,5 @@
 from decimal import Decimal
-from jal.db.db import JalDB
+from jal.db.db import JalCachedDB
 from jal.db.asset import JalAsset
 from jal.db.peer import JalPeer
 import jal.db.operations
@@ -8,15 +8,14 @@ from jal.constants import Setup, BookAccount, PredefindedAccountType, Predefined
 from jal.db.country import JalCountry
 
 
-class JalAccount(JalDB):
-    db_cache = []
+class JalAccount(JalCachedDB):
+    db_cache = None
+    _cache_sql = "SELECT * FROM accounts"
     MONEY_FLOW = 1
     ASSETS_FLOW = 2
 
     def __init__(self, account_id: int = 0, data: dict = None, search: bool = False, create: bool = False) -> None:
-        super().__init__(cached=True)
-        if not JalAccount.db_cache:
-            self._fetch_data()
+        super().__init__()
         self._id = account_id
         if self._valid_data(data, search, create):
             if search:
@@ -39,8 +38,8 @@ class JalAccount(JalDB):
                          (":currency", data['currency']), (":organization", data['organization']),
                          (":country", data['country']), (":precision", data['precision'])], commit=True)
                     self._id = query.lastInsertId()
-                self._fetch_data(only_self=True)
-        self._data = next((x for x in self.db_cache if x['id']==self._id), None)
+                self._update_cache(self._id)
+        self._data = self._cached_record(self._id)
         self._type = self._data['type_id'] if self._data is not None else None
         self._name = self._data['name'] if self._data is not None else ''
         self._number = self._data['number'] if self._data is not None else None
@@ -51,39 +50,15 @@ class JalAccount(JalDB):
         self._reconciled = int(self._data['reconciled_on']) if self._data is not None else 0
         self._precision = int(self._data['precision']) if self._data is not None else Setup.DEFAULT_ACCOUNT_PRECISION
 
-    def invalidate_cache(self):
-        self._fetch_data()
-
-    # JalAccount maintains single cache available for all instances
-    @classmethod
-    def class_cache(cls) -> True:
-        return True
-
-    def _fetch_data(self, only_self=False):
-        if only_self:
-            element = next((x for x in self.db_cache if x['id']==self._id), None)
-            data = self._read("SELECT * FROM accounts WHERE id=:id", [(":id", self._id)], named=True)
-            if data is not None:
-                if element is not None:
-                    JalAccount.db_cache[JalAccount.db_cache.index(element)] = data
-                else:
-                    JalAccount.db_cache.append(data)
-        else:
-            JalAccount.db_cache = []
-            query = self._exec("SELECT * FROM accounts ORDER BY id")
-            while query.next():
-                JalAccount.db_cache.append(self._read_record(query, named=True))
-
     # Method returns a list of JalAccount objects for accounts of given type (or all if None given)
     # Flag "active_only" allows only active accounts output by default
     @classmethod
     def get_all_accounts(cls, account_type: int = None, active_only: bool = True) -> list:
         accounts = []
-        query = cls._exec("SELECT id, active FROM accounts WHERE type_id=:type OR :type IS NULL",
-                          [(":type", account_type)])
-        while query.next():
-            account_id, active = cls._read_record(query, cast=[int, bool])
-            if active_only and not active:
+        for account_id, account in sorted(cls._cached_records().items()):
+            if account_type is not None and account['type_id'] != account_type:
+                continue
+            if active_only and not account['active']:
                 continue
             accounts.append(JalAccount(account_id))
         return accounts
@@ -179,6 +154,7 @@ class JalAccount(JalDB):
         _ = self._exec("UPDATE accounts SET organization_id=:peer_id WHERE id=:id",
                        [(":id", self._id), (":peer_id", peer_id)])
         self._organization_id = peer_id
+        self._update_cache(self._id)
 
     def reconciled_at(self) -> int:
         return self._reconciled
@@ -186,7 +162,7 @@ class JalAccount(JalDB):
     def reconcile(self, timestamp: int):
         _ = self._exec("UPDATE accounts SET reconciled_on=:timestamp WHERE id = :account_id",
                        [(":timestamp", timestamp), (":account_id", self._id)])
-        self._fetch_data(only_self=True)
+        self._update_cache(self._id)
 
     def precision(self) -> int:
         return self._precision
@@ -204,13 +180,18 @@ class JalAccount(JalDB):
         assets = []
         query = self._exec(
             "WITH _last_ids AS ("
-            "SELECT MAX(id) AS id, asset_id FROM ledger "
-            "WHERE account_id=:account_id AND timestamp<=:timestamp GROUP BY asset_id"
+            "SELECT MAX(id) AS id, asset_id FROM ("
+            "SELECT ledger_id AS id, asset_id FROM ledger_snapshots WHERE account_id=:account_id AND timestamp=:snapshot "
+            "UNION ALL "
+            "SELECT id, asset_id FROM ledger "
+            "WHERE account_id=:account_id AND timestamp>:snapshot AND timestamp<=:timestamp"
+            ") GROUP BY asset_id"
             ") "
             "SELECT l.asset_id, amount_acc, value_acc "
             "FROM ledger l JOIN _last_ids d ON l.asset_id=d.asset_id AND l.id=d.id "
             "WHERE amount_acc!='0' AND book_account=:assets",
-            [(":account_id", self._id), (":timestamp", timestamp), (":assets", BookAccount.Assets)])
+            [(":account_id", self._id), (":snapshot", self._snapshot(timestamp)), (":timestamp", timestamp),
+             (":assets", BookAccount.Assets)])
         while query.next():
             try:
                 asset_id, amount, value = self._read_record(query, cast=[int, Decimal, Decimal])
@@ -223,27 +204,32 @@ class JalAccount(JalDB):
     def get_asset_amount(self, timestamp: int, asset_id: int) -> Decimal:
         asset =JalAsset(asset_id)
         if asset.type() == PredefinedAsset.Money:
-            money = self._read("SELECT amount_acc FROM ledger "
-                               "WHERE account_id=:account_id AND asset_id=:asset_id AND timestamp<=:timestamp "
-                               "AND book_account=:money ORDER BY id DESC LIMIT 1",
-                               [(":account_id", self._id), (":asset_id", asset_id),
-                                (":timestamp", timestamp), (":money", BookAccount.Money)])
-            money = Decimal('0') if money is None else Decimal(money)
-            debt = self._read("SELECT amount_acc FROM ledger "
-                              "WHERE account_id=:account_id AND asset_id=:asset_id AND timestamp<=:timestamp "
-                              "AND book_account=:liabilities ORDER BY id DESC LIMIT 1",
-                              [(":account_id", self._id), (":asset_id", asset_id),
-                               (":timestamp", timestamp), (":liabilities", BookAccount.Liabilities)])
-            debt = Decimal('0') if debt is None else Decimal(debt)
+            money = self._book_amount(timestamp, asset_id, BookAccount.Money)
+            debt = self._book_amount(timestamp, asset_id, BookAccount.Liabilities)
             return money + debt
         else:
-            value = self._read("SELECT amount_acc FROM ledger "
-                               "WHERE account_id=:account_id AND asset_id=:asset_id AND timestamp<=:timestamp "
-                               "AND book_account=:assets ORDER BY id DESC LIMIT 1",
-                               [(":account_id", self._id), (":asset_id", asset_id),
-                                (":timestamp", timestamp), (":assets", BookAccount.Assets)])
-            amount = Decimal(value) if value is not None else Decimal('0')
-            return amount
+            return self._book_amount(timestamp, asset_id, BookAccount.Assets)
+
+    # Returns timestamp of the latest ledger snapshot of the account that was made not later than given timestamp
+    # (or 0 if there are no such snapshots). Balances at timestamp are calculated from this snapshot and ledger
+    # records between snapshot and timestamp
+    def _snapshot(self, timestamp: int) -> int:
+        return self._read("SELECT COALESCE(MAX(timestamp), 0) FROM ledger_snapshots "
+                          "WHERE account_id=:account_id AND timestamp<=:timestamp",
+                          [(":account_id", self._id), (":timestamp", timestamp)])
+
+    # Returns last amount of asset recorded in ledger for given book of the account not later than given timestamp
+    def _book_amount(self, timestamp: int, asset_id: int, book: int) -> Decimal:
+        amount = self._read(
+            "SELECT amount_acc FROM ledger WHERE id=(SELECT MAX(id) FROM ("
+            "SELECT ledger_id AS id FROM ledger_snapshots WHERE account_id=:account_id AND asset_id=:asset_id "
+            "AND book_account=:book AND timestamp=:snapshot "
+            "UNION ALL "
+            "SELECT id FROM ledger WHERE account_id=:account_id AND asset_id=:asset_id AND book_account=:book "
+            "AND timestamp>:snapshot AND timestamp<=:timestamp))",
+            [(":account_id", self._id), (":asset_id", asset_id), (":book", book),
+             (":snapshot", self._snapshot(timestamp)), (":timestamp", timestamp)])
+        return Decimal('0') if amount is None else Decimal(amount)
 
     def get_book_turnover(self, book, begin, end) -> Decimal:
         value = self._read("SELECT SUM(amount) FROM ledger WHERE account_id=:account_id AND book_account=:book "
@@ -302,6 +288,16 @@ class JalAccount(JalDB):
         data['precision'] = data['precision'] if "precision" in data else Setup.DEFAULT_ACCOUNT_PRECISION
         return True
 
+    # Returns a list of account ids (0 if not found or not unique) for given list of dictionaries with 'number' and
+    # 'currency' keys. Accounts are matched with help of one in-memory index built from cached records
+    @classmethod
+    def find_accounts(cls, search_list: list) -> list:
+        index = {}
+        for account_id, account in cls._cached_records().items():
+            index.setdefault((account['number'], account['currency_id']), []).append(account_id)
+        ids = [index.get((x['number'], x['currency']), []) for x in search_list]
+        return [x[0] if len(x) == 1 else 0 for x in ids]
+
     def _find_account(self, data: dict) -> int:
         id = self._read("SELECT id FROM accounts WHERE number=:account_number AND currency_id=:currency",
                         [(":account_number", data['number']), (":currency", data['currency'])], check_unique=True)
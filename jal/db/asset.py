@@ -1,4 +1,6 @@
 import logging
+import threading
+from bisect import bisect_right, insort
 from decimal import Decimal, InvalidOperation
 from PySide6.QtCore import Qt, QDate
 from jal.constants import BookAccount, MarketDataFeed, AssetData, PredefinedAsset
@@ -17,13 +19,25 @@ def db_timestamp2int(timestamp_string: str) -> int:
     return timestamp
 
 
+# Class caches are shared between GUI thread and background ledger re-build thread. Cache data are read without lock,
+# so they are never filled in place: new data are prepared aside and then put into cache by one assignment. All changes
+# of caches are made under '_cache_lock' in order not to mix data that were loaded by different threads
 class JalAsset(JalDB):
-    db_cache = []
+    _cache_lock = threading.RLock()
+    db_cache = {}             # asset_id -> asset data with list of 'symbols' and optional dictionary of extra 'data'
+    symbols_index = {}        # symbol folded to upper case -> sorted list of ids of assets with this active symbol
+    isin_index = {}           # isin -> sorted list of ids of assets with this isin and at least one active symbol
+    reg_number_index = {}     # registration code -> sorted list of ids of assets with this code
+    quotes_cache = {}         # (asset_id, currency_id) -> ([timestamps], [quotes]) lists sorted by timestamp
+    cross_rates_cache = {}    # (asset_id, currency_id, timestamp) -> cross-rate calculated via base currency
+    base_currency_cache = None   # ([since_timestamps], [currency_ids]) lists sorted by timestamp
 
     def __init__(self, asset_id: int = 0, data: dict = None, search: bool = False, create: bool = False) -> None:
         super().__init__(cached=True)
         if not JalAsset.db_cache:
-            self._fetch_data()
+            with JalAsset._cache_lock:
+                if not JalAsset.db_cache:   # Cache might be loaded by other thread while lock was awaited
+                    self._fetch_data()
         self._id = asset_id
         if self._valid_data(data, search, create):
             if search:
@@ -35,8 +49,8 @@ class JalAsset(JalDB):
                     [(":type", data['type']), (":full_name", data['name']),
                      (":isin", data['isin']), (":country", data['country'])], commit=True)
                 self._id = query.lastInsertId()
-                self._fetch_data()
-        self._data = next((x for x in self.db_cache if x['id'] == self._id), None)
+                self._fetch_data(only_self=True)
+        self._data = JalAsset.db_cache.get(self._id)
         self._type = self._data['type_id'] if self._data is not None else None
         self._name = self._data['full_name'] if self._data is not None else ''
         self._isin = self._data['isin'] if self._data is not None else None
@@ -48,33 +62,104 @@ class JalAsset(JalDB):
 
     def invalidate_cache(self):
         self._fetch_data()
+        self._drop_quotes_cache()
 
     # JalAsset maintains single cache available for all instances
     @classmethod
     def class_cache(cls) -> True:
         return True
 
-    def _fetch_data(self):
-        JalAsset.db_cache = []
-        query = self._exec("SELECT * FROM assets ORDER BY id")
+    # Drops cached quotes for given asset/currency pair (or all quotes if asset_id is None) together with all
+    # cross-rates, as they might be based on the dropped quotes
+    @classmethod
+    def _drop_quotes_cache(cls, asset_id: int = None, currency_id: int = None) -> None:
+        with JalAsset._cache_lock:
+            if asset_id is None:
+                JalAsset.quotes_cache = {}
+                JalAsset.base_currency_cache = None
+            else:
+                JalAsset.quotes_cache.pop((asset_id, currency_id), None)
+            JalAsset.cross_rates_cache = {}
+
+    # Loads data of all assets into the cache or updates cached data of current asset only if only_self is True
+    def _fetch_data(self, only_self=False):
+        if only_self:
+            assets_filter, data_filter = "WHERE id=:asset_id ", "WHERE asset_id=:asset_id "
+            params = [(":asset_id", self._id)]
+        else:
+            assets_filter = data_filter = ''
+            params = []
+        loaded = {}
+        query = self._exec(f"SELECT * FROM assets {assets_filter}ORDER BY id", params)
         while query.next():
             asset_data = self._read_record(query, named=True)
             asset_data['symbols'] = []
-            symbols_query = self._exec("SELECT * FROM asset_tickers WHERE asset_id=:id", [(":id", asset_data['id'])])
-            while symbols_query.next():
-                symbol = self._read_record(symbols_query, named=True)
-                del symbol['id']
-                del symbol['asset_id']
+            loaded[asset_data['id']] = asset_data
+        query = self._exec(f"SELECT * FROM asset_tickers {data_filter}"
+                           f"ORDER BY asset_id, symbol COLLATE NOCASE, currency_id", params)
+        while query.next():
+            symbol = self._read_record(query, named=True)
+            asset_data = loaded.get(symbol['asset_id'])
+            del symbol['id']
+            del symbol['asset_id']
+            if asset_data is not None:
                 asset_data['symbols'].append(symbol)
-            extra_data = {}
-            data_query = self._exec("SELECT datatype, value FROM asset_data WHERE asset_id=:id ORDER BY datatype",
-                                    [(":id", asset_data['id'])])
-            while data_query.next():
-                datatype, value = self._read_record(data_query)
-                extra_data[datatype] = value
-            if extra_data:
-                asset_data['data'] = extra_data
-            JalAsset.db_cache.append(asset_data)
+        query = self._exec(f"SELECT asset_id, datatype, value FROM asset_data {data_filter}"
+                           f"ORDER BY asset_id, datatype", params)
+        while query.next():
+            asset_id, datatype, value = self._read_record(query)
+            if asset_id in loaded:
+                loaded[asset_id].setdefault('data', {})[datatype] = value
+        with JalAsset._cache_lock:
+            if only_self:
+                self._drop_from_indices(self._id)
+                if self._id not in loaded:
+                    JalAsset.db_cache.pop(self._id, None)
+                indices = (JalAsset.symbols_index, JalAsset.isin_index, JalAsset.reg_number_index)
+            else:
+                indices = ({}, {}, {})
+            symbols_index, isin_index, reg_number_index = indices
+            for asset_data in loaded.values():
+                active = False
+                for symbol in asset_data['symbols']:
+                    if symbol['active'] == 1:
+                        active = True
+                        insort(symbols_index.setdefault(self._symbol_key(symbol['symbol']), []), asset_data['id'])
+                if active and asset_data['isin']:
+                    insort(isin_index.setdefault(asset_data['isin'], []), asset_data['id'])
+                reg_number = asset_data.get('data', {}).get(AssetData.RegistrationCode, '')
+                if reg_number:
+                    insort(reg_number_index.setdefault(reg_number, []), asset_data['id'])
+            if only_self:
+                JalAsset.db_cache.update(loaded)
+            else:
+                JalAsset.db_cache = loaded
+                JalAsset.symbols_index, JalAsset.isin_index, JalAsset.reg_number_index = indices
+        if only_self:
+            self._data = JalAsset.db_cache.get(self._id)
+
+    # Removes given asset from the symbols, isin and reg.number indices (its keys are taken from the cache)
+    @classmethod
+    def _drop_from_indices(cls, asset_id: int) -> None:
+        asset_data = JalAsset.db_cache.get(asset_id)
+        if asset_data is None:
+            return
+        keys = [(JalAsset.symbols_index, cls._symbol_key(x['symbol'])) for x in asset_data['symbols']]
+        keys.append((JalAsset.isin_index, asset_data['isin']))
+        keys.append((JalAsset.reg_number_index, asset_data.get('data', {}).get(AssetData.RegistrationCode, '')))
+        for index, key in keys:
+            ids = index.get(key, [])
+            if asset_id in ids:
+                ids.remove(asset_id)
+
+    # Returns a key for symbols index - it matches SQLite NOCASE collation that folds ASCII characters only
+    @staticmethod
+    def _symbol_key(symbol: str) -> str:
+        return symbol.encode('utf-8').upper().decode('utf-8')
+
+    # Re-reads asset data into the cache - it should be called if asset was modified without JalAsset methods
+    def reload_data(self) -> None:
+        self._fetch_data(only_self=True)
 
     def dump(self) -> dict:
         return self._data
@@ -121,7 +206,7 @@ class JalAsset(JalDB):
             if existing['quote_source'] == MarketDataFeed.NA:
                 _ = self._exec("UPDATE asset_tickers SET quote_source=:data_source WHERE id=:id",
                                [(":data_source", data_source), (":id", existing['id'])])
-        self._fetch_data()
+        self._fetch_data(only_self=True)
 
     # Returns country object for the asset
     def country(self) -> JalCountry:
@@ -136,20 +221,45 @@ class JalAsset(JalDB):
     def quote(self, timestamp: int, currency_id: int) -> tuple:
         if self._id == currency_id:
             return timestamp, Decimal('1')
-        quote = self._read("SELECT timestamp, quote FROM quotes WHERE asset_id=:asset_id "
-                           "AND currency_id=:currency_id AND timestamp<=:timestamp ORDER BY timestamp DESC LIMIT 1",
-                           [(":asset_id", self._id), (":currency_id", currency_id), (":timestamp", timestamp)])
-        if quote is None:
-            if self._type == PredefinedAsset.Money and currency_id != self.get_base_currency(timestamp):  # find a cross-rate
-                rate1 = self.quote(timestamp, self.get_base_currency(timestamp))[1]
-                rate2 = JalAsset(currency_id).quote(timestamp, self.get_base_currency(timestamp))[1]
-                rate = 0 if rate2 == Decimal('0') else rate1 / rate2
-                return timestamp, rate
-            else:
-                logging.warning(self.tr("There are no quote/rate for ") +
-                                f"{self.symbol()} ({JalAsset(currency_id).symbol()}) {ts2d(timestamp)}")
-                return 0, Decimal('0')
-        return int(quote[0]), Decimal(quote[1])
+        timestamps, quotes = self._cached_quotes(currency_id)
+        idx = bisect_right(timestamps, timestamp)
+        if idx:
+            return timestamps[idx - 1], quotes[idx - 1]
+        base_currency = self.get_base_currency(timestamp)
+        if self._type == PredefinedAsset.Money and currency_id != base_currency:  # find a cross-rate
+            try:
+                rate = JalAsset.cross_rates_cache[(self._id, currency_id, timestamp)]
+            except KeyError:
+                rate1 = self.quote(timestamp, base_currency)[1]
+                rate2 = JalAsset(currency_id).quote(timestamp, base_currency)[1]
+                rate = Decimal('0') if rate2 == Decimal('0') else rate1 / rate2
+                JalAsset.cross_rates_cache[(self._id, currency_id, timestamp)] = rate
+            return timestamp, rate
+        else:
+            logging.warning(self.tr("There are no quote/rate for ") +
+                            f"{self.symbol()} ({JalAsset(currency_id).symbol()}) {ts2d(timestamp)}")
+            return 0, Decimal('0')
+
+    # Returns a tuple of two lists ([timestamps], [quotes]) with all quotes of the asset in given currency sorted by
+    # timestamp. Quotes are loaded from database once and are kept in class cache until set_quotes() or
+    # invalidate_cache() is called
+    def _cached_quotes(self, currency_id: int) -> tuple:
+        try:
+            return JalAsset.quotes_cache[(self._id, currency_id)]
+        except KeyError:
+            pass
+        with JalAsset._cache_lock:   # Quotes can't be dropped from cache by other thread while they are loaded
+            timestamps = []
+            quotes = []
+            query = self._exec("SELECT timestamp, quote FROM quotes "
+                               "WHERE asset_id=:asset_id AND currency_id=:currency_id ORDER BY timestamp",
+                               [(":asset_id", self._id), (":currency_id", currency_id)])
+            while query.next():
+                timestamp, quote = self._read_record(query, cast=[int, Decimal])
+                timestamps.append(timestamp)
+                quotes.append(quote)
+            JalAsset.quotes_cache[(self._id, currency_id)] = (timestamps, quotes)
+        return timestamps, quotes
 
     # Return a list of tuples (timestamp:int, quote:Decimal) of all quotes available for asset
     # for time interval begin-end
@@ -198,19 +308,53 @@ class JalAsset(JalDB):
         return sources
 
     # Set quotations for given currency_id. Quotations is a list of {'timestamp':int, 'quote':Decimal} values
-    def set_quotes(self, quotations: list, currency_id: int) -> None:
-        data = [x for x in quotations if x['timestamp'] is not None and x['quote'] is not None]  # Drop Nones
-        if data:
-            for quote in quotations:
-                _ = self._exec("INSERT OR REPLACE INTO quotes (asset_id, currency_id, timestamp, quote) "
-                               "VALUES(:asset_id, :currency_id, :timestamp, :quote)",
-                               [(":asset_id", self._id), (":currency_id", currency_id),
-                                (":timestamp", quote['timestamp']), (":quote", format_decimal(quote['quote']))])
-            begin = min(data, key=lambda x: x['timestamp'])['timestamp']
-            end = max(data, key=lambda x: x['timestamp'])['timestamp']
-            self.commit()
-            logging.info(self.tr("Quotations were updated: ") +
-                         f"{self.symbol(currency_id)} ({JalAsset(currency_id).symbol()}) {ts2d(begin)} - {ts2d(end)}")
+    # Returns a tuple (inserted, skipped) with number of new/updated quotes and quotes that were stored already
+    def set_quotes(self, quotations: list, currency_id: int) -> tuple:
+        counts = self.store_quotes({(self._id, currency_id): ([x['timestamp'] for x in quotations],
+                                                              [x['quote'] for x in quotations])})
+        return counts.get((self._id, currency_id), (0, 0))
+
+    # Stores quotations of several assets with one DB transaction. 'data' is a dictionary
+    # {(asset_id, currency_id): ([timestamps], [quotes])} with lists of int timestamps and Decimal quotes of the same
+    # length (pairs with None values are dropped). Quotes that are stored in DB with the same value already are skipped
+    # and others are inserted (or replace stored values) in batches.
+    # Returns a dictionary {(asset_id, currency_id): (inserted, skipped)} or empty dictionary if DB update failed
+    @classmethod
+    def store_quotes(cls, data: dict) -> dict:
+        counts = {}
+        asset_ids, currency_ids, timestamps, quotes = [], [], [], []
+        for (asset_id, currency_id), (new_timestamps, new_quotes) in data.items():
+            new = {int(t): q for t, q in zip(new_timestamps, new_quotes) if t is not None and q is not None}
+            if not new:
+                continue
+            begin = min(new)
+            end = max(new)
+            asset = JalAsset(asset_id)
+            stored = dict(asset.quotes(begin, end, currency_id))
+            changed = [t for t in sorted(new) if stored.get(t) != new[t]]
+            asset_ids += [asset_id] * len(changed)
+            currency_ids += [currency_id] * len(changed)
+            timestamps += changed
+            quotes += [format_decimal(new[t]) for t in changed]
+            counts[(asset_id, currency_id)] = (len(changed), len(new) - len(changed))
+            logging.info(asset.tr("Quotations were updated: ") +
+                         f"{asset.symbol(currency_id)} ({JalAsset(currency_id).symbol()}) {ts2d(begin)} - {ts2d(end)}, "
+                         + asset.tr("new: ") + f"{len(changed)}, " + asset.tr("skipped: ") + f"{len(new) - len(changed)}")
+        if not timestamps:
+            return counts
+        own_transaction = cls.connection().transaction()   # Quotes are a part of caller transaction if it is active
+        if cls._exec_batch("INSERT OR REPLACE INTO quotes (asset_id, currency_id, timestamp, quote) "
+                           "VALUES(:asset_id, :currency_id, :timestamp, :quote)",
+                           [(":asset_id", asset_ids), (":currency_id", currency_ids),
+                            (":timestamp", timestamps), (":quote", quotes)]) is None:
+            if own_transaction:
+                cls.connection().rollback()
+            counts = {}
+        elif own_transaction:
+            cls.connection().commit()
+        for asset_id, currency_id in data:
+            cls._drop_quotes_cache(asset_id, currency_id)
+        return counts
 
     def expiry(self):
         return self._expiry
@@ -239,7 +383,7 @@ class JalAsset(JalDB):
                     updaters[key](data[key])
                 except KeyError:  # No updater for this key is present
                     continue
-        self._fetch_data()
+        self._fetch_data(only_self=True)
 
     def _update_isin(self, new_isin: str) -> None:
         if self._isin:
@@ -306,41 +450,36 @@ class JalAsset(JalDB):
         data['reg_number'] = data['reg_number'] if 'reg_number' in data else ''
         return True
 
+    # Searches for an asset that matches given data. All searches except the search by name use in-memory indices:
+    # 1. by ISIN: an asset with this ISIN (or without ISIN) and the same symbol or with this ISIN only if the symbol
+    #    isn't given or doesn't match (it might be changed)
+    # 2. by registration code
+    # 3. by symbol (case-insensitive) with optional asset type (and expiration date if type is given)
+    # 4. by full name
     def _find_asset(self, data: dict) -> int:
-        id = None
         if data['isin']:
-            # Select either by ISIN if no symbol given OR by both ISIN & symbol
-            id = self._read("SELECT id FROM assets_ext "
-                            "WHERE ((isin=:isin OR isin='') AND symbol=:symbol) OR (isin=:isin AND :symbol='')",
-                            [(":isin", data['isin']), (":symbol", data['symbol'])])
-            if id is None and data['symbol']:  # Make one more try by ISIN only if no match for ISIN+Symbol due to symbol change
-                id = self._read("SELECT id FROM assets_ext WHERE isin=:isin", [(":isin", data['isin'])])
-            if id is None:
-                return 0
-            else:
-                return id
+            if data['symbol']:
+                id = next((x for x in JalAsset.symbols_index.get(self._symbol_key(data['symbol']), [])
+                           if JalAsset.db_cache[x]['isin'] in (data['isin'], '') and
+                           self._has_active_symbol(x, data['symbol'])), None)
+                if id is not None:
+                    return id
+            return next(iter(JalAsset.isin_index.get(data['isin'], [])), 0)
         if data['reg_number']:
-            id = self._read("SELECT asset_id FROM asset_data WHERE datatype=:datatype AND value=:reg_number",
-                            [(":datatype", AssetData.RegistrationCode), (":reg_number", data['reg_number'])])
+            id = next(iter(JalAsset.reg_number_index.get(data['reg_number'], [])), None)
             if id is not None:
                 return id
         if data['symbol']:
+            candidates = JalAsset.symbols_index.get(self._symbol_key(data['symbol']), [])
             if 'type' in data:
+                candidates = (x for x in candidates if JalAsset.db_cache[x]['type_id'] == data['type'])
                 if 'expiry' in data:
-                    id = self._read("SELECT a.id FROM assets_ext a "
-                                    "LEFT JOIN asset_data d ON a.id=d.asset_id AND d.datatype=:datatype "
-                                    "WHERE symbol=:symbol COLLATE NOCASE AND type_id=:type AND value=:value",
-                                    [(":datatype", AssetData.ExpiryDate), (":symbol", data['symbol']),
-                                     (":type", data['type']), (":value", data['expiry'])])
-                else:
-                    id = self._read("SELECT id FROM assets_ext "
-                                    "WHERE symbol=:symbol COLLATE NOCASE and type_id=:type",
-                                    [(":symbol", data['symbol']), (":type", data['type'])])
-            else:
-                id = self._read("SELECT id FROM assets_ext WHERE symbol=:symbol COLLATE NOCASE",
-                                [(":symbol", data['symbol'])])
+                    candidates = (x for x in candidates if JalAsset.db_cache[x].get('data', {}).get(
+                        AssetData.ExpiryDate, None) == str(data['expiry']))
+            id = next(iter(candidates), None)
             if id is not None:
                 return id
+        id = None
         if data['name']:
             id = self._read("SELECT id FROM assets_ext WHERE full_name=:name COLLATE NOCASE",
                             [(":name", data['name'])])
@@ -349,6 +488,18 @@ class JalAsset(JalDB):
         else:
             return id
 
+    # Returns True if asset has an active symbol that is exactly the same as given one (case-sensitive)
+    @staticmethod
+    def _has_active_symbol(asset_id: int, symbol: str) -> bool:
+        return any(x['symbol'] == symbol and x['active'] == 1 for x in JalAsset.db_cache[asset_id]['symbols'])
+
+    # Returns a list of asset ids (0 if not found) for given list of search data dictionaries. It gives the same
+    # result as JalAsset(data=..., search=True).id() for every item but avoids creation of JalAsset objects
+    @classmethod
+    def find_assets(cls, search_list: list) -> list:
+        finder = JalAsset()
+        return [finder._find_asset(x) if finder._valid_data(x, search=True) else 0 for x in search_list]
+
     # Method returns a list of {"asset": JalAsset, "currency" currency_id} that describes assets involved into ledger
     # operations between begin and end timestamps or that have non-zero value in ledger
     @classmethod
@@ -392,13 +543,18 @@ class JalAsset(JalDB):
     def get_base_currency(cls, timestamp: int=None) -> int:
         if timestamp is None:
             timestamp = QDate.currentDate().startOfDay(Qt.UTC).toSecsSinceEpoch()
-        base_id = cls._read("SELECT currency_id FROM base_currency WHERE since_timestamp<=:timestamp "
-                            "ORDER BY since_timestamp DESC LIMIT 1", [(":timestamp", timestamp)])
-        try:
-            base_id = int(base_id)
-        except TypeError:
-            base_id = 0
-        return base_id
+        if JalAsset.base_currency_cache is None:
+            since = []
+            currencies = []
+            query = cls._exec("SELECT since_timestamp, currency_id FROM base_currency ORDER BY since_timestamp")
+            while query.next():
+                since_timestamp, currency_id = cls._read_record(query, cast=[int, int])
+                since.append(since_timestamp)
+                currencies.append(currency_id)
+            JalAsset.base_currency_cache = (since, currencies)
+        since, currencies = JalAsset.base_currency_cache
+        idx = bisect_right(since, timestamp)
+        return currencies[idx - 1] if idx else 0
 
     # Return a list of (timestamp, currency_id) tuples that represent currency valid currency IDs that were in force
     # after between beginning_of_the_year(begin) and end_of_the_year(end) timestamps.
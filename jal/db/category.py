@@ -1,19 +1,28 @@
 from decimal import Decimal
 from jal.constants import BookAccount
-from jal.db.db import JalDB
+from jal.db.db import JalCachedDB
 from jal.db.asset import JalAsset
 from jal.db.operations import IncomeSpending
 
 
-class JalCategory(JalDB):
+class JalCategory(JalCachedDB):
+    db_cache = None
+    _cache_sql = "SELECT id, pid, name FROM categories"
+    _children = {}    # category id -> list of child category ids
+
     def __init__(self, id: int = 0):
         super().__init__()
         self._id = id
-        self._data = self._read("SELECT pid, name FROM categories WHERE id=:category_id",
-                                [(":category_id", self._id)], named=True)
+        self._data = self._cached_record(self._id)
         self._pid = self._data['pid'] if self._data is not None else 0
         self._name = self._data['name'] if self._data is not None else None
 
+    @classmethod
+    def _prepare_cache(cls) -> None:
+        JalCategory._children = {}
+        for category_id in sorted(cls.db_cache):
+            JalCategory._children.setdefault(cls.db_cache[category_id]['pid'], []).append(category_id)
+
     def id(self) -> int:
         return self._id
 
@@ -25,11 +34,8 @@ class JalCategory(JalDB):
 
     # Returns a list of JalCategory objects that represent child categories of the current category
     def get_child_categories(self) -> list:
-        children = []
-        query = self._exec("SELECT id FROM categories WHERE pid=:category_id", [(":category_id", self._id)])
-        while query.next():
-            children.append(JalCategory(self._read_record(query)))
-        return children
+        self._cached_records()
+        return [JalCategory(x) for x in JalCategory._children.get(self._id, [])]
 
     # Calculates overall turnover in ledger for the category between begin and end timestamps in given currency
     # (conversion rate is used for the day of operation)
@@ -50,6 +56,30 @@ class JalCategory(JalDB):
             turnover += amount * rate
         return -turnover
 
+    # Returns a list of (category_id, timestamp, amount) tuples for all income/spending ledger records between begin
+    # and end timestamps. Amounts are converted into given currency with conversion rate for the day of operation and
+    # have the same sign as get_turnover() result. All categories are loaded with one query.
+    @classmethod
+    def get_turnovers(cls, begin: int, end: int, output_currency_id: int) -> list:
+        turnovers = []
+        currencies = {}
+        query = cls._exec("SELECT l.category_id, l.timestamp, l.amount, a.currency_id FROM ledger l "
+                          "LEFT JOIN accounts AS a ON l.account_id=a.id "
+                          "WHERE (l.book_account=:book_costs OR l.book_account=:book_incomes) "
+                          "AND l.timestamp>=:begin AND l.timestamp<=:end AND l.category_id IS NOT NULL",
+                          [(":book_costs", BookAccount.Costs), (":book_incomes", BookAccount.Incomes),
+                           (":begin", begin), (":end", end)])
+        while query.next():
+            category_id, timestamp, amount, currency_id = cls._read_record(query, cast=[int, int, Decimal, int])
+            if currency_id == output_currency_id:
+                rate = Decimal('1')
+            else:
+                if currency_id not in currencies:
+                    currencies[currency_id] = JalAsset(currency_id)
+                rate = currencies[currency_id].quote(timestamp, output_currency_id)[1]
+            turnovers.append((category_id, timestamp, -amount * rate))
+        return turnovers
+
     def add_or_update_mapped_name(self, name: str) -> None:
         _ = self._exec("INSERT OR REPLACE INTO map_category (value, mapped_to) "
                        "VALUES (:item_name, :category_id)",
@@ -80,4 +110,5 @@ class JalCategory(JalDB):
         self._exec("UPDATE map_category SET mapped_to=:new_id WHERE mapped_to=:old_id",
                    [(":new_id", new_id), (":old_id", self._id)])
         self._exec("DELETE FROM categories WHERE id=:old_id", [(":old_id", self._id)], commit=True)
+        self._update_cache(self._id)
         self._id = 0
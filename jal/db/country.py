@@ -1,39 +1,32 @@
-from jal.db.db import JalDB
+from jal.db.db import JalCachedDB
 from jal.db.settings import JalSettings
 
 
-class JalCountry(JalDB):
-    db_cache = []
+class JalCountry(JalCachedDB):
+    db_cache = None
+    _cache_sql = "SELECT * FROM countries_ext"
+    _names = {}    # (country id, language code) -> country name
 
     def __init__(self, country_id: int = 0, data: dict = None, search=False) -> None:
-        super().__init__(cached=True)
-        if not JalCountry.db_cache:
-            self._fetch_data()
+        super().__init__()
         self._id = country_id
         if self._valid_data(data):
             if search:
                 self._id = self._find_country(data)
-        try:
-            self._data = [x for x in self.db_cache if x['id'] == self._id][0]
-        except IndexError:
-            self._data = None
+        self._data = self._cached_record(self._id)
         self._name = self._data['name'] if self._data is not None else None
         self._code = self._data['code'] if self._data is not None else None
         self._iso_code = self._data['iso_code'] if self._data is not None else None
 
-    def invalidate_cache(self):
-        self._fetch_data()
-
-    # JalCountry maintains single cache available for all instances
+    # Loads names of countries in all languages
     @classmethod
-    def class_cache(cls) -> True:
-        return True
-
-    def _fetch_data(self):
-        JalCountry.db_cache = []
-        query = self._exec("SELECT * FROM countries_ext ORDER BY id")
+    def _prepare_cache(cls) -> None:
+        JalCountry._names = {}
+        query = cls._exec("SELECT c.country_id, l.language, c.name FROM country_names c "
+                          "LEFT JOIN languages l ON c.language_id=l.id")
         while query.next():
-            JalCountry.db_cache.append(self._read_record(query, named=True))
+            country_id, language, name = cls._read_record(query)
+            JalCountry._names[(country_id, language)] = name
 
     def id(self) -> int:
         return self._id
@@ -42,9 +35,8 @@ class JalCountry(JalDB):
     def name(self, language: str='') -> str:
         if not language:
             language = JalSettings().getLanguage()
-        return self._read("SELECT c.name FROM country_names c LEFT JOIN languages l ON c.language_id=l.id "
-                          "WHERE country_id=:country_id AND l.language=:language",
-                          [(":country_id", self._id), (":language", language)])
+        self._cached_records()
+        return JalCountry._names.get((self._id, language))
 
     def code(self) -> str:
         return self._code
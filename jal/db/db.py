@@ -3,13 +3,16 @@ import os
 import sys
 import re
 import logging
+import threading
 import sqlparse
-from pkg_resources import parse_version
+from time import perf_counter
+from collections import OrderedDict
 from PySide6.QtWidgets import QApplication, QMessageBox
 from PySide6.QtSql import QSql, QSqlDatabase, QSqlQuery, QSqlTableModel
 
 from jal.constants import Setup
-from jal.db.helpers import get_dbfilename
+from jal.db.helpers import get_dbfilename, version_tuple
+from jal.db.query_stats import QueryStats
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -80,12 +83,46 @@ class JalSqlError:
 class JalDB:
     _tables = []
     _instances_with_cache = []
+    # Prepared queries are cached by SQL text and re-used by _exec() - key is a tuple (sql_text, forward_only) and value
+    # is a tuple (query, set of query parameter names). Separate cache is kept for every connection (i.e. for every
+    # thread) in '_query_caches' dictionary {connection name: cache}. Every cache is limited by QUERY_CACHE_SIZE entries
+    # (least recently used queries are dropped first). 0 size disables the cache.
+    QUERY_CACHE_SIZE = 256
+    _query_caches = {}
+    _query_cache_hits = 0
+    _query_cache_misses = 0
+    # Bulk mode state for connections that are in bulk mode {connection name: {'keys': {}, 'invalidations': {}}}:
+    # 'keys' - {table name: (list of integer validation fields, set of their values in table)} to check duplicates
+    # 'invalidations' - {(account_id, asset_id): timestamp} the earliest timestamp of changes for account and asset
+    _bulk_states = {}
+    # Statistics of executed SQL statements (QueryStats object) - it is collected only if enabled by
+    # enable_query_stats() as time measurement adds overhead to every query. Queries that run longer than
+    # SLOW_QUERY_THRESHOLD seconds are written into slow query log, statements that are executed more than
+    # REPEATED_QUERY_THRESHOLD times within one user action are reported as possible N+1 problems.
+    SLOW_QUERY_THRESHOLD = 0.1
+    REPEATED_QUERY_THRESHOLD = 100
+    _query_stats = None
+    # Ledger invalidations that are done by DB triggers for operation tables - a list of tuples (account field,
+    # asset field, timestamp field) for every table. Asset None stands for account currency. Records of action_details
+    # and action_results tables take account and timestamp from their parent operation.
+    _ledger_triggers = {
+        "actions": [("account_id", None, "timestamp")],
+        "action_details": [("account_id", None, "timestamp")],
+        "dividends": [("account_id", "asset_id", "timestamp")],
+        "trades": [("account_id", "asset_id", "timestamp")],
+        "asset_actions": [("account_id", "asset_id", "timestamp")],
+        "action_results": [("account_id", "asset_id", "timestamp")],
+        "transfers": [("withdrawal_account", "asset", "withdrawal_timestamp"),
+                      ("deposit_account", "asset", "deposit_timestamp"),
+                      ("fee_account", None, "withdrawal_timestamp")]
+    }
 
     # By default, db objects don't cache data. But if and object may cache db data we need to track it so parameter
     # 'cached' to be set to True. Such objects should implement invalidate_cache(), class_cache() methods also.
     def __init__(self, cached=False, **kwargs):
-        if cached:
-            self._instances_with_cache.append(self)
+        if cached:   # One instance is enough to invalidate cache that is kept on a class level
+            if not self.class_cache() or all(type(x) is not type(self) for x in self._instances_with_cache):
+                self._instances_with_cache.append(self)
         super().__init__()
 
     def tr(self, text):
@@ -99,6 +136,7 @@ class JalDB:
     #    if schema version is invalid it will close DB
     # Returns: LedgerInitError(code == NoError(0) if db was initialized successfully)
     def init_db(self, db_path) -> JalDBError:
+        self._drop_query_cache()   # Queries of previous connection can't be used with a new one
         db = QSqlDatabase.addDatabase("QSQLITE", Setup.DB_CONNECTION)
         if not db.isValid():
             return JalDBError(JalDBError.DbDriverFailure)
@@ -106,7 +144,7 @@ class JalDB:
         db.setConnectOptions("QSQLITE_ENABLE_REGEXP=1")
         db.open()
         sqlite_version = self.get_engine_version()
-        if parse_version(sqlite_version) < parse_version(Setup.SQLITE_MIN_VERSION):
+        if version_tuple(sqlite_version) < version_tuple(Setup.SQLITE_MIN_VERSION):
             db.close()
             return JalDBError(JalDBError.OutdatedSqlite)
         JalDB._tables = db.tables(QSql.Tables) + db.tables(QSql.Views)  # Bitwise or somehow doesn't work here :(
@@ -116,12 +154,15 @@ class JalDB:
             if error.code != JalDBError.NoError:
                 return error
         if self._read("SELECT value FROM settings WHERE name='CleanDB'") == 1:
+            self._drop_query_cache()
             db.close()
             os.remove(get_dbfilename(db_path))
             db.open()
             error = self.run_sql_script(db_path + Setup.INIT_SCRIPT_PATH)
             if error.code != JalDBError.NoError:
                 return error
+        # Write-ahead log allows to read last committed data while ledger is re-built by another connection
+        _ = self._read("PRAGMA journal_mode=WAL")
         schema_version = self._read("SELECT value FROM settings WHERE name='SchemaVersion'")
         if schema_version < Setup.DB_REQUIRED_VERSION:
             db.close()
@@ -132,6 +173,7 @@ class JalDB:
                               details=f"(expected: {Setup.DB_REQUIRED_VERSION}, got: {schema_version})")
         self.enable_fk(True)
         self.enable_triggers(True)
+        self.invalidate_cache()   # Drop data that might be cached from previously opened database
 
         return JalDBError(JalDBError.NoError)
 
@@ -145,16 +187,48 @@ class JalDB:
         return self._read("SELECT last_insert_rowid()")
 
     # ------------------------------------------------------------------------------------------------------------------
-    # This function returns SQLite connection used by JAL or fails with RuntimeError exception
+    # This function returns SQLite connection used by JAL or fails with RuntimeError exception.
+    # Qt connections can't be shared between threads, so a separate connection is opened for every worker thread on
+    # first use - it should be closed with close_thread_connection() before the thread is finished.
     @staticmethod
     def connection():
-        db = QSqlDatabase.database(Setup.DB_CONNECTION)
+        name = JalDB._connection_name()
+        if name != Setup.DB_CONNECTION and not QSqlDatabase.contains(name):
+            JalDB._open_thread_connection(name)
+        db = QSqlDatabase.database(name)
         if not db.isValid():
-            raise RuntimeError(f"DB connection '{Setup.DB_CONNECTION}' is invalid")
+            raise RuntimeError(f"DB connection '{name}' is invalid")
         if not db.isOpen():
-            logging.fatal(f"DB connection '{Setup.DB_CONNECTION}' is not open")
+            logging.fatal(f"DB connection '{name}' is not open")
         return db
 
+    # Returns a name of DB connection that should be used by current thread
+    @staticmethod
+    def _connection_name() -> str:
+        if threading.current_thread() is threading.main_thread():
+            return Setup.DB_CONNECTION
+        return f"{Setup.DB_CONNECTION}_{threading.get_ident()}"
+
+    # Opens a new connection with given name to the same database as main connection has
+    @staticmethod
+    def _open_thread_connection(name: str) -> None:
+        db = QSqlDatabase.cloneDatabase(Setup.DB_CONNECTION, name)
+        if not db.open():
+            logging.fatal(f"DB connection '{name}' failed to open: {db.lastError().text()}")
+            return
+        JalDB().enable_fk(True)   # Foreign keys are enabled for every connection separately
+
+    # Closes connection that was opened for current thread (it has no effect for the main thread)
+    @classmethod
+    def close_thread_connection(cls) -> None:
+        name = cls._connection_name()
+        if name == Setup.DB_CONNECTION or not QSqlDatabase.contains(name):
+            return
+        cls._query_caches.pop(name, None)
+        cls.finish_query_action()   # Work of background thread is one action
+        QSqlDatabase.database(name, open=False).close()
+        QSqlDatabase.removeDatabase(name)
+
     # Returns a name of current database file in use
     @classmethod
     def _db_path(cls) -> str:
@@ -171,27 +245,125 @@ class JalDB:
         if params is None:
             params = []
         db = cls.connection()
-        query = QSqlQuery(db)
-        query.setForwardOnly(forward_only)
-        if not query.prepare(sql_text):
-            logging.error(f"SQL query preparation failure: '{query.lastError().text()}' for query '{sql_text}'")
+        query, query_params = cls._prepared_query(sql_text, forward_only)
+        if query is None:
             return None
-        query_params = set(re.findall(r":(\w+)", sql_text, re.IGNORECASE))  # get all parameter names in query text
         assert len(query_params) == len(params), f"SQL: wrong number of parameters {params} for '{sql_text}'"
         for param in params:
+            assert param[0][1:] in query_params, f"SQL: failed to assign parameter {param} in '{sql_text}'"
             query.bindValue(param[0], param[1])
-            assert query.boundValue(param[0]) == param[1], f"SQL: failed to assign parameter {param} in '{sql_text}'"
-        if not query.exec():
+        if cls._query_stats is None:
+            result = query.exec()
+        else:
+            start = perf_counter()
+            result = query.exec()
+            cls._query_stats.record(cls._connection_name(), sql_text, perf_counter() - start, params=params)
+        if not result:
             error = JalSqlError(query.lastError().text())
             if error.custom():
                 error.show()
             else:
                 logging.error(f"SQL failure: '{error.message()}' for query '{sql_text}' with params '{params}'")
             return None
-        if commit:
+        if commit and cls._connection_name() not in cls._bulk_states:
             db.commit()
         return query
 
+    # -------------------------------------------------------------------------------------------------------------------
+    # Returns a tuple (query, set of parameter names) with QSqlQuery prepared for given sql_text or (None, None) if
+    # preparation failed. Query is taken from the cache if it isn't in use - i.e. it isn't a SELECT query with a result
+    # that wasn't read till the end (the query might be still iterated by a caller, for example, when another query
+    # with the same text is executed inside the loop). Otherwise, a new query is prepared and put into the cache.
+    @classmethod
+    def _prepared_query(cls, sql_text, forward_only):
+        key = (sql_text, forward_only)
+        cache = cls._query_caches.setdefault(cls._connection_name(), OrderedDict())
+        try:
+            query, query_params = cache[key]
+            if not query.isActive() or not query.isSelect() or query.at() == QSql.AfterLastRow:
+                cache.move_to_end(key)
+                cls._query_cache_hits += 1
+                return query, query_params
+        except KeyError:
+            pass
+        cls._query_cache_misses += 1
+        query = QSqlQuery(cls.connection())
+        query.setForwardOnly(forward_only)
+        if not query.prepare(sql_text):
+            logging.error(f"SQL query preparation failure: '{query.lastError().text()}' for query '{sql_text}'")
+            return None, None
+        query_params = set(re.findall(r":(\w+)", sql_text, re.IGNORECASE))  # get all parameter names in query text
+        if cls.QUERY_CACHE_SIZE:
+            cache[key] = (query, query_params)
+            cache.move_to_end(key)
+            while len(cache) > cls.QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+        return query, query_params
+
+    # Removes all prepared queries of current connection from the cache - it should be done before connection is
+    # closed or re-opened
+    @classmethod
+    def _drop_query_cache(cls):
+        cls._query_caches.pop(cls._connection_name(), None)
+
+    # Returns statistics of prepared queries cache of current connection as a dictionary
+    @classmethod
+    def query_cache_stats(cls) -> dict:
+        return {'size': len(cls._query_caches.get(cls._connection_name(), {})),
+                'hits': cls._query_cache_hits, 'misses': cls._query_cache_misses}
+
+    # -------------------------------------------------------------------------------------------------------------------
+    # Executes an SQL query from given sql_text once for every set of parameter values - i.e. as a batch
+    # params is a list of tuples (":param", [value1, value2, ...]) where all value lists have the same length
+    # It is much faster than separate _exec() calls as query is prepared only once and parameters aren't validated.
+    # QSqlQuery.execBatch() isn't used as it is emulated for SQLite and its time grows quadratically with batch size
+    # return value - QSqlQuery object or None if batch execution failed
+    @classmethod
+    def _exec_batch(cls, sql_text, params):
+        query, query_params = cls._prepared_query(sql_text, True)
+        if query is None:
+            return None
+        assert len(query_params) == len(params), f"SQL: wrong number of parameters {params} for '{sql_text}'"
+        names = [param[0] for param in params]
+        start = perf_counter()
+        for values in zip(*[param[1] for param in params]):
+            for name, value in zip(names, values):
+                query.bindValue(name, value)
+            if not query.exec():
+                error = JalSqlError(query.lastError().text())
+                if error.custom():
+                    error.show()
+                else:
+                    logging.error(f"SQL batch failure: '{error.message()}' for query '{sql_text}' "
+                                  f"with params '{list(zip(names, values))}'")
+                return None
+        if cls._query_stats is not None and params and params[0][1]:
+            cls._query_stats.record(cls._connection_name(), sql_text, perf_counter() - start, count=len(params[0][1]))
+        return query
+
+    # -------------------------------------------------------------------------------------------------------------------
+    # Starts (or stops if 'enable' is False) collection of SQL statements statistics. Collected data are dropped.
+    # Slow queries are written into a log file that is located next to the database file.
+    @classmethod
+    def enable_query_stats(cls, enable: bool = True) -> None:
+        if enable:
+            log_file = os.path.dirname(cls._db_path()) + os.sep + Setup.SLOW_QUERY_LOG
+            cls._query_stats = QueryStats(cls.SLOW_QUERY_THRESHOLD, cls.REPEATED_QUERY_THRESHOLD, log_file)
+        else:
+            cls._query_stats = None
+
+    # Returns QueryStats object with collected statistics or None if collection isn't enabled
+    @classmethod
+    def query_stats(cls) -> Union[QueryStats, None]:
+        return cls._query_stats
+
+    # Marks the end of user action for statistics of current connection - it should be called when application
+    # becomes idle (or when background task is completed) to detect statements repeated within one action
+    @classmethod
+    def finish_query_action(cls) -> None:
+        if cls._query_stats is not None:
+            cls._query_stats.finish_action(cls._connection_name())
+
     # ------------------------------------------------------------------------------------------------------------------
     # Reads the result of 'sql_test' query from the database (with given params - the same as for _exec() method)
     # returns result of the query or None if result is empty
@@ -201,13 +373,13 @@ class JalDB:
     @classmethod
     def _read(cls, sql_text, params=None, named=False, check_unique=False):
         query = cls._exec(sql_text, params)
+        res = None
         if query.next():
             res = cls._read_record(query, named=named)
             if check_unique and query.next():
-                return None  # More than one record in result when only one expected
-            return res
-        else:
-            return None
+                res = None  # More than one record in result when only one expected
+        query.finish()   # Release the result as query won't be used anymore and may be re-used from the cache
+        return res
 
     # ------------------------------------------------------------------------------------------------------------------
     # Method takes current active record of given query and returns its values as:
@@ -251,11 +423,12 @@ class JalDB:
 
     # ------------------------------------------------------------------------------------------------------------------
     # Enables DB triggers if enable == True and disables it otherwise
-    def enable_triggers(self, enable):
+    # Change is committed immediately if 'commit' is True, otherwise it is a part of current transaction
+    def enable_triggers(self, enable, commit=True):
         if enable:
-            _ = self._exec("UPDATE settings SET value=1 WHERE name='TriggersEnabled'", commit=True)
+            _ = self._exec("UPDATE settings SET value=1 WHERE name='TriggersEnabled'", commit=commit)
         else:
-            _ = self._exec("UPDATE settings SET value=0 WHERE name='TriggersEnabled'", commit=True)
+            _ = self._exec("UPDATE settings SET value=0 WHERE name='TriggersEnabled'", commit=commit)
 
     # ------------------------------------------------------------------------------------------------------------------
     # Set synchronous mode ON if synchronous == True and OFF it otherwise
@@ -275,6 +448,7 @@ class JalDB:
 
     # Method loads sql script into database
     def run_sql_script(self, script_file) -> JalDBError:
+        self._drop_query_cache()   # Active cached queries would lock tables that may be modified by the script
         try:
             with open(script_file, 'r', encoding='utf-8') as sql_script:
                 statements = sqlparse.split(sql_script)
@@ -282,6 +456,7 @@ class JalDB:
                     clean_statement = sqlparse.format(statement, strip_comments=True)
                     if self._exec(clean_statement, commit=False) is None:
                         _ = self._exec("ROLLBACK")
+                        self._drop_query_cache()
                         self.connection().close()
                         return JalDBError(JalDBError.SQLFailure, f"FAILED: {clean_statement}")
                     else:
@@ -312,7 +487,95 @@ class JalDB:
         return JalDBError(JalDBError.NoError)
 
     def commit(self):
-        self.connection().commit()
+        if self._connection_name() not in self._bulk_states:
+            self.connection().commit()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Starts bulk mode for current connection: all changes are kept in one transaction till end_bulk() call, commits
+    # requested by _exec() are postponed, triggers are disabled and ledger invalidations are accumulated in memory.
+    # Returns False if bulk mode can't be started as a transaction is active already (changes are made as usual then)
+    @classmethod
+    def begin_bulk(cls) -> bool:
+        name = cls._connection_name()
+        if name in cls._bulk_states or not cls.connection().transaction():
+            return False
+        cls._bulk_states[name] = {'keys': {}, 'invalidations': {}}
+        JalDB().enable_triggers(False, commit=False)
+        return True
+
+    # Finishes bulk mode. If 'commit' is True then ledger is invalidated once for every changed account and asset since
+    # the earliest timestamp of changes and the transaction is committed. Otherwise (or if invalidation fails) all
+    # changes are rolled back and cached data are dropped as they might keep rolled back records.
+    # Returns True if changes were committed
+    @classmethod
+    def end_bulk(cls, commit: bool = True) -> bool:
+        state = cls._bulk_states.pop(cls._connection_name(), None)
+        if state is None:
+            return False
+        if commit:
+            keys = list(state['invalidations'])
+            query = cls._exec_batch("INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) "
+                                    "VALUES (:account_id, :asset_id, :timestamp)",
+                                    [(":account_id", [x[0] for x in keys]), (":asset_id", [x[1] for x in keys]),
+                                     (":timestamp", [state['invalidations'][x] for x in keys])])
+            commit = query is not None
+        if commit:
+            JalDB().enable_triggers(True, commit=False)
+            commit = cls.connection().commit()
+        if not commit:
+            cls.connection().rollback()
+            JalDB().invalidate_cache()
+        return commit
+
+    # Records ledger invalidation for operation from 'table_name' with given 'data' (or with given 'oid' if data
+    # aren't given) in bulk mode - the same way as DB triggers do it. Nothing is done if bulk mode isn't active.
+    @classmethod
+    def _defer_ledger_invalidation(cls, table_name: str, data: dict = None, oid: int = 0) -> None:
+        state = cls._bulk_states.get(cls._connection_name())
+        if state is None:
+            return
+        if data is None:
+            data = cls._read(f"SELECT * FROM {table_name} WHERE id=:id", [(":id", oid)], named=True)
+            if data is None:
+                return
+        for account_field, asset_field, timestamp_field in cls._ledger_triggers.get(table_name, []):
+            account_id = data.get(account_field, None)
+            if account_id is None or account_id == '':
+                continue
+            asset_id = data.get(asset_field, None) if asset_field else None
+            key = (account_id, None if asset_id == '' else asset_id)
+            timestamp = data[timestamp_field]
+            state['invalidations'][key] = min(timestamp, state['invalidations'].get(key, timestamp))
+
+    # Returns a tuple (set of keys, key) for duplicates check in bulk mode. Set contains values of integer validation
+    # fields for all records of 'table_name' and key is a tuple of these values for given 'data'. Operation can't have
+    # a duplicate in DB if its key isn't in the set. (None, None) is returned if bulk mode isn't active or key can't be
+    # compared outside of SQLite (table has no integer validation fields or data have values of other types).
+    def _bulk_operation_key(self, table_name: str, validation_fields: list, data: dict) -> (set, tuple):
+        state = self._bulk_states.get(self._connection_name())
+        if state is None:
+            return None, None
+        if table_name not in state['keys']:
+            columns = {}
+            query = self._exec(f"PRAGMA table_info({table_name})")
+            while query.next():
+                column = self._read_record(query, named=True)
+                columns[column['name']] = column['type'].upper()
+            fields = [x for x in validation_fields if columns.get(x, '') == 'INTEGER']
+            keys = set()
+            if fields:
+                query = self._exec(f"SELECT {', '.join(fields)} FROM {table_name}")
+                while query.next():
+                    values = self._read_record(query, named=True)   # named to get a list for a single field too
+                    keys.add(tuple(None if values[x] == '' else values[x] for x in fields))
+            state['keys'][table_name] = (fields, keys)
+        fields, keys = state['keys'][table_name]
+        if not fields:
+            return None, None
+        key = tuple(data[x] for x in fields)
+        if any(x is not None and type(x) not in (bool, int, float) for x in key):
+            return None, None
+        return keys, key
 
     # This method creates a db record in 'table' name that describes relevant operation.
     # 'data' is a dict that contains operation data and dict 'fields' describes it having
@@ -326,11 +589,16 @@ class JalDB:
             return oid
         else:
             oid = self.insert_operation(table_name, fields, data)
+        keys, key = self._bulk_operation_key(table_name, [x for x in fields if fields[x].get('validation', False)], data)
+        if keys is not None:
+            keys.add(key)
+        self._defer_ledger_invalidation(table_name, data)
         children = [x for x in fields if 'children' in fields[x] and fields[x]['children']]
         for child in children:
             for item in data[child]:
                 item[fields[child]['child_pid']] = oid
                 self.create_operation(fields[child]['child_table'], fields[child]['child_fields'], item)
+                self._defer_ledger_invalidation(fields[child]['child_table'], {**data, **item})
         return oid
 
     # Verify that 'data' contains no more fields than described in 'fields'
@@ -357,6 +625,10 @@ class JalDB:
         for field in validation_fields:
             if field not in data:
                 data[field] = fields[field]['default']   # set to default value
+        keys, key = self._bulk_operation_key(table_name, validation_fields, data)
+        if keys is not None and key not in keys:
+            return 0
+        for field in validation_fields:
             if data[field] is None:
                 query_text += f"{field} IS NULL AND "
             else:
@@ -406,3 +678,58 @@ class JalModel(QSqlTableModel, JalDB):
         self.setFilter('')
         self.select()
         return result
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Base class for reference data that are kept in memory as an identity map: all records of a derived class are loaded
+# with one '_cache_sql' query into class level 'db_cache' dictionary {id: record} on first use and are taken by id
+# after that. Derived class should define its own 'db_cache = None' and '_cache_sql' attributes and may calculate
+# extra values for loaded records in _prepare_cache(). Records are loaded again after invalidate_cache() call (it is
+# done by reference data editors) or may be updated one by one with _update_cache() after modification.
+class JalCachedDB(JalDB):
+    db_cache = None
+    _cache_sql = ''
+
+    def __init__(self, **kwargs):
+        super().__init__(cached=True, **kwargs)
+
+    def invalidate_cache(self):
+        type(self).db_cache = None
+
+    @classmethod
+    def class_cache(cls) -> True:
+        return True
+
+    # Returns a dictionary with all cached records of the class
+    @classmethod
+    def _cached_records(cls) -> dict:
+        if cls.db_cache is None:
+            cls.db_cache = {}
+            query = cls._exec(cls._cache_sql)
+            while query.next():
+                record = cls._read_record(query, named=True)
+                cls.db_cache[record['id']] = record
+            cls._prepare_cache()
+        return cls.db_cache
+
+    # Returns cached record with given id or None if there is no such record
+    @classmethod
+    def _cached_record(cls, record_id: int) -> Union[dict, None]:
+        return cls._cached_records().get(record_id)
+
+    # Re-reads a record with given id from database into the cache (or removes it from the cache if it was deleted)
+    @classmethod
+    def _update_cache(cls, record_id: int) -> None:
+        if cls.db_cache is None:
+            return   # Nothing to update as all records will be loaded on the next access
+        record = cls._read(f"SELECT * FROM ({cls._cache_sql}) WHERE id=:id", [(":id", record_id)], named=True)
+        if record is None:
+            cls.db_cache.pop(record_id, None)
+        else:
+            cls.db_cache[record_id] = record
+        cls._prepare_cache()
+
+    # Calculates values that are derived from cached records - it is called after every change of the cache
+    @classmethod
+    def _prepare_cache(cls) -> None:
+        pass
@@ -1,4 +1,5 @@
 import os
+import re
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
 from PySide6.QtCore import QLocale
@@ -58,6 +59,13 @@ def get_app_path() -> str:
     return os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + os.sep
 
 
+# -------------------------------------------------------------------------------------------------------------------
+# Converts version string like '3.35.5' into a tuple of 3 integers, so versions may be compared as tuples
+def version_tuple(version: str) -> tuple:
+    numbers = [int(x) for x in re.findall(r'\d+', version)[:3]]
+    return tuple(numbers + [0] * (3 - len(numbers)))
+
+
 # -------------------------------------------------------------------------------------------------------------------
 def get_dbfilename(app_path):
     return app_path + Setup.DB_PATH
@@ -1,9 +1,10 @@
 import sys
 import logging
 import traceback
+from collections import deque
 from datetime import datetime
 from decimal import Decimal
-from PySide6.QtCore import Signal, QObject, QDate
+from PySide6.QtCore import Signal, Slot, QObject, QThread, QDate
 from PySide6.QtWidgets import QDialog, QMessageBox
 from jal.constants import BookAccount
 from jal.db.helpers import format_decimal
@@ -37,9 +38,10 @@ class RebuildDialog(QDialog):
     def isFastAndDirty(self):
         return self.ui.FastAndDirty.isChecked()
 
+    # Returns -1 for 'Last' option in order to re-build ledger since per-account invalidation frontiers
     def getTimestamp(self):
         if self.ui.LastRadioButton.isChecked():
-            return self.frontier
+            return -1
         elif self.ui.DateRadionButton.isChecked():
             return self.ui.CustomDateEdit.dateTime().toSecsSinceEpoch()
         else:  # self.AllRadioButton.isChecked()
@@ -80,21 +82,101 @@ class LedgerAmounts(dict, JalDB):
             return amount
 
 
+# ===================================================================================================================
+# Subclasses dictionary to keep open positions (lots) for [account, asset] in memory during ledger re-build
+# Every value is a deque of dicts with keys: id, timestamp, op_type, operation_id, account_id, asset_id, price,
+# remaining_qty - ordered for FIFO matching. Lots of [account, asset] are loaded from 'trades_opened' on first access.
+# New lots aren't written into DB immediately - they are collected in 'opened' list and stored by Ledger later
+class LedgerLots(dict, JalDB):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened = []    # lots that were created since last clear()
+        self.loaded = []    # lots that were loaded from DB - tuples (lot, remaining_qty as it is stored in DB)
+
+    def clear(self):
+        super().clear()
+        self.opened = []
+        self.loaded = []
+
+    def __getitem__(self, key):
+        # predefined indices in key tuple
+        ACCOUNT = 0
+        ASSET = 1
+
+        try:
+            return super().__getitem__(key)
+        except KeyError:
+            lots = deque()
+            query = self._exec("SELECT id, timestamp, op_type, operation_id, account_id, asset_id, price, remaining_qty "
+                               "FROM trades_opened "
+                               "WHERE account_id=:account_id AND asset_id=:asset_id AND remaining_qty!=:zero "
+                               "ORDER BY timestamp, op_type DESC",
+                               [(":account_id", key[ACCOUNT]), (":asset_id", key[ASSET]),
+                                (":zero", format_decimal(Decimal('0')))])
+            while query.next():
+                lot = self._read_record(query, named=True, cast=[int, int, int, int, int, int, Decimal, Decimal])
+                self.loaded.append((lot, lot['remaining_qty']))
+                lots.append(lot)
+            super().__setitem__(key, lots)
+            return lots
+
+    # Puts new lot into its place in FIFO order (lots are sorted by timestamp and by op_type in reverse order)
+    def open(self, lot: dict):
+        lots = self[(lot['account_id'], lot['asset_id'])]
+        position = len(lots)
+        while position > 0 and (lots[position - 1]['timestamp'], -lots[position - 1]['op_type']) > \
+                (lot['timestamp'], -lot['op_type']):
+            position -= 1
+        lots.insert(position, lot)
+        self.opened.append(lot)
+
+    # Takes 'qty' from open lots of [account_id, asset_id] in FIFO order.
+    # Returns a list of tuples (lot, matched_qty) where sum of matched_qty is equal to 'qty' or less if there are no
+    # enough open lots. Lots that were matched completely are removed from the book.
+    def match(self, account_id: int, asset_id: int, qty: Decimal) -> list:
+        matches = []
+        lots = self[(account_id, asset_id)]
+        while lots and qty > Decimal('0'):
+            lot = lots[0]
+            matched_qty = min(lot['remaining_qty'], qty)
+            lot['remaining_qty'] -= matched_qty
+            qty -= matched_qty
+            if lot['remaining_qty'] == Decimal('0'):
+                lots.popleft()
+            matches.append((lot, matched_qty))
+        return matches
+
+
 # ===================================================================================================================
 class Ledger(QObject, JalDB):
     updated = Signal()
+    progress = Signal(int, int)   # (processed operations, total operations) - emitted PROGRESS_STEPS times per re-build
     SILENT_REBUILD_THRESHOLD = 1000
+    WRITE_BATCH_SIZE = 10000    # How many records are kept in memory before they are written into DB
+    PROGRESS_STEPS = 100
 
     def __init__(self):
         super().__init__()
         self.amounts = LedgerAmounts("amount_acc")    # store last amount for [book, account, asset]
         self.values = LedgerAmounts("value_acc")      # together with corresponding value
+        self.lots = LedgerLots()                      # open positions for [account, asset]
+        self._pending = {}          # Records to be written by flush() - {SQL query: [list of query parameters]}
+        self._pending_count = 0
         self.main_window = None
         self.progress_bar = None
+        self._thread = None             # Thread of background re-build
+        self._cancel_requested = False
+        self._rebuild_requested = False  # Set if rebuild() was called while background re-build was running
 
     def setProgressBar(self, main_window, progress_widget):
         self.main_window = main_window
         self.progress_bar = progress_widget
+        self.progress.connect(self._show_progress)
+
+    @Slot(int, int)
+    def _show_progress(self, processed, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(processed)
 
     # Returns timestamp of last operations that were calculated into ledger
     def getCurrentFrontier(self):
@@ -103,6 +185,11 @@ class Ledger(QObject, JalDB):
             current_frontier = 0
         return current_frontier
 
+    # Returns the earliest timestamp since which ledger is invalid or timestamp of the last ledger record if it is valid
+    def getRebuildFrontier(self):
+        frontiers = self._dirty_frontiers()
+        return min(frontiers.values()) if frontiers else self.getCurrentFrontier()
+
     @classmethod
     def get_operations_sequence(cls, begin: int, end: int, account_id: int = 0) -> list:
         sequence = []
@@ -158,15 +245,16 @@ class Ledger(QObject, JalDB):
         rounding_error = Decimal('0')
         if book == BookAccount.Assets and asset_id is None:
             raise ValueError(self.tr("No asset defined for: ") + f"{operation.dump()}")
+        account = JalAccount(operation.account_id())
         if asset_id is None:
-            asset_id = JalAccount(operation.account_id()).currency()
+            asset_id = account.currency()
         if (book == BookAccount.Costs or book == BookAccount.Incomes) and category is None:
             raise ValueError(self.tr("No category set for: ") + f"{operation.dump()}")
         if (book == BookAccount.Costs or book == BookAccount.Incomes) and peer is None:
             raise ValueError(self.tr("No peer set for: ") + f"{operation.dump()}")
         tag = tag if tag else None  # Get rid of possible empty values
         # Round values according to account decimal precision
-        precision = JalAccount(operation.account_id()).precision()
+        precision = account.precision()
         amount = round(amount, precision)
         value = Decimal('0') if value is None else round(value, precision)
         self.amounts[(book, operation.account_id(), asset_id)] += amount
@@ -178,19 +266,79 @@ class Ledger(QObject, JalDB):
                 (self.values[(book, operation.account_id(), asset_id)] != Decimal('0')):
             rounding_error = Decimal('0') - self.values[(book, operation.account_id(), asset_id)]
             self.values[(book, operation.account_id(), asset_id)] += rounding_error
-        _ = self._exec("INSERT INTO ledger (timestamp, op_type, operation_id, book_account, asset_id, "
-                       "account_id, amount, value, amount_acc, value_acc, peer_id, category_id, tag_id) "
-                       "VALUES(:timestamp, :op_type, :operation_id, :book, :asset_id, :account_id, "
-                       ":amount, :value, :amount_acc, :value_acc, :peer_id, :category_id, :tag_id)",
-                       [(":timestamp", operation.timestamp()), (":op_type", operation.type()),
-                        (":operation_id", operation.oid()), (":book", book), (":asset_id", asset_id),
-                        (":account_id", operation.account_id()),
-                        (":amount", format_decimal(amount)), (":value", format_decimal(value)),
-                        (":amount_acc", format_decimal(self.amounts[(book, operation.account_id(), asset_id)])),
-                        (":value_acc", format_decimal(self.values[(book, operation.account_id(), asset_id)])),
-                        (":peer_id", peer), (":category_id", category), (":tag_id", tag)])
+        self._queue("INSERT INTO ledger (timestamp, op_type, operation_id, book_account, asset_id, "
+                    "account_id, amount, value, amount_acc, value_acc, peer_id, category_id, tag_id) "
+                    "VALUES(:timestamp, :op_type, :operation_id, :book, :asset_id, :account_id, "
+                    ":amount, :value, :amount_acc, :value_acc, :peer_id, :category_id, :tag_id)",
+                    [(":timestamp", operation.timestamp()), (":op_type", operation.type()),
+                     (":operation_id", operation.oid()), (":book", book), (":asset_id", asset_id),
+                     (":account_id", operation.account_id()),
+                     (":amount", format_decimal(amount)), (":value", format_decimal(value)),
+                     (":amount_acc", format_decimal(self.amounts[(book, operation.account_id(), asset_id)])),
+                     (":value_acc", format_decimal(self.values[(book, operation.account_id(), asset_id)])),
+                     (":peer_id", peer), (":category_id", category), (":tag_id", tag)])
         return rounding_error
 
+    # Creates a new open position (lot). Position is created by operation 'op_type'/'operation_id' at given 'timestamp'
+    # with 'qty' of 'asset_id' bought (or sold for short position) at 'price'. It is stored in DB by _store_lots()
+    def openTrade(self, timestamp, op_type, operation_id, account_id, asset_id, price, qty):
+        self.lots.open({'id': None, 'timestamp': timestamp, 'op_type': op_type, 'operation_id': operation_id,
+                        'account_id': account_id, 'asset_id': asset_id, 'price': price, 'remaining_qty': qty})
+
+    # Matches 'qty' of asset with open positions of given account in FIFO order.
+    # Returns a list of tuples (position, matched_qty) where position is a dict with keys: timestamp, op_type,
+    # operation_id, account_id, asset_id, price, remaining_qty
+    def matchTrades(self, account_id, asset_id, qty) -> list:
+        return self.lots.match(account_id, asset_id, qty)
+
+    # Puts a new deal into 'trades_closed' table - open position 'opening_trade' (a dict as returned by openTrades())
+    # is closed by 'operation' with given 'price' and 'qty'
+    def closeTrade(self, opening_trade, operation, price, qty):
+        self._queue("INSERT INTO trades_closed(account_id, asset_id, open_op_type, open_op_id, open_timestamp, "
+                    "open_price, close_op_type, close_op_id, close_timestamp, close_price, qty) "
+                    "VALUES(:account_id, :asset_id, :open_op_type, :open_op_id, :open_timestamp, :open_price, "
+                    ":close_op_type, :close_op_id, :close_timestamp, :close_price, :qty)",
+                    [(":account_id", opening_trade['account_id']), (":asset_id", opening_trade['asset_id']),
+                     (":open_op_type", opening_trade['op_type']), (":open_op_id", opening_trade['operation_id']),
+                     (":open_timestamp", opening_trade['timestamp']),
+                     (":open_price", format_decimal(opening_trade['price'])),
+                     (":close_op_type", operation.type()), (":close_op_id", operation.oid()),
+                     (":close_timestamp", operation.timestamp()), (":close_price", format_decimal(price)),
+                     (":qty", format_decimal(qty))])
+
+    # Puts current state of open positions into 'trades_opened' table: new positions are inserted and remaining
+    # quantity is updated for positions that were loaded from DB
+    def _store_lots(self):
+        for lot in self.lots.opened:
+            self._queue("INSERT INTO trades_opened(timestamp, op_type, operation_id, account_id, asset_id, price, "
+                        "remaining_qty) "
+                        "VALUES(:timestamp, :type, :operation_id, :account_id, :asset_id, :price, :remaining_qty)",
+                        [(":timestamp", lot['timestamp']), (":type", lot['op_type']),
+                         (":operation_id", lot['operation_id']), (":account_id", lot['account_id']),
+                         (":asset_id", lot['asset_id']), (":price", format_decimal(lot['price'])),
+                         (":remaining_qty", format_decimal(lot['remaining_qty']))])
+        for lot, stored_qty in self.lots.loaded:
+            if lot['remaining_qty'] != stored_qty:
+                self._queue("UPDATE trades_opened SET remaining_qty=:remaining_qty WHERE id=:id",
+                            [(":remaining_qty", format_decimal(lot['remaining_qty'])), (":id", lot['id'])])
+        self.lots.clear()
+
+    # Keeps SQL query with its parameters in memory. Queries are executed later by flush() in batches
+    def _queue(self, sql_text, params):
+        self._pending.setdefault(sql_text, []).append(params)
+        self._pending_count += 1
+        if self._pending_count >= self.WRITE_BATCH_SIZE:
+            self.flush()
+
+    # Writes all pending records into DB. Queries are executed in batches in order of their first appearance.
+    # Should be called before any direct read of 'ledger' or 'trades_closed' tables during re-build
+    def flush(self):
+        for sql_text, queue in self._pending.items():
+            params = [(name, [row[i][1] for row in queue]) for i, (name, _value) in enumerate(queue[0])]
+            _ = self._exec_batch(sql_text, params)
+        self._pending.clear()
+        self._pending_count = 0
+
     # Returns Amount measured in current account currency or asset that 'book' has at current ledger frontier
     def getAmount(self, book, account_id, asset_id=None):
         if asset_id is None:
@@ -217,92 +365,334 @@ class Ledger(QObject, JalDB):
             self.appendTransaction(operation, BookAccount.Liabilities, debit)
         return debit
 
+    # Returns a dict {account_id: timestamp} with the earliest timestamp since which ledger of the account is invalid.
+    # Invalidation of asset transfer withdrawal is propagated to deposit account as incoming asset takes its value
+    # from the outgoing part of the transfer.
+    def _dirty_frontiers(self) -> dict:
+        frontiers = {}
+        query = self._exec("SELECT account_id, MIN(timestamp) FROM ledger_dirty GROUP BY account_id")
+        while query.next():
+            account_id, timestamp = self._read_record(query, cast=[int, int])
+            frontiers[account_id] = timestamp
+        if not frontiers:
+            return frontiers
+        transfers = []
+        query = self._exec("SELECT withdrawal_account, withdrawal_timestamp, deposit_account, deposit_timestamp "
+                           "FROM transfers WHERE asset IS NOT NULL")
+        while query.next():
+            transfers.append(self._read_record(query, cast=[int, int, int, int]))
+        propagated = True
+        while propagated:
+            propagated = False
+            for src_account, src_timestamp, dst_account, dst_timestamp in transfers:
+                if src_account in frontiers and src_timestamp >= frontiers[src_account]:
+                    if dst_account not in frontiers or dst_timestamp < frontiers[dst_account]:
+                        frontiers[dst_account] = dst_timestamp
+                        propagated = True
+        return frontiers
+
+    # Returns a list of operations from 'operation_sequence' that should be processed for ledger re-build.
+    # If 'frontiers' dict is given then only operations of these accounts that happened after account frontier are taken
+    def _rebuild_sequence(self, frontier: int, frontiers: dict) -> list:
+        sequence = []
+        query = self._exec("SELECT op_type, id, timestamp, account_id, subtype FROM operation_sequence "
+                           "WHERE timestamp >= :frontier", [(":frontier", frontier)])
+        while query.next():
+            data = self._read_record(query, named=True)
+            if frontiers and (data['account_id'] not in frontiers or data['timestamp'] < frontiers[data['account_id']]):
+                continue
+            sequence.append(data)
+        return sequence
+
+    # Deletes ledger records and deals that happened after frontier (for given account only if account_id is set)
+    def _purge(self, frontier: int, account_id: int = None):
+        condition = "" if account_id is None else " AND account_id=:account_id"
+        params = [(":frontier", frontier)] if account_id is None else [(":frontier", frontier), (":account_id", account_id)]
+        _ = self._exec("DELETE FROM trades_closed WHERE close_timestamp >= :frontier" + condition, params)
+        _ = self._exec("DELETE FROM ledger WHERE timestamp >= :frontier" + condition, params)
+        _ = self._exec("DELETE FROM ledger_totals WHERE timestamp >= :frontier" + condition, params)
+        _ = self._exec("DELETE FROM ledger_snapshots WHERE timestamp >= :frontier" + condition, params)
+        _ = self._exec("DELETE FROM trades_opened WHERE timestamp >= :frontier" + condition, params)
+
+    # Fill ledger totals values
+    # NOFIXME: Table 'ledger_totals' may be replaced by a view. But it will impact performance heavily as
+    # this view won't have indices for optimal performance
+    def _fill_totals(self, frontier: int, account_id: int = None):
+        condition = "" if account_id is None else " AND account_id=:account_id"
+        params = [(":frontier", frontier)] if account_id is None else [(":frontier", frontier), (":account_id", account_id)]
+        _ = self._exec(
+            "INSERT INTO ledger_totals"
+            "(op_type, operation_id, timestamp, book_account, asset_id, account_id, amount_acc, value_acc) "
+            "SELECT op_type, operation_id, timestamp, book_account, asset_id, account_id, amount_acc, value_acc "
+            "FROM ledger "
+            "WHERE id IN (SELECT MAX(id) FROM ledger WHERE timestamp >= :frontier" + condition + " "
+            "GROUP BY op_type, operation_id, book_account, account_id, asset_id)", params)
+
+    # Fills 'ledger_snapshots' for all months that have ledger records after frontier (for given account only if
+    # account_id is set). Every snapshot is made from previous snapshot of the account and ledger records between them
+    def _fill_snapshots(self, frontier: int, account_id: int = None):
+        if account_id is None:
+            query = self._exec("SELECT DISTINCT account_id FROM ledger WHERE timestamp >= :frontier",
+                               [(":frontier", frontier)])
+            accounts = []
+            while query.next():
+                accounts.append(self._read_record(query, cast=[int]))
+            for account_id in accounts:
+                self._fill_snapshots(frontier, account_id)
+            return
+        base = self._read("SELECT COALESCE(MAX(timestamp), 0) FROM ledger_snapshots WHERE account_id=:account_id "
+                          "AND timestamp < :frontier", [(":account_id", account_id), (":frontier", frontier)])
+        months = []
+        query = self._exec("SELECT DISTINCT CAST(strftime('%s', timestamp, 'unixepoch', 'start of month', '+1 month') "
+                           "AS INTEGER) - 1 AS month_end FROM ledger "
+                           "WHERE account_id=:account_id AND timestamp >= :frontier ORDER BY month_end",
+                           [(":account_id", account_id), (":frontier", frontier)])
+        while query.next():
+            months.append(self._read_record(query, cast=[int]))
+        for month_end in months:
+            _ = self._exec(
+                "INSERT INTO ledger_snapshots (timestamp, account_id, asset_id, book_account, ledger_id) "
+                "SELECT :month_end, :account_id, asset_id, book_account, MAX(id) FROM ("
+                "SELECT asset_id, book_account, ledger_id AS id FROM ledger_snapshots "
+                "WHERE account_id=:account_id AND timestamp=:base "
+                "UNION ALL "
+                "SELECT asset_id, book_account, id FROM ledger "
+                "WHERE account_id=:account_id AND timestamp>:base AND timestamp<=:month_end"
+                ") GROUP BY asset_id, book_account",
+                [(":month_end", month_end), (":account_id", account_id), (":base", base)])
+            base = month_end
+
     # Rebuild transaction sequence and recalculate all amounts
     # timestamp:
-    # -1 - re-build from last valid operation (from ledger frontier)
+    # -1 - re-build only accounts that were invalidated since last re-build (they are recorded in 'ledger_dirty' table)
     #      will asks for confirmation if we have more than SILENT_REBUILD_THRESHOLD operations require rebuild
     # 0 - re-build from scratch
     # any - re-build all operations after given timestamp
+    # Amounts of re-built accounts are taken from the last valid ledger record before account frontier by LedgerAmounts
+    # Re-build is done in current thread and UI is blocked till the end. Use rebuild_in_background() for long re-builds.
     def rebuild(self, from_timestamp=-1, fast_and_dirty=False):
+        if self.is_running():   # Ledger will be checked again after completion of background re-build
+            self._rebuild_requested = True
+            logging.info(self.tr("Ledger re-build is in progress already"))
+            return
+        if not self._confirm_rebuild(from_timestamp):
+            return
+        self._cancel_requested = False
+        if self.progress_bar is not None:
+            self.main_window.showProgressBar(True)
+        try:
+            self._rebuild(from_timestamp, fast_and_dirty)
+        finally:
+            if self.progress_bar is not None:
+                self.main_window.showProgressBar(False)
+        self.updated.emit()
+
+    # Starts ledger re-build (with the same parameters as rebuild() has) in a separate thread with its own DB
+    # connection. All changes are made in one transaction, so UI continues to show last consistent ledger till the end.
+    # Progress is reported by 'progress' signal and re-build may be stopped by cancel() call without any changes.
+    def rebuild_in_background(self, from_timestamp=-1, fast_and_dirty=False):
+        if self.is_running():
+            logging.info(self.tr("Ledger re-build is in progress already"))
+            return
+        if not self._confirm_rebuild(from_timestamp):
+            return
+        self._cancel_requested = False
+        self._rebuild_requested = False
+        self._thread = LedgerRebuildThread(self, from_timestamp, fast_and_dirty)
+        self._thread.finished.connect(self._rebuild_finished)
+        if self.progress_bar is not None:
+            self.main_window.showProgressBar(True, background=True)
+        self._thread.start()
+
+    # Returns True if ledger re-build is running in background
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    # Requests to stop ledger re-build. It is checked between operations, and all changes are rolled back after that
+    @Slot()
+    def cancel(self):
+        self._cancel_requested = True
+
+    # Cancels background re-build (if any) and waits for its completion
+    def stop(self):
+        if self.is_running():
+            self.cancel()
+            self._thread.wait()
+
+    @Slot()
+    def _rebuild_finished(self):
+        if self._thread is None:
+            return
+        self._thread.wait()
+        self._thread = None
+        if self.progress_bar is not None:
+            self.main_window.showProgressBar(False)
+        self.updated.emit()
+        if self._rebuild_requested:   # Process changes that were made while re-build was running
+            self._rebuild_requested = False
+            self.rebuild()
+
+    # Returns False if re-build isn't needed or user declined it. Asks user for confirmation if re-build of invalidated
+    # accounts (from_timestamp == -1) requires processing of more than SILENT_REBUILD_THRESHOLD operations
+    def _confirm_rebuild(self, from_timestamp: int) -> bool:
+        if from_timestamp >= 0:
+            return True
+        frontiers = self._dirty_frontiers()
+        if not frontiers:
+            logging.info(self.tr("Ledger is up to date"))
+            self.updated.emit()
+            return False
+        sequence = self._rebuild_sequence(min(frontiers.values()), frontiers)
+        if len(sequence) > self.SILENT_REBUILD_THRESHOLD:
+            if QMessageBox().warning(None, self.tr("Confirmation"), f"{len(sequence)}" +
+                                     self.tr(" operations require rebuild. Do you want to do it right now?"),
+                                     QMessageBox.Yes, QMessageBox.No) == QMessageBox.No:
+                JalSettings().setValue('RebuildDB', 1)
+                return False
+        return True
+
+    # Does ledger re-build (see rebuild() for parameters description) in one DB transaction of current thread.
+    # Returns True if ledger was re-built and False if there was nothing to do or re-build was cancelled
+    def _rebuild(self, from_timestamp, fast_and_dirty) -> bool:
         exception_happened = False
         last_timestamp = 0
         self.amounts.clear()
         self.values.clear()
-        if from_timestamp >= 0:
-            frontier = from_timestamp
-            operations_count = self._read("SELECT COUNT(id) FROM operation_sequence WHERE timestamp >= :frontier",
-                                          [(":frontier", frontier)])
-        else:
-            frontier = self.getCurrentFrontier()
-            operations_count = self._read("SELECT COUNT(id) FROM operation_sequence WHERE timestamp >= :frontier",
-                                          [(":frontier", frontier)])
-            if operations_count > self.SILENT_REBUILD_THRESHOLD:
-                if QMessageBox().warning(None, self.tr("Confirmation"), f"{operations_count}" +
-                                         self.tr(" operations require rebuild. Do you want to do it right now?"),
-                                         QMessageBox.Yes, QMessageBox.No) == QMessageBox.No:
-                    JalSettings().setValue('RebuildDB', 1)
-                    return
-        if operations_count == 0:
-            logging.info(self.tr("Leger is empty"))
-            return
-        if self.progress_bar is not None:
-            self.progress_bar.setRange(0, operations_count)
-            self.main_window.showProgressBar(True)
-        logging.info(self.tr("Re-building ledger since: ") + f"{ts2dt(frontier)}")
-        start_time = datetime.now()
-        _ = self._exec("DELETE FROM trades_closed WHERE close_timestamp >= :frontier", [(":frontier", frontier)])
-        _ = self._exec("DELETE FROM ledger WHERE timestamp >= :frontier", [(":frontier", frontier)])
-        _ = self._exec("DELETE FROM ledger_totals WHERE timestamp >= :frontier", [(":frontier", frontier)])
-        _ = self._exec("DELETE FROM trades_opened WHERE timestamp >= :frontier", [(":frontier", frontier)])
-
-        self.enable_triggers(False)
+        self.lots.clear()
+        if not self.connection().transaction():   # All changes are made in one transaction, visible after commit only
+            logging.error(self.tr("Failed to start transaction for ledger re-build: ") +
+                          self.connection().lastError().text())
+            return False
         if fast_and_dirty:  # For 30k operations difference of execution time is - with 0:02:41 / without 0:11:44
             self.set_synchronous(False)
         try:
-            query = self._exec("SELECT op_type, id, timestamp, account_id, subtype FROM operation_sequence "
-                               "WHERE timestamp >= :frontier", [(":frontier", frontier)])
-            while query.next():
-                data = self._read_record(query, named=True)
-                last_timestamp = data['timestamp']
-                operation = LedgerTransaction().get_operation(data['op_type'], data['id'], data['subtype'])
-                operation.processLedger(self)
-                if self.progress_bar is not None:
-                    self.progress_bar.setValue(query.at())
-        except Exception as e:
-            if "pytest" in sys.modules:  # Throw exception if we are in test mode or handle it if we are live
-                raise e
-            exception_happened = True
-            if type(e) == LedgerError:
-                logging.error(e)   # Short log for ledger custom exception
+            if from_timestamp >= 0:
+                frontiers = {}
+                frontier = from_timestamp
+            else:
+                frontiers = self._dirty_frontiers()
+                frontier = min(frontiers.values(), default=0)
+            sequence = self._rebuild_sequence(frontier, frontiers) if from_timestamp >= 0 or frontiers else []
+            operations_count = len(sequence)
+            if operations_count == 0:
+                self.connection().rollback()
+                logging.info(self.tr("Leger is empty"))
+                return False
+            self.progress.emit(0, operations_count)
+            logging.info(self.tr("Re-building ledger since: ") + f"{ts2dt(frontier)}")
+            start_time = datetime.now()
+            if frontiers:
+                for account_id in frontiers:
+                    self._purge(frontiers[account_id], account_id)
+                _ = self._exec("DELETE FROM ledger_dirty")
+            else:
+                self._purge(frontier)
+                _ = self._exec("DELETE FROM ledger_dirty WHERE timestamp >= :frontier", [(":frontier", frontier)])
+            self.enable_triggers(False, commit=False)
+            chunk = max(operations_count // self.PROGRESS_STEPS, 1)
+            processed = 0
+            try:
+                operations = LedgerTransaction.get_operations(sequence)   # Load all operations at once with bulk queries
+                for data, operation in zip(sequence, operations):
+                    if self._cancel_requested:
+                        raise LedgerRebuildCancelled()
+                    last_timestamp = data['timestamp']
+                    operation.processLedger(self)
+                    processed += 1
+                    if processed % chunk == 0 or processed == operations_count:
+                        self.progress.emit(processed, operations_count)
+            except LedgerRebuildCancelled:
+                raise
+            except Exception as e:
+                if "pytest" in sys.modules:  # Throw exception if we are in test mode or handle it if we are live
+                    raise e
+                exception_happened = True
+                if type(e) == LedgerError:
+                    logging.error(e)   # Short log for ledger custom exception
+                else:
+                    logging.error(f"{traceback.format_exc()}")  # and full log for anything unexpected
+                self._invalidate_unprocessed(sequence[processed:])
+            self._store_lots()
+            self.flush()
+            if frontiers:
+                for account_id in frontiers:
+                    self._fill_totals(frontiers[account_id], account_id)
+                    self._fill_snapshots(frontiers[account_id], account_id)
             else:
-                logging.error(f"{traceback.format_exc()}")  # and full log for anything unexpected
+                self._fill_totals(frontier)
+                self._fill_snapshots(frontier)
+            self.enable_triggers(True, commit=False)
+            JalSettings().setValue('RebuildDB', 0, commit=False)
+            if not self.connection().commit():
+                error = self.connection().lastError().text()
+                self._discard_pending()
+                self.connection().rollback()
+                logging.error(self.tr("Failed to commit ledger re-build, ledger wasn't changed: ") + error)
+                return False
+        except LedgerRebuildCancelled:
+            self._discard_pending()
+            self.connection().rollback()
+            logging.warning(self.tr("Ledger re-build was cancelled, ledger wasn't changed"))
+            return False
+        except Exception:
+            self._discard_pending()
+            self.connection().rollback()
+            raise
         finally:
             if fast_and_dirty:
                 self.set_synchronous(True)
-            self.enable_triggers(True)
-            if self.progress_bar is not None:
-                self.main_window.showProgressBar(False)
-        # Fill ledger totals values
-        # NOFIXME: Table 'ledger_totals' may be replaced by a view. But it will impact performance heavily as
-        # this view won't have indices for optimal performance
-        _ = self._exec(
-            "INSERT INTO ledger_totals"
-            "(op_type, operation_id, timestamp, book_account, asset_id, account_id, amount_acc, value_acc) "
-            "SELECT op_type, operation_id, timestamp, book_account, asset_id, account_id, amount_acc, value_acc "
-            "FROM ledger "
-            "WHERE id IN (SELECT MAX(id) FROM ledger WHERE timestamp >= :frontier "
-            "GROUP BY op_type, operation_id, book_account, account_id, asset_id)", [(":frontier", frontier)])
-        JalSettings().setValue('RebuildDB', 0)
         if exception_happened:
             logging.error(self.tr("Exception happened. Ledger is incomplete. Please correct errors listed in log"))
         else:
             logging.info(self.tr("Ledger is complete. Elapsed time: ") + f"{datetime.now() - start_time}" +
                          self.tr(", new frontier: ") + f"{ts2dt(last_timestamp)}")
+        return True
 
-        self.updated.emit()
+    # Drops records that were prepared for DB but weren't written yet
+    def _discard_pending(self):
+        self._pending.clear()
+        self._pending_count = 0
+        self.lots.clear()
+
+    # Marks ledger as invalid for accounts of operations that weren't processed, so next re-build will start from them
+    def _invalidate_unprocessed(self, sequence: list):
+        frontiers = {}
+        for data in sequence:
+            if data['account_id'] not in frontiers:
+                frontiers[data['account_id']] = data['timestamp']
+        for account_id in frontiers:
+            _ = self._exec("INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) "
+                           "VALUES (:account_id, NULL, :timestamp)",
+                           [(":account_id", account_id), (":timestamp", frontiers[account_id])])
 
     def showRebuildDialog(self, parent):
-        rebuild_dialog = RebuildDialog(parent, self.getCurrentFrontier())
+        rebuild_dialog = RebuildDialog(parent, self.getRebuildFrontier())
         if rebuild_dialog.exec():
-            self.rebuild(from_timestamp=rebuild_dialog.getTimestamp(),
-                         fast_and_dirty=rebuild_dialog.isFastAndDirty())
+            self.rebuild_in_background(from_timestamp=rebuild_dialog.getTimestamp(),
+                                       fast_and_dirty=rebuild_dialog.isFastAndDirty())
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Exception that is raised inside Ledger._rebuild() in order to stop processing and roll back all changes
+class LedgerRebuildCancelled(Exception):
+    pass
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Thread that runs Ledger._rebuild(). Ledger data are written via separate DB connection that is opened by JalDB for
+# the thread on first use and is closed when re-build is completed
+class LedgerRebuildThread(QThread):
+    def __init__(self, ledger, from_timestamp, fast_and_dirty):
+        super().__init__()
+        self._ledger = ledger
+        self._from_timestamp = from_timestamp
+        self._fast_and_dirty = fast_and_dirty
+        self.result = False
+
+    def run(self):
+        try:
+            self.result = self._ledger._rebuild(self._from_timestamp, self._fast_and_dirty)
+        except Exception:
+            logging.error(f"{traceback.format_exc()}")
+        finally:
+            JalDB.close_thread_connection()
@@ -54,21 +54,59 @@ class LedgerTransaction(JalDB):
     def dump(self):
         return str(self._data)
 
+    # Returns operation object of given type and id. If 'record' is given then it is used as operation data instead
+    # of reading it from database (it should be a dict as returned by _load_records() of corresponding class)
     @staticmethod
-    def get_operation(operation_type, operation_id, display_type=None):
+    def get_operation(operation_type, operation_id, display_type=None, record=None):
         if operation_type == LedgerTransaction.IncomeSpending:
-            return IncomeSpending(operation_id)
+            return IncomeSpending(operation_id, record=record)
         elif operation_type == LedgerTransaction.Dividend:
-            return Dividend(operation_id)
+            return Dividend(operation_id, record=record)
         elif operation_type == LedgerTransaction.Trade:
-            return Trade(operation_id)
+            return Trade(operation_id, record=record)
         elif operation_type == LedgerTransaction.Transfer:
-            return Transfer(operation_id, display_type)
+            return Transfer(operation_id, display_type, record=record)
         elif operation_type == LedgerTransaction.CorporateAction:
-            return CorporateAction(operation_id)
+            return CorporateAction(operation_id, record=record)
         else:
             raise ValueError(f"An attempt to select unknown operation type: {operation_type}")
 
+    # Returns a list of operation objects for 'sequence' - a list of dicts with 'op_type', 'id', 'timestamp' and
+    # 'subtype' keys (like records of 'operation_sequence' view). Order of operations is the same as in 'sequence'.
+    # Data of all operations are read with one query per operation table instead of several queries per operation.
+    # Only operations from 'sequence' are read, so an incremental re-build doesn't load history of unchanged accounts.
+    @staticmethod
+    def get_operations(sequence: list) -> list:
+        if not sequence:
+            return []
+        operation_classes = {
+            LedgerTransaction.IncomeSpending: IncomeSpending,
+            LedgerTransaction.Dividend: Dividend,
+            LedgerTransaction.Trade: Trade,
+            LedgerTransaction.Transfer: Transfer,
+            LedgerTransaction.CorporateAction: CorporateAction
+        }
+        records = {}
+        for op_type in set(x['op_type'] for x in sequence):
+            try:
+                ids = set(x['id'] for x in sequence if x['op_type'] == op_type)
+                records[op_type] = operation_classes[op_type]._load_records(ids)
+            except KeyError:
+                raise ValueError(f"An attempt to select unknown operation type: {op_type}")
+        return [LedgerTransaction.get_operation(x['op_type'], x['id'], x['subtype'],
+                                                record=records[x['op_type']].get(x['id'], None)) for x in sequence]
+
+    # Returns a dict {operation_id: record} with data of operations that have id from 'ids' set
+    @classmethod
+    def _load_records(cls, ids: set) -> dict:
+        raise NotImplementedError(f"_load_records() method is not defined in {cls.__name__} class")
+
+    # Returns SQL condition that selects rows with 'field' value from 'ids' set. Ids are integers taken from database,
+    # so they are put into SQL text directly as their number may exceed the limit of query parameters
+    @staticmethod
+    def _ids_condition(field: str, ids: set) -> str:
+        return f"{field} IN ({','.join(str(int(x)) for x in sorted(ids))})"
+
     @staticmethod
     def create_new(operation_type, operation_data):
         if operation_type == LedgerTransaction.IncomeSpending:
@@ -86,6 +124,7 @@ class LedgerTransaction(JalDB):
 
     # Deletes operation from database
     def delete(self) -> None:
+        self._defer_ledger_invalidation(self._db_table, oid=self._oid)
         _ = self._exec(f"DELETE FROM {self._db_table} WHERE id={self._oid}")
         self._oid = 0
         self._otype = 0
@@ -138,49 +177,23 @@ class LedgerTransaction(JalDB):
         amount = Decimal('0') if amount is None else Decimal(amount)
         return amount
 
-    # Performs FIFO deals match in ledger: takes current open positions from 'open_trades' table and converts
-    # them into deals in 'deals' table while supplied qty is enough.
+    # Performs FIFO deals match in ledger: takes current open positions from ledger and converts
+    # them into deals in 'trades_closed' table while supplied qty is enough.
+    # ledger - Ledger object that keeps open positions and deals during ledger re-build
     # deal_sign = +1 if closing deal is Buy operation and -1 if it is Sell operation.
     # qty - quantity of asset that closes previous open positions
     # price is None if we process corporate action or transfer where we keep initial value and don't have profit or loss
     # Returns total qty, value of deals created.
-    def _close_deals_fifo(self, deal_sign, qty, price):
+    def _close_deals_fifo(self, ledger, deal_sign, qty, price):
         processed_qty = Decimal('0')
         processed_value = Decimal('0')
-        # Get a list of all previous not matched trades or corporate actions
-        query = self._exec("SELECT timestamp, op_type, operation_id, account_id, asset_id, price, remaining_qty "
-                           "FROM trades_opened "
-                           "WHERE account_id=:account_id AND asset_id=:asset_id AND remaining_qty!=:zero "
-                           "ORDER BY timestamp, op_type DESC",
-                           [(":account_id", self._account.id()), (":asset_id", self._asset.id()),
-                            (":zero", format_decimal(Decimal('0')))])
-        while query.next():
-            opening_trade = self._read_record(query, named=True, cast=[int, int, int, int, int, Decimal, Decimal])
-            next_deal_qty = opening_trade['remaining_qty']
-            if (processed_qty + next_deal_qty) > qty:  # We can't close all trades with current operation
-                next_deal_qty = qty - processed_qty    # If it happens - just process the remainder of the trade
-            remaining_qty = opening_trade['remaining_qty'] - next_deal_qty
-            _ = self._exec("UPDATE trades_opened SET remaining_qty=:new_remaining_qty "
-                           "WHERE op_type=:op_type AND operation_id=:id AND asset_id=:asset_id",
-                           [(":new_remaining_qty", format_decimal(remaining_qty)), (":asset_id", self._asset.id()),
-                            (":op_type", opening_trade['op_type']), (":id", opening_trade['operation_id'])])
+        # Take previous not matched trades or corporate actions
+        for opening_trade, next_deal_qty in ledger.matchTrades(self._account.id(), self._asset.id(), qty):
             open_price = opening_trade['price']
             close_price = opening_trade['price'] if price is None else price
-            _ = self._exec(
-                "INSERT INTO trades_closed(account_id, asset_id, open_op_type, open_op_id, open_timestamp, open_price, "
-                "close_op_type, close_op_id, close_timestamp, close_price, qty) "
-                "VALUES(:account_id, :asset_id, :open_op_type, :open_op_id, :open_timestamp, :open_price, "
-                ":close_op_type, :close_op_id, :close_timestamp, :close_price, :qty)",
-                [(":account_id", self._account.id()), (":asset_id", self._asset.id()),
-                 (":open_op_type", opening_trade['op_type']), (":open_op_id", opening_trade['operation_id']),
-                 (":open_timestamp", opening_trade['timestamp']), (":open_price", format_decimal(open_price)),
-                 (":close_op_type", self._otype), (":close_op_id", self._oid),
-                 (":close_timestamp", self.timestamp()), (":close_price", format_decimal(close_price)),
-                 (":qty", format_decimal((-deal_sign) * next_deal_qty))])
+            ledger.closeTrade(opening_trade, self, close_price, (-deal_sign) * next_deal_qty)
             processed_qty += next_deal_qty
             processed_value += (next_deal_qty * open_price)
-            if processed_qty == qty:
-                break
         return processed_qty, processed_value
 
     def id(self):
@@ -276,13 +289,20 @@ class IncomeSpending(LedgerTransaction):
         }
     }
 
-    def __init__(self, operation_id=None):
+    _db_select = "SELECT a.id, a.timestamp, a.account_id, a.peer_id, p.name AS peer, " \
+                 "a.alt_currency_id AS currency FROM actions AS a LEFT JOIN agents AS p ON a.peer_id = p.id "
+    _db_select_details = "SELECT d.pid, d.category_id, c.name AS category, d.tag_id, t.tag, " \
+                         "d.amount, d.amount_alt, d.note FROM action_details AS d " \
+                         "LEFT JOIN categories AS c ON c.id=d.category_id " \
+                         "LEFT JOIN tags AS t ON t.id=d.tag_id "
+
+    def __init__(self, operation_id=None, record=None):
         super().__init__(operation_id)
         self._otype = LedgerTransaction.IncomeSpending
-        self._data = self._read("SELECT a.timestamp, a.account_id, a.peer_id, p.name AS peer, "
-                                "a.alt_currency_id AS currency FROM actions AS a "
-                                "LEFT JOIN agents AS p ON a.peer_id = p.id WHERE a.id=:oid",
-                                [(":oid", self._oid)], named=True)
+        if record is None:
+            self._data = self._read(self._db_select + "WHERE a.id=:oid", [(":oid", self._oid)], named=True)
+        else:
+            self._data = record.copy()
         self._timestamp = self._data['timestamp']
         self._account = jal.db.account.JalAccount(self._data['account_id'])
         self._account_name = self._account.name()
@@ -291,14 +311,13 @@ class IncomeSpending(LedgerTransaction):
         self._peer_id = self._data['peer_id']
         self._peer = self._data['peer']
         self._currency = self._data['currency']
-        details_query = self._exec("SELECT d.category_id, c.name AS category, d.tag_id, t.tag, "
-                                   "d.amount, d.amount_alt, d.note FROM action_details AS d "
-                                   "LEFT JOIN categories AS c ON c.id=d.category_id "
-                                   "LEFT JOIN tags AS t ON t.id=d.tag_id "
-                                   "WHERE d.pid= :pid", [(":pid", self._oid)])
-        self._details = []
-        while details_query.next():
-            self._details.append(self._read_record(details_query, named=True))
+        if record is None:
+            details_query = self._exec(self._db_select_details + "WHERE d.pid= :pid", [(":pid", self._oid)])
+            self._details = []
+            while details_query.next():
+                self._details.append(self._read_record(details_query, named=True))
+        else:
+            self._details = self._data.pop('details')
         self._amount = sum(Decimal(line['amount']) for line in self._details)
         self._label, self._label_color = ('—', CustomColor.DarkRed) if self._amount < 0 else ('+', CustomColor.DarkGreen)
         if self._currency:
@@ -306,6 +325,21 @@ class IncomeSpending(LedgerTransaction):
             self._currency_name = JalAsset(self._currency).symbol()
         self._amount_alt = sum(Decimal(line['amount_alt']) for line in self._details)
 
+    @classmethod
+    def _load_records(cls, ids: set) -> dict:
+        records = {}
+        query = cls._exec(cls._db_select + "WHERE " + cls._ids_condition("a.id", ids))
+        while query.next():
+            record = cls._read_record(query, named=True)
+            record['details'] = []
+            records[record['id']] = record
+        query = cls._exec(cls._db_select_details + "WHERE " + cls._ids_condition("d.pid", ids))
+        while query.next():
+            detail = cls._read_record(query, named=True)
+            if detail['pid'] in records:
+                records[detail['pid']]['details'].append(detail)
+        return records
+
     def description(self) -> str:
         description = self._peer
         if self._currency:
@@ -384,7 +418,14 @@ class Dividend(LedgerTransaction):
         "note": {"mandatory": False, "validation": True}
     }
 
-    def __init__(self, operation_id=None):
+    _db_select = "SELECT d.id, d.type, d.timestamp, d.ex_date, d.number, d.account_id, d.asset_id, " \
+                 "d.amount, d.tax, l.amount_acc AS t_qty, d.note AS note " \
+                 "FROM dividends AS d " \
+                 "LEFT JOIN assets AS a ON d.asset_id = a.id " \
+                 "LEFT JOIN ledger_totals AS l ON l.op_type=d.op_type AND l.operation_id=d.id " \
+                 "AND l.book_account = :book_assets "
+
+    def __init__(self, operation_id=None, record=None):
         labels = {
             Dividend.Dividend: ('Δ', CustomColor.DarkGreen),
             Dividend.BondInterest: ('%', CustomColor.DarkGreen),
@@ -394,13 +435,11 @@ class Dividend(LedgerTransaction):
         super().__init__(operation_id)
         self._otype = LedgerTransaction.Dividend
         self._view_rows = 2
-        self._data = self._read("SELECT d.type, d.timestamp, d.ex_date, d.number, d.account_id, d.asset_id, "
-                                "d.amount, d.tax, l.amount_acc AS t_qty, d.note AS note "
-                                "FROM dividends AS d "
-                                "LEFT JOIN assets AS a ON d.asset_id = a.id "
-                                "LEFT JOIN ledger_totals AS l ON l.op_type=d.op_type AND l.operation_id=d.id "
-                                "AND l.book_account = :book_assets WHERE d.id=:oid",
-                                [(":book_assets", BookAccount.Assets), (":oid", self._oid)], named=True)
+        if record is None:
+            self._data = self._read(self._db_select + "WHERE d.id=:oid",
+                                    [(":book_assets", BookAccount.Assets), (":oid", self._oid)], named=True)
+        else:
+            self._data = record
         self._subtype = self._data['type']
         self._label, self._label_color = labels[self._subtype]
         self._timestamp = self._data['timestamp']
@@ -416,6 +455,16 @@ class Dividend(LedgerTransaction):
         self._note = self._data['note']
         self._broker = self._account.organization()
 
+    @classmethod
+    def _load_records(cls, ids: set) -> dict:
+        records = {}
+        query = cls._exec(cls._db_select + "WHERE " + cls._ids_condition("d.id", ids),
+                          [(":book_assets", BookAccount.Assets)])
+        while query.next():
+            record = cls._read_record(query, named=True)
+            records[record['id']] = record
+        return records
+
     # Returns a list of Dividend objects for given asset, account and subtype
     # if asset_id is 0 - return for all assets, if subtype is 0 - return all types
     # skip_accrued=True - don't include accrued interest in resulting list
@@ -531,6 +580,7 @@ class Dividend(LedgerTransaction):
                    [(":id", self._oid), (":amount", format_decimal(amount))])
 
     def update_tax(self, new_tax) -> None:   # FIXME method should take Decimal value, not float
+        self._defer_ledger_invalidation(self._db_table, oid=self._oid)
         _ = self._exec("UPDATE dividends SET tax=:tax WHERE id=:dividend_id",
                        [(":dividend_id", self._oid), (":tax", new_tax)], commit=True)
 
@@ -569,12 +619,8 @@ class Dividend(LedgerTransaction):
         if asset_amount < Decimal('0'):
             raise NotImplemented(self.tr("Not supported action: stock dividend or vesting closes short trade.") +
                                  f" Operation: {self.dump()}")
-        _ = self._exec(
-            "INSERT INTO trades_opened(timestamp, op_type, operation_id, account_id, asset_id, price, remaining_qty) "
-            "VALUES(:timestamp, :type, :operation_id, :account_id, :asset_id, :price, :remaining_qty)",
-            [(":timestamp", self._timestamp), (":type", self._otype), (":operation_id", self._oid),
-             (":account_id", self._account.id()), (":asset_id", self._asset.id()),
-             (":price", format_decimal(self.price())),(":remaining_qty", format_decimal(self._amount))])
+        ledger.openTrade(self._timestamp, self._otype, self._oid, self._account.id(), self._asset.id(),
+                         self.price(), self._amount)
         ledger.appendTransaction(self, BookAccount.Assets, self._amount,
                                  asset_id=self._asset.id(), value=self._amount * self.price())
         if self._tax:
@@ -598,15 +644,19 @@ class Trade(LedgerTransaction):
         "note": {"mandatory": False, "validation": False}
     }
 
+    _db_select = "SELECT t.id, t.timestamp, t.settlement, t.number, t.account_id, t.asset_id, t.qty, " \
+                 "t.price, t.fee, t.note FROM trades AS t "
+
     # operation_data is either an integer to select operation from database or a dict with operation data that is used
     # to create a new operation in database and then select it
-    def __init__(self, operation_data=None):
+    def __init__(self, operation_data=None, record=None):
         super().__init__(operation_data)
         self._otype = LedgerTransaction.Trade
         self._view_rows = 2
-        self._data = self._read("SELECT t.timestamp, t.settlement, t.number, t.account_id, t.asset_id, t.qty, "
-                                "t.price, t.fee, t.note FROM trades AS t WHERE t.id=:oid",
-                                [(":oid", self._oid)], named=True)
+        if record is None:
+            self._data = self._read(self._db_select + "WHERE t.id=:oid", [(":oid", self._oid)], named=True)
+        else:
+            self._data = record
         self._timestamp = self._data['timestamp']
         self._settlement = self._data['settlement']
         self._account = jal.db.account.JalAccount(self._data['account_id'])
@@ -625,6 +675,15 @@ class Trade(LedgerTransaction):
         else:
             self._label, self._label_color = ('B', CustomColor.DarkGreen)
 
+    @classmethod
+    def _load_records(cls, ids: set) -> dict:
+        records = {}
+        query = cls._exec(cls._db_select + "WHERE " + cls._ids_condition("t.id", ids))
+        while query.next():
+            record = cls._read_record(query, named=True)
+            records[record['id']] = record
+        return records
+
     def settlement(self) -> int:
         return self._settlement
 
@@ -695,7 +754,7 @@ class Trade(LedgerTransaction):
         # Get asset amount accumulated before current operation
         asset_amount = ledger.getAmount(BookAccount.Assets, self._account.id(), self._asset.id())
         if ((-deal_sign) * asset_amount) > Decimal('0'):  # Match trade if we have asset that is opposite to operation
-            processed_qty, processed_value = self._close_deals_fifo(deal_sign, qty, self._price)
+            processed_qty, processed_value = self._close_deals_fifo(ledger, deal_sign, qty, self._price)
         if deal_sign > 0:
             credit_value = ledger.takeCredit(self, self._account.id(), trade_value)
         else:
@@ -710,12 +769,8 @@ class Trade(LedgerTransaction):
                                      deal_sign * ((self._price * processed_qty) - processed_value + rounding_error),
                                      category=PredefinedCategory.Profit, peer=self._broker)
         if processed_qty < qty:  # We have a reminder that opens a new position
-            _ = self._exec(
-                "INSERT INTO trades_opened(timestamp, op_type, operation_id, account_id, asset_id, price, remaining_qty) "
-                "VALUES(:timestamp, :type, :operation_id, :account_id, :asset_id, :price, :remaining_qty)",
-                [(":timestamp", self._timestamp), (":type", self._otype), (":operation_id", self._oid),
-                 (":account_id", self._account.id()), (":asset_id", self._asset.id()),
-                 (":price", format_decimal(self._price)), (":remaining_qty", format_decimal(qty - processed_qty))])
+            ledger.openTrade(self._timestamp, self._otype, self._oid, self._account.id(), self._asset.id(),
+                             self._price, qty - processed_qty)
             ledger.appendTransaction(self, BookAccount.Assets, deal_sign * (qty - processed_qty),
                                      asset_id=self._asset.id(), value=deal_sign * (qty - processed_qty) * self._price)
         if self._fee:
@@ -743,7 +798,11 @@ class Transfer(LedgerTransaction):
         "note": {"mandatory": False, "validation": False}
     }
 
-    def __init__(self, operation_id=None, display_type=None):
+    _db_select = "SELECT t.id, t.withdrawal_timestamp, t.withdrawal_account, t.withdrawal, " \
+                 "t.deposit_timestamp, t.deposit_account, t.deposit, t.fee_account, t.fee, t.asset, " \
+                 "t.number, t.note FROM transfers AS t "
+
+    def __init__(self, operation_id=None, display_type=None, record=None):
         labels = {
             Transfer.Outgoing: ('<', CustomColor.DarkBlue),
             Transfer.Incoming: ('>', CustomColor.DarkBlue),
@@ -752,10 +811,10 @@ class Transfer(LedgerTransaction):
         super().__init__(operation_id)
         self._otype = LedgerTransaction.Transfer
         self._display_type = display_type
-        self._data = self._read("SELECT t.withdrawal_timestamp, t.withdrawal_account, t.withdrawal, "
-                                "t.deposit_timestamp, t.deposit_account, t.deposit, t.fee_account, t.fee, t.asset, "
-                                "t.number, t.note FROM transfers AS t WHERE t.id=:oid",
-                                [(":oid", self._oid)], named=True)
+        if record is None:
+            self._data = self._read(self._db_select + "WHERE t.id=:oid", [(":oid", self._oid)], named=True)
+        else:
+            self._data = record
         self._withdrawal_account = jal.db.account.JalAccount(self._data['withdrawal_account'])
         self._withdrawal_account_name = self._withdrawal_account.name()
         self._withdrawal_timestamp = self._data['withdrawal_timestamp']
@@ -787,6 +846,15 @@ class Transfer(LedgerTransaction):
         else:
             assert False, "Unknown transfer type"
 
+    @classmethod
+    def _load_records(cls, ids: set) -> dict:
+        records = {}
+        query = cls._exec(cls._db_select + "WHERE " + cls._ids_condition("t.id", ids))
+        while query.next():
+            record = cls._read_record(query, named=True)
+            records[record['id']] = record
+        return records
+
     def timestamp(self):
         if self._display_type == Transfer.Incoming:
             return self._deposit_timestamp
@@ -913,7 +981,7 @@ class Transfer(LedgerTransaction):
                 raise LedgerError(self.tr("Asset amount is not enough for asset transfer processing. Date: ")
                                   + f"{ts2dt(self._withdrawal_timestamp)}, "
                                   + f"Asset amount: {asset_amount}, Operation: {self.dump()}")
-            processed_qty, processed_value = self._close_deals_fifo(Decimal('-1.0'), self._withdrawal, None)
+            processed_qty, processed_value = self._close_deals_fifo(ledger, Decimal('-1.0'), self._withdrawal, None)
             if processed_qty < self._withdrawal:
                 raise LedgerError(self.tr("Processed asset amount is less than transfer amount. Date: ")
                                   + f"{ts2dt(self._withdrawal_timestamp)}, "
@@ -926,6 +994,7 @@ class Transfer(LedgerTransaction):
                                      asset_id=self._asset.id(), value=processed_value*currency_rate)
         elif self._display_type == Transfer.Incoming:
             # get value of withdrawn asset
+            ledger.flush()
             value = self._read("SELECT value FROM ledger "
                                "WHERE book_account=:book_transfers AND op_type=:op_type AND operation_id=:id",
                                [(":book_transfers", BookAccount.Transfers), (":op_type", self._otype),
@@ -937,12 +1006,8 @@ class Transfer(LedgerTransaction):
             base = JalAsset.get_base_currency(self._withdrawal_timestamp)
             _, currency_rate = JalAsset(self._deposit_account.currency()).quote(self._deposit_timestamp, base)
             price = value * currency_rate / self._deposit
-            _ = self._exec(
-                "INSERT INTO trades_opened(timestamp, op_type, operation_id, account_id, asset_id, price, remaining_qty) "
-                "VALUES(:timestamp, :type, :operation_id, :account_id, :asset_id, :price, :remaining_qty)",
-                [(":timestamp", self._deposit_timestamp), (":type", self._otype), (":operation_id", self._oid),
-                 (":account_id", self._deposit_account.id()), (":asset_id", self._asset.id()),
-                 (":price", format_decimal(price)), (":remaining_qty", format_decimal(self._deposit))])
+            ledger.openTrade(self._deposit_timestamp, self._otype, self._oid, self._deposit_account.id(),
+                             self._asset.id(), price, self._deposit)
             ledger.appendTransaction(self, BookAccount.Transfers, -self._deposit,
                                      asset_id=self._asset.id(), value=-value)
             ledger.appendTransaction(self, BookAccount.Assets, self._deposit,
@@ -978,7 +1043,11 @@ class CorporateAction(LedgerTransaction):
         }
     }
 
-    def __init__(self, operation_id=None):
+    _db_select = "SELECT a.id, a.type, a.timestamp, a.number, a.account_id, a.qty, a.asset_id, a.note " \
+                 "FROM asset_actions AS a "
+    _db_select_results = "SELECT r.action_id, r.asset_id, r.qty, r.value_share FROM action_results AS r "
+
+    def __init__(self, operation_id=None, record=None):
         labels = {
             CorporateAction.NA: ("?", CustomColor.LightRed),
             CorporateAction.Merger: ('⭃', CustomColor.Black),
@@ -997,13 +1066,15 @@ class CorporateAction(LedgerTransaction):
         }
         super().__init__(operation_id)
         self._otype = LedgerTransaction.CorporateAction
-        self._data = self._read("SELECT a.type, a.timestamp, a.number, a.account_id, a.qty, a.asset_id, a.note "
-                                "FROM asset_actions AS a WHERE a.id=:oid", [(":oid", self._oid)], named=True)
-        results_query = self._exec("SELECT asset_id, qty, value_share FROM action_results WHERE action_id=:oid",
-                                   [(":oid", self._oid)])
-        self._results = []
-        while results_query.next():
-            self._results.append(self._read_record(results_query, named=True))
+        if record is None:
+            self._data = self._read(self._db_select + "WHERE a.id=:oid", [(":oid", self._oid)], named=True)
+            results_query = self._exec(self._db_select_results + "WHERE r.action_id=:oid", [(":oid", self._oid)])
+            self._results = []
+            while results_query.next():
+                self._results.append(self._read_record(results_query, named=True))
+        else:
+            self._data = record.copy()
+            self._results = self._data.pop('results')
         self._view_rows = len(self._results)
         self._subtype = self._data['type']
         self._oname = self.names[self._subtype]
@@ -1021,6 +1092,21 @@ class CorporateAction(LedgerTransaction):
         self._note = self._data['note']
         self._broker = self._account.organization()
 
+    @classmethod
+    def _load_records(cls, ids: set) -> dict:
+        records = {}
+        query = cls._exec(cls._db_select + "WHERE " + cls._ids_condition("a.id", ids))
+        while query.next():
+            record = cls._read_record(query, named=True)
+            record['results'] = []
+            records[record['id']] = record
+        query = cls._exec(cls._db_select_results + "WHERE " + cls._ids_condition("r.action_id", ids))
+        while query.next():
+            result = cls._read_record(query, named=True)
+            if result['action_id'] in records:
+                records[result['action_id']]['results'].append(result)
+        return records
+
     # Settlement returns timestamp as corporate action happens immediately in Jal
     def settlement(self) -> int:
         return self._timestamp
@@ -1136,7 +1222,7 @@ class CorporateAction(LedgerTransaction):
             raise LedgerError(self.tr("Results value of corporate action doesn't match 100% of initial asset value. ")
                                       + f"Date: {ts2dt(self._timestamp)}, Asset amount: {asset_amount}, " 
                                         f"Distributed: {100.0 * float(allocation)}%, Operation: {self.dump()}")
-        processed_qty, processed_value = self._close_deals_fifo(Decimal('-1.0'), self._qty, None)
+        processed_qty, processed_value = self._close_deals_fifo(ledger, Decimal('-1.0'), self._qty, None)
         # Withdraw value with old quantity of old asset
         ledger.appendTransaction(self, BookAccount.Assets, -processed_qty,
                                  asset_id=self._asset.id(), value=-processed_value)
@@ -1156,11 +1242,5 @@ class CorporateAction(LedgerTransaction):
             else:
                 value = share * processed_value
                 price = value / qty
-                _ = self._exec(
-                    "INSERT INTO trades_opened(timestamp, op_type, operation_id, "
-                    "account_id, asset_id, price, remaining_qty) "
-                    "VALUES(:timestamp, :type, :operation_id, :account_id, :asset_id, :price, :remaining_qty)",
-                    [(":timestamp", self._timestamp), (":type", self._otype), (":operation_id", self._oid),
-                     (":account_id", self._account.id()), (":asset_id", asset.id()), (":price", format_decimal(price)),
-                     (":remaining_qty", format_decimal(qty))])
+                ledger.openTrade(self._timestamp, self._otype, self._oid, self._account.id(), asset.id(), price, qty)
                 ledger.appendTransaction(self, BookAccount.Assets, qty, asset_id=asset.id(), value=value)
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from collections import OrderedDict
 from PySide6.QtCore import Qt, Slot, QDate, QAbstractTableModel, QModelIndex
 from PySide6.QtGui import QBrush, QFontDatabase
 from PySide6.QtWidgets import QStyledItemDelegate, QHeaderView
@@ -9,6 +10,9 @@ from jal.widgets.helpers import ts2dt
 
 
 class OperationsModel(QAbstractTableModel):
+    FETCH_BATCH_SIZE = 500     # How many rows are added to the model by one fetchMore() call
+    CACHE_SIZE = 2000          # How many prepared rows are kept in memory for display
+
     def __init__(self, parent_view):
         super().__init__(parent_view)
         self._columns = [" ", self.tr("Timestamp"), self.tr("Account"), self.tr("Notes"),
@@ -16,16 +20,49 @@ class OperationsModel(QAbstractTableModel):
         self._view = parent_view
         self._amount_delegate = None
         self._data = []
+        self._fetched = 0          # Number of rows from self._data that are exposed to the view
+        self._fetch_all = False    # All rows should be exposed after every reset (e.g. if view applies some filter)
+        self._cache = OrderedDict()   # LRU cache of rows prepared for display: {(op_type, id, subtype): row_data}
         self._begin = 0
         self._end = 0
         self._account = 0
         self._bold_font = QFontDatabase.systemFont(QFontDatabase.GeneralFont)
         self._bold_font.setBold(True)
 
+        self.modelReset.connect(self._reset_cache)
         self.prepareData()
 
     def rowCount(self, parent=None):
-        return len(self._data)
+        return min(self._fetched, len(self._data))
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._fetched < len(self._data)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        self.fetchRows(self._fetched + self.FETCH_BATCH_SIZE)
+
+    # Makes at least 'count' rows (or all available rows if there are less of them) visible for the view
+    def fetchRows(self, count):
+        count = min(count, len(self._data))
+        if count <= self._fetched:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, count - 1)
+        self._fetched = count
+        self.endInsertRows()
+
+    def fetchAll(self):
+        self.fetchRows(len(self._data))
+
+    # Keeps all rows exposed to the view (now and after every reset) if 'enabled' or returns to batch fetching otherwise.
+    # It is required for filtering as filter should be applied to all operations, not only to fetched ones
+    def setFetchAll(self, enabled: bool):
+        self._fetch_all = enabled
+        if enabled:
+            self.fetchAll()
 
     def columnCount(self, parent=None):
         return len(self._columns)
@@ -45,20 +82,18 @@ class OperationsModel(QAbstractTableModel):
         row = index.row()
         if not index.isValid():
             return None
-        operation = LedgerTransaction().get_operation(self._data[row]['op_type'],
-                                                      self._data[row]['id'],
-                                                      self._data[row]['subtype'])
         if role == Qt.DisplayRole:
-            return self.data_text(operation, index.column())
+            return self._row_data(row)['text'][index.column()]
         if role == Qt.FontRole and index.column() == 0:
             # below line isn't related with font, it is put here to be called for each row minimal times (ideally 1)
-            self._view.setRowHeight(row, self._view.verticalHeader().defaultSectionSize() * operation.view_rows())
+            self._view.setRowHeight(row,
+                                    self._view.verticalHeader().defaultSectionSize() * self._row_data(row)['view_rows'])
             return self._bold_font
         if role == Qt.ForegroundRole and self._view.isEnabled():
             if index.column() == 0:
-                return QBrush(operation.label_color())
+                return QBrush(self._row_data(row)['label_color'])
             elif index.column() == 5:
-                if operation.reconciled():
+                if self._row_data(row)['reconciled']:
                     return QBrush(CustomColor.Blue)
         if role == Qt.TextAlignmentRole:
             if index.column() == 0:
@@ -69,6 +104,39 @@ class OperationsModel(QAbstractTableModel):
         if role == Qt.UserRole:  # return underlying data for given field extra parameter
             return self._data[index.row()][field]
 
+    # Returns a dict with all data that are required to display given row. Operation is loaded from DB only once and
+    # then prepared row data are taken from cache until it is invalidated
+    def _row_data(self, row) -> dict:
+        key = (self._data[row]['op_type'], self._data[row]['id'], self._data[row]['subtype'])
+        try:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        except KeyError:
+            pass
+        operation = LedgerTransaction.get_operation(key[0], key[1], key[2])
+        row_data = {
+            'text': [self.data_text(operation, column) for column in range(len(self._columns))],
+            'view_rows': operation.view_rows(),
+            'label_color': operation.label_color(),
+            'reconciled': operation.reconciled()
+        }
+        self._cache[key] = row_data
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return row_data
+
+    @Slot()
+    def _reset_cache(self):
+        self._cache.clear()
+        self._fetched = len(self._data) if self._fetch_all else min(self.FETCH_BATCH_SIZE, len(self._data))
+
+    # Drops prepared data of all rows, so they will be re-loaded from DB. Should be called when ledger was updated
+    @Slot()
+    def invalidate(self):
+        self._cache.clear()
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1))
+
     def data_text(self, operation, column):
         if column == 0:
             return operation.label()
@@ -132,6 +200,7 @@ class OperationsModel(QAbstractTableModel):
         if self._view.model() != self:          # View uses some proxy model
             idx = self._view.model().mapToSource(idx)
         self.prepareData()
+        self.fetchRows(idx.row() + 1)           # Selected row should be available after reset
         if self._view.model() != self:
             idx = self._view.model().mapFromSource(idx)
         self._view.setCurrentIndex(idx)
@@ -1,7 +1,10 @@
-from jal.db.db import JalDB
+from jal.db.db import JalDB, JalCachedDB
 
 
-class JalPeer(JalDB):
+class JalPeer(JalCachedDB):
+    db_cache = None
+    _cache_sql = "SELECT id, pid, name FROM agents"
+
     def __init__(self, id: int = 0, data: dict = None, search=False, create=False) -> None:
         super().__init__()
         self._id = id
@@ -12,12 +15,12 @@ class JalPeer(JalDB):
                 query = self._exec("INSERT INTO agents (pid, name) VALUES (:pid, :name)",
                                    [(":pid", data['parent']), (":name", data['name'])])
                 self._id = query.lastInsertId()
-        self._data = self._read("SELECT name FROM agents WHERE id=:peer_id",
-                                [(":peer_id", self._id)], named=True)
+                self._update_cache(self._id)
+        self._data = self._cached_record(self._id)
         self._name = self._data['name'] if self._data is not None else None
 
     def dump(self):
-        return self._data
+        return {'name': self._name} if self._data is not None else None
 
     def id(self) -> int:
         return self._id
@@ -28,11 +31,7 @@ class JalPeer(JalDB):
     # Returns a list of all available peers
     @classmethod
     def get_all_peers(cls):
-        peers = []
-        query = cls._exec("SELECT id FROM agents")
-        while query.next():
-            peers.append(JalPeer(cls._read_record(query, cast=[int])))
-        return peers
+        return [JalPeer(x) for x in sorted(cls._cached_records())]
 
     # Returns possible peer_id by a given name
     @classmethod
@@ -76,4 +75,5 @@ class JalPeer(JalDB):
         self._exec("UPDATE map_peer SET mapped_to=:new_id WHERE mapped_to=:old_id",
                    [(":new_id", new_id), (":old_id", self._id)])
         self._exec("DELETE FROM agents WHERE id=:old_id", [(":old_id", self._id)], commit=True)
+        JalDB().invalidate_cache()   # Organizations of accounts were changed together with the peer itself
         self._id = 0
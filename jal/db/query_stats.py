@@ -0,0 +1,106 @@
+import re
+import logging
+import threading
+from functools import lru_cache
+from datetime import datetime
+from collections import deque
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Returns SQL text where literal values are replaced with '?' and all whitespaces are collapsed - i.e. queries that
+# differ only by values that were put directly into the text are counted as the same statement
+@lru_cache(maxsize=1024)
+def normalize_sql(sql_text: str) -> str:
+    sql_text = re.sub(r"'(?:[^']|'')*'", "?", sql_text)
+    sql_text = re.sub(r"(?<![\w:.])-?\d+(?:\.\d+)?\b", "?", sql_text)
+    return re.sub(r"\s+", " ", sql_text).strip()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Statistics of SQL statements that are executed by JalDB. It keeps for every normalized statement a number of
+# executions, total and maximum execution time. Statements are also counted for current user action of every DB
+# connection separately - a statement that is executed more than 'repeat_threshold' times within one action is
+# reported as a possible N+1 query problem when action is finished. Statements that take more than 'slow_threshold'
+# seconds are written into 'log_file' (if it is given) and the latest of them are kept in memory.
+# Methods may be called from different threads.
+class QueryStats:
+    SLOW_QUERIES_KEPT = 100     # How many slow queries are kept in memory for summary
+
+    def __init__(self, slow_threshold: float, repeat_threshold: int, log_file: str = ''):
+        self._lock = threading.Lock()
+        self._slow_threshold = slow_threshold
+        self._repeat_threshold = repeat_threshold
+        self._log_file = log_file
+        self._started = datetime.now()
+        self._statements = {}     # {normalized sql: [count, total time, max time]}
+        self._actions = {}        # {connection name: {normalized sql: count in current action}}
+        self._repeated = {}       # {normalized sql: maximum count in one action} for statements above repeat_threshold
+        self._slow = deque(maxlen=self.SLOW_QUERIES_KEPT)  # (time, duration, sql text, params) of slow queries
+
+    # Records 'count' executions of 'sql_text' with total 'duration' (in seconds) that were made via 'connection'
+    def record(self, connection: str, sql_text: str, duration: float, count: int = 1, params=None) -> None:
+        statement = normalize_sql(sql_text)
+        slow = duration > self._slow_threshold * count
+        with self._lock:
+            stats = self._statements.setdefault(statement, [0, 0.0, 0.0])
+            stats[0] += count
+            stats[1] += duration
+            stats[2] = max(stats[2], duration / count)
+            action = self._actions.setdefault(connection, {})
+            action[statement] = action.get(statement, 0) + count
+            if slow:
+                self._slow.append((datetime.now(), duration, sql_text, params))
+        if slow:
+            self._log_slow_query(duration, count, sql_text, params)
+
+    # Finishes current user action for 'connection' and reports statements that were repeated too many times in it
+    def finish_action(self, connection: str) -> None:
+        with self._lock:
+            action = self._actions.pop(connection, {})
+            repeated = {x: count for x, count in action.items() if count > self._repeat_threshold}
+            for statement, count in repeated.items():
+                self._repeated[statement] = max(count, self._repeated.get(statement, 0))
+        for statement, count in repeated.items():
+            logging.warning(f"SQL statement was executed {count} times in one action: '{statement}'")
+
+    def _log_slow_query(self, duration: float, count: int, sql_text: str, params) -> None:
+        if not self._log_file:
+            return
+        batch = f" (batch of {count})" if count > 1 else ''
+        try:
+            with open(self._log_file, 'a', encoding='utf-8') as log:
+                log.write(f"{datetime.now().isoformat(sep=' ', timespec='milliseconds')} {duration * 1e3:.1f}ms"
+                          f"{batch}: {sql_text} {params if params else ''}\n")
+        except OSError as e:
+            logging.warning(f"Failed to write slow query log '{self._log_file}': {e}")
+            self._log_file = ''
+
+    # Returns collected statistics as a dictionary that may be serialized to JSON. Statements are sorted by total time
+    def summary(self) -> dict:
+        with self._lock:
+            statements = [{'sql': sql, 'count': x[0], 'total_ms': x[1] * 1e3, 'max_ms': x[2] * 1e3,
+                           'repeated_in_action': self._repeated.get(sql, 0)} for sql, x in self._statements.items()]
+            slow = [{'time': x[0].isoformat(timespec='milliseconds'), 'duration_ms': x[1] * 1e3, 'sql': x[2],
+                     'params': str(x[3]) if x[3] else ''} for x in self._slow]
+        statements.sort(key=lambda x: x['total_ms'], reverse=True)
+        return {'started': self._started.isoformat(timespec='seconds'),
+                'slow_threshold_ms': self._slow_threshold * 1e3, 'repeat_threshold': self._repeat_threshold,
+                'executions': sum(x['count'] for x in statements), 'total_ms': sum(x['total_ms'] for x in statements),
+                'statements': statements, 'slow_queries': slow}
+
+    # Returns text report with 'top' statements by total time and all statements repeated too many times in one action
+    def report(self, top: int = 10) -> str:
+        summary = self.summary()
+        lines = [f"SQL statistics since {summary['started']}: {summary['executions']} executions of "
+                 f"{len(summary['statements'])} statements, {summary['total_ms']:.0f}ms in total"]
+        for x in summary['statements'][:top]:
+            lines.append(f"{x['total_ms']:10.1f}ms {x['count']:8d}x max {x['max_ms']:.1f}ms: {x['sql']}")
+        repeated = [x for x in summary['statements'] if x['repeated_in_action']]
+        if repeated:
+            lines.append(f"Statements executed more than {summary['repeat_threshold']} times in one action:")
+            for x in sorted(repeated, key=lambda x: x['repeated_in_action'], reverse=True):
+                lines.append(f"{x['repeated_in_action']:8d}x: {x['sql']}")
+        if summary['slow_queries']:
+            lines.append(f"Slow queries (longer than {summary['slow_threshold_ms']:.0f}ms): "
+                         f"{len(summary['slow_queries'])}")
+        return "\n".join(lines)
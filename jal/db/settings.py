@@ -25,10 +25,11 @@ class JalSettings(JalDB):
             value = default
         return value
 
-    def setValue(self, key, value):
+    # Change is committed immediately if 'commit' is True, otherwise it is a part of current transaction
+    def setValue(self, key, value, commit=True):
         self._exec("INSERT OR REPLACE INTO settings(id, name, value) "
                    "VALUES((SELECT id FROM settings WHERE name=:key), :key, :value)",
-                   [(":key", key), (":value", value)], commit=True)
+                   [(":key", key), (":value", value)], commit=commit)
 
     # Returns 2-letter language code that corresponds to current 'Language' settings in DB
     def getLanguage(self):
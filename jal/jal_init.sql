@@ -192,6 +192,16 @@ CREATE TABLE ledger (
     category_id  INTEGER REFERENCES categories (id) ON DELETE NO ACTION ON UPDATE NO ACTION,
     tag_id       INTEGER REFERENCES tags (id) ON DELETE NO ACTION ON UPDATE NO ACTION
 );
+DROP INDEX IF EXISTS ledger_by_account_asset_book;
+CREATE INDEX ledger_by_account_asset_book ON ledger (account_id, asset_id, book_account, id);
+DROP INDEX IF EXISTS ledger_by_timestamp;
+CREATE INDEX ledger_by_timestamp ON ledger (timestamp);
+DROP INDEX IF EXISTS ledger_by_category;
+CREATE INDEX ledger_by_category ON ledger (category_id, timestamp);
+DROP INDEX IF EXISTS ledger_by_peer;
+CREATE INDEX ledger_by_peer ON ledger (peer_id, timestamp);
+DROP INDEX IF EXISTS ledger_by_operation;
+CREATE INDEX ledger_by_operation ON ledger (op_type, operation_id, book_account);
 
 -- Table: ledger_totals to keep last accumulated amount value for each transaction
 DROP TABLE IF EXISTS ledger_totals;
@@ -211,6 +221,30 @@ CREATE INDEX ledger_totals_by_timestamp ON ledger_totals (timestamp);
 DROP INDEX IF EXISTS ledger_totals_by_operation_book;
 CREATE INDEX ledger_totals_by_operation_book ON ledger_totals (op_type, operation_id, book_account);
 
+-- Table: ledger_snapshots to keep id of the last ledger record for every [account, asset, book] at the end of month
+DROP TABLE IF EXISTS ledger_snapshots;
+CREATE TABLE ledger_snapshots (
+    id           INTEGER PRIMARY KEY UNIQUE NOT NULL,
+    timestamp    INTEGER NOT NULL,
+    account_id   INTEGER NOT NULL,
+    asset_id     INTEGER,
+    book_account INTEGER NOT NULL,
+    ledger_id    INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS ledger_snapshots_by_account;
+CREATE INDEX ledger_snapshots_by_account ON ledger_snapshots (account_id, timestamp);
+
+-- Table: ledger_dirty to keep the earliest timestamp since which ledger isn't valid for [account, asset]
+DROP TABLE IF EXISTS ledger_dirty;
+CREATE TABLE ledger_dirty (
+    id           INTEGER PRIMARY KEY UNIQUE NOT NULL,
+    account_id   INTEGER NOT NULL,
+    asset_id     INTEGER NOT NULL,
+    timestamp    INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS ledger_dirty_by_account_asset;
+CREATE UNIQUE INDEX ledger_dirty_by_account_asset ON ledger_dirty (account_id, asset_id);
+
 -- Table: map_category
 DROP TABLE IF EXISTS map_category;
 CREATE TABLE map_category (
@@ -400,6 +434,11 @@ DROP VIEW IF EXISTS frontier;
 CREATE VIEW frontier AS SELECT MAX(ledger.timestamp) AS ledger_frontier FROM ledger;
 
 
+-- View: ledger_invalidation (insertion only - it marks ledger as invalid for account/asset since given timestamp)
+DROP VIEW IF EXISTS ledger_invalidation;
+CREATE VIEW ledger_invalidation AS SELECT account_id, asset_id, timestamp FROM ledger_dirty;
+
+
 -- View: assets_ext
 DROP VIEW IF EXISTS assets_ext;
 CREATE VIEW assets_ext AS
@@ -429,6 +468,23 @@ BEGIN
 END;
 
 
+-- Keeps the earliest invalid timestamp for account/asset and removes invalid ledger records and snapshots of the account
+-- (stale snapshots would point to deleted ledger records)
+DROP TRIGGER IF EXISTS on_ledger_invalidation;
+CREATE TRIGGER on_ledger_invalidation
+    INSTEAD OF INSERT ON ledger_invalidation FOR EACH ROW WHEN NEW.account_id IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO ledger_dirty (account_id, asset_id, timestamp)
+    SELECT a.id, coalesce(NEW.asset_id, a.currency_id), min(NEW.timestamp, coalesce(d.timestamp, NEW.timestamp))
+    FROM accounts a
+    LEFT JOIN ledger_dirty d ON d.account_id = a.id AND d.asset_id = coalesce(NEW.asset_id, a.currency_id)
+    WHERE a.id = NEW.account_id;
+    DELETE FROM ledger WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+    DELETE FROM ledger_snapshots WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+    DELETE FROM trades_opened WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+END;
+
+
 -- Trigger: action_details_after_delete
 DROP TRIGGER IF EXISTS action_details_after_delete;
 CREATE TRIGGER action_details_after_delete
@@ -436,7 +492,8 @@ CREATE TRIGGER action_details_after_delete
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= (SELECT timestamp FROM actions WHERE id = OLD.pid);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NULL, timestamp FROM actions WHERE id = OLD.pid;
 END;
 
 
@@ -447,7 +504,8 @@ CREATE TRIGGER action_details_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= (SELECT timestamp FROM actions WHERE id = NEW.pid);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NULL, timestamp FROM actions WHERE id = NEW.pid;
 END;
 
 -- Trigger: action_details_after_update
@@ -457,7 +515,8 @@ CREATE TRIGGER action_details_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= (SELECT timestamp FROM actions WHERE id = OLD.pid );
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NULL, timestamp FROM actions WHERE id = OLD.pid;
 END;
 
 -- Trigger: actions_after_delete
@@ -468,7 +527,7 @@ CREATE TRIGGER actions_after_delete
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
     DELETE FROM action_details WHERE pid = OLD.id;
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (OLD.account_id, NULL, OLD.timestamp);
 END;
 
 -- Trigger: actions_after_insert
@@ -478,7 +537,7 @@ CREATE TRIGGER actions_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (NEW.account_id, NULL, NEW.timestamp);
 END;
 
 -- Trigger: actions_after_update
@@ -488,7 +547,8 @@ CREATE TRIGGER actions_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp OR timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (OLD.account_id, NULL, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (NEW.account_id, NULL, NEW.timestamp);
 END;
 
 -- Trigger: dividends_after_delete
@@ -498,7 +558,8 @@ CREATE TRIGGER dividends_after_delete
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
 END;
 
 -- Trigger: dividends_after_insert
@@ -508,7 +569,8 @@ CREATE TRIGGER dividends_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
 END;
 
 -- Trigger: dividends_after_update
@@ -518,7 +580,10 @@ CREATE TRIGGER dividends_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp OR timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS trades_after_delete;
@@ -527,8 +592,8 @@ CREATE TRIGGER trades_after_delete
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp;
-    DELETE FROM trades_opened WHERE timestamp >= OLD.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS trades_after_insert;
@@ -537,8 +602,8 @@ CREATE TRIGGER trades_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= NEW.timestamp;
-    DELETE FROM trades_opened WHERE timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS trades_after_update;
@@ -547,8 +612,10 @@ CREATE TRIGGER trades_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp OR timestamp >= NEW.timestamp;
-    DELETE FROM trades_opened WHERE timestamp >= OLD.timestamp OR timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS asset_action_after_delete;
@@ -557,8 +624,8 @@ CREATE TRIGGER asset_action_after_delete
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp;
-    DELETE FROM trades_opened WHERE timestamp >= OLD.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS asset_action_after_insert;
@@ -567,8 +634,8 @@ CREATE TRIGGER asset_action_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= NEW.timestamp;
-    DELETE FROM trades_opened WHERE timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS asset_action_after_update;
@@ -577,8 +644,10 @@ CREATE TRIGGER asset_action_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.timestamp OR timestamp >= NEW.timestamp;
-    DELETE FROM trades_opened WHERE timestamp >= OLD.timestamp  OR timestamp >= NEW.timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
 END;
 
 DROP TRIGGER IF EXISTS asset_result_after_delete;
@@ -587,7 +656,8 @@ CREATE TRIGGER asset_result_after_delete
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= (SELECT timestamp FROM asset_actions WHERE id = OLD.action_id);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, OLD.asset_id, timestamp FROM asset_actions WHERE id = OLD.action_id;
 END;
 
 DROP TRIGGER IF EXISTS asset_result_after_insert;
@@ -596,7 +666,8 @@ CREATE TRIGGER asset_result_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= (SELECT timestamp FROM asset_actions WHERE id = NEW.action_id);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NEW.asset_id, timestamp FROM asset_actions WHERE id = NEW.action_id;
 END;
 
 DROP TRIGGER IF EXISTS asset_result_after_update;
@@ -605,7 +676,8 @@ CREATE TRIGGER asset_result_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= (SELECT timestamp FROM asset_actions WHERE id = OLD.action_id);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, OLD.asset_id, timestamp FROM asset_actions WHERE id = OLD.action_id;
 END;
 
 DROP TRIGGER IF EXISTS transfers_after_delete;
@@ -614,7 +686,10 @@ CREATE TRIGGER transfers_after_delete
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.withdrawal_timestamp OR timestamp >= OLD.deposit_timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.withdrawal_account, OLD.asset, OLD.withdrawal_timestamp),
+           (OLD.deposit_account, OLD.asset, OLD.deposit_timestamp),
+           (OLD.fee_account, NULL, OLD.withdrawal_timestamp);
 END;
 
 DROP TRIGGER IF EXISTS transfers_after_insert;
@@ -623,7 +698,10 @@ CREATE TRIGGER transfers_after_insert
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= NEW.withdrawal_timestamp OR timestamp >= NEW.deposit_timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.withdrawal_account, NEW.asset, NEW.withdrawal_timestamp),
+           (NEW.deposit_account, NEW.asset, NEW.deposit_timestamp),
+           (NEW.fee_account, NULL, NEW.withdrawal_timestamp);
 END;
 
 DROP TRIGGER IF EXISTS transfers_after_update;
@@ -633,8 +711,13 @@ CREATE TRIGGER transfers_after_update
       FOR EACH ROW
       WHEN (SELECT value FROM settings WHERE id = 1)
 BEGIN
-    DELETE FROM ledger WHERE timestamp >= OLD.withdrawal_timestamp OR timestamp >= OLD.deposit_timestamp OR
-                timestamp >= NEW.withdrawal_timestamp OR timestamp >= NEW.deposit_timestamp;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.withdrawal_account, OLD.asset, OLD.withdrawal_timestamp),
+           (OLD.deposit_account, OLD.asset, OLD.deposit_timestamp),
+           (OLD.fee_account, NULL, OLD.withdrawal_timestamp),
+           (NEW.withdrawal_account, NEW.asset, NEW.withdrawal_timestamp),
+           (NEW.deposit_account, NEW.asset, NEW.deposit_timestamp),
+           (NEW.fee_account, NULL, NEW.withdrawal_timestamp);
 END;
 
 DROP TRIGGER IF EXISTS validate_account_insert;
@@ -662,7 +745,7 @@ END;
 
 
 -- Initialize default values for settings
-INSERT INTO settings(id, name, value) VALUES (0, 'SchemaVersion', 44);
+INSERT INTO settings(id, name, value) VALUES (0, 'SchemaVersion', 47);
 INSERT INTO settings(id, name, value) VALUES (1, 'TriggersEnabled', 1);
 -- INSERT INTO settings(id, name, value) VALUES (2, 'BaseCurrency', 1); -- Deprecated and ID shouldn't be re-used
 INSERT INTO settings(id, name, value) VALUES (3, 'Language', 1);
@@ -1,13 +1,15 @@
 import logging
+import threading
 import xml.etree.ElementTree as xml_tree
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import monotonic, sleep
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from io import StringIO
 
-import pandas as pd
-from pandas.errors import ParserError
 import json
-from PySide6.QtCore import Qt, QObject, Signal, QDate
+from PySide6.QtCore import Qt, QObject, Signal, Slot, QDate
 from PySide6.QtWidgets import QApplication, QDialog, QListWidgetItem
 
 from jal.ui.ui_update_quotes_window import Ui_UpdateQuotesDlg
@@ -55,28 +57,78 @@ class QuotesUpdateDialog(QDialog):
         return checked
 
 
+# ===================================================================================================================
+# Limits rate of requests to one data source: every next request is delayed to keep given interval after previous one
+class RateLimiter:
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self._interval
+        if delay > 0:
+            sleep(delay)
+
+
 # ===================================================================================================================
 # Worker class
 # ===================================================================================================================
+# Downloads are executed in thread pools (one pool per data source) while all database operations are done by
+# QuoteDownloader object itself in its thread: loaders get plain asset data that are prepared together with download
+# tasks and results of downloads are delivered back via queued Qt signals.
 # noinspection SpellCheckingInspection
 class QuoteDownloader(QObject):
+    # Data source: (maximum number of simultaneous downloads, minimum interval between requests in seconds)
+    SOURCE_LIMITS = {
+        MarketDataFeed.NA: (1, 0),
+        MarketDataFeed.FX: (2, 0.5),
+        MarketDataFeed.RU: (4, 0.2),
+        MarketDataFeed.US: (2, 1.0),
+        MarketDataFeed.EU: (2, 1.0),
+        MarketDataFeed.CA: (2, 0.5),
+        MarketDataFeed.GB: (2, 1.0),
+        MarketDataFeed.FRA: (2, 1.0)
+    }
     download_completed = Signal()
+    download_progress = Signal(int, int)   # number of finished downloads, total number of downloads
+    _download_finished = Signal(object)    # a download task with its result
+    _asset_info_loaded = Signal(int, object)   # an asset id and dictionary with its updated details
 
     def __init__(self):
         super().__init__()
         self.CBR_codes = None
+        self._cbr_lock = threading.Lock()
+        self._pools = {}
+        self._limiters = {}
+        self._tasks_total = 0
+        self._tasks_left = 0
+        self._download_finished.connect(self._store_download)
+        self._asset_info_loaded.connect(self._update_asset_info)
 
     def showQuoteDownloadDialog(self, parent):
         dialog = QuotesUpdateDialog(parent)
         if dialog.exec():
             self.DownloadData(dialog.getStartDate(), dialog.getEndDate(), dialog.getSourceList())
-            self.download_completed.emit()
 
+    # Starts download of quotes and rates for given period from selected sources.
+    # Method returns immediately and 'download_completed' signal is emitted when all downloads are finished.
     def DownloadData(self, start_timestamp, end_timestamp, sources_list):
+        if self._tasks_left:
+            logging.warning(self.tr("Quotes download is already in progress"))
+            return
+        tasks = []
         if MarketDataFeed.FX in sources_list:
-            self.download_currency_rates(start_timestamp, end_timestamp)
-        self.download_asset_prices(start_timestamp, end_timestamp, sources_list)
-        logging.info(self.tr("Download completed"))
+            tasks += self._currency_rates_tasks(start_timestamp, end_timestamp)
+        tasks += self._asset_prices_tasks(start_timestamp, end_timestamp, sources_list)
+        self._start_downloads(tasks)
+
+    # Returns True if there are downloads that aren't finished yet
+    def is_running(self) -> bool:
+        return self._tasks_left > 0
 
     # Checks for present quotations of 'asset' in given 'currency' and adjusts 'start' timestamp to be at
     # the end of available quotes interval if needed.
@@ -88,35 +140,48 @@ class QuoteDownloader(QObject):
             from_timestamp = quotes_end if quotes_end > start else start
         return from_timestamp
 
-    def _store_quotations(self, asset: JalAsset, currency_id: int, data: pd.DataFrame) -> None:
-        if data is not None:
-            quotations = []
-            for date, quote in data.iterrows():  # Date in pandas dataset is in UTC by default
-                quotations.append({'timestamp': int(date.timestamp()), 'quote': quote[0]})
-            asset.set_quotes(quotations, currency_id)
+    # Returns a dictionary with asset data that price loaders need: 'id', 'symbol' (all symbols of asset), 'isin',
+    # 'quote_symbol' (symbol in given currency) and 'currency' (symbol of given currency)
+    @staticmethod
+    def asset_download_info(asset: JalAsset, currency_id: int) -> dict:
+        return {'id': asset.id(), 'symbol': asset.symbol(), 'isin': asset.isin(),
+                'quote_symbol': asset.symbol(currency_id), 'currency': JalAsset(currency_id).symbol()}
 
-    def download_currency_rates(self, start_timestamp, end_timestamp):
+    def _store_quotations(self, asset: JalAsset, currency_id: int, data: 'pd.DataFrame') -> None:
+        if data is not None:
+            timestamps = [int(date.timestamp()) for date in data.index]   # Date in pandas dataset is in UTC by default
+            JalAsset.store_quotes({(asset.id(), currency_id): (timestamps, data.iloc[:, 0].tolist())})
+
+    # Returns a list of download tasks for currency rates. Every task is a dictionary with keys:
+    # 'source' - data source, 'loader' - function that returns data, 'asset' and 'currency' to store quotes for,
+    # 'warning' - a message to display if download fails. Loader gets only plain values (not JalAsset objects) as it is
+    # executed in a pool thread that shouldn't access database
+    def _currency_rates_tasks(self, start_timestamp, end_timestamp) -> list:
         data_loaders = {
             "RUB": self.CBR_DataReader,
             "EUR": self.ECB_DataReader
         }
-        self.PrepareRussianCBReader()
+        self.CBR_codes = None    # Force codes reload as they are prepared once for every download
+        tasks = []
         for base in set([x[1] for x in JalAsset.get_base_currency_history(start_timestamp, end_timestamp)]):
+            base_symbol = JalAsset(base).symbol()
             for currency in JalAsset.get_currencies():
                 if currency.id() == base or currency.quote_source(None) != MarketDataFeed.FX:
                     continue  # Skip as it is X/X ratio that is always 1
                 from_timestamp = self._adjust_start(currency, base, start_timestamp)
                 if end_timestamp < from_timestamp:
                     continue
-                try:
-                    data = data_loaders[JalAsset(base).symbol()](currency, from_timestamp, end_timestamp)
-                except (xml_tree.ParseError, pd.errors.EmptyDataError, KeyError):
-                    logging.warning(self.tr("No rates were downloaded for ") +
-                                    f"{currency.symbol()}/{JalAsset(base).symbol()}")
+                warning = self.tr("No rates were downloaded for ") + f"{currency.symbol()}/{base_symbol}"
+                if base_symbol not in data_loaders:
+                    logging.warning(warning)
                     continue
-                self._store_quotations(currency, base, data)
+                tasks.append({'source': MarketDataFeed.FX, 'asset': currency, 'currency': base, 'warning': warning,
+                              'loader': partial(data_loaders[base_symbol], currency.symbol(), from_timestamp,
+                                                end_timestamp)})
+        return tasks
 
-    def download_asset_prices(self, start_timestamp, end_timestamp, sources_list):
+    # Returns a list of download tasks for asset prices (see _currency_rates_tasks() for task description)
+    def _asset_prices_tasks(self, start_timestamp, end_timestamp, sources_list) -> list:
         data_loaders = {
             MarketDataFeed.NA: self.Dummy_DataReader,
             MarketDataFeed.RU: self.MOEX_DataReader,
@@ -126,6 +191,7 @@ class QuoteDownloader(QObject):
             MarketDataFeed.GB: self.YahooLSE_Downloader,
             MarketDataFeed.FRA: self.YahooFRA_Downloader
         }
+        tasks = []
         assets = JalAsset.get_active_assets(start_timestamp, end_timestamp)  # append assets list
         for asset_data in assets:
             asset = asset_data['asset']
@@ -133,17 +199,74 @@ class QuoteDownloader(QObject):
             from_timestamp = self._adjust_start(asset, currency, start_timestamp)
             if end_timestamp < from_timestamp:
                 continue
-            try:
-                data_source = asset.quote_source(currency)
-                if data_source not in sources_list:   # skip sources that are not requested
-                    continue
-                data = data_loaders[data_source](asset, currency, from_timestamp, end_timestamp)
-            except (xml_tree.ParseError, pd.errors.EmptyDataError, KeyError):
-                logging.warning(self.tr("No quotes were downloaded for ") + f"{asset.symbol()}")
+            data_source = asset.quote_source(currency)
+            if data_source not in sources_list:   # skip sources that are not requested
+                continue
+            warning = self.tr("No quotes were downloaded for ") + f"{asset.symbol()}"
+            if data_source not in data_loaders:
+                logging.warning(warning)
                 continue
-            self._store_quotations(asset, currency, data)
+            tasks.append({'source': data_source, 'asset': asset, 'currency': currency, 'warning': warning,
+                          'loader': partial(data_loaders[data_source], self.asset_download_info(asset, currency),
+                                            from_timestamp, end_timestamp)})
+        return tasks
+
+    # Submits download tasks into thread pools of their data sources
+    def _start_downloads(self, tasks: list) -> None:
+        self._tasks_total = self._tasks_left = len(tasks)
+        if not tasks:
+            self._finish_downloads()
+            return
+        self.download_progress.emit(0, self._tasks_total)
+        for task in tasks:
+            source = task['source']
+            if source not in self._pools:
+                concurrency, interval = self.SOURCE_LIMITS.get(source, (1, 1.0))
+                self._pools[source] = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="jal_download")
+                self._limiters[source] = RateLimiter(interval)
+            self._pools[source].submit(self._download, task)
+
+    # Executed in a pool thread: downloads data for the task and sends it back for storage
+    def _download(self, task: dict) -> None:
+        import pandas as pd
+
+        self._limiters[task['source']].wait()
+        try:
+            task['data'] = task['loader']()
+        except (xml_tree.ParseError, pd.errors.EmptyDataError, KeyError):
+            task['data'] = None
+            logging.warning(task['warning'])
+        except Exception as e:
+            task['data'] = None
+            logging.error(task['warning'] + f": {e}")
+        self._download_finished.emit(task)
+
+    # Stores downloaded data into database (it is executed in the thread of QuoteDownloader object)
+    @Slot(object)
+    def _store_download(self, task: dict) -> None:
+        try:
+            self._store_quotations(task['asset'], task['currency'], task['data'])
+        finally:
+            self._tasks_left -= 1
+            self.download_progress.emit(self._tasks_total - self._tasks_left, self._tasks_total)
+            if not self._tasks_left:
+                self._finish_downloads()
+
+    def _finish_downloads(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
+        self._pools = {}
+        self._limiters = {}
+        logging.info(self.tr("Download completed"))
+        self.download_completed.emit()
+
+    @Slot(int, object)
+    def _update_asset_info(self, asset_id: int, details: dict) -> None:
+        JalAsset(asset_id).update_data(details)
 
     def PrepareRussianCBReader(self):
+        import pandas as pd
+
         rows = []
         try:
             xml_root = xml_tree.fromstring(get_web_data("http://www.cbr.ru/scripts/XML_valFull.asp"))
@@ -156,17 +279,22 @@ class QuoteDownloader(QObject):
         self.CBR_codes = pd.DataFrame(rows, columns=["ISO_name", "CBR_code"])
 
     # Empty method to make a unified call for any asset
-    def Dummy_DataReader(self, _asset, _currency_id, _start_timestamp, _end_timestamp):
+    def Dummy_DataReader(self, _asset, _start_timestamp, _end_timestamp):
         return None
 
-    def CBR_DataReader(self, currency, start_timestamp, end_timestamp):
+    def CBR_DataReader(self, currency: str, start_timestamp, end_timestamp):
+        import pandas as pd
+
         date1 = datetime.utcfromtimestamp(start_timestamp).strftime('%d/%m/%Y')
         # add 1 day to end_timestamp as CBR sets rate are a day ahead
         date2 = (datetime.utcfromtimestamp(end_timestamp) + timedelta(days=1)).strftime('%d/%m/%Y')
+        with self._cbr_lock:
+            if self.CBR_codes is None:
+                self.PrepareRussianCBReader()
         try:
-            code = str(self.CBR_codes.loc[self.CBR_codes["ISO_name"] == currency.symbol(), "CBR_code"].values[0]).strip()
+            code = str(self.CBR_codes.loc[self.CBR_codes["ISO_name"] == currency, "CBR_code"].values[0]).strip()
         except IndexError:
-            logging.debug(self.tr("There are no CBR data for: " + f"{currency.symbol()}"))
+            logging.debug(self.tr("There are no CBR data for: " + f"{currency}"))
             return None
         url = f"http://www.cbr.ru/scripts/XML_dynamic.asp?date_req1={date1}&date_req2={date2}&VAL_NM_RQ={code}"
         xml_root = xml_tree.fromstring(get_web_data(url))
@@ -187,14 +315,16 @@ class QuoteDownloader(QObject):
         rates = data.set_index("Date")
         return rates
 
-    def ECB_DataReader(self, currency, start_timestamp, end_timestamp):
+    def ECB_DataReader(self, currency: str, start_timestamp, end_timestamp):
+        import pandas as pd
+
         date1 = datetime.utcfromtimestamp(start_timestamp).strftime('%Y-%m-%d')
         date2 = datetime.utcfromtimestamp(end_timestamp).strftime('%Y-%m-%d')
-        url = f"https://sdw-wsrest.ecb.europa.eu/service/data/EXR/D.{currency.symbol()}.EUR.SP00.A?startPeriod={date1}&endPeriod={date2}"
+        url = f"https://sdw-wsrest.ecb.europa.eu/service/data/EXR/D.{currency}.EUR.SP00.A?startPeriod={date1}&endPeriod={date2}"
         file = StringIO(get_web_data(url, headers={'Accept': 'text/csv'}))
         try:
             data = pd.read_csv(file, dtype={'TIME_PERIOD': str, 'OBS_VALUE': str})
-        except ParserError:
+        except pd.errors.ParserError:
             return None
         data.rename(columns={'TIME_PERIOD': 'Date', 'OBS_VALUE': 'Rate'}, inplace=True)
         data = data[['Date', 'Rate']]  # Keep only required columns
@@ -341,26 +471,28 @@ class QuoteDownloader(QObject):
         return secid
 
     # noinspection PyMethodMayBeStatic
-    def MOEX_DataReader(self, asset, currency_id, start_timestamp, end_timestamp, update_symbol=True):
-        currency = JalAsset(currency_id).symbol()
-        moex_info = self.MOEX_info(symbol=asset.symbol(currency_id), isin=asset.isin(), currency=currency, special=True)
+    def MOEX_DataReader(self, asset: dict, start_timestamp, end_timestamp, update_symbol=True):
+        import pandas as pd
+
+        moex_info = self.MOEX_info(symbol=asset['quote_symbol'], isin=asset['isin'], currency=asset['currency'],
+                                   special=True)
         if not ('engine' in moex_info and 'market' in moex_info and 'board' in moex_info) or \
                 (moex_info['engine'] is None) or (moex_info['market'] is None) or (moex_info['board'] is None):
-            logging.warning(f"Failed to find {asset.symbol()} on moex.com")
+            logging.warning(f"Failed to find {asset['symbol']} on moex.com")
             return None
         if (moex_info['market'] == 'bonds') and (moex_info['board'] == 'TQCB'):
-            asset_code = asset.isin()   # Corporate bonds are quoted by ISIN
+            asset_code = asset['isin']   # Corporate bonds are quoted by ISIN
         elif (moex_info['market'] == 'shares') and (moex_info['board'] == 'TQIF'):
-            asset_code = asset.isin()   # ETFs are quoted by ISIN
+            asset_code = asset['isin']   # ETFs are quoted by ISIN
         else:
-            asset_code = asset.symbol(currency_id)
+            asset_code = asset['quote_symbol']
         if update_symbol:
             isin = moex_info['isin'] if 'isin' in moex_info else ''
             reg_number = moex_info['reg_number'] if 'reg_number' in moex_info else ''
             expiry = moex_info['expiry'] if 'expiry' in moex_info else 0
             principal = moex_info['principal'] if 'principal' in moex_info else 0
             details = {'isin': isin, 'reg_number': reg_number, 'expiry': expiry, 'principal': principal}
-            asset.update_data(details)
+            self._asset_info_loaded.emit(asset['id'], details)   # Asset data is updated in DB by the main thread
 
         # Get price history
         date1 = datetime.utcfromtimestamp(start_timestamp).strftime('%Y-%m-%d')
@@ -385,13 +517,15 @@ class QuoteDownloader(QObject):
         return close
 
     # noinspection PyMethodMayBeStatic
-    def Yahoo_Downloader(self, asset, _currency_id, start_timestamp, end_timestamp, suffix=''):
-        url = f"https://query1.finance.yahoo.com/v7/finance/download/{asset.symbol()+suffix}?" \
+    def Yahoo_Downloader(self, asset: dict, start_timestamp, end_timestamp, suffix=''):
+        import pandas as pd
+
+        url = f"https://query1.finance.yahoo.com/v7/finance/download/{asset['symbol'] + suffix}?" \
               f"period1={start_timestamp}&period2={end_timestamp}&interval=1d&events=history"
         file = StringIO(get_web_data(url))
         try:
             data = pd.read_csv(file, dtype={'Date': str, 'Close': str})
-        except ParserError:
+        except pd.errors.ParserError:
             return None
         data['Date'] = pd.to_datetime(data['Date'], format="%Y-%m-%d")
         data['Close'] = data['Close'].apply(Decimal)
@@ -401,19 +535,21 @@ class QuoteDownloader(QObject):
         return close
 
     # The same as Yahoo_Downloader but it adds ".L" suffix to asset_code and returns prices in GBP
-    def YahooLSE_Downloader(self, asset, currency_id, start_timestamp, end_timestamp):
-        return self.Yahoo_Downloader(asset, currency_id, start_timestamp, end_timestamp, suffix='.L')
+    def YahooLSE_Downloader(self, asset: dict, start_timestamp, end_timestamp):
+        return self.Yahoo_Downloader(asset, start_timestamp, end_timestamp, suffix='.L')
 
     # The same as Yahoo_Downloader but it adds ".F" suffix to asset_code and returns prices in EUR
-    def YahooFRA_Downloader(self, asset, currency_id, start_timestamp, end_timestamp):
-        return self.Yahoo_Downloader(asset, currency_id, start_timestamp, end_timestamp, suffix='.F')
+    def YahooFRA_Downloader(self, asset: dict, start_timestamp, end_timestamp):
+        return self.Yahoo_Downloader(asset, start_timestamp, end_timestamp, suffix='.F')
 
     # noinspection PyMethodMayBeStatic
-    def Euronext_DataReader(self, asset, currency_id, start_timestamp, end_timestamp):
+    def Euronext_DataReader(self, asset: dict, start_timestamp, end_timestamp):
+        import pandas as pd
+
         params = {'format': 'csv', 'decimal_separator': '.', 'date_form': 'd/m/Y', 'op': '', 'adjusted': '',
                   'base100': '', 'startdate': datetime.utcfromtimestamp(start_timestamp).strftime('%Y-%m-%d'),
                   'enddate': datetime.utcfromtimestamp(end_timestamp).strftime('%Y-%m-%d')}
-        url = f"https://live.euronext.com/en/ajax/AwlHistoricalPrice/getFullDownloadAjax/{asset.isin()}-XPAR"
+        url = f"https://live.euronext.com/en/ajax/AwlHistoricalPrice/getFullDownloadAjax/{asset['isin']}-XPAR"
         quotes = post_web_data(url, params=params)
         quotes_text = quotes.replace(u'\ufeff', '').splitlines()    # Remove BOM from the beginning
         if len(quotes_text) < 4:
@@ -422,13 +558,13 @@ class QuoteDownloader(QObject):
         if quotes_text[0] != '"Historical Data"':
             logging.warning(self.tr("Euronext quotes header not found in: ") + quotes)
             return None
-        if quotes_text[2] != asset.isin():
+        if quotes_text[2] != asset['isin']:
             logging.warning(self.tr("Euronext quotes ISIN mismatch in: ") + quotes)
             return None
         file = StringIO(quotes)
         try:
             data = pd.read_csv(file, header=3, sep=';', dtype={'Date': str, 'Close': str})
-        except ParserError:
+        except pd.errors.ParserError:
             return None
         data['Date'] = pd.to_datetime(data['Date'], format="%d/%m/%Y")
         data['Close'] = data['Close'].apply(Decimal)
@@ -440,13 +576,15 @@ class QuoteDownloader(QObject):
         return close
 
     # noinspection PyMethodMayBeStatic
-    def TMX_Downloader(self, asset, _currency_id, start_timestamp, end_timestamp):
+    def TMX_Downloader(self, asset: dict, start_timestamp, end_timestamp):
+        import pandas as pd
+
         url = 'https://app-money.tmx.com/graphql'
         params = {
             "operationName": "getCompanyPriceHistoryForDownload",
             "variables":
                 {
-                    "symbol": asset.symbol(),
+                    "symbol": asset['symbol'],
                     "start": datetime.utcfromtimestamp(start_timestamp).strftime('%Y-%m-%d'),
                     "end": datetime.utcfromtimestamp(end_timestamp).strftime('%Y-%m-%d'),
                     "adjusted": False,
@@ -1,7 +1,7 @@
-import requests
-from requests.exceptions import ConnectTimeout, ConnectionError
 import logging
 import platform
+import threading
+from urllib.parse import urlparse
 from PySide6.QtWidgets import QApplication
 from jal import __version__
 
@@ -26,23 +26,47 @@ def isEnglish(text):
         return True
 
 
+# ===================================================================================================================
+# Sessions are kept per host in order to re-use keep-alive connections for subsequent requests to the same site.
+# Connection pool of every session is big enough to serve simultaneous requests from several download threads.
+SESSION_POOL_SIZE = 8
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+# Returns a session that should be used for requests to given url
+def get_session(url) -> 'requests.Session':
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        if host not in _sessions:
+            session = requests.Session()
+            session.headers['User-Agent'] = make_user_agent(url=url)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SESSION_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return _sessions[host]
+
+
 # ===================================================================================================================
 # Retrieve URL from web with given method and params
 def request_url(method, url, params=None, json_params=None, headers=None):
-    session = requests.Session()
-    session.headers['User-Agent'] = make_user_agent(url=url)
-    if headers is not None:
-        session.headers.update(headers)
+    from requests.exceptions import ConnectTimeout, ConnectionError
+
+    session = get_session(url)
     try:
         if method == "GET":
-            response = session.get(url)
+            response = session.get(url, headers=headers)
         elif method == "POST":
             if params:
-                response = session.post(url, data=params)
+                response = session.post(url, data=params, headers=headers)
             elif json_params:
-                response = session.post(url, json=json_params)
+                response = session.post(url, json=json_params, headers=headers)
             else:
-                response = session.post(url)
+                response = session.post(url, headers=headers)
         else:
             raise ValueError("Unknown download method for URL")
     except ConnectTimeout:
@@ -53,6 +53,9 @@ class CategoryReportWindow(MdiWidget):
             self.ui.ReportCategoryEdit.selected_id = settings['category_id']
             self.onCategoryChange()
 
+    def refresh(self):
+        self.category_model.invalidate()
+
     def connect_signals_and_slots(self):
         self.ui.ReportRange.changed.connect(self.ui.ReportTableView.model().setDateRange)
         self.ui.ReportCategoryEdit.changed.connect(self.onCategoryChange)
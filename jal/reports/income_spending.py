@@ -1,4 +1,5 @@
 from functools import partial
+from bisect import bisect_right
 from datetime import datetime
 from PySide6.QtCore import Qt, Slot, QObject, QAbstractItemModel, QModelIndex
 from PySide6.QtGui import QAction, QBrush
@@ -352,22 +353,39 @@ class IncomeSpendingReportModel(QAbstractItemModel):
             assert False, "Wrong period for Income/Spending report"
         self._root = ReportTreeItem(self._begin, self._end, -1, "ROOT", periods=self._periodicity)  # invisible root
         self._root.appendChild(ReportTreeItem(self._begin, self._end, 0, self.tr("TOTAL"), periods=self._periodicity))  # visible root
-        self._load_child_amounts(root_category)
+        self._load_child_amounts(root_category, self._period_amounts())
         self._root.removeEmptyChildren()
         self.modelReset.emit()
         self._view.expandAll()
 
-    def _load_child_amounts(self, parent_category: JalCategory):
+    # Returns a dict {category_id: {(year, period_number): amount}} with turnovers of all categories for every period
+    # from self._period_list. Ledger records are loaded once and every one is added to all periods that contain it.
+    def _period_amounts(self) -> dict:
+        amounts = {}
+        if not self._period_list:
+            return amounts
+        begins = [x['begin_ts'] for x in self._period_list]
+        turnovers = JalCategory.get_turnovers(self._period_list[0]['begin_ts'], self._period_list[-1]['end_ts'],
+                                              self._currency)
+        for category_id, timestamp, amount in turnovers:
+            category_amounts = amounts.setdefault(category_id, {})
+            i = bisect_right(begins, timestamp) - 1
+            while i >= 0 and self._period_list[i]['end_ts'] >= timestamp:  # periods may overlap at their bounds
+                key = (self._period_list[i]['year'], self._period_list[i]['number'])
+                category_amounts[key] = category_amounts.get(key, 0) + amount
+                i -= 1
+        return amounts
+
+    def _load_child_amounts(self, parent_category: JalCategory, amounts: dict):
         for category in parent_category.get_child_categories():
             leaf = self._root.getLeafById(category.id())
             if leaf is None:
                 parent = self._root.getLeafById(category.parent_id())
                 leaf = ReportTreeItem(self._begin, self._end, category.id(), category.name(), parent=parent)
                 parent.appendChild(leaf)
-            for period in self._period_list:
-                leaf.addAmount(period['year'], period['number'],
-                               category.get_turnover(period['begin_ts'], period['end_ts'], self._currency))
-            self._load_child_amounts(category)
+            for (year, number), amount in amounts.get(category.id(), {}).items():
+                leaf.addAmount(year, number, amount)
+            self._load_child_amounts(category, amounts)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
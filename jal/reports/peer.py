@@ -53,6 +53,9 @@ class PeerReportWindow(MdiWidget):
             self.ui.ReportPeerEdit.selected_id = settings['peer_id']
             self.onPeerChange()
 
+    def refresh(self):
+        self.peer_model.invalidate()
+
     def connect_signals_and_slots(self):
         self.ui.ReportRange.changed.connect(self.ui.ReportTableView.model().setDateRange)
         self.ui.ReportPeerEdit.changed.connect(self.onPeerChange)
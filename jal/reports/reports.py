@@ -7,6 +7,7 @@ from PySide6.QtCore import QObject
 from jal.constants import Setup
 from jal.db.helpers import get_app_path
 from jal.db.settings import JalSettings, FolderFor
+from jal.widgets.helpers import plugin_metadata
 from jal.data_export.xlsx import XLSX
 
 
@@ -22,33 +23,54 @@ class Reports(QObject):
     def mdi_area(self):
         return self._mdi
 
+    # Report modules aren't imported here - their metadata are read from source files and module is imported on the
+    # first use. Module is imported immediately only if its metadata can't be read without import
     def loadReportsList(self):
         reports_folder = get_app_path() + Setup.REPORT_PATH
         report_modules = [filename[:-3] for filename in os.listdir(reports_folder) if filename.endswith(".py")]
         for module_name in report_modules:
-            logging.debug(f"Trying to load report module: {module_name}")
-            module = importlib.import_module(f"jal.reports.{module_name}")
-            try:
-                report_class_name = getattr(module, "JAL_REPORT_CLASS")
-            except AttributeError:
+            logging.debug(f"Reading metadata of report module: {module_name}")
+            metadata = plugin_metadata(reports_folder + os.sep + module_name + ".py", "JAL_REPORT_CLASS",
+                                       ['group', 'name', 'window_class'])
+            if metadata is None:
                 continue
-            try:
-                class_instance = getattr(module, report_class_name)
-            except AttributeError:
-                logging.error(self.tr("Report class can't be loaded: ") + report_class_name)
-                continue
-            report = class_instance()
-            group = report.group if hasattr(report, "group") else ''
-            self.items.append({'group': group, 'name': report.name,
-                               'module': module, 'window_class': report.window_class})
-            logging.debug(f"Report class '{report_class_name}' providing '{report.name}' report has been loaded")
+            if 'name' in metadata and 'window_class' in metadata:
+                self.items.append({'group': metadata.get('group', ''), 'name': metadata['name'],
+                                   'module': None, 'module_name': module_name,
+                                   'window_class': metadata['window_class']})
+            else:
+                self.loadReportModule(module_name)
         self.items = sorted(self.items, key=lambda item: item['name'])
 
+    # Imports report module and adds its description into self.items list
+    def loadReportModule(self, module_name):
+        logging.debug(f"Trying to load report module: {module_name}")
+        module = importlib.import_module(f"jal.reports.{module_name}")
+        try:
+            report_class_name = getattr(module, "JAL_REPORT_CLASS")
+        except AttributeError:
+            return
+        try:
+            class_instance = getattr(module, report_class_name)
+        except AttributeError:
+            logging.error(self.tr("Report class can't be loaded: ") + report_class_name)
+            return
+        report = class_instance()
+        group = report.group if hasattr(report, "group") else ''
+        self.items.append({'group': group, 'name': report.name, 'module': module, 'module_name': module_name,
+                           'window_class': report.window_class})
+        logging.debug(f"Report class '{report_class_name}' providing '{report.name}' report has been loaded")
+
+    # Returns report window class from module that is imported if it wasn't done before
+    def windowClass(self, report_loader):
+        if report_loader['module'] is None:
+            report_loader['module'] = importlib.import_module(f"jal.reports.{report_loader['module_name']}")
+        return getattr(report_loader['module'], report_loader['window_class'])
+
     # method is called directly from menu, so it contains QAction that was triggered
     def show(self, action):
         report_loader = self.items[action.data()]
-        module = report_loader['module']
-        class_instance = getattr(module, report_loader['window_class'])
+        class_instance = self.windowClass(report_loader)
         report = class_instance(self)
         self._mdi.addSubWindow(report, maximized=True)
 
@@ -58,8 +80,7 @@ class Reports(QObject):
             logging.warning(self.tr("Report not found for window class: ") + window_class)
             return
         report_loader = report[0]
-        module = report_loader['module']
-        class_instance = getattr(module, report_loader['window_class'])
+        class_instance = self.windowClass(report_loader)
         report = class_instance(self, settings)
         self._mdi.addSubWindow(report, maximized=maximized)
 
@@ -53,6 +53,9 @@ class TagReportWindow(MdiWidget):
             self.ui.ReportTagEdit.selected_id = settings['tag_id']
             self.onTagChange()
 
+    def refresh(self):
+        self.tag_model.invalidate()
+
     def connect_signals_and_slots(self):
         self.ui.ReportRange.changed.connect(self.ui.ReportTableView.model().setDateRange)
         self.ui.ReportTagEdit.changed.connect(self.onTagChange)
@@ -276,6 +276,11 @@ class Ui_ImportSlipDlg(object):
 
         self.gridLayout.addWidget(self.LinesTableView, 4, 1, 1, 4)
 
+        self.RecognizerCombo = QComboBox(self.SlipGroup)
+        self.RecognizerCombo.setObjectName(u"RecognizerCombo")
+
+        self.gridLayout.addWidget(self.RecognizerCombo, 1, 4, 1, 1)
+
         self.AssignCategoryBtn = QPushButton(self.SlipGroup)
         self.AssignCategoryBtn.setObjectName(u"AssignCategoryBtn")
 
@@ -352,6 +357,9 @@ class Ui_ImportSlipDlg(object):
         self.PeerLbl.setText(QCoreApplication.translate("ImportSlipDlg", u"Peer:", None))
         self.LinesLbl.setText(QCoreApplication.translate("ImportSlipDlg", u"Lines:", None))
         self.AccountLbl.setText(QCoreApplication.translate("ImportSlipDlg", u"Account:", None))
+#if QT_CONFIG(tooltip)
+        self.RecognizerCombo.setToolTip(QCoreApplication.translate("ImportSlipDlg", u"Method of categories recognition", None))
+#endif // QT_CONFIG(tooltip)
         self.AssignCategoryBtn.setText(QCoreApplication.translate("ImportSlipDlg", u"Auto-assign categories", None))
         self.AssignTagBtn.setText(QCoreApplication.translate("ImportSlipDlg", u"Set Tag for all lines", None))
         self.ClearBtn.setText(QCoreApplication.translate("ImportSlipDlg", u"Clear", None))
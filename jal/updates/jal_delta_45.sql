@@ -0,0 +1,281 @@
+BEGIN TRANSACTION;
+--------------------------------------------------------------------------------
+PRAGMA foreign_keys = 0;
+--------------------------------------------------------------------------------
+-- Ledger invalidation is tracked per account/asset instead of global timestamp
+-- Table: ledger_dirty to keep the earliest timestamp since which ledger isn't valid for [account, asset]
+DROP TABLE IF EXISTS ledger_dirty;
+CREATE TABLE ledger_dirty (
+    id           INTEGER PRIMARY KEY UNIQUE NOT NULL,
+    account_id   INTEGER NOT NULL,
+    asset_id     INTEGER NOT NULL,
+    timestamp    INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS ledger_dirty_by_account_asset;
+CREATE UNIQUE INDEX ledger_dirty_by_account_asset ON ledger_dirty (account_id, asset_id);
+
+-- View: ledger_invalidation (insertion only - it marks ledger as invalid for account/asset since given timestamp)
+DROP VIEW IF EXISTS ledger_invalidation;
+CREATE VIEW ledger_invalidation AS SELECT account_id, asset_id, timestamp FROM ledger_dirty;
+
+-- Keeps the earliest invalid timestamp for account/asset and removes invalid ledger records of the account
+DROP TRIGGER IF EXISTS on_ledger_invalidation;
+CREATE TRIGGER on_ledger_invalidation
+    INSTEAD OF INSERT ON ledger_invalidation FOR EACH ROW WHEN NEW.account_id IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO ledger_dirty (account_id, asset_id, timestamp)
+    SELECT a.id, coalesce(NEW.asset_id, a.currency_id), min(NEW.timestamp, coalesce(d.timestamp, NEW.timestamp))
+    FROM accounts a
+    LEFT JOIN ledger_dirty d ON d.account_id = a.id AND d.asset_id = coalesce(NEW.asset_id, a.currency_id)
+    WHERE a.id = NEW.account_id;
+    DELETE FROM ledger WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+    DELETE FROM trades_opened WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+END;
+
+-- Trigger: action_details_after_delete
+DROP TRIGGER IF EXISTS action_details_after_delete;
+CREATE TRIGGER action_details_after_delete
+      AFTER DELETE ON action_details
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NULL, timestamp FROM actions WHERE id = OLD.pid;
+END;
+
+-- Trigger: action_details_after_insert
+DROP TRIGGER IF EXISTS action_details_after_insert;
+CREATE TRIGGER action_details_after_insert
+      AFTER INSERT ON action_details
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NULL, timestamp FROM actions WHERE id = NEW.pid;
+END;
+
+-- Trigger: action_details_after_update
+DROP TRIGGER IF EXISTS action_details_after_update;
+CREATE TRIGGER action_details_after_update
+      AFTER UPDATE ON action_details
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NULL, timestamp FROM actions WHERE id = OLD.pid;
+END;
+
+-- Trigger: actions_after_delete
+DROP TRIGGER IF EXISTS actions_after_delete;
+CREATE TRIGGER actions_after_delete
+      AFTER DELETE ON actions
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    DELETE FROM action_details WHERE pid = OLD.id;
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (OLD.account_id, NULL, OLD.timestamp);
+END;
+
+-- Trigger: actions_after_insert
+DROP TRIGGER IF EXISTS actions_after_insert;
+CREATE TRIGGER actions_after_insert
+      AFTER INSERT ON actions
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (NEW.account_id, NULL, NEW.timestamp);
+END;
+
+-- Trigger: actions_after_update
+DROP TRIGGER IF EXISTS actions_after_update;
+CREATE TRIGGER actions_after_update
+      AFTER UPDATE OF timestamp, account_id, peer_id ON actions
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (OLD.account_id, NULL, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp) VALUES (NEW.account_id, NULL, NEW.timestamp);
+END;
+
+-- Trigger: dividends_after_delete
+DROP TRIGGER IF EXISTS dividends_after_delete;
+CREATE TRIGGER dividends_after_delete
+      AFTER DELETE ON dividends
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+END;
+
+-- Trigger: dividends_after_insert
+DROP TRIGGER IF EXISTS dividends_after_insert;
+CREATE TRIGGER dividends_after_insert
+      AFTER INSERT ON dividends
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
+END;
+
+-- Trigger: dividends_after_update
+DROP TRIGGER IF EXISTS dividends_after_update;
+CREATE TRIGGER dividends_after_update
+      AFTER UPDATE OF timestamp, account_id, asset_id, amount, tax ON dividends
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS trades_after_delete;
+CREATE TRIGGER trades_after_delete
+         AFTER DELETE ON trades
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS trades_after_insert;
+CREATE TRIGGER trades_after_insert
+      AFTER INSERT ON trades
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS trades_after_update;
+CREATE TRIGGER trades_after_update
+      AFTER UPDATE OF timestamp, account_id, asset_id, qty, price, fee ON trades
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS asset_action_after_delete;
+CREATE TRIGGER asset_action_after_delete
+      AFTER DELETE ON asset_actions
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS asset_action_after_insert;
+CREATE TRIGGER asset_action_after_insert
+      AFTER INSERT ON asset_actions
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS asset_action_after_update;
+CREATE TRIGGER asset_action_after_update
+      AFTER UPDATE OF timestamp, account_id, type, asset_id, qty ON asset_actions
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.account_id, OLD.asset_id, OLD.timestamp);
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.account_id, NEW.asset_id, NEW.timestamp);
+END;
+
+DROP TRIGGER IF EXISTS asset_result_after_delete;
+CREATE TRIGGER asset_result_after_delete
+      AFTER DELETE ON action_results
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, OLD.asset_id, timestamp FROM asset_actions WHERE id = OLD.action_id;
+END;
+
+DROP TRIGGER IF EXISTS asset_result_after_insert;
+CREATE TRIGGER asset_result_after_insert
+      AFTER INSERT ON action_results
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, NEW.asset_id, timestamp FROM asset_actions WHERE id = NEW.action_id;
+END;
+
+DROP TRIGGER IF EXISTS asset_result_after_update;
+CREATE TRIGGER asset_result_after_update
+      AFTER UPDATE OF asset_id, qty, value_share ON action_results
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    SELECT account_id, OLD.asset_id, timestamp FROM asset_actions WHERE id = OLD.action_id;
+END;
+
+DROP TRIGGER IF EXISTS transfers_after_delete;
+CREATE TRIGGER transfers_after_delete
+      AFTER DELETE ON transfers
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.withdrawal_account, OLD.asset, OLD.withdrawal_timestamp),
+           (OLD.deposit_account, OLD.asset, OLD.deposit_timestamp),
+           (OLD.fee_account, NULL, OLD.withdrawal_timestamp);
+END;
+
+DROP TRIGGER IF EXISTS transfers_after_insert;
+CREATE TRIGGER transfers_after_insert
+      AFTER INSERT ON transfers
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (NEW.withdrawal_account, NEW.asset, NEW.withdrawal_timestamp),
+           (NEW.deposit_account, NEW.asset, NEW.deposit_timestamp),
+           (NEW.fee_account, NULL, NEW.withdrawal_timestamp);
+END;
+
+DROP TRIGGER IF EXISTS transfers_after_update;
+CREATE TRIGGER transfers_after_update
+      AFTER UPDATE OF withdrawal_timestamp, deposit_timestamp, withdrawal_account, deposit_account, fee_account,
+                      withdrawal, deposit, fee, asset ON transfers
+      FOR EACH ROW
+      WHEN (SELECT value FROM settings WHERE id = 1)
+BEGIN
+    INSERT INTO ledger_invalidation (account_id, asset_id, timestamp)
+    VALUES (OLD.withdrawal_account, OLD.asset, OLD.withdrawal_timestamp),
+           (OLD.deposit_account, OLD.asset, OLD.deposit_timestamp),
+           (OLD.fee_account, NULL, OLD.withdrawal_timestamp),
+           (NEW.withdrawal_account, NEW.asset, NEW.withdrawal_timestamp),
+           (NEW.deposit_account, NEW.asset, NEW.deposit_timestamp),
+           (NEW.fee_account, NULL, NEW.withdrawal_timestamp);
+END;
+
+--------------------------------------------------------------------------------
+-- Mark ledger as invalid for accounts that have operations after current ledger frontier
+INSERT INTO ledger_dirty (account_id, asset_id, timestamp)
+SELECT o.account_id, a.currency_id, MIN(o.timestamp) FROM operation_sequence o
+LEFT JOIN accounts a ON a.id = o.account_id
+WHERE o.timestamp >= coalesce((SELECT ledger_frontier FROM frontier), 0) AND NOT o.account_id IS NULL
+GROUP BY o.account_id;
+--------------------------------------------------------------------------------
+PRAGMA foreign_keys = 1;
+--------------------------------------------------------------------------------
+-- Set new DB schema version
+UPDATE settings SET value=45 WHERE name='SchemaVersion';
+COMMIT;
@@ -0,0 +1,21 @@
+BEGIN TRANSACTION;
+--------------------------------------------------------------------------------
+PRAGMA foreign_keys = 0;
+--------------------------------------------------------------------------------
+-- Indices for 'ledger' table that match queries for amounts, turnovers, operation filters and ledger re-build
+DROP INDEX IF EXISTS ledger_by_account_asset_book;
+CREATE INDEX ledger_by_account_asset_book ON ledger (account_id, asset_id, book_account, id);
+DROP INDEX IF EXISTS ledger_by_timestamp;
+CREATE INDEX ledger_by_timestamp ON ledger (timestamp);
+DROP INDEX IF EXISTS ledger_by_category;
+CREATE INDEX ledger_by_category ON ledger (category_id, timestamp);
+DROP INDEX IF EXISTS ledger_by_peer;
+CREATE INDEX ledger_by_peer ON ledger (peer_id, timestamp);
+DROP INDEX IF EXISTS ledger_by_operation;
+CREATE INDEX ledger_by_operation ON ledger (op_type, operation_id, book_account);
+--------------------------------------------------------------------------------
+PRAGMA foreign_keys = 1;
+--------------------------------------------------------------------------------
+-- Set new DB schema version
+UPDATE settings SET value=46 WHERE name='SchemaVersion';
+COMMIT;
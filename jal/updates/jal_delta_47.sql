@@ -0,0 +1,38 @@
+BEGIN TRANSACTION;
+--------------------------------------------------------------------------------
+PRAGMA foreign_keys = 0;
+--------------------------------------------------------------------------------
+-- Table: ledger_snapshots to keep id of the last ledger record for every [account, asset, book] at the end of month
+-- (it is filled by ledger re-build, balances are calculated from ledger directly while it is empty)
+DROP TABLE IF EXISTS ledger_snapshots;
+CREATE TABLE ledger_snapshots (
+    id           INTEGER PRIMARY KEY UNIQUE NOT NULL,
+    timestamp    INTEGER NOT NULL,
+    account_id   INTEGER NOT NULL,
+    asset_id     INTEGER,
+    book_account INTEGER NOT NULL,
+    ledger_id    INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS ledger_snapshots_by_account;
+CREATE INDEX ledger_snapshots_by_account ON ledger_snapshots (account_id, timestamp);
+-- Trigger: on_ledger_invalidation keeps the earliest invalid timestamp for account/asset and removes invalid ledger
+-- records and snapshots of the account (stale snapshots would point to deleted ledger records)
+DROP TRIGGER IF EXISTS on_ledger_invalidation;
+CREATE TRIGGER on_ledger_invalidation
+    INSTEAD OF INSERT ON ledger_invalidation FOR EACH ROW WHEN NEW.account_id IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO ledger_dirty (account_id, asset_id, timestamp)
+    SELECT a.id, coalesce(NEW.asset_id, a.currency_id), min(NEW.timestamp, coalesce(d.timestamp, NEW.timestamp))
+    FROM accounts a
+    LEFT JOIN ledger_dirty d ON d.account_id = a.id AND d.asset_id = coalesce(NEW.asset_id, a.currency_id)
+    WHERE a.id = NEW.account_id;
+    DELETE FROM ledger WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+    DELETE FROM ledger_snapshots WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+    DELETE FROM trades_opened WHERE account_id = NEW.account_id AND timestamp >= NEW.timestamp;
+END;
+--------------------------------------------------------------------------------
+PRAGMA foreign_keys = 1;
+--------------------------------------------------------------------------------
+-- Set new DB schema version
+UPDATE settings SET value=47 WHERE name='SchemaVersion';
+COMMIT;
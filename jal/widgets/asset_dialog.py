@@ -7,6 +7,7 @@ from PySide6.QtWidgets import QDialog, QDataWidgetMapper, QStyledItemDelegate, Q
 from jal.ui.ui_asset_dlg import Ui_AssetDialog
 from jal.constants import PredefinedAsset, AssetData
 from jal.db.helpers import load_icon, localize_decimal
+from jal.db.asset import JalAsset
 from jal.widgets.delegates import DateTimeEditWithReset, BoolDelegate
 from jal.db.reference_models import AbstractReferenceListModel
 
@@ -108,6 +109,7 @@ class AssetDialog(QDialog):
             logging.fatal(e)
             return
         self._asset_id = asset_id
+        JalAsset(asset_id).reload_data()   # Keep cached asset data in line with changes that were made via models
         super().accept()
 
     def reject(self) -> None:
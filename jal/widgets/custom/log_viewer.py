@@ -1,22 +1,31 @@
 import os
+import json
 import logging
 from jal.constants import CustomColor
+from jal.db.db import JalDB
 from jal.db.helpers import load_icon
-from PySide6.QtCore import Qt, Slot
-from PySide6.QtWidgets import QApplication, QPlainTextEdit, QLabel, QPushButton
+from PySide6.QtCore import Qt, Slot, Signal, QObject, QAbstractEventDispatcher
+from PySide6.QtWidgets import QApplication, QPlainTextEdit, QLabel, QPushButton, QFileDialog
 from PySide6.QtGui import QBrush, QAction
 
 
+# Helper class that delivers log messages to the view via Qt signal. It allows to log messages from any thread
+# as signal is queued to GUI thread if message comes from another thread.
+class LogSignal(QObject):
+    message = Signal(int, str)
+
+
 # Adapter class to have custom log handler that may be passed to logger.addHandler/logger.removeHandler methods and
 # then forward all messages parent view to display them
 class LogHandler(logging.Handler):
     def __init__(self, parent_view):
-        self._parent_view = parent_view
+        self._signal = LogSignal()
+        self._signal.message.connect(parent_view.displayMessage)
         super().__init__()
 
     def emit(self, record, **kwargs):
         message = self.format(record)
-        self._parent_view.displayMessage(record.levelno, message)
+        self._signal.message.emit(record.levelno, message)
 
 
 # A GUI class to display messages from python logging unit in a normal multi-line text area
@@ -38,6 +47,15 @@ class LogViewer(QPlainTextEdit):
         self.addAction(load_icon("copy.png"), self.tr('Copy'), self._copy2clipboard)
         self.addAction(self.tr('Select all'), self.selectAll)
         self.addAction(load_icon("delete.png"), self.tr('Clear'), self.clear)
+        separator = QAction(self)
+        separator.setSeparator(True)
+        self.addAction(separator)
+        self.sql_stats_action = self.addAction(self.tr('Collect SQL statistics'), self.enableSqlStats)
+        self.sql_stats_action.setCheckable(True)
+        self.sql_report_action = self.addAction(self.tr('Show SQL statistics'), self.showSqlStats)
+        self.sql_export_action = self.addAction(self.tr('Save SQL statistics...'), self.saveSqlStats)
+        self.sql_report_action.setEnabled(False)
+        self.sql_export_action.setEnabled(False)
 
     def _copy2clipboard(self):
         cursor = self.textCursor()
@@ -50,11 +68,53 @@ class LogViewer(QPlainTextEdit):
         log_level = os.environ.get('LOGLEVEL', 'INFO').upper()
         self._logger.setLevel(log_level)
         self._log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        if os.environ.get('SQL_STATS', '0') == '1':
+            self.sql_stats_action.setChecked(True)
+            self.enableSqlStats()
 
     def stopLogging(self):
+        if self.sql_stats_action.isChecked():
+            self.sql_stats_action.setChecked(False)
+            self.enableSqlStats()
         self._logger.removeHandler(self._log_handler)    # Removing handler (but it doesn't prevent exception at exit)
         logging.raiseExceptions = False                  # Silencing logging module exceptions
 
+    # Starts or stops collection of SQL statistics depending on menu action state. User action is considered to be
+    # finished every time when application becomes idle and waits for new events
+    @Slot()
+    def enableSqlStats(self):
+        enable = self.sql_stats_action.isChecked()
+        if enable == (JalDB.query_stats() is not None):
+            return
+        JalDB.enable_query_stats(enable)
+        dispatcher = QAbstractEventDispatcher.instance()
+        if dispatcher is not None:
+            if enable:
+                dispatcher.aboutToBlock.connect(JalDB.finish_query_action)
+            else:
+                dispatcher.aboutToBlock.disconnect(JalDB.finish_query_action)
+        self.sql_report_action.setEnabled(enable)
+        self.sql_export_action.setEnabled(enable)
+
+    @Slot()
+    def showSqlStats(self):
+        if JalDB.query_stats() is not None:
+            self.displayMessage(logging.INFO, JalDB.query_stats().report())
+
+    @Slot()
+    def saveSqlStats(self):
+        if JalDB.query_stats() is None:
+            return
+        filename, _filter = QFileDialog.getSaveFileName(self, self.tr("Save SQL statistics"), ".",
+                                                        self.tr("JSON files (*.json)"))
+        if not filename:
+            return
+        try:
+            with open(filename, 'w', encoding='utf-8') as stats_file:
+                json.dump(JalDB.query_stats().summary(), stats_file, indent=2)
+        except OSError as e:
+            logging.error(self.tr("Failed to save SQL statistics: ") + str(e))
+
     def displayMessage(self, level: int, message: str):
         predefinded_colors = {
             logging.DEBUG: CustomColor.Grey,
@@ -1,3 +1,4 @@
+import ast
 import logging
 from datetime import time, datetime, timedelta, timezone
 from PySide6.QtGui import QImage
@@ -19,6 +20,43 @@ def dependency_present(module_list: list) -> bool:
             result = False
     return result
 
+# -----------------------------------------------------------------------------------------------------------------------
+# Reads metadata of plugin module (statement loader or report) without module import. Name of plugin class is taken from
+# module variable 'class_variable'. Then 'attributes' of the class are taken from its constructor if they are assigned
+# with string constants like self.name = "Name" or self.name = self.tr("Name"). Strings are translated with class name as
+# a context. Returns a dictionary {'class': class name, attribute: value} where attributes without constant value are
+# omitted, or None if module doesn't declare a plugin class
+def plugin_metadata(filename: str, class_variable: str, attributes: list):
+    with open(filename, 'r', encoding='utf-8') as module_file:
+        module = ast.parse(module_file.read(), filename)
+    class_name = None
+    for node in module.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and \
+                any(isinstance(x, ast.Name) and x.id == class_variable for x in node.targets):
+            class_name = node.value.value
+    if class_name is None:
+        return None
+    metadata = {'class': class_name}
+    classes = [x for x in module.body if isinstance(x, ast.ClassDef) and x.name == class_name]
+    constructors = [x for c in classes for x in c.body if isinstance(x, ast.FunctionDef) and x.name == '__init__']
+    for constructor in constructors:
+        for node in ast.walk(constructor):
+            if not isinstance(node, ast.Assign):
+                continue
+            value = node.value
+            if isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute) and value.func.attr == 'tr' \
+                    and len(value.args) == 1 and isinstance(value.args[0], ast.Constant):
+                value = QApplication.translate(class_name, value.args[0].value)
+            elif isinstance(value, ast.Constant) and isinstance(value.value, str):
+                value = value.value
+            else:
+                continue
+            for target in node.targets:
+                if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) \
+                        and target.value.id == 'self' and target.attr in attributes:
+                    metadata[target.attr] = value
+    return metadata
+
 # -----------------------------------------------------------------------------------------------------------------------
 # Check if given signal of an object is connected or not
 def is_signal_connected(object, signal_name) -> bool:
@@ -8,7 +8,7 @@ from functools import partial
 
 from PySide6.QtCore import Qt, Slot, QDir, QLocale, QMetaObject
 from PySide6.QtGui import QIcon, QActionGroup, QAction
-from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox, QProgressBar, QMenu
+from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox, QProgressBar, QMenu, QPushButton
 
 from jal import __version__
 from jal.ui.ui_main_window import Ui_JAL_MainWindow
@@ -27,7 +27,6 @@ from jal.net.downloader import QuoteDownloader
 from jal.db.ledger import Ledger
 from jal.data_import.statements import Statements
 from jal.reports.reports import Reports
-from jal.data_import.slips import ImportSlipDialog
 
 
 #-----------------------------------------------------------------------------------------------------------------------
@@ -46,6 +45,9 @@ class MainWindow(QMainWindow):
         self.ProgressBar = QProgressBar(self)
         self.ui.StatusBar.addPermanentWidget(self.ProgressBar)
         self.ProgressBar.setVisible(False)
+        self.CancelButton = QPushButton(self.tr("Cancel"), self)
+        self.ui.StatusBar.addPermanentWidget(self.CancelButton)
+        self.CancelButton.setVisible(False)
         self.ledger.setProgressBar(self, self.ProgressBar)
         self.ui.Logs.setStatusBar(self.ui.StatusBar)
         self.ui.Logs.startLogging()
@@ -102,7 +104,9 @@ class MainWindow(QMainWindow):
         self.ui.PrepareTaxForms.triggered.connect(partial(TaxWidget.showInMDI, self.ui.mdiArea))
         self.ui.PrepareFlowReport.triggered.connect(partial(MoneyFlowWidget.showInMDI, self.ui.mdiArea))
         self.downloader.download_completed.connect(self.updateWidgets)
+        self.downloader.download_progress.connect(self.onDownloadProgress)
         self.ledger.updated.connect(self.updateWidgets)
+        self.CancelButton.clicked.connect(self.ledger.cancel)
         self.statements.load_completed.connect(self.onStatementImport)
 
     @Slot()
@@ -129,10 +133,11 @@ class MainWindow(QMainWindow):
         if JalSettings().getValue('RebuildDB', 0) == 1:
             if QMessageBox().warning(self, self.tr("Confirmation"), self.tr("Ledger isn't complete. Rebuild it now?"),
                                      QMessageBox.Yes, QMessageBox.No) == QMessageBox.Yes:
-                self.ledger.rebuild()
+                self.ledger.rebuild_in_background()
 
     @Slot()
     def closeEvent(self, event):
+        self.ledger.stop()
         JalSettings().setValue('WindowGeometry', base64.encodebytes(self.saveGeometry().data()).decode('utf-8'))
         JalSettings().setValue('WindowState', base64.encodebytes(self.saveState().data()).decode('utf-8'))
         self.ui.Logs.stopLogging()
@@ -211,6 +216,7 @@ class MainWindow(QMainWindow):
     def createOperationsWindow(self):
         operations_window = self.ui.mdiArea.addSubWindow(OperationsWidget(self), maximized=True)
         operations_window.widget().dbUpdated.connect(self.ledger.rebuild)
+        operations_window.widget().setReadOnly(self.ledger.is_running())
 
     @Slot()
     def showAboutWindow(self):
@@ -229,13 +235,36 @@ class MainWindow(QMainWindow):
         about_box.setInformativeText(about_text)
         about_box.show()
 
-    def showProgressBar(self, visible=False):
+    # Shows progress bar and blocks UI. If operation is done in background then central widget stays available for
+    # data browsing only (all windows are put into read-only mode) and operation may be cancelled by the button
+    def showProgressBar(self, visible=False, background=False):
         self.ProgressBar.setVisible(visible)
-        self.ui.centralwidget.setEnabled(not visible)
+        self.CancelButton.setVisible(visible and background)
+        self.ui.centralwidget.setEnabled(not visible or background)
         self.ui.MainMenu.setEnabled(not visible)
+        for action in self.write_actions():   # Actions are available via shortcuts even if menu is disabled
+            action.setEnabled(not visible)
+        for window in self.ui.mdiArea.subWindowList():
+            window.widget().setReadOnly(visible and background)
+
+    # Returns actions that modify database and shouldn't be available while ledger is being re-built
+    def write_actions(self) -> list:
+        return [self.statementGroup, self.ui.action_LoadQuotes, self.ui.actionImportSlipRU, self.ui.actionBackup,
+                self.ui.actionRestore, self.ui.actionCleanAll, self.ui.action_Re_build_Ledger, self.ui.actionAccounts,
+                self.ui.actionAssets, self.ui.actionPeers, self.ui.actionCategories, self.ui.actionTags,
+                self.ui.actionQuotes, self.ui.actionBaseCurrency, self.ui.PrepareTaxForms, self.ui.PrepareFlowReport]
+
+    # Shows progress of quotes download without UI blocking as download is done in background
+    @Slot(int, int)
+    def onDownloadProgress(self, finished, total):
+        self.ProgressBar.setRange(0, total)
+        self.ProgressBar.setValue(finished)
+        self.ProgressBar.setVisible(finished < total)
 
     @Slot()
     def importSlip(self):
+        from jal.data_import.slips import ImportSlipDialog   # Imported on demand as it depends on heavy modules
+
         dialog = ImportSlipDialog(self)
         dialog.finished.connect(self.onSlipImportFinished)
         dialog.open()
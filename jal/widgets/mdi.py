@@ -19,6 +19,10 @@ class MdiWidget(QWidget):
     def refresh(self):
         pass
 
+    # Widget should allow data browsing only, without any changes, while 'read_only' is set
+    def setReadOnly(self, read_only: bool):
+        pass
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Class that acts as QMdiArea in SubWindowView mode but has Tabs at the same time
@@ -47,6 +47,13 @@ class JalOperationsTabs(QStackedWidget):
                 else:
                     widget.revertChanges()
 
+    # Switches operation editors into read-only mode (or back). Uncommitted changes are saved or reverted before it
+    def setReadOnly(self, read_only: bool):
+        if read_only:
+            self._check_for_changes()
+        for widget in self.widgets.values():
+            widget.setEnabled(not read_only)
+
     def show_operation(self, op_type, operation_id):
         self._check_for_changes()
         self.setCurrentIndex(op_type)
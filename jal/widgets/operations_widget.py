@@ -23,6 +23,7 @@ class OperationsWidget(MdiWidget):
         self.ui.setupUi(self)
 
         self.current_index = None  # this is used in onOperationContextMenu() to track item for menu
+        self.read_only = False     # operations can't be created, changed or deleted if set
 
         # Set icons
         self.ui.NewOperationBtn.setIcon(load_icon("new.png"))
@@ -104,6 +105,7 @@ class OperationsWidget(MdiWidget):
 
     @Slot()
     def updateOperationsFilter(self):
+        self.operations_model.setFetchAll(bool(self.ui.SearchString.text()))
         self.ui.OperationsTableView.model().setFilterFixedString(self.ui.SearchString.text())
         self.ui.OperationsTableView.model().setFilterKeyColumn(-1)
 
@@ -125,12 +127,13 @@ class OperationsWidget(MdiWidget):
     @Slot()
     def onOperationContextMenu(self, pos):
         self.current_index = self.ui.OperationsTableView.indexAt(pos)
-        if len(self.ui.OperationsTableView.selectionModel().selectedRows()) != 1:
+        if len(self.ui.OperationsTableView.selectionModel().selectedRows()) != 1 or self.read_only:
             self.actionReconcile.setEnabled(False)
             self.actionCopy.setEnabled(False)
         else:
             self.actionReconcile.setEnabled(True)
             self.actionCopy.setEnabled(True)
+        self.actionDelete.setEnabled(not self.read_only)
         self.contextMenu.popup(self.ui.OperationsTableView.viewport().mapToGlobal(pos))
 
     @Slot()
@@ -143,3 +146,14 @@ class OperationsWidget(MdiWidget):
 
     def refresh(self):
         self.balances_model.update()
+        self.operations_model.invalidate()
+
+    def setReadOnly(self, read_only: bool):
+        self.read_only = read_only
+        self.ui.OperationsTabs.setReadOnly(read_only)
+        self.ui.NewOperationBtn.setEnabled(not read_only)
+        self.ui.CopyOperationBtn.setEnabled(not read_only)
+        self.ui.DeleteOperationBtn.setEnabled(not read_only)
+        self.actionReconcile.setEnabled(not read_only)
+        self.actionCopy.setEnabled(not read_only)
+        self.actionDelete.setEnabled(not read_only)
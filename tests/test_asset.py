@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+from tests.fixtures import project_root, data_path, prepare_db
+from tests.helpers import d2t, create_stocks, create_assets, create_quotes
+from jal.constants import PredefindedAccountType, PredefinedAsset
+from jal.db.db import JalDB
+from jal.db.account import JalAccount
+from jal.db.asset import JalAsset
+
+
+def test_asset_quotes_cache(prepare_db):
+    create_quotes(2, 1, [(d2t(220101), 70.0), (d2t(220110), 75.0)])
+    create_quotes(3, 1, [(d2t(220101), 80.0)])
+    usd = JalAsset(2)
+    assert usd.quote(d2t(211231), 1) == (0, Decimal('0'))
+    assert usd.quote(d2t(220101), 1) == (d2t(220101), Decimal('70'))
+    assert usd.quote(d2t(220105), 1) == (d2t(220101), Decimal('70'))
+    assert usd.quote(d2t(220110), 1) == (d2t(220110), Decimal('75'))
+    assert usd.quote(d2t(220201), 1) == (d2t(220110), Decimal('75'))
+    assert JalAsset(3).quote(d2t(220105), 2) == (d2t(220105), Decimal('80') / Decimal('70'))
+
+    # New quotes should replace cached values together with cross-rates that depend on them
+    create_quotes(2, 1, [(d2t(220103), 72.0)])
+    assert usd.quote(d2t(220105), 1) == (d2t(220103), Decimal('72'))
+    assert JalAsset(3).quote(d2t(220105), 2) == (d2t(220105), Decimal('80') / Decimal('72'))
+
+    # Direct modification of database is visible after cache invalidation only
+    JalDB._exec("DELETE FROM quotes WHERE asset_id=2 AND currency_id=1 AND timestamp=:timestamp",
+                [(":timestamp", d2t(220103))])
+    assert usd.quote(d2t(220105), 1) == (d2t(220103), Decimal('72'))
+    JalDB().invalidate_cache()
+    assert usd.quote(d2t(220105), 1) == (d2t(220101), Decimal('70'))
+
+
+def test_store_quotes(prepare_db):
+    create_quotes(2, 1, [(d2t(220101), 70.0), (d2t(220102), 71.0)])
+    counts = JalAsset.store_quotes({
+        (2, 1): ([d2t(220101), d2t(220102), d2t(220103), None], [Decimal('70'), Decimal('71.5'), Decimal('72'), None]),
+        (3, 1): ([d2t(220101), d2t(220102)], [Decimal('80'), None])
+    })
+    assert counts == {(2, 1): (2, 1), (3, 1): (1, 0)}
+    assert JalAsset(2).quotes(d2t(220101), d2t(220103), 1) == [
+        (d2t(220101), Decimal('70')), (d2t(220102), Decimal('71.5')), (d2t(220103), Decimal('72'))]
+    assert JalAsset(2).quote(d2t(220105), 1) == (d2t(220103), Decimal('72'))
+    assert JalAsset(3).set_quotes([{'timestamp': d2t(220101), 'quote': Decimal('80.0')}], 1) == (0, 1)
+    assert JalDB._read("SELECT COUNT(*) FROM quotes WHERE asset_id IN (2, 3) AND currency_id=1") == 4
+
+
+def test_asset_data_cache(prepare_db):
+    create_stocks([('A', 'A SHARE'), ('B', 'B SHARE')], currency_id=2)   # id = 4, 5
+    other = JalAsset.db_cache[5]
+    assert JalAsset(data={'symbol': 'a'}, search=True).id() == 4
+    assert JalAsset(data={'symbol': 'A', 'type': PredefinedAsset.Stock}, search=True).id() == 4
+    assert JalAsset(data={'symbol': 'A', 'type': PredefinedAsset.Bond}, search=True).id() == 0
+
+    # Symbol and data updates should change cached data of modified asset only
+    asset = JalAsset(4)
+    asset.add_symbol('AA', 2)
+    asset.update_data({'reg_number': 'REG-A'})
+    assert asset.symbol(2) == 'AA'
+    assert JalAsset(4).symbol() == 'AA'
+    assert JalAsset(4).reg_number() == 'REG-A'
+    assert JalAsset.db_cache[5] is other
+    assert JalAsset(data={'symbol': 'A'}, search=True).id() == 0
+    assert JalAsset(data={'symbol': 'AA'}, search=True).id() == 4
+    asset.add_symbol('B', 3)
+    assert JalAsset(data={'symbol': 'B'}, search=True).id() == 4
+
+    # Cached data should be the same as after full reload
+    cache = JalAsset.db_cache.copy()
+    index = {k: v for k, v in JalAsset.symbols_index.items() if v}
+    JalDB().invalidate_cache()
+    assert JalAsset.db_cache == cache
+    assert JalAsset.symbols_index == index
+
+
+def test_find_assets(prepare_db):
+    create_assets([('A', 'A SHARE', 'US0000000001', 2, PredefinedAsset.Stock, 0),    # id = 4
+                   ('B', 'B SHARE', '', 2, PredefinedAsset.Stock, 0),                # id = 5
+                   ('b', 'B BOND', 'RU0000000002', 1, PredefinedAsset.Bond, 0),      # id = 6
+                   ('F', 'F FUTURE', '', 2, PredefinedAsset.Derivative, 0)],         # id = 7
+                  data=[(5, 'reg_number', 'REG-B'), (7, 'expiry', d2t(240315))])
+    search_list = [
+        {'isin': 'US0000000001'},
+        {'isin': 'US0000000001', 'symbol': 'A2'},                # Symbol change - match by ISIN only
+        {'isin': 'RU0000000002', 'symbol': 'b'},
+        {'isin': 'RU0000000002', 'symbol': 'B'},                 # Exact symbol for ISIN search - B SHARE has no ISIN
+        {'isin': 'XX0000000000'},
+        {'reg_number': 'REG-B'},
+        {'symbol': 'B', 'type': PredefinedAsset.Bond},
+        {'symbol': 'f', 'type': PredefinedAsset.Derivative, 'expiry': d2t(240315)},
+        {'symbol': 'F', 'type': PredefinedAsset.Derivative, 'expiry': d2t(240415)},
+        {'symbol': 'USD', 'type': PredefinedAsset.Money},
+        {'name': 'a share'}
+    ]
+    expected = [4, 4, 6, 5, 0, 5, 6, 7, 0, 2, 4]
+    assert JalAsset.find_assets([x.copy() for x in search_list]) == expected
+    assert [JalAsset(data=x, search=True).id() for x in search_list] == expected
+
+    # Indices should follow asset changes and be the same as after full reload
+    JalAsset(5).update_data({'isin': 'US0000000003', 'reg_number': 'REG-C'})
+    assert JalAsset.find_assets([{'isin': 'US0000000003'}, {'reg_number': 'REG-C'}, {'reg_number': 'REG-B'}]) == [5, 5, 0]
+    indices = [{k: v for k, v in x.items() if v} for x in (JalAsset.isin_index, JalAsset.reg_number_index)]
+    JalDB().invalidate_cache()
+    assert [JalAsset.isin_index, JalAsset.reg_number_index] == indices
+
+    create_assets([('EUR', 'Euro', '', None, PredefinedAsset.Money, 0)])   # id = 8, a currency with duplicate symbol
+    accounts = [JalAccount(data={'type': PredefindedAccountType.Investment, 'name': f"Acc {x}", 'number': 'U1',
+                                 'currency': x, 'active': 1}, create=True).id() for x in (2, 3)]
+    assert JalAccount.find_accounts([{'number': 'U1', 'currency': 2}, {'number': 'U1', 'currency': 3},
+                                     {'number': 'U2', 'currency': 2}]) == accounts + [0]
@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+from tests.fixtures import project_root, data_path, prepare_db, prepare_db_ledger
+from tests.helpers import d2t, create_actions, create_quotes
+from jal.constants import PredefindedAccountType
+from jal.db.ledger import Ledger
+from jal.db.account import JalAccount
+from jal.db.category import JalCategory
+
+
+def test_category_turnovers(prepare_db_ledger):
+    JalAccount(data={'type': PredefindedAccountType.Cash, 'name': 'USD Wallet', 'number': 'N/A', 'currency': 2,
+                     'active': 1}, create=True)   # id = 2
+    create_quotes(2, 1, [(d2t(220101), 70.0), (d2t(220201), 80.0)])
+    create_actions([
+        (d2t(220105), 1, 1, [(5, -100.0), (6, -20.0)]),
+        (d2t(220110), 2, 1, [(5, -10.0), (8, 5.0)]),
+        (d2t(220205), 2, 1, [(5, -1.0)]),
+        (d2t(220301), 1, 1, [(8, 50.0)])
+    ])
+    Ledger().rebuild(from_timestamp=0)
+    turnovers = JalCategory.get_turnovers(d2t(220101), d2t(220228), 1)
+    assert sorted(turnovers) == [(5, d2t(220105), Decimal('-100')), (5, d2t(220110), Decimal('-700')),
+                                 (5, d2t(220205), Decimal('-80')), (6, d2t(220105), Decimal('-20')),
+                                 (8, d2t(220110), Decimal('350'))]
+    for category_id in [5, 6, 8]:   # Result should match with per-category calculation
+        assert sum([x[2] for x in turnovers if x[0] == category_id]) == \
+               JalCategory(category_id).get_turnover(d2t(220101), d2t(220228), 1)
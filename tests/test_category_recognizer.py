@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import logging
+import pytest
+from types import SimpleNamespace, ModuleType
+
+from tests.fixtures import project_root, data_path, prepare_db
+from jal.db.category import JalCategory
+import jal.data_import.category_recognizer as category_recognizer
+from jal.data_import.category_recognizer import NgramRecognizer, KerasRecognizer, recognize_categories, \
+    select_recognizer, selected_recognizer, training_data_fingerprint, TRAIN_EPOCHS, FINE_TUNE_EPOCHS, RECOGNIZER_FILE, \
+    MODEL_FILE
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Minimal replacement of Tensorflow that is used by KerasRecognizer - model only remembers how it was trained
+class StubTokenizer:
+    def __init__(self, word_index=None, **_kwargs):
+        self.word_index = word_index if word_index is not None else {}
+
+    def fit_on_texts(self, texts):
+        for word in ' '.join(texts).split():
+            self.word_index.setdefault(word, len(self.word_index) + 1)
+
+    def texts_to_sequences(self, texts):
+        return [[self.word_index.get(x, 0) for x in text.split()] for text in texts]
+
+    def to_json(self):
+        return json.dumps(self.word_index)
+
+
+class StubModel:
+    def __init__(self, _layers=None, fits=None):
+        self.fits = fits if fits is not None else []   # (epochs, number of samples) for every fit() call
+
+    def compile(self, **_kwargs):
+        pass
+
+    def fit(self, X, _Y, epochs, **_kwargs):
+        self.fits.append((epochs, len(X)))
+
+    def save(self, filename):
+        with open(filename, 'w', encoding='utf-8') as model_file:
+            json.dump(self.fits, model_file)
+
+
+def load_stub_model(filename):
+    with open(filename, 'r', encoding='utf-8') as model_file:
+        return StubModel(fits=[tuple(x) for x in json.load(model_file)])
+
+
+def stub_module(name, **attributes):
+    module = ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+@pytest.fixture
+def stub_tensorflow(tmp_path, monkeypatch):
+    keras = stub_module(
+        "tensorflow.keras",
+        Sequential=StubModel,
+        layers=SimpleNamespace(Embedding=lambda **_kwargs: None, Flatten=lambda: None,
+                               Dense=lambda *_args, **_kwargs: None),
+        preprocessing=SimpleNamespace(
+            text=SimpleNamespace(Tokenizer=StubTokenizer,
+                                 tokenizer_from_json=lambda x: StubTokenizer(word_index=json.loads(x))),
+            sequence=SimpleNamespace(pad_sequences=lambda x, **_kwargs: x)),
+        utils=SimpleNamespace(to_categorical=lambda x, **_kwargs: x),
+        models=SimpleNamespace(load_model=load_stub_model))
+    tensorflow = stub_module("tensorflow", keras=keras, get_logger=lambda: logging.getLogger("tensorflow"))
+    monkeypatch.setitem(sys.modules, "tensorflow", tensorflow)
+    monkeypatch.setitem(sys.modules, "tensorflow.keras", keras)
+    path = str(tmp_path) + os.sep + "recognizer" + os.sep
+    monkeypatch.setattr(category_recognizer, "recognizer_path", lambda: path)
+    yield path
+
+
+def add_mapped_names(count, start=0, category_id=5):
+    for i in range(start, start + count):
+        JalCategory(category_id).add_or_update_mapped_name(f"ITEM {i}")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_category_recognizer(prepare_db):
+    lines = [('MILK 3.2% 1L', 5), ('MILK LOW FAT 2.5% 0.5L', 5), ('BREAD WHITE 400G', 6), ('RYE BREAD 300G', 6),
+             ('APPLES GREEN 1KG', 7), ('RED APPLES', 7)]
+    for name, category_id in lines:
+        JalCategory(category_id).add_or_update_mapped_name(name)
+    select_recognizer(NgramRecognizer.name)
+    assert selected_recognizer() == NgramRecognizer.name
+    assert NgramRecognizer.title() == "Character n-grams"
+
+    categories, confidence = recognize_categories(['MILK 1.5% 1L', 'BREAD BLACK', 'APPLES 2KG RED', 'XYZ'])
+    assert categories == [5, 6, 7, 5]   # The most frequent category is returned if nothing similar is found
+    assert all(0 < x <= 1 for x in confidence[:3])
+    assert confidence[3] == 0
+
+    JalCategory(7).add_or_update_mapped_name('XYZ')   # Recognizer is re-trained as categorized lines were changed
+    categories, confidence = recognize_categories(['XYZ'])
+    assert categories == [7]
+    assert confidence[0] == pytest.approx(1)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_training_data_fingerprint():
+    lines = [{'value': 'MILK', 'mapped_to': 5}, {'value': 'BREAD', 'mapped_to': 6}]
+    fingerprint = training_data_fingerprint(lines)
+    assert training_data_fingerprint(list(reversed(lines))) == fingerprint   # order of lines doesn't matter
+    assert training_data_fingerprint(lines[:1]) != fingerprint
+    assert training_data_fingerprint([lines[0], {'value': 'BREAD', 'mapped_to': 7}]) != fingerprint
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Checks that saved model is re-used if data wasn't changed, fine-tuned if some lines were added and trained from
+# scratch if data grew too much since the last full training (even by several small steps) or categories were changed
+def test_keras_recognizer_training(prepare_db, stub_tensorflow):
+    path = stub_tensorflow
+    add_mapped_names(50, category_id=5)
+    add_mapped_names(50, start=50, category_id=6)
+
+    recognizer = KerasRecognizer()
+    recognizer.prepare()
+    model = recognizer._recognizer
+    assert model['model'].fits == [(TRAIN_EPOCHS, 100)]
+    assert model['trained_size'] == 100
+    assert model['fingerprint'] == training_data_fingerprint(JalCategory.get_mapped_names())
+    with open(path + RECOGNIZER_FILE, 'r', encoding='utf-8') as json_file:
+        saved = json.load(json_file)
+    assert saved['fingerprint'] == model['fingerprint']
+    assert saved['trained_size'] == 100
+    assert saved['categories'] == [5, 6]
+
+    recognizer = KerasRecognizer()   # New instance takes saved model without training
+    recognizer.prepare()
+    assert recognizer._recognizer['model'].fits == [(TRAIN_EPOCHS, 100)]
+    assert recognizer._recognizer['tokenizer'].word_index == model['tokenizer'].word_index
+
+    add_mapped_names(10, start=100)   # +10% - model is fine-tuned
+    recognizer.prepare()
+    assert recognizer._recognizer['model'].fits == [(TRAIN_EPOCHS, 100), (FINE_TUNE_EPOCHS, 110)]
+    assert recognizer._recognizer['trained_size'] == 100
+
+    add_mapped_names(10, start=110)   # +20% since training from scratch - model is still fine-tuned
+    recognizer = KerasRecognizer()
+    recognizer.prepare()
+    assert recognizer._recognizer['model'].fits == [(TRAIN_EPOCHS, 100), (FINE_TUNE_EPOCHS, 110),
+                                                    (FINE_TUNE_EPOCHS, 120)]
+    assert recognizer._recognizer['trained_size'] == 100
+
+    add_mapped_names(10, start=120)   # +30% since training from scratch (while +8% since last fine-tuning)
+    recognizer.prepare()
+    assert recognizer._recognizer['model'].fits == [(TRAIN_EPOCHS, 130)]
+    assert recognizer._recognizer['trained_size'] == 130
+
+    add_mapped_names(1, start=130, category_id=7)   # new category requires training from scratch
+    recognizer.prepare()
+    assert recognizer._recognizer['model'].fits == [(TRAIN_EPOCHS, 131)]
+    assert recognizer._recognizer['categories'] == [5, 6, 7]
+
+    with open(path + RECOGNIZER_FILE, 'w', encoding='utf-8') as json_file:   # broken description isn't loaded
+        json_file.write("{")
+    recognizer = KerasRecognizer()
+    recognizer.prepare()
+    assert recognizer._recognizer['model'].fits == [(TRAIN_EPOCHS, 131)]
+    with open(path + MODEL_FILE, 'r', encoding='utf-8') as model_file:
+        assert json.load(model_file) == [[TRAIN_EPOCHS, 131]]
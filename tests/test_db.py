@@ -0,0 +1,65 @@
+from tests.fixtures import project_root, data_path, prepare_db, prepare_db_ledger
+from tests.helpers import d2t
+from jal.db.db import JalDB
+from jal.db.account import JalAccount
+from jal.db.peer import JalPeer
+from jal.db.category import JalCategory
+from jal.db.country import JalCountry
+
+
+def test_query_cache(prepare_db):
+    sql = "SELECT id FROM assets WHERE id>=:min_id ORDER BY id"
+    stats = JalDB.query_cache_stats()
+    assert JalDB._read(sql, [(":min_id", 2)]) == 2
+    assert JalDB._read(sql, [(":min_id", 3)]) == 3
+    assert JalDB.query_cache_stats()['misses'] == stats['misses'] + 1
+    assert JalDB.query_cache_stats()['hits'] == stats['hits'] + 1
+    # Execution of the same query inside iteration shouldn't break the outer query
+    ids = []
+    query = JalDB._exec(sql, [(":min_id", 1)])
+    while query.next():
+        ids.append(JalDB._read_record(query))
+        assert JalDB._read(sql, [(":min_id", 3)]) == 3
+    assert ids == [1, 2, 3]
+    assert JalDB._read(sql, [(":min_id", 2)]) == 2
+    # Cache size is limited
+    size = JalDB.QUERY_CACHE_SIZE
+    JalDB.QUERY_CACHE_SIZE = 2
+    for i in range(5):
+        assert JalDB._read(f"SELECT {i}") == i
+    assert JalDB.query_cache_stats()['size'] == 2
+    JalDB.QUERY_CACHE_SIZE = size
+
+
+def test_reference_cache(prepare_db_ledger):
+    def queries_count():
+        stats = JalDB.query_cache_stats()
+        return stats['hits'] + stats['misses']
+
+    query = JalDB._exec("SELECT id FROM categories WHERE pid=0")
+    root_categories = []
+    while query.next():
+        root_categories.append(JalDB._read_record(query))
+    assert [x.id() for x in JalCategory(0).get_child_categories()] == root_categories
+    JalAccount(1), JalPeer(1), JalCategory(5), JalCountry(1).name('en')    # warm-up caches
+    instances = len(JalDB._instances_with_cache)
+    count = queries_count()
+    for i in range(10):
+        account = JalAccount(1)
+        assert account.currency() == 1
+        assert account.precision() == 2
+        assert JalPeer(1).name() == 'Shop'
+        assert JalCategory(5).name() == 'Fees'
+        assert [x.id() for x in JalCategory(2).get_child_categories()] == [5, 6]
+        assert JalCountry(1).name('en') == 'Russia'
+        assert JalCountry(1).name('ru') == 'Россия'
+    assert queries_count() == count
+    assert len(JalDB._instances_with_cache) == instances
+
+    # Changes made via classes should update the cache
+    JalAccount(1).reconcile(d2t(220101))
+    assert JalAccount(1).reconciled_at() == d2t(220101)
+    peer_id = JalPeer(data={'name': 'New Peer'}, create=True).id()
+    assert JalPeer(peer_id).name() == 'New Peer'
+    JalPeer(peer_id).replace_with(1)
+    assert JalPeer(peer_id).name() is None
@@ -1,4 +1,6 @@
+import threading
 import pandas as pd
+from functools import partial
 from datetime import datetime
 from decimal import Decimal
 from pandas._testing import assert_frame_equal
@@ -6,12 +8,17 @@ from pandas._testing import assert_frame_equal
 from tests.fixtures import project_root, data_path, prepare_db, prepare_db_moex
 from tests.helpers import d2t, create_stocks, create_assets
 from jal.db.asset import JalAsset
-from jal.constants import PredefinedAsset
+from jal.constants import PredefinedAsset, MarketDataFeed
 from jal.net.helpers import isEnglish
 from jal.net.downloader import QuoteDownloader
 from jal.data_import.slips_tax import SlipsTaxAPI
 
 
+# Returns asset data for price loaders as they are prepared for download tasks
+def asset_info(asset_id, currency_id) -> dict:
+    return QuoteDownloader.asset_download_info(JalAsset(asset_id), currency_id)
+
+
 def test_English():
     assert isEnglish("asdfAF12!@#") == True
     assert isEnglish("asdfБF12!@#") == False
@@ -108,13 +115,13 @@ def test_CBR_downloader(prepare_db):
     rates_usd = pd.DataFrame({'Rate': [Decimal('77.5104'), Decimal('77.2535'), Decimal('75.6826')],
                           'Date': [datetime(2021, 4, 13), datetime(2021, 4, 14), datetime(2021, 4, 15)]})
     rates_usd = rates_usd.set_index('Date')
-    rates_downloaded = downloader.CBR_DataReader(JalAsset(2), 1618272000, 1618358400)
+    rates_downloaded = downloader.CBR_DataReader(JalAsset(2).symbol(), 1618272000, 1618358400)
     assert_frame_equal(rates_usd, rates_downloaded)
 
     rates_try = pd.DataFrame({'Rate': [Decimal('9.45087'), Decimal('9.49270'), Decimal('9.37234')],
                               'Date': [datetime(2021, 4, 13), datetime(2021, 4, 14), datetime(2021, 4, 15)]})
     rates_try = rates_try.set_index('Date')
-    rates_downloaded = downloader.CBR_DataReader(JalAsset(4), 1618272000, 1618358400)
+    rates_downloaded = downloader.CBR_DataReader(JalAsset(4).symbol(), 1618272000, 1618358400)
     assert_frame_equal(rates_try, rates_downloaded)
 
 def test_ECB_downloader(prepare_db):
@@ -122,7 +129,7 @@ def test_ECB_downloader(prepare_db):
                               'Date': [datetime(2021, 4, 13), datetime(2021, 4, 14)]})
     rates_usd = rates_usd.set_index('Date')
     downloader = QuoteDownloader()
-    rates_downloaded = downloader.ECB_DataReader(JalAsset(2), d2t(210413), d2t(210414))
+    rates_downloaded = downloader.ECB_DataReader(JalAsset(2).symbol(), d2t(210413), d2t(210414))
     assert_frame_equal(rates_usd, rates_downloaded)
 
 def test_MOEX_downloader(prepare_db_moex):
@@ -143,7 +150,7 @@ def test_MOEX_downloader(prepare_db_moex):
     etf_quotes = etf_quotes.set_index('Date')
 
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.MOEX_DataReader(JalAsset(4), 1, 1618272000, 1618358400)
+    quotes_downloaded = downloader.MOEX_DataReader(asset_info(4, 1), 1618272000, 1618358400)
     assert_frame_equal(stock_quotes, quotes_downloaded)
     sber = JalAsset(4)
     assert sber.type() == PredefinedAsset.Stock
@@ -152,7 +159,7 @@ def test_MOEX_downloader(prepare_db_moex):
     assert sber.name() == ''
     assert sber.reg_number() == '10301481B'
 
-    quotes_downloaded = downloader.MOEX_DataReader(JalAsset(6), 1, 1626912000, 1626998400)
+    quotes_downloaded = downloader.MOEX_DataReader(asset_info(6, 1), 1626912000, 1626998400)
     assert_frame_equal(bond_quotes, quotes_downloaded)
     bond = JalAsset(6)
     assert bond.type() == PredefinedAsset.Bond
@@ -163,7 +170,7 @@ def test_MOEX_downloader(prepare_db_moex):
     assert bond.expiry() == str(d2t(410515))
     assert bond.principal() == Decimal('1000')
 
-    quotes_downloaded = downloader.MOEX_DataReader(JalAsset(7), 1, 1626912000, 1626998400)
+    quotes_downloaded = downloader.MOEX_DataReader(asset_info(7, 1), 1626912000, 1626998400)
     assert_frame_equal(corp_quotes, quotes_downloaded)
     bond2 = JalAsset(7)
     assert bond2.type() == PredefinedAsset.Bond
@@ -174,10 +181,10 @@ def test_MOEX_downloader(prepare_db_moex):
     assert bond2.expiry() == str(d2t(211130))
     assert bond2.principal() == Decimal('1000')
 
-    quotes_downloaded = downloader.MOEX_DataReader(JalAsset(8), 1, 1639353600, 1639440000, update_symbol=False)
+    quotes_downloaded = downloader.MOEX_DataReader(asset_info(8, 1), 1639353600, 1639440000, update_symbol=False)
     assert_frame_equal(etf_quotes, quotes_downloaded)
 
-    quotes_downloaded = downloader.MOEX_DataReader(JalAsset(9), 1, 1639353600, 1639440000, update_symbol=False)
+    quotes_downloaded = downloader.MOEX_DataReader(asset_info(9, 1), 1639353600, 1639440000, update_symbol=False)
     assert quotes_downloaded is None
 
 
@@ -188,7 +195,7 @@ def test_MOEX_downloader_USD(prepare_db_moex):
                                'Date': [datetime(2021, 12, 13), datetime(2021, 12, 14)]})
     usd_quotes = usd_quotes.set_index('Date')
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.MOEX_DataReader(JalAsset(8), 2, 1639353600, 1639440000, update_symbol=False)
+    quotes_downloaded = downloader.MOEX_DataReader(asset_info(8, 2), 1639353600, 1639440000, update_symbol=False)
     assert_frame_equal(usd_quotes, quotes_downloaded)
 
 
@@ -199,7 +206,7 @@ def test_NYSE_downloader(prepare_db):
     quotes = quotes.set_index('Date')
 
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.Yahoo_Downloader(JalAsset(4), 2, 1618272000, 1618444800)
+    quotes_downloaded = downloader.Yahoo_Downloader(asset_info(4, 2), 1618272000, 1618444800)
     assert_frame_equal(quotes, quotes_downloaded)
 
 
@@ -210,7 +217,7 @@ def test_LSE_downloader(prepare_db):
     quotes = quotes.set_index('Date')
 
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.YahooLSE_Downloader(JalAsset(4), 3, 1618272000, 1618444800)
+    quotes_downloaded = downloader.YahooLSE_Downloader(asset_info(4, 3), 1618272000, 1618444800)
     assert_frame_equal(quotes, quotes_downloaded)
 
 
@@ -221,7 +228,7 @@ def test_Euronext_downloader(prepare_db):
     quotes = quotes.set_index('Date')
 
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.Euronext_DataReader(JalAsset(4), 3, 1618272000, 1618444800)
+    quotes_downloaded = downloader.Euronext_DataReader(asset_info(4, 3), 1618272000, 1618444800)
     assert_frame_equal(quotes, quotes_downloaded)
 
 
@@ -232,7 +239,7 @@ def test_TMX_downloader(prepare_db):
     quotes = quotes.set_index('Date')
 
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.TMX_Downloader(JalAsset(4), 3, 1618272000, 1618444800)
+    quotes_downloaded = downloader.TMX_Downloader(asset_info(4, 3), 1618272000, 1618444800)
     assert_frame_equal(quotes, quotes_downloaded)
 
 
@@ -243,5 +250,45 @@ def test_Frankfurt_downloader(prepare_db):
     quotes = quotes.set_index('Date')
 
     downloader = QuoteDownloader()
-    quotes_downloaded = downloader.YahooFRA_Downloader(JalAsset(4), 3, d2t(210413), d2t(210415))
+    quotes_downloaded = downloader.YahooFRA_Downloader(asset_info(4, 3), d2t(210413), d2t(210415))
     assert_frame_equal(quotes, quotes_downloaded)
+
+
+# Loaders of download tasks get plain values only as they are executed in threads without database access
+def test_download_tasks(prepare_db):
+    create_stocks([('A', 'A SHARE')], currency_id=2)   # id = 4
+    JalAsset(4).add_symbol('A.RUB', 1, '')
+    assert asset_info(4, 1) == {'id': 4, 'symbol': 'A,A.RUB', 'isin': '', 'quote_symbol': 'A.RUB', 'currency': 'RUB'}
+    assert asset_info(4, 2) == {'id': 4, 'symbol': 'A,A.RUB', 'isin': '', 'quote_symbol': 'A', 'currency': 'USD'}
+
+    tasks = QuoteDownloader()._currency_rates_tasks(d2t(220101), d2t(220131))
+    assert sorted([x['loader'].args for x in tasks]) == [('EUR', d2t(220101), d2t(220131)),
+                                                         ('USD', d2t(220101), d2t(220131))]
+
+
+def test_concurrent_download(prepare_db, qtbot):
+    create_stocks([('A', 'A SHARE'), ('B', 'B SHARE'), ('C', 'C SHARE')], currency_id=2)
+    threads = set()
+
+    def loader(price):
+        threads.add(threading.get_ident())
+        return pd.DataFrame({'Close': [Decimal(price)]}, index=[pd.Timestamp(d2t(220301), unit='s')])
+
+    def failed_loader():
+        raise KeyError
+
+    downloader = QuoteDownloader()
+    tasks = [{'source': MarketDataFeed.US, 'asset': JalAsset(asset_id), 'currency': 2, 'warning': 'failed',
+              'loader': partial(loader, str(asset_id))} for asset_id in [4, 5, 6]]
+    tasks.append({'source': MarketDataFeed.EU, 'asset': JalAsset(4), 'currency': 3, 'warning': 'failed',
+                  'loader': failed_loader})
+    progress = []
+    downloader.download_progress.connect(lambda finished, total: progress.append((finished, total)))
+    with qtbot.waitSignal(downloader.download_completed, timeout=10000):
+        downloader._start_downloads(tasks)
+    assert progress == [(0, 4), (1, 4), (2, 4), (3, 4), (4, 4)]
+    assert threading.get_ident() not in threads
+    assert not downloader.is_running()
+    for asset_id in [4, 5, 6]:
+        assert JalAsset(asset_id).quote(d2t(220301), 2) == (d2t(220301), Decimal(str(asset_id)))
+    assert JalAsset(4).quote(d2t(220301), 3) == (0, Decimal('0'))
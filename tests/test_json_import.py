@@ -1,10 +1,12 @@
 import json
+import pytest
 from decimal import Decimal
 from tests.fixtures import project_root, data_path, prepare_db, prepare_db_ibkr, prepare_db_moex
 
-from jal.data_import.statement import Statement
+from jal.data_import.statement import Statement, Statement_ImportError
 from tests.helpers import d2t
 from jal.constants import PredefinedAsset
+from jal.db.db import JalDB
 from jal.db.account import JalAccount
 from jal.db.asset import JalAsset, AssetData
 from jal.db.peer import JalPeer
@@ -327,3 +329,86 @@ def test_ukfu_json_import(tmp_path, project_root, data_path, prepare_db_moex):
     assets = JalAsset.get_assets()
     assert len(assets) == len(test_assets)
     assert [x.dump() for x in assets] == test_assets
+
+
+def test_statement_index(prepare_db):
+    statement = Statement()
+    statement._data = {
+        "accounts": [{"id": 1, "number": "U1", "currency": 1}],
+        "assets": [{"id": 1, "type": "money"}, {"id": 2, "type": "stock", "isin": "US0000000001"}],
+        "symbols": [{"id": 1, "asset": 1, "symbol": "USD"}, {"id": 2, "asset": 2, "symbol": "A", "currency": 1}],
+        "assets_data": [], "trades": [], "corporate_actions": [], "asset_payments": [], "income_spending": [],
+        "transfers": [{"id": 1, "account": [1, 0, 0], "asset": [1, 1], "timestamp": 1, "withdrawal": 1.0,
+                       "deposit": 1.0, "fee": 0.0}]
+    }
+    for i in range(3):
+        statement._data["trades"].append({"id": statement._next_id("trades"), "account": 1, "asset": 2})
+    assert [x['id'] for x in statement._data["trades"]] == [1, 2, 3]
+    assert statement.asset_id({'isin': "US0000000001"}) == 2
+    assert statement.asset_id({'symbol': "B", 'currency': 1}) == 3
+    assert statement._find_in_list(statement._data["symbols"], "asset", 3)['symbol'] == "B"
+
+    # Ids are remapped in all sections including lists of values and elements appended after index creation
+    statement._data["trades"].append({"id": statement._next_id("trades"), "account": 1, "asset": 3})
+    old_id = statement._set_id("assets", statement._asset(1), -5)
+    statement._update_id("currency", old_id, 5)
+    statement._update_id("asset", old_id, 5)
+    statement._set_id("assets", statement._asset(2), -7)
+    statement._update_id("asset", 2, 7)
+    assert statement._data["transfers"][0]["asset"] == [-5, -5]
+    assert statement._data["accounts"][0]["currency"] == -5
+    assert [x['asset'] for x in statement._data["trades"]] == [-7, -7, -7, 3]
+    assert [x.get('currency') for x in statement._data["symbols"]] == [None, -5, -5]
+    assert statement._find_in_list(statement._data["assets"], "id", 2) is None
+    assert statement._asset(-7)['isin'] == "US0000000001"
+    assert statement._next_id("assets") == 4
+    assert statement._next_id("trades") == 5
+
+
+def test_bulk_import(data_path, prepare_db_ibkr):
+    tables = ["actions", "action_details", "dividends", "trades", "transfers", "asset_actions", "action_results"]
+    statement = Statement()
+    statement.load(data_path + 'ibkr.json')
+    statement.validate_format()
+    statement.match_db_ids()
+    statement.import_into_db()
+    assert JalDB._read("SELECT value FROM settings WHERE name='TriggersEnabled'") == 1
+    counts = [JalDB._read(f"SELECT COUNT(*) FROM {x}") for x in tables]
+    dirty = JalDB._read("SELECT GROUP_CONCAT(account_id || ':' || asset_id || ':' || timestamp) "
+                        "FROM (SELECT * FROM ledger_dirty ORDER BY account_id, asset_id)")
+
+    # Deferred invalidation should give the same result as triggers do for every operation
+    _ = JalDB._exec("DELETE FROM ledger_dirty")
+    for table in tables:
+        column = "asset_id=asset_id" if table == "action_results" else ("pid=pid" if table == "action_details" else
+                 "withdrawal_timestamp=withdrawal_timestamp" if table == "transfers" else "timestamp=timestamp")
+        _ = JalDB._exec(f"UPDATE {table} SET {column}")
+    assert JalDB._read("SELECT GROUP_CONCAT(account_id || ':' || asset_id || ':' || timestamp) "
+                       "FROM (SELECT * FROM ledger_dirty ORDER BY account_id, asset_id)") == dirty
+
+    # Repeated import should skip all operations as duplicates (income/spending has no duplicates check)
+    statement = Statement()
+    statement.load(data_path + 'ibkr.json')
+    statement.validate_format()
+    statement.match_db_ids()
+    statement._data.pop('period')   # Skip period check that asks for confirmation
+    statement.import_into_db()
+    assert [JalDB._read(f"SELECT COUNT(*) FROM {x}") for x in tables[2:]] == counts[2:]
+
+    # Failed import should leave no changes in DB and in cached data
+    assets_count = len(JalAsset.get_assets())
+    counts = [JalDB._read(f"SELECT COUNT(*) FROM {x}") for x in tables]
+    statement = Statement()
+    statement._data = {x: [] for x in Statement._mutable_sections}
+    statement._data.update({
+        "assets": [{"id": 1, "type": "stock", "name": "New share", "isin": "US0000000001"}],
+        "symbols": [{"id": 1, "asset": 1, "symbol": "NEW", "currency": -2}],
+        "trades": [{"id": 1, "number": "", "timestamp": d2t(220101), "settlement": d2t(220101), "account": 1,
+                    "asset": 1, "quantity": 1.0, "price": 10.0, "fee": 0.0}]
+    })
+    with pytest.raises(Statement_ImportError):
+        statement.import_into_db()
+    assert len(JalAsset.get_assets()) == assets_count
+    assert JalAsset(data={'isin': 'US0000000001'}, search=True).id() == 0
+    assert [JalDB._read(f"SELECT COUNT(*) FROM {x}") for x in tables] == counts
+    assert JalDB._read("SELECT value FROM settings WHERE name='TriggersEnabled'") == 1
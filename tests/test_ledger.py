@@ -1,14 +1,20 @@
+import re
 from decimal import Decimal
+from PySide6.QtSql import QSqlDatabase
+from PySide6.QtWidgets import QWidget
 
 from tests.fixtures import project_root, data_path, prepare_db, prepare_db_fifo, prepare_db_ledger
 from tests.helpers import d2t, create_stocks, create_actions, create_trades, create_quotes, \
     create_corporate_actions, create_stock_dividends, create_transfers
-from constants import BookAccount, PredefindedAccountType
-from jal.db.ledger import Ledger, LedgerAmounts
+from constants import Setup, BookAccount, PredefindedAccountType
+from jal.db.db import JalDB
+from jal.db.ledger import Ledger, LedgerAmounts, RebuildDialog
 from jal.db.account import JalAccount
 from jal.db.asset import JalAsset
 from jal.db.peer import JalPeer
-from jal.db.operations import LedgerTransaction, Dividend
+from jal.db.category import JalCategory
+from jal.db.operations import LedgerTransaction, IncomeSpending, Dividend, Trade, CorporateAction
+from jal.widgets.helpers import ts2d
 
 
 #-----------------------------------------------------------------------------------------------------------------------
@@ -464,3 +470,329 @@ def test_asset_transfer(prepare_db):
     trades = JalAccount(2).closed_trades_list()
     assert len(trades) == 1
     assert sum([x.profit() for x in trades]) == Decimal('995')
+
+
+def test_incremental_rebuild(prepare_db_ledger):
+    JalAccount(data={'type': PredefindedAccountType.Cash, 'name': 'Purse', 'number': 'N/A', 'currency': 1, 'active': 1},
+               create=True)   # id = 2
+    create_actions([
+        (d2t(220101), 1, 1, [(4, 1000.0)]),
+        (d2t(220102), 2, 1, [(4, 500.0)]),
+        (d2t(220110), 1, 1, [(5, -100.0)]),
+        (d2t(220111), 2, 1, [(5, -50.0)])
+    ])
+    create_transfers([(d2t(220115), 1, 200.0, 2, 200.0, None)])
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+    account2_ids = JalAccount._read("SELECT GROUP_CONCAT(id) FROM ledger WHERE account_id=2")
+
+    # Back-dated operation should invalidate only one account
+    create_actions([(d2t(220105), 1, 1, [(5, -10.0)])])
+    assert ledger._dirty_frontiers() == {1: d2t(220105)}
+    ledger.rebuild()
+    assert JalAccount._read("SELECT COUNT(*) FROM ledger_dirty") == 0
+    assert JalAccount._read("SELECT GROUP_CONCAT(id) FROM ledger WHERE account_id=2") == account2_ids
+    amounts = LedgerAmounts("amount_acc")
+    assert amounts[(BookAccount.Money, 1, 1)] == Decimal('690')
+    assert amounts[(BookAccount.Money, 2, 1)] == Decimal('650')
+
+    # Result should be the same as for full re-build
+    ledger.rebuild(from_timestamp=0)
+    amounts = LedgerAmounts("amount_acc")
+    assert amounts[(BookAccount.Money, 1, 1)] == Decimal('690')
+    assert amounts[(BookAccount.Money, 2, 1)] == Decimal('650')
+
+
+def test_rebuild_transfer_propagation(prepare_db):
+    JalPeer(data={'name': 'Test Peer', 'parent': 0}, create=True)
+    for i in range(3):
+        JalAccount(data={'type': PredefindedAccountType.Investment, 'name': f"account{i}", 'number': f"U{i}",
+                         'currency': 1, 'active': 1, 'organization': 1}, create=True)
+    create_stocks([('A', 'A SHARE')], currency_id=1)   # id = 4
+    create_actions([(d2t(220101), 1, 1, [(4, 1000.0)])])
+    create_trades(1, [(d2t(220201), d2t(220203), 4, 5.0, 100.0, 1.0)])
+    create_transfers([(d2t(220207), 1, 5.0, 2, 5.0, 4)])
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+
+    LedgerTransaction.get_operation(LedgerTransaction.Trade, 1).update_price(Decimal('90'))
+    assert ledger._dirty_frontiers() == {1: d2t(220201), 2: d2t(220207)}
+    ledger.rebuild()
+    values = LedgerAmounts("value_acc")
+    assert values[(BookAccount.Assets, 2, 4)] == Decimal('450')
+
+
+def test_rebuild_write_batches(prepare_db):
+    JalPeer(data={'name': 'Test Peer', 'parent': 0}, create=True)
+    for i in range(2):
+        JalAccount(data={'type': PredefindedAccountType.Investment, 'name': f"account{i}", 'number': f"U{i}",
+                         'currency': 1, 'active': 1, 'organization': 1}, create=True)
+    create_stocks([('A', 'A SHARE')], currency_id=1)   # id = 4
+    create_actions([(d2t(220101), 1, 1, [(4, 10000.0)])])
+    create_trades(1, [
+        (d2t(220201), d2t(220203), 4, 10.0, 100.0, 1.0),
+        (d2t(220202), d2t(220204), 4, 5.0, 110.0, 1.0),
+        (d2t(220205), d2t(220207), 4, -12.0, 120.0, 1.0)
+    ])
+    create_transfers([(d2t(220210), 1, 3.0, 2, 3.0, 4)])
+    create_trades(2, [(d2t(220215), d2t(220217), 4, -3.0, 130.0, 1.0)])
+
+    def dump():
+        tables = {}
+        for table in ['ledger', 'trades_opened', 'trades_closed']:
+            query = JalAccount._exec(f"SELECT * FROM {table} ORDER BY id")
+            tables[table] = []
+            while query.next():
+                tables[table].append(JalAccount._read_record(query))
+        return tables
+
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+    batched = dump()
+    ledger.WRITE_BATCH_SIZE = 1   # Every record is written into DB immediately
+    ledger.rebuild(from_timestamp=0)
+    assert dump() == batched
+    assert len(batched['trades_closed']) == 4
+    assert JalAccount._read("SELECT SUM(remaining_qty) FROM trades_opened") == 0
+
+
+def test_bulk_operations_load(prepare_db_fifo):
+    create_stocks([('A', 'A SHARE'), ('B', 'B SHARE')], currency_id=2)   # id = 4, 5
+    create_actions([(d2t(220101), 1, 1, [(5, -100.0), (6, -30.0)])])
+    create_trades(1, [(d2t(220201), d2t(220203), 4, 10.0, 100.0, 1.0)])
+    create_corporate_actions(1, [(d2t(220205), 3, 4, 10.0, 'Symbol change A -> B', [(5, 10.0, 1.0)])])
+    create_stock_dividends([(Dividend.StockDividend, d2t(220210), 1, 5, 1.0, 2, 105.0, 0.0, 'Stock dividend +1 B')])
+    create_transfers([(d2t(220215), 1, 50.0, 1, 50.0, None)])
+
+    sequence = Ledger.get_operations_sequence(0, d2t(221231))
+    assert len(sequence) == 7
+    operations = LedgerTransaction.get_operations(sequence)
+    for data, operation in zip(sequence, operations):
+        expected = LedgerTransaction.get_operation(data['op_type'], data['id'], data['subtype'])
+        assert type(operation) == type(expected)
+        assert operation.timestamp() == expected.timestamp()
+        assert operation.account_id() == expected.account_id()
+        assert operation.dump() == expected.dump()
+        if data['op_type'] == LedgerTransaction.IncomeSpending:
+            assert operation.lines() == expected.lines()
+        if data['op_type'] == LedgerTransaction.CorporateAction:
+            assert operation.get_results() == expected.get_results()
+
+    # Only operations from the sequence are loaded, not all operations since the earliest of them
+    create_actions([(d2t(220301), 1, 1, [(5, -10.0)])])
+    ids = set(x['id'] for x in Ledger.get_operations_sequence(0, d2t(221231))
+              if x['op_type'] == LedgerTransaction.IncomeSpending and x['timestamp'] in [d2t(220101), d2t(220301)])
+    assert len(ids) == 2
+    records = IncomeSpending._load_records(ids)
+    assert records.keys() == ids
+    assert [len(records[x]['details']) for x in sorted(ids)] == [2, 1]
+    assert Trade._load_records({1}).keys() == {1}
+    assert CorporateAction._load_records(set()) == {}
+
+
+def test_lots_incremental_rebuild(prepare_db_fifo):
+    create_stocks([('A', 'A SHARE')], currency_id=2)   # id = 4
+    create_trades(1, [
+        (d2t(220201), d2t(220203), 4, 10.0, 100.0, 0.0),
+        (d2t(220202), d2t(220204), 4, 5.0, 110.0, 0.0),
+        (d2t(220205), d2t(220207), 4, -4.0, 120.0, 0.0),
+        (d2t(220215), d2t(220217), 4, -8.0, 130.0, 0.0)
+    ])
+
+    def dump():
+        tables = {}
+        query = JalAccount._exec("SELECT timestamp, op_type, operation_id, price, remaining_qty FROM trades_opened "
+                                 "ORDER BY timestamp, operation_id")
+        tables['opened'] = []
+        while query.next():
+            tables['opened'].append(JalAccount._read_record(query, cast=[int, int, int, Decimal, Decimal]))
+        query = JalAccount._exec("SELECT open_op_id, close_op_id, open_price, close_price, qty FROM trades_closed "
+                                 "ORDER BY close_timestamp, open_timestamp")
+        tables['closed'] = []
+        while query.next():
+            tables['closed'].append(JalAccount._read_record(query, cast=[int, int, Decimal, Decimal, Decimal]))
+        return tables
+
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+    assert dump()['opened'] == [[d2t(220201), 3, 1, Decimal('100'), Decimal('0')],
+                                [d2t(220202), 3, 2, Decimal('110'), Decimal('3')]]
+    # Back-dated sale after partial close of the first lot - it should continue matching from restored DB state
+    create_trades(1, [(d2t(220210), d2t(220212), 4, -3.0, 125.0, 0.0)])
+    ledger.rebuild()
+    incremental = dump()
+    assert incremental['opened'] == [[d2t(220201), 3, 1, Decimal('100'), Decimal('0')],
+                                     [d2t(220202), 3, 2, Decimal('110'), Decimal('0')]]
+    assert len(incremental['closed']) == 4
+    ledger.rebuild(from_timestamp=0)
+    assert dump() == incremental
+
+
+# Checks that frequent queries to 'ledger' table use indices instead of full table scan. Queries are captured from
+# JalDB._exec() calls that are made by methods reading the ledger, and then their plans are checked with the same params
+def test_ledger_query_plans(prepare_db_ledger, monkeypatch):
+    JalAccount(data={'type': PredefindedAccountType.Investment, 'name': 'Broker', 'number': '1234', 'currency': 1,
+                     'active': 1, 'organization': 1, 'precision': 10}, create=True)   # id = 2
+    create_actions([(d2t(220105), 1, 1, [(5, -100.0), (6, -20.0)]), (d2t(220110), 1, 1, [(4, 1000.0)])])
+    create_stocks([('A', 'A SHARE')], currency_id=1)   # id = 4
+    create_trades(1, [(d2t(220112), d2t(220112), 4, 5.0, 100.0, 0.0)])
+    create_transfers([(d2t(220115), 1, 5.0, 2, 5.0, 4)])   # Move A from Wallet to Broker
+
+    statements = {}
+    original_exec = JalDB._exec.__func__
+
+    def capturing_exec(cls, sql_text, params=None, forward_only=True, commit=False):
+        if re.search(r"\bledger\b", sql_text) and re.match(r"\s*(SELECT|WITH|DELETE)\b", sql_text, re.IGNORECASE):
+            statements.setdefault(sql_text, params if params else [])
+        return original_exec(cls, sql_text, params, forward_only=forward_only, commit=commit)
+
+    monkeypatch.setattr(JalDB, "_exec", classmethod(capturing_exec))
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+    # Only search of withdrawal value for incoming transfer is checked from re-build as it is done for every transfer
+    for sql in [x for x in statements if ":book_transfers" not in x]:
+        statements.pop(sql)
+    assert len(statements) == 1
+    account = JalAccount(1)
+    _ = LedgerAmounts("amount_acc")[(BookAccount.Money, 1, 1)]
+    _ = account.get_asset_amount(d2t(220201), 1)
+    _ = account.assets_list(d2t(220201))
+    _ = account.get_book_turnover(BookAccount.Costs, d2t(220101), d2t(221231))
+    _ = account.get_category_turnover(5, d2t(220101), d2t(221231))
+    _ = JalCategory(5).get_turnover(d2t(220101), d2t(221231), 1)
+    _ = Ledger.get_operations_by_peer(d2t(220101), d2t(221231), 1)
+    _ = Ledger.get_operations_by_category(d2t(220101), d2t(221231), 5)
+    ledger._purge(d2t(220201))
+    ledger._purge(d2t(220201), account_id=1)
+    monkeypatch.undo()
+
+    # Lookups of last amount for [account, asset, book] should use the same index both directly and via snapshots
+    expected_indices = {r"^SELECT amount_acc FROM ledger WHERE book_account": "ledger_by_account_asset_book",
+                        r"^SELECT amount_acc FROM ledger WHERE id=\(SELECT MAX\(id\)": "ledger_by_account_asset_book",
+                        r":book_transfers": "ledger_by_operation"}
+    assert len(statements) >= 10
+    for sql, params in statements.items():
+        query = JalDB._exec("EXPLAIN QUERY PLAN " + sql, params)
+        assert query is not None
+        plan = []
+        while query.next():
+            detail = query.value(3)
+            assert re.match(r"SCAN (TABLE )?(ledger|l)\b", detail) is None, f"Full scan '{detail}' for: {sql}"
+            assert not detail.startswith("USE TEMP B-TREE FOR ORDER BY"), f"Sorting '{detail}' for: {sql}"
+            plan.append(detail)
+        for pattern, index in expected_indices.items():
+            if re.search(pattern, " ".join(sql.split())):
+                assert any(f"ledger USING INDEX {index} " in x for x in plan), f"No {index} in {plan} for: {sql}"
+
+
+def test_ledger_snapshots(prepare_db_fifo):
+    create_stocks([('A', 'A SHARE'), ('B', 'B SHARE')], currency_id=2)
+    create_trades(1, [
+        (d2t(201215), d2t(201217), 4, 10.0, 100.0, 1.0),
+        (d2t(210110), d2t(210112), 5, 5.0, 200.0, 1.0),
+        (d2t(210131), d2t(210202), 4, -4.0, 110.0, 1.0),
+        (d2t(210301), d2t(210303), 5, -5.0, 190.0, 1.0),
+        (d2t(210415), d2t(210417), 4, 2.0, 120.0, 1.0)
+    ])
+    account = JalAccount(1)
+
+    def balances() -> list:
+        result = []
+        for date in [201101, 201130, 201215, 201231, 210110, 210131, 210201, 210228, 210301, 210415, 210501, 220101]:
+            assets = [(x['asset'].id(), x['amount'], x['value']) for x in account.assets_list(d2t(date))]
+            amounts = [account.get_asset_amount(d2t(date), asset_id) for asset_id in [2, 4, 5]]
+            result.append((sorted(assets), amounts))
+        return result
+
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+    assert JalDB._read("SELECT COUNT(DISTINCT timestamp) FROM ledger_snapshots") == 5   # 11/20, 12/20, 01/21, 03/21 and 04/21
+    with_snapshots = balances()
+    assert with_snapshots[3] == ([(4, Decimal('10'), Decimal('1000'))], [Decimal('8999'), Decimal('10'), Decimal('0')])
+    assert with_snapshots[-1][1] == [Decimal('9145'), Decimal('8'), Decimal('0')]
+    _ = JalDB._exec("DELETE FROM ledger_snapshots")
+    assert balances() == with_snapshots   # The same result should be taken directly from ledger
+
+    # Incremental re-build should update snapshots after frontier only
+    ledger.rebuild(from_timestamp=0)
+    create_trades(1, [(d2t(210205), d2t(210207), 5, 1.0, 200.0, 1.0)])
+    ledger.rebuild()
+    assert JalDB._read("SELECT COUNT(*) FROM ledger_snapshots WHERE timestamp < :frontier",
+                       [(":frontier", d2t(210201))]) > 0
+    with_snapshots = balances()
+    assert with_snapshots[-1][1] == [Decimal('8944'), Decimal('8'), Decimal('1')]
+    _ = JalDB._exec("DELETE FROM ledger_snapshots")
+    assert balances() == with_snapshots
+
+    # Operation change invalidates ledger and snapshots after it - balances should be valid before any re-build
+    ledger.rebuild(from_timestamp=0)
+    _ = JalDB._exec("UPDATE trades SET qty=6.0 WHERE timestamp=:timestamp", [(":timestamp", d2t(210110))])
+    assert JalDB._read("SELECT COUNT(*) FROM ledger_snapshots WHERE timestamp >= :timestamp",
+                       [(":timestamp", d2t(210110))]) == 0
+    invalidated = balances()
+    assert invalidated[-1] == ([(4, Decimal('10'), Decimal('1000'))], [Decimal('8999'), Decimal('10'), Decimal('0')])
+    _ = JalDB._exec("DELETE FROM ledger_snapshots")
+    assert balances() == invalidated
+
+
+def test_background_rebuild(prepare_db_ledger, qtbot):
+    create_actions([
+        (d2t(220101), 1, 1, [(4, 1000.0)]),
+        (d2t(220110), 1, 1, [(5, -100.0)])
+    ])
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+
+    # Cancelled re-build should leave ledger and its invalidation records untouched
+    create_actions([(d2t(220105), 1, 1, [(5, -10.0)])])
+    ledger_ids = JalDB._read("SELECT GROUP_CONCAT(id) FROM ledger")
+    ledger.progress.connect(ledger.cancel)
+    ledger.rebuild()
+    ledger.progress.disconnect(ledger.cancel)
+    assert JalDB._read("SELECT GROUP_CONCAT(id) FROM ledger") == ledger_ids
+    assert ledger._dirty_frontiers() == {1: d2t(220105)}
+    assert JalDB._read("SELECT value FROM settings WHERE name='TriggersEnabled'") == 1
+
+    # Background re-build uses its own connection and makes result visible after completion
+    progress = []
+    ledger.progress.connect(lambda processed, total: progress.append((processed, total)))
+    with qtbot.waitSignal(ledger.updated, timeout=10000):
+        ledger.rebuild_in_background()
+    assert not ledger.is_running()
+    assert progress[-1] == (2, 2)
+    assert ledger._dirty_frontiers() == {}
+    assert LedgerAmounts("amount_acc")[(BookAccount.Money, 1, 1)] == Decimal('890')
+    assert QSqlDatabase.connectionNames() == [Setup.DB_CONNECTION]
+
+
+# 'Last' option of re-build dialog should re-build ledger since the earliest back-dated change
+def test_rebuild_dialog_last(prepare_db_ledger, qtbot):
+    create_actions([
+        (d2t(220101), 1, 1, [(4, 1000.0)]),
+        (d2t(220110), 1, 1, [(5, -100.0)]),
+        (d2t(220120), 1, 1, [(5, -200.0)])
+    ])
+    ledger = Ledger()
+    ledger.rebuild(from_timestamp=0)
+
+    create_actions([(d2t(220105), 1, 1, [(5, -10.0)])])
+    parent = QWidget()
+    qtbot.addWidget(parent)
+    dialog = RebuildDialog(parent, ledger.getRebuildFrontier())
+    qtbot.addWidget(dialog)
+    assert dialog.ui.FrontierDateLabel.text() == ts2d(d2t(220105))
+    with qtbot.waitSignal(ledger.updated, timeout=10000):
+        ledger.rebuild_in_background(from_timestamp=dialog.getTimestamp(), fast_and_dirty=dialog.isFastAndDirty())
+    assert JalDB._read("SELECT COUNT(*) FROM ledger_dirty") == 0
+    assert LedgerAmounts("amount_acc")[(BookAccount.Money, 1, 1)] == Decimal('690')
+
+
+# Re-build shouldn't change anything if it can't have its own transaction
+def test_rebuild_transaction_failure(prepare_db_ledger):
+    create_actions([(d2t(220101), 1, 1, [(4, 1000.0)])])
+    ledger = Ledger()
+    assert JalDB.connection().transaction()
+    assert not ledger._rebuild(0, False)
+    assert JalDB.connection().rollback()
+    assert JalDB._read("SELECT COUNT(*) FROM ledger") == 0
+    assert JalDB._read("SELECT value FROM settings WHERE name='TriggersEnabled'") == 1
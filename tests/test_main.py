@@ -1,4 +1,7 @@
 import os
+import sys
+import json
+import subprocess
 from shutil import copyfile
 import sqlite3
 from decimal import Decimal
@@ -9,6 +12,7 @@ from jal.db.db import JalDB, JalDBError
 from jal.db.asset import JalAsset
 from jal.db.helpers import get_dbfilename, localize_decimal
 from jal.db.backup_restore import JalBackup
+from jal.db.query_stats import normalize_sql
 from tests.helpers import pop2minor_digits, d2t, dt2t
 
 
@@ -103,3 +107,77 @@ def test_backup_load(tmp_path, project_root):
     JalDB.connection().close()
     os.remove(target_path)  # Clean db init script
     os.remove(get_dbfilename(str(tmp_path) + os.sep))  # Clean db file
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Script that measures time from start of python process till main window is shown (DB is expected to exist already)
+STARTUP_SCRIPT = """
+import os, sys, json
+from time import perf_counter
+start = perf_counter()
+sys.path.insert(0, sys.argv[1])
+from PySide6.QtWidgets import QApplication
+from jal.db.db import JalDB
+from jal.widgets.main_window import MainWindow
+app = QApplication([])
+error = JalDB().init_db(sys.argv[2])
+window = MainWindow('en')
+window.show()
+app.processEvents()
+duration = perf_counter() - start
+heavy = [x for x in ['pandas', 'lxml', 'xlsxwriter', 'requests', 'jsonschema', 'tensorflow'] if x in sys.modules]
+window.close()
+print(json.dumps({'error': error.code, 'time': duration, 'heavy_modules': heavy}))
+"""
+STARTUP_TIME_LIMIT = 10   # seconds, it is much less usually but test environment may be slow
+
+
+def test_startup_time(tmp_path, project_root):
+    # Create database in advance as it isn't a part of usual application start
+    copyfile(project_root + os.sep + 'jal' + os.sep + Setup.INIT_SCRIPT_PATH,
+             str(tmp_path) + os.sep + Setup.INIT_SCRIPT_PATH)
+    error = JalDB().init_db(str(tmp_path) + os.sep)
+    assert error.code == JalDBError.NoError
+    JalDB.connection().close()
+
+    environment = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    process = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, project_root, str(tmp_path) + os.sep],
+                             capture_output=True, text=True, env=environment, timeout=120)
+    assert process.returncode == 0, process.stderr
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    assert result['error'] == JalDBError.NoError
+    assert result['heavy_modules'] == []   # These modules should be imported only when they are used
+    assert result['time'] < STARTUP_TIME_LIMIT
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_query_stats(tmp_path, project_root, monkeypatch, caplog):
+    copyfile(project_root + os.sep + 'jal' + os.sep + Setup.INIT_SCRIPT_PATH,
+             str(tmp_path) + os.sep + Setup.INIT_SCRIPT_PATH)
+    assert JalDB().init_db(str(tmp_path) + os.sep).code == JalDBError.NoError
+    assert normalize_sql("SELECT t1.id FROM t1 WHERE name='it''s'  AND\n value=-1.5 AND id=:id") == \
+           "SELECT t1.id FROM t1 WHERE name=? AND value=? AND id=:id"
+    monkeypatch.setattr(JalDB, "SLOW_QUERY_THRESHOLD", 0)     # all queries will be logged as slow ones
+    monkeypatch.setattr(JalDB, "REPEATED_QUERY_THRESHOLD", 2)
+    assert JalDB.query_stats() is None
+    JalDB.enable_query_stats()
+    for i in range(3):
+        assert JalDB._read(f"SELECT symbol FROM asset_tickers WHERE asset_id={i + 1}") is not None
+    assert JalDB._exec_batch("INSERT INTO tags (tag) VALUES (:tag)", [(":tag", ["A", "B"])]) is not None
+    JalDB.finish_query_action()
+    assert "SQL statement was executed 3 times in one action: 'SELECT symbol FROM asset_tickers WHERE asset_id=?'" \
+           in [x.getMessage() for x in caplog.records if x.levelname == 'WARNING']
+    summary = JalDB.query_stats().summary()
+    statements = {x['sql']: x for x in summary['statements']}
+    assert summary['executions'] == 5
+    assert statements["SELECT symbol FROM asset_tickers WHERE asset_id=?"]['count'] == 3
+    assert statements["SELECT symbol FROM asset_tickers WHERE asset_id=?"]['repeated_in_action'] == 3
+    assert statements["INSERT INTO tags (tag) VALUES (:tag)"]['count'] == 2
+    assert statements["INSERT INTO tags (tag) VALUES (:tag)"]['repeated_in_action'] == 0
+    assert len(summary['slow_queries']) == 4
+    assert "3x: SELECT symbol FROM asset_tickers WHERE asset_id=?" in JalDB.query_stats().report()
+    with open(str(tmp_path) + os.sep + Setup.SLOW_QUERY_LOG, 'r', encoding='utf-8') as log:
+        assert len(log.readlines()) == 4
+    JalDB.enable_query_stats(False)
+    assert JalDB.query_stats() is None
+    JalDB.connection().close()
@@ -0,0 +1,112 @@
+import pytest
+from PySide6.QtCore import Qt, QSortFilterProxyModel
+from PySide6.QtWidgets import QTableView
+
+from tests.fixtures import project_root, data_path, prepare_db, prepare_db_ledger
+from tests.helpers import d2t, create_actions
+from jal.db.db import JalDB
+from jal.db.peer import JalPeer
+from jal.db.ledger import Ledger
+import jal.widgets.reference_dialogs   # it is imported before models in order to resolve circular import of widgets
+from jal.db.operations_model import OperationsModel
+
+OPERATIONS_COUNT = 1201
+MARKET_ROW = 600     # An operation with unique peer that is out of the first fetched batch in any sort order
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture
+def operations_model(prepare_db_ledger, qtbot):
+    JalPeer(data={'name': 'Market', 'parent': 0}, create=True)   # id = 2
+    JalDB.begin_bulk()
+    create_actions([(d2t(220101) + i * 60, 1, 2 if i == MARKET_ROW else 1, [(5, -1.0 - i)])
+                    for i in range(OPERATIONS_COUNT)])
+    JalDB.end_bulk()
+    Ledger().rebuild(from_timestamp=0)
+    view = QTableView()
+    qtbot.addWidget(view)
+    model = OperationsModel(view)
+    view.setModel(model)
+    model.setDateRange(d2t(220101), d2t(221231))
+    yield model
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Rows are exposed to the view by batches
+def test_operations_fetch(operations_model):
+    model = operations_model
+    assert model.rowCount() == OperationsModel.FETCH_BATCH_SIZE
+    assert model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 2 * OperationsModel.FETCH_BATCH_SIZE
+    model.fetchMore()
+    assert model.rowCount() == OPERATIONS_COUNT
+    assert not model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == OPERATIONS_COUNT
+    model.update()    # reset returns model to the first batch
+    assert model.rowCount() == OperationsModel.FETCH_BATCH_SIZE
+    model.fetchAll()
+    assert model.rowCount() == OPERATIONS_COUNT
+    assert not model.canFetchMore()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Prepared rows are kept in LRU cache of limited size
+def test_operations_cache(operations_model, monkeypatch):
+    model = operations_model
+    monkeypatch.setattr(OperationsModel, "CACHE_SIZE", 10)
+    model.invalidate()
+
+    def key(row):
+        return model._data[row]['op_type'], model._data[row]['id'], model._data[row]['subtype']
+
+    for row in range(15):
+        _ = model.data(model.index(row, 3))
+    assert len(model._cache) == 10
+    assert key(4) not in model._cache
+    assert all(key(row) in model._cache for row in range(5, 15))
+    _ = model.data(model.index(5, 3))    # row 5 becomes the most recently used one
+    _ = model.data(model.index(15, 3))
+    assert len(model._cache) == 10
+    assert key(5) in model._cache
+    assert key(6) not in model._cache
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Cached rows are reloaded from DB after invalidation only
+def test_operations_invalidate(operations_model):
+    model = operations_model
+    changes = []
+    model.dataChanged.connect(lambda top_left, bottom_right: changes.append((top_left.row(), bottom_right.row())))
+    index = model.index(0, 3)
+    assert model.data(index) == 'Shop'
+    _ = JalDB._exec("UPDATE agents SET name='Store' WHERE id=1")
+    assert model.data(index) == 'Shop'
+    model.invalidate()
+    assert changes == [(0, OperationsModel.FETCH_BATCH_SIZE - 1)]
+    assert len(model._cache) == 0
+    assert model.data(index) == 'Store'
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Filter is applied to all operations and stays so after model reset
+def test_operations_filter(operations_model):
+    model = operations_model
+    proxy = QSortFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+    proxy.setFilterKeyColumn(-1)
+    proxy.setFilterFixedString("market")
+    assert proxy.rowCount() == 0    # operation wasn't fetched yet
+    model.setFetchAll(True)
+    assert proxy.rowCount() == 1
+    model.update()
+    assert model.rowCount() == OPERATIONS_COUNT
+    assert proxy.rowCount() == 1
+    assert model.get_operation(proxy.mapToSource(proxy.index(0, 0)).row())[1] == MARKET_ROW + 1
+    model.setFetchAll(False)
+    proxy.setFilterFixedString("")
+    model.update()
+    assert model.rowCount() == OperationsModel.FETCH_BATCH_SIZE
+    assert proxy.rowCount() == OperationsModel.FETCH_BATCH_SIZE
@@ -1,4 +1,5 @@
 import json
+from lxml import etree
 
 from tests.fixtures import project_root, data_path, prepare_db, prepare_db_ibkr, prepare_db_xls
 from data_import.broker_statements.ibkr import StatementIBKR
@@ -29,6 +30,17 @@ def test_statement_ibkr(tmp_path, project_root, data_path, prepare_db_ibkr):
     IBKR.load(data_path + 'ibkr_rights_vesting.xml')
     assert IBKR._data == statement
 
+    # Test that result doesn't depend on order of sections in statement
+    with open(data_path + 'ibkr.json', 'r', encoding='utf-8') as json_file:
+        statement = json.load(json_file)
+    xml_root = etree.parse(data_path + 'ibkr.xml')
+    xml_statement = xml_root.find('.//FlexStatement')
+    xml_statement[:] = reversed(list(xml_statement))
+    xml_root.write(str(tmp_path / 'ibkr_reversed.xml'))
+    IBKR = StatementIBKR()
+    IBKR.load(str(tmp_path / 'ibkr_reversed.xml'))
+    assert IBKR._data == statement
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 def test_statement_uralsib(tmp_path, project_root, data_path, prepare_db_xls):